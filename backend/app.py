@@ -1,140 +1,1042 @@
-from flask import Flask, request, jsonify
+from flask import Flask, Response, redirect, request, jsonify, stream_with_context
+import json
 from flask_cors import CORS
-import pytz
-from datetime import datetime
-from timezonefinder import TimezoneFinder
-import swisseph as swe
+import logging
+import math
+import os
+import time
+from datetime import datetime, timedelta
+from urllib.parse import urlencode
 
 # Import the core logic from our new, verified module
-from astrology_core import get_astrological_data, ephe_path_exists
+from astrology_core import get_astrological_data, ephe_path_exists, get_chart_cache, get_ephemeris_table
+from batch import compute_charts, MAX_BATCH_RECORDS
+from timezone_resolver import TimezoneResolver
+from time_conversion import STATUS_NAMES, convert_local_times, local_to_julian_day, parse_local_time
+from warmup import readiness, warm_up
+from transits import TIMELINE_ORB, iter_transit_timeline, natal_points_from_chart
+from rarity import load_rarity_index
+from astrocartography import DEFAULT_LINE_STEP, astrocartography_map
+from unknown_time import MAX_LATITUDE as UNKNOWN_TIME_MAX_LATITUDE, unknown_time_chart
+from metrics import end_request, finish_request, render_prometheus, stage, start_request
+from response_format import ResponseFormat, encode, shape_chart
+from fingerprint import (canonical_birth, canonical_query, chart_fingerprint, engine_version, representation_etag,
+                         validate_coordinates)
+from geocoder import DEFAULT_LIMIT as GEOCODE_DEFAULT_LIMIT, MAX_LIMIT as GEOCODE_MAX_LIMIT, load_geocoder
+from report_store import make_record, store_from_environment
+from report_generation import generator_from_environment
+from jobs import DEFAULT_TIER as DEFAULT_JOB_TIER, FINISHED as JOB_FINISHED, TIERS as JOB_TIERS, \
+    QueueFull, queue_from_environment
 
 app = Flask(__name__)
 CORS(app)  # Enable CORS for all routes
 
-# Initialize timezone finder
-tf = TimezoneFinder()
+logger = logging.getLogger(__name__)
+
+# Longest transit timeline a single request may stream, in days.
+MAX_TIMELINE_DAYS = int(os.environ.get('COSMIC_TIMELINE_MAX_DAYS', 3660))
+
+# Grid-backed timezone resolver; TimezoneFinder is only loaded for border cells
+timezone_resolver = TimezoneResolver()
+
+# Precomputed rarity tables (memory-mapped); None if the index is missing
+rarity_index = load_rarity_index()
+
+# Offline gazetteer for /api/geocode and placeId lookups; None if the index is missing
+geocoder = load_geocoder()
+
+# Reports persisted by chart fingerprint; None if disabled
+report_store = store_from_environment()
+
+# Narrative reports, generated at most once per chart fingerprint and template
+report_generator = generator_from_environment()
+
+# Queue for heavy analyses, run by a separate runner process; None if disabled
+job_queue = queue_from_environment()
+
+# Longest a job status stream stays open, in seconds; it must end well inside
+# the gunicorn worker timeout, and clients reconnect or poll after it.
+JOB_STREAM_SECONDS = float(os.environ.get('COSMIC_JOBS_STREAM_SECONDS', 25))
+JOB_STREAM_INTERVAL = 0.5
+
+# Longest a report stream stays open, in seconds, for the same reason; the
+# client resumes the generation from the offset in the reconnect record.
+REPORT_STREAM_SECONDS = float(os.environ.get('COSMIC_REPORT_STREAM_SECONDS', 25))
+REPORT_STREAM_HEARTBEAT = 1.0
+
+# Identifies everything besides the birth inputs that a chart depends on; part of every ETag
+CHART_ENGINE_VERSION = engine_version(get_ephemeris_table(), rarity_index, geocoder)
+
+# How long browsers and shared caches may reuse a GET chart, in seconds.
+CHART_MAX_AGE = int(os.environ.get('COSMIC_CHART_MAX_AGE', 86400))
+
+# --- Request Instrumentation ---
+
+@app.before_request
+def begin_request_metrics():
+    start_request()
+
+@app.after_request
+def add_server_timing(response):
+    """Records the request in /metrics and reports its stage timings to the client."""
+    server_timing = finish_request(request.endpoint, response.status_code)
+    if server_timing:
+        response.headers['Server-Timing'] = server_timing
+    return response
+
+@app.teardown_request
+def end_request_metrics(error=None):
+    end_request()
 
 # --- Helper Functions for API ---
 
 def get_timezone_from_coordinates(lat, lon):
-    """Get timezone from coordinates using timezonefinder."""
+    """
+    Get timezone from coordinates. Known gazetteer places answer from their
+    precomputed zone; anything else goes to the grid-backed resolver.
+    """
     try:
-        timezone_str = tf.timezone_at(lat=lat, lng=lon)
-        if timezone_str:
-            return timezone_str
-        else:
-            # Fallback to offset-based timezone
-            offset_hours = round(lon / 15)
-            return f"Etc/GMT{-offset_hours if offset_hours >= 0 else f'+{abs(offset_hours)}'}"
+        with stage('timezone'):
+            zone = geocoder.timezone_at(lat, lon) if geocoder is not None else None
+            return zone or timezone_resolver.resolve(lat, lon)
     except Exception as e:
-        print(f"Error getting timezone: {e}")
+        logger.warning("Error getting timezone for (%s, %s): %s", lat, lon, e)
         # Fallback to UTC
         return 'UTC'
 
-def get_julian_day(date_str, time_str, timezone_str):
-    """Convert date, time, and timezone to Julian day."""
+def get_timezones_for_coordinates(lats, lons):
+    """Bulk variant of get_timezone_from_coordinates for batch requests."""
     try:
-        # Parse the date and time
-        date_format = "%Y-%m-%d"
-        time_format = "%H:%M"
-        
-        birth_date = datetime.strptime(date_str, date_format).date()
-        birth_time = datetime.strptime(time_str, time_format).time()
-        
-        # Combine date and time
-        birth_datetime = datetime.combine(birth_date, birth_time)
-        
-        # Apply timezone
-        timezone = pytz.timezone(timezone_str)
-        birth_datetime = timezone.localize(birth_datetime)
-        
-        # Convert to UTC
-        birth_datetime_utc = birth_datetime.astimezone(pytz.UTC)
-        
-        # Calculate Julian day
-        jd = swe.julday(
-            birth_datetime_utc.year,
-            birth_datetime_utc.month,
-            birth_datetime_utc.day,
-            birth_datetime_utc.hour + birth_datetime_utc.minute / 60.0 + birth_datetime_utc.second / 3600.0
-        )
-        
-        return jd
+        if geocoder is None:
+            return timezone_resolver.resolve_many(lats, lons)
+        zones = [geocoder.timezone_at(lat, lon) for lat, lon in zip(lats, lons)]
+        pending = [i for i, zone in enumerate(zones) if zone is None]
+        if pending:
+            resolved = timezone_resolver.resolve_many([lats[i] for i in pending], [lons[i] for i in pending])
+            for i, zone in zip(pending, resolved):
+                zones[i] = zone
+        return zones
     except Exception as e:
-        print(f"Error calculating Julian day: {e}")
-        return None
+        logger.warning("Error resolving timezones in bulk: %s", e)
+        return [get_timezone_from_coordinates(lat, lon) for lat, lon in zip(lats, lons)]
+
+def resolve_julian_day(date_str, time_str, timezone_str):
+    """
+    Convert local date, time, and timezone to a Julian day plus its DST status.
+
+    Returns:
+        tuple: (jd, status) where status is 'ok', 'ambiguous' or 'nonexistent';
+               (None, None) if the input is invalid.
+    """
+    try:
+        with stage('julian_day'):
+            return local_to_julian_day(date_str, time_str, timezone_str)
+    except Exception as e:
+        logger.info("Invalid birth date/time: %s", e)
+        return None, None
+
+def get_julian_day(date_str, time_str, timezone_str):
+    """Convert date, time, and timezone to Julian day."""
+    return resolve_julian_day(date_str, time_str, timezone_str)[0]
+
+def find_place(place_id):
+    """
+    The gazetteer place with this placeId.
+
+    Raises:
+        ValueError: If the id is unknown or the geocoder index is not built.
+    """
+    if geocoder is None:
+        raise ValueError("placeId lookups are unavailable: the geocoder index is not built")
+    place = geocoder.place(place_id)
+    if place is None:
+        raise ValueError(f"Unknown placeId: {place_id}")
+    return place
+
+def parse_birth_place(data):
+    """
+    The validated (latitude, longitude) of a birth record, from its
+    coordinates or from a `placeId` from /api/geocode.
+
+    Raises:
+        ValueError: If the place is unknown or a coordinate is malformed or out of range.
+    """
+    if data.get('placeId') is not None:
+        place = find_place(data['placeId'])
+        return place['latitude'], place['longitude']
+    return validate_coordinates(data.get('latitude'), data.get('longitude'))
+
+def parse_birth_record(data):
+    """
+    Extracts and validates the birth fields shared by the chart endpoints.
+
+    A `placeId` from /api/geocode may stand in for latitude and longitude.
+
+    Returns:
+        tuple: (birth_date, birth_time, latitude, longitude)
+
+    Raises:
+        ValueError: If a field is missing, malformed or out of range.
+    """
+    if not isinstance(data, dict):
+        raise ValueError("Birth record must be a JSON object")
+
+    birth_date = data.get('birthDate')
+    birth_time = data.get('birthTime')
+    if not birth_date or not birth_time:
+        raise ValueError("birthDate and birthTime are required")
+
+    latitude, longitude = parse_birth_place(data)
+    return birth_date, birth_time, latitude, longitude
+
+def build_chart_response(chart_data, birth_date, birth_time, timezone_str, latitude, longitude,
+                         local_time_status='ok'):
+    """Adds the frontend-expected display fields to a core chart."""
+    sun_sign = chart_data['planets']['Sun']['sign']
+    moon_sign = chart_data['planets']['Moon']['sign']
+    ascendant_sign = chart_data['ascendant']['sign']
+    
+    # Format birth data for display, from the values the chart was computed with
+    birth_datetime = datetime(1970, 1, 1) + timedelta(seconds=parse_local_time(birth_date, birth_time))
+    formatted_birth_date = birth_datetime.strftime("%B %d, %Y")
+    formatted_time = birth_datetime.strftime("%I:%M %p")
+
+    with stage('rarity'):
+        rarity = rarity_index.score_chart(chart_data) if rarity_index is not None else None
+    rarity_sentence = (
+        f" This configuration appears in only 1 in {rarity['oneIn']:,} births, marking you as a rare cosmic expression."
+        if rarity else ""
+    )
+    
+    # Add all expected fields
+    chart_data.update({
+        'sunSign': sun_sign,
+        'moonSign': moon_sign,
+        'ascendant': ascendant_sign,
+        'ascendantData': chart_data['ascendant'],
+        'formattedBirthDate': formatted_birth_date,
+        'formattedTime': formatted_time,
+        'overview': f"You emerge as a {sun_sign} Sun with the emotional depths of a {moon_sign} Moon, anchored through a {ascendant_sign} Rising. This trinity forms your cosmic signature—a unique frequency in the symphony of existence. Your air elemental dominance reveals the primary energy through which you interface with reality." + rarity_sentence,
+        'rarity': rarity,
+        'meta': {
+            "birthDate": birth_date,
+            "birthTime": birth_time,
+            "timezone": timezone_str,
+            "localTimeStatus": local_time_status,
+            "coordinates": {
+                "latitude": latitude,
+                "longitude": longitude
+            }
+        }
+    })
+    return chart_data
+
+def response_format_from_request():
+    """The client's ?fields=, ?precision= and Accept choices; raises ValueError if invalid."""
+    return ResponseFormat.from_request(request.args, request.accept_mimetypes)
+
+def formatted_response(payload, response_format):
+    """Encodes a response body in the representation the client negotiated."""
+    with stage('serialize'):
+        body = encode(payload, response_format.mimetype)
+    response = Response(body, mimetype=response_format.mimetype)
+    response.vary.add('Accept')
+    return response
+
+def compute_chart_response(birth_date, birth_time, latitude, longitude, include_harmonics=False):
+    """
+    Resolves the timezone and Julian day of a birth and computes its display chart.
+
+    Returns:
+        tuple: (response data, None) on success, or (None, (error message,
+               HTTP status)) when the input or the server setup is invalid.
+    """
+    # Get timezone based on coordinates
+    timezone_str = get_timezone_from_coordinates(latitude, longitude)
+
+    # Calculate Julian day
+    jd, local_time_status = resolve_julian_day(birth_date, birth_time, timezone_str)
+    if not jd:
+        return None, ("Invalid birth data", 400)
+
+    # Check if ephemeris files exist
+    if not ephe_path_exists():
+        return None, ("Ephemeris data not found on server.", 500)
+
+    # Get all astrological data from the core module; harmonic charts
+    # and midpoints only when asked for
+    chart_data = get_astrological_data(jd, latitude, longitude, include_harmonics=include_harmonics)
+
+    return build_chart_response(
+        chart_data, birth_date, birth_time, timezone_str, latitude, longitude, local_time_status
+    ), None
+
+def stream_records(records, sse_retry=None):
+    """
+    A streaming response of record dicts: NDJSON, or Server-Sent Events (one
+    event per record, named by its `type`) when the client accepts
+    text/event-stream or passes ?format=sse.
+
+    Args:
+        records (iterable): Records, consumed lazily within the request context.
+        sse_retry (int, optional): Milliseconds SSE clients wait before reconnecting.
+    """
+    use_sse = request.args.get('format') == 'sse' or (
+        request.accept_mimetypes.best_match(['application/x-ndjson', 'text/event-stream']) == 'text/event-stream'
+    )
+
+    def generate():
+        if use_sse and sse_retry is not None:
+            yield f"retry: {sse_retry}\n\n"
+        try:
+            for record in records:
+                if use_sse:
+                    yield f"event: {record['type']}\ndata: {json.dumps(record)}\n\n"
+                else:
+                    yield json.dumps(record) + "\n"
+        finally:
+            # A client that disconnects closes this generator; pass that on at once
+            if hasattr(records, 'close'):
+                records.close()
+
+    response = Response(
+        stream_with_context(generate()),
+        mimetype='text/event-stream' if use_sse else 'application/x-ndjson'
+    )
+    response.headers['Cache-Control'] = 'no-cache'
+    # Stop reverse proxies from buffering the stream
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
 
 # --- API Endpoints ---
 
+def timeline_params(data):
+    """
+    Validates a transit timeline request.
+
+    Args:
+        data (dict): `natal` (point name -> longitude) or birth fields, plus
+            optional `startDate`, `days` and `orb`.
+
+    Returns:
+        tuple: (params, error). params holds natal, startDate, startJd, days
+               and orb; error is a (message, status) pair.
+    """
+    if not isinstance(data, dict):
+        return None, ("Expected a JSON object", 400)
+
+    try:
+        days = int(data.get('days', 28))
+        orb = float(data.get('orb', TIMELINE_ORB))
+        start_date = data.get('startDate') or datetime.utcnow().strftime("%Y-%m-%d")
+        start_jd = local_to_julian_day(start_date, "00:00", "UTC")[0]
+    except (TypeError, ValueError):
+        return None, ("Invalid startDate, days or orb", 400)
+    if not 1 <= days <= MAX_TIMELINE_DAYS:
+        return None, (f"days must be between 1 and {MAX_TIMELINE_DAYS}", 400)
+    if not 0 < orb <= 10:
+        return None, ("orb must be between 0 and 10 degrees", 400)
+
+    if isinstance(data.get('natal'), dict):
+        try:
+            natal_points = {str(name): float(lon) % 360.0 for name, lon in data['natal'].items()}
+        except (TypeError, ValueError):
+            return None, ("natal longitudes must be numbers", 400)
+        if not natal_points:
+            return None, ("natal must not be empty", 400)
+    else:
+        try:
+            birth_date, birth_time, latitude, longitude = parse_birth_record(data)
+        except ValueError as e:
+            return None, (str(e), 400)
+        jd, _ = resolve_julian_day(birth_date, birth_time, get_timezone_from_coordinates(latitude, longitude))
+        if not jd:
+            return None, ("Invalid birth data", 400)
+        if not ephe_path_exists():
+            return None, ("Ephemeris data not found on server.", 500)
+        natal_points = natal_points_from_chart(get_astrological_data(jd, latitude, longitude))
+
+    return {"natal": natal_points, "startDate": start_date, "startJd": start_jd, "days": days, "orb": orb}, None
+
+def astrocartography_params(data):
+    """
+    Validates an astrocartography request.
+
+    Args:
+        data (dict): Birth fields plus optional `lineStep` and `fieldStep`.
+
+    Returns:
+        tuple: (params, error). params holds julianDay, lineStep, fieldStep
+               and meta; error is a (message, status) pair.
+    """
+    try:
+        birth_date, birth_time, latitude, longitude = parse_birth_record(data)
+    except ValueError as e:
+        return None, (str(e), 400)
+    try:
+        line_step = float(data.get('lineStep', DEFAULT_LINE_STEP))
+        field_step = float(data['fieldStep']) if data.get('fieldStep') is not None else None
+    except (TypeError, ValueError):
+        return None, ("lineStep and fieldStep must be numbers", 400)
+    if not 0.25 <= line_step <= 10:
+        return None, ("lineStep must be between 0.25 and 10 degrees", 400)
+    if field_step is not None and not 1 <= field_step <= 30:
+        return None, ("fieldStep must be between 1 and 30 degrees", 400)
+
+    timezone_str = get_timezone_from_coordinates(latitude, longitude)
+    jd, local_time_status = resolve_julian_day(birth_date, birth_time, timezone_str)
+    if not jd:
+        return None, ("Invalid birth data", 400)
+
+    if not ephe_path_exists():
+        return None, ("Ephemeris data not found on server.", 500)
+
+    meta = {
+        "birthDate": birth_date,
+        "birthTime": birth_time,
+        "timezone": timezone_str,
+        "localTimeStatus": local_time_status,
+        "julianDay": jd
+    }
+    return {"julianDay": jd, "lineStep": line_step, "fieldStep": field_step, "meta": meta}, None
+
+def report_job_params(data):
+    """
+    Validates a report job: the birth's fingerprint, canonical inputs and
+    chart (from the report store when it has them).
+
+    Returns:
+        tuple: (params, error), error being a (message, status) pair.
+    """
+    try:
+        birth_date, birth_time, latitude, longitude = parse_birth_record(data)
+        canonical = canonical_birth(birth_date, birth_time, latitude, longitude)
+    except ValueError as e:
+        return None, (str(e), 400)
+
+    fingerprint = chart_fingerprint(canonical, CHART_ENGINE_VERSION)
+    stored = report_store.get(fingerprint) if report_store is not None else None
+    if stored is not None:
+        chart = stored['chart']
+    else:
+        chart, error = compute_chart_response(
+            canonical['birthDate'], canonical['birthTime'],
+            float(canonical['latitude']), float(canonical['longitude'])
+        )
+        if error:
+            return None, error
+    return {
+        "fingerprint": fingerprint,
+        "engineVersion": CHART_ENGINE_VERSION,
+        "canonical": canonical,
+        "chart": chart,
+        "templateVersion": report_generator.template_version
+    }, None
+
 @app.route('/api/cosmic-signature', methods=['POST'])
 def cosmic_signature_endpoint():
+    """
+    Computes one chart.
+
+    Query arguments `fields` and `precision` and the Accept header shape the
+    response; see response_format.py.
+    """
     try:
         data = request.json
         
-        # Extract birth data
-        birth_date = data.get('birthDate')
-        birth_time = data.get('birthTime')
-        latitude = float(data.get('latitude'))
-        longitude = float(data.get('longitude'))
-        
-        # Get timezone based on coordinates
-        timezone_str = get_timezone_from_coordinates(latitude, longitude)
+        # Extract birth data and the requested response shape
+        try:
+            birth_date, birth_time, latitude, longitude = parse_birth_record(data)
+            response_format = response_format_from_request()
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
         
-        # Calculate Julian day
-        jd = get_julian_day(birth_date, birth_time, timezone_str)
-        if not jd:
-            return jsonify({"error": "Invalid birth data"}), 400
-            
-        # Check if ephemeris files exist
+        response_data, error = compute_chart_response(
+            birth_date, birth_time, latitude, longitude, include_harmonics=bool(data.get('harmonics'))
+        )
+        if error:
+            return jsonify({"error": error[0]}), error[1]
+        return formatted_response(shape_chart(response_data, response_format), response_format)
+    
+    except Exception as e:
+        logger.exception("Error in cosmic_signature_endpoint")
+        return jsonify({"error": "An internal server error occurred."}), 500
+
+@app.route('/api/cosmic-signature', methods=['GET'])
+def cosmic_signature_get_endpoint():
+    """
+    Cacheable form of the chart endpoint.
+
+    Takes birthDate, birthTime, latitude and longitude (plus harmonics,
+    fields and precision) as query arguments; a placeId may stand in for the
+    coordinates. Requests not in canonical form are redirected to the
+    canonical URL, so each chart has exactly one.
+    Responses carry a strong ETag and Cache-Control, and a matching
+    If-None-Match is answered with 304 before any chart work runs.
+    """
+    try:
+        args = request.args
+        try:
+            latitude, longitude = args.get('latitude'), args.get('longitude')
+            if args.get('placeId'):
+                place = find_place(args['placeId'])
+                latitude, longitude = place['latitude'], place['longitude']
+            canonical = canonical_birth(args.get('birthDate'), args.get('birthTime'), latitude, longitude)
+            response_format = response_format_from_request()
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        include_harmonics = args.get('harmonics', '').lower() in ('1', 'true', 'yes')
+
+        query = canonical_query(canonical, include_harmonics, response_format)
+        cache_control = f"public, max-age={CHART_MAX_AGE}"
+        if list(args.items(multi=True)) != query:
+            response = redirect(f"{request.path}?{urlencode(query, safe=':,')}", code=301)
+            response.headers['Cache-Control'] = cache_control
+            return response
+
+        fingerprint = chart_fingerprint(canonical, CHART_ENGINE_VERSION, include_harmonics)
+        etag = representation_etag(fingerprint, response_format)
+        if request.if_none_match.contains_weak(etag):
+            response = Response(status=304)
+        else:
+            response_data, error = compute_chart_response(
+                canonical['birthDate'], canonical['birthTime'], float(canonical['latitude']),
+                float(canonical['longitude']), include_harmonics
+            )
+            if error:
+                return jsonify({"error": error[0]}), error[1]
+            response = formatted_response(shape_chart(response_data, response_format), response_format)
+
+        response.set_etag(etag)
+        response.headers['Cache-Control'] = cache_control
+        response.vary.add('Accept')
+        return response
+
+    except Exception as e:
+        logger.exception("Error in cosmic_signature_get_endpoint")
+        return jsonify({"error": "An internal server error occurred."}), 500
+
+@app.route('/api/cosmic-signature/batch', methods=['POST'])
+def cosmic_signature_batch_endpoint():
+    """
+    Computes charts for many birth records in one request.
+
+    Accepts either a JSON list of birth records or an object with a `records`
+    list. Each record uses the same fields as /api/cosmic-signature and may
+    carry an `id`, which is echoed back. Results are returned in input order,
+    each holding either `data` or `error`; `fields`, `precision` and the
+    Accept header shape each `data` as for a single chart.
+    """
+    try:
+        data = request.json
+        records = data.get('records') if isinstance(data, dict) else data
+        if not isinstance(records, list) or not records:
+            return jsonify({"error": "Expected a non-empty list of birth records"}), 400
+        try:
+            response_format = response_format_from_request()
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        if len(records) > MAX_BATCH_RECORDS:
+            return jsonify({"error": f"Batch exceeds the limit of {MAX_BATCH_RECORDS} records"}), 413
+
         if not ephe_path_exists():
             return jsonify({"error": "Ephemeris data not found on server."}), 500
 
-        # Get all astrological data from the core module
-        chart_data = get_astrological_data(jd, latitude, longitude)
-        
-        # Add frontend-expected fields
-        sun_sign = chart_data['planets']['Sun']['sign']
-        moon_sign = chart_data['planets']['Moon']['sign']
-        ascendant_sign = chart_data['ascendant']['sign']
-        
-        # Format birth data for display
-        from datetime import datetime
-        birth_datetime = datetime.strptime(f"{birth_date} {birth_time}", "%Y-%m-%d %H:%M")
-        formatted_birth_date = birth_datetime.strftime("%B %d, %Y")
-        formatted_time = birth_datetime.strftime("%I:%M %p")
-        
-        # Add all expected fields
-        chart_data.update({
-            'sunSign': sun_sign,
-            'moonSign': moon_sign,
-            'ascendant': ascendant_sign,
-            'ascendantData': chart_data['ascendant'],
-            'formattedBirthDate': formatted_birth_date,
-            'formattedTime': formatted_time,
-            'overview': f"You emerge as a {sun_sign} Sun with the emotional depths of a {moon_sign} Moon, anchored through a {ascendant_sign} Rising. This trinity forms your cosmic signature—a unique frequency in the symphony of existence. Your air elemental dominance reveals the primary energy through which you interface with reality. This configuration appears in only 1 in 1728 births, marking you as a rare cosmic expression.",
-            'meta': {
-                "birthDate": birth_date,
-                "birthTime": birth_time,
-                "timezone": timezone_str,
-                "coordinates": {
-                    "latitude": latitude,
-                    "longitude": longitude
-                }
-            }
-        })
-        
-        return jsonify(chart_data)
-    
+        results = [None] * len(records)
+        parsed = {}
+        tasks = []
+
+        valid = []
+        for index, record in enumerate(records):
+            try:
+                valid.append((index, parse_birth_record(record)))
+            except ValueError as e:
+                results[index] = {"error": str(e)}
+
+        # Resolve every timezone in one bulk lookup and convert all local
+        # times to Julian Days in one vectorized pass.
+        timezones = get_timezones_for_coordinates(
+            [fields[2] for _, fields in valid], [fields[3] for _, fields in valid]
+        )
+        julian_days, statuses = convert_local_times(
+            [fields[0] for _, fields in valid], [fields[1] for _, fields in valid], timezones
+        )
+        for (index, (birth_date, birth_time, latitude, longitude)), timezone_str, jd, status in zip(
+                valid, timezones, julian_days.tolist(), statuses.tolist()):
+            if math.isnan(jd):
+                results[index] = {"error": "Invalid birth data"}
+                continue
+
+            parsed[index] = (birth_date, birth_time, timezone_str, latitude, longitude, STATUS_NAMES[status])
+            tasks.append((index, (jd, latitude, longitude)))
+
+        charts = compute_charts([task for _, task in tasks])
+        for (index, _), (chart_data, error) in zip(tasks, charts):
+            if error:
+                results[index] = {"error": error}
+            else:
+                results[index] = {"data": shape_chart(build_chart_response(chart_data, *parsed[index]), response_format)}
+
+        failed = 0
+        for index, (record, result) in enumerate(zip(records, results)):
+            result['index'] = index
+            if isinstance(record, dict) and 'id' in record:
+                result['id'] = record['id']
+            if 'error' in result:
+                failed += 1
+
+        return formatted_response({
+            "count": len(results),
+            "succeeded": len(results) - failed,
+            "failed": failed,
+            "results": results
+        }, response_format)
+
+    except Exception as e:
+        logger.exception("Error in cosmic_signature_batch_endpoint")
+        return jsonify({"error": "An internal server error occurred."}), 500
+
+@app.route('/api/transits/timeline', methods=['POST'])
+def transit_timeline_endpoint():
+    """
+    Streams a day-by-day transit timeline against a natal chart.
+
+    The body carries either `natal` (point name -> longitude) or the birth
+    fields of /api/cosmic-signature, plus `startDate` (YYYY-MM-DD, default
+    today UTC), `days` (default 28) and optionally `orb`. Records are streamed
+    as NDJSON, or as Server-Sent Events when the client accepts
+    text/event-stream or passes ?format=sse.
+    """
+    try:
+        params, error = timeline_params(request.json)
+        if error:
+            return jsonify({"error": error[0]}), error[1]
+        natal_points, start_date, start_jd = params['natal'], params['startDate'], params['startJd']
+        days, orb = params['days'], params['orb']
+
+        def records():
+            yield {"type": "start", "startDate": start_date, "days": days, "natal": natal_points}
+            count = 0
+            try:
+                for record in iter_transit_timeline(natal_points, start_jd, days, orb=orb):
+                    count += 1
+                    yield record
+            except Exception as e:
+                logger.exception("Error streaming transit timeline")
+                yield {"type": "error", "error": "Timeline generation failed"}
+                return
+            yield {"type": "end", "records": count}
+
+        return stream_records(records())
+
+    except Exception as e:
+        logger.exception("Error in transit_timeline_endpoint")
+        return jsonify({"error": "An internal server error occurred."}), 500
+
+@app.route('/api/astrocartography', methods=['POST'])
+def astrocartography_endpoint():
+    """
+    Returns planetary MC/IC/ASC/DSC lines for a birth moment.
+
+    Takes the birth fields of /api/cosmic-signature plus optional `lineStep`
+    (latitude spacing of the ASC/DSC samples, degrees) and `fieldStep`
+    (include the relocated Ascendant/Midheaven grid at this spacing).
+    """
+    try:
+        params, error = astrocartography_params(request.json)
+        if error:
+            return jsonify({"error": error[0]}), error[1]
+        result = astrocartography_map(params['julianDay'], params['lineStep'], params['fieldStep'])
+        result['meta'] = params['meta']
+        return jsonify(result)
+
+    except Exception as e:
+        logger.exception("Error in astrocartography_endpoint")
+        return jsonify({"error": "An internal server error occurred."}), 500
+
+@app.route('/api/cosmic-signature/unknown-time', methods=['POST'])
+def unknown_time_endpoint():
+    """
+    Chart for a birth date without a time.
+
+    Takes `birthDate` and `latitude` and `longitude` (or a `placeId`) and
+    returns the intervals of the local day during which the planet signs,
+    the Ascendant sign and the major aspects hold. Places inside the polar
+    circles are refused: the Ascendant there can jump too far to bracket.
+    """
+    try:
+        data = request.json
+        if not isinstance(data, dict) or not data.get('birthDate'):
+            return jsonify({"error": "birthDate is required"}), 400
+        try:
+            latitude, longitude = parse_birth_place(data)
+            if abs(latitude) > UNKNOWN_TIME_MAX_LATITUDE:
+                raise ValueError(f"Unknown-time charts are limited to latitudes within ±{UNKNOWN_TIME_MAX_LATITUDE:g}°")
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+
+        if not ephe_path_exists():
+            return jsonify({"error": "Ephemeris data not found on server."}), 500
+
+        timezone_str = get_timezone_from_coordinates(latitude, longitude)
+        try:
+            result = unknown_time_chart(data['birthDate'], latitude, longitude, timezone_str)
+        except ValueError:
+            return jsonify({"error": "Invalid birth data"}), 400
+
+        result['meta'] = {
+            "birthDate": data['birthDate'],
+            "timezone": timezone_str,
+            "location": {"latitude": latitude, "longitude": longitude}
+        }
+        return jsonify(result)
+
     except Exception as e:
-        print(f"Error in cosmic_signature_endpoint: {e}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("Error in unknown_time_endpoint")
         return jsonify({"error": "An internal server error occurred."}), 500
 
+@app.route('/api/reports', methods=['POST'])
+def store_report_endpoint():
+    """
+    Finds or creates the stored report for a birth in one round trip.
+
+    Takes a birth record (coordinates or a placeId) plus optional `report`
+    content and `reportVersion`. A stored chart is returned without any
+    ephemeris work; otherwise the chart is computed and stored. A supplied
+    report replaces the stored one, and is never served by
+    /api/reports/generate as a generated report, whatever its version.
+    """
+    try:
+        if report_store is None:
+            return jsonify({"error": "Report storage is disabled on this server."}), 503
+        data = request.json
+        try:
+            birth_date, birth_time, latitude, longitude = parse_birth_record(data)
+            canonical = canonical_birth(birth_date, birth_time, latitude, longitude)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+
+        fingerprint = chart_fingerprint(canonical, CHART_ENGINE_VERSION)
+        report = data.get('report')
+        with stage('report_store'):
+            stored = report_store.get(fingerprint)
+        cached = stored is not None
+
+        if stored is None or report is not None:
+            if stored is None:
+                chart, error = compute_chart_response(
+                    canonical['birthDate'], canonical['birthTime'],
+                    float(canonical['latitude']), float(canonical['longitude'])
+                )
+                if error:
+                    return jsonify({"error": error[0]}), error[1]
+            else:
+                chart = stored['chart']
+            record = make_record(fingerprint, CHART_ENGINE_VERSION, canonical, chart, report, data.get('reportVersion'))
+            with stage('report_store'):
+                stored = report_store.put(record)
+
+        return jsonify(dict(stored, cached=cached))
+
+    except Exception as e:
+        logger.exception("Error in store_report_endpoint")
+        return jsonify({"error": "An internal server error occurred."}), 500
+
+@app.route('/api/reports/<fingerprint>', methods=['GET'])
+def get_report_endpoint(fingerprint):
+    """A stored report by its chart fingerprint."""
+    if report_store is None:
+        return jsonify({"error": "Report storage is disabled on this server."}), 503
+    with stage('report_store'):
+        stored = report_store.get(fingerprint)
+    if stored is None:
+        return jsonify({"error": "Report not found"}), 404
+    return jsonify(stored)
+
+@app.route('/api/reports/generate', methods=['POST'])
+def generate_report_endpoint():
+    """
+    Streams the narrative report for a birth.
+
+    Takes a birth record (coordinates or a placeId). A report already
+    generated under the current template comes back at once; a request for
+    one that is still being generated joins that generation. Records are
+    streamed as NDJSON, or as Server-Sent Events when the client accepts
+    text/event-stream or passes ?format=sse; ?format=json returns the whole
+    report in one response.
+
+    Streams close after REPORT_STREAM_SECONDS with a reconnect record; posting
+    its `generation` and `offset` with the birth record resumes from there.
+    """
+    try:
+        data = request.json
+        try:
+            birth_date, birth_time, latitude, longitude = parse_birth_record(data)
+            canonical = canonical_birth(birth_date, birth_time, latitude, longitude)
+            resume_id = data.get('generation')
+            resume_offset = int(data.get('offset', 0))
+            if resume_offset < 0:
+                raise ValueError("offset must not be negative")
+        except (TypeError, ValueError) as e:
+            return jsonify({"error": str(e)}), 400
+
+        fingerprint = chart_fingerprint(canonical, CHART_ENGINE_VERSION)
+        template_version = report_generator.template_version
+        if report_generator.cached(fingerprint) is None and report_store is not None:
+            with stage('report_store'):
+                stored = report_store.get(fingerprint)
+            if (stored is not None and stored['generatedVersion'] == template_version
+                    and isinstance(stored['report'], str)):
+                report_generator.remember(fingerprint, stored['report'])
+
+        loaded = {}
+
+        def load_chart():
+            # Called only if this request starts the generation
+            stored = report_store.get(fingerprint) if report_store is not None else None
+            if stored is not None:
+                loaded['chart'] = stored['chart']
+            else:
+                chart, error = compute_chart_response(
+                    canonical['birthDate'], canonical['birthTime'],
+                    float(canonical['latitude']), float(canonical['longitude'])
+                )
+                if error:
+                    raise (ValueError if error[1] < 500 else RuntimeError)(error[0])
+                loaded['chart'] = chart
+            return loaded['chart']
+
+        def persist(text):
+            if report_store is not None:
+                report_store.put(make_record(fingerprint, CHART_ENGINE_VERSION, canonical, loaded['chart'],
+                                             text, template_version, generated_version=template_version))
+
+        try:
+            chunks, source, generation_id = report_generator.stream(fingerprint, load_chart, persist,
+                                                                     heartbeat=REPORT_STREAM_HEARTBEAT)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        resumed = resume_id is not None and resume_id == generation_id
+        start = {"type": "start", "fingerprint": fingerprint, "templateVersion": template_version,
+                 "cached": source == "cache", "generation": generation_id, "resumed": resumed}
+        deadline = time.monotonic() + REPORT_STREAM_SECONDS
+
+        if request.args.get('format') == 'json':
+            parts = []
+            try:
+                for chunk in chunks:
+                    if chunk is not None:
+                        parts.append(chunk)
+                    elif time.monotonic() >= deadline:
+                        # Still generating; it finishes in the background and is stored
+                        response = jsonify({"fingerprint": fingerprint, "templateVersion": template_version,
+                                            "generation": generation_id, "status": "generating"})
+                        response.headers['Retry-After'] = '5'
+                        return response, 202
+            except (RuntimeError, TimeoutError):
+                logger.exception("Error generating report")
+                return jsonify({"error": "Report generation failed"}), 502
+            return jsonify({"fingerprint": fingerprint, "templateVersion": template_version,
+                            "cached": start["cached"], "report": ''.join(parts)})
+
+        def records():
+            yield start
+            # Characters of the report read so far; those before the offset were already sent
+            position = 0
+            skip = resume_offset if resumed else 0
+            try:
+                for chunk in chunks:
+                    if chunk:
+                        position += len(chunk)
+                        if skip:
+                            cut = min(skip, len(chunk))
+                            chunk, skip = chunk[cut:], skip - cut
+                        if chunk:
+                            yield {"type": "token", "text": chunk}
+                    if time.monotonic() >= deadline:
+                        yield {"type": "reconnect", "generation": generation_id, "offset": position}
+                        return
+            except (RuntimeError, TimeoutError):
+                logger.exception("Error streaming report")
+                yield {"type": "error", "error": "Report generation failed"}
+                return
+            yield {"type": "end", "length": position}
+
+        return stream_records(records())
+
+    except Exception as e:
+        logger.exception("Error in generate_report_endpoint")
+        return jsonify({"error": "An internal server error occurred."}), 500
+
+# Request validation for each job kind; see jobs.HANDLERS for what runs them.
+JOB_PARAMS = {
+    "transits": timeline_params,
+    "astrocartography": astrocartography_params,
+    "report": report_job_params,
+}
+
+@app.route('/api/jobs', methods=['POST'])
+def submit_job_endpoint():
+    """
+    Queues a heavy analysis and returns its id at once (202).
+
+    The body carries `kind` (transits, astrocartography or report) and the
+    fields of the matching endpoint. The X-Cosmic-Tier header (premium,
+    standard or free, set by the gateway) orders the queue. A full queue
+    answers 429 with Retry-After.
+    """
+    try:
+        if job_queue is None:
+            return jsonify({"error": "Background jobs are disabled on this server."}), 503
+        data = request.json
+        if not isinstance(data, dict):
+            return jsonify({"error": "Expected a JSON object"}), 400
+        kind = data.get('kind')
+        if kind not in JOB_PARAMS:
+            return jsonify({"error": f"kind must be one of {', '.join(JOB_PARAMS)}"}), 400
+        tier = request.headers.get('X-Cosmic-Tier', DEFAULT_JOB_TIER).lower()
+        if tier not in JOB_TIERS:
+            return jsonify({"error": f"X-Cosmic-Tier must be one of {', '.join(JOB_TIERS)}"}), 400
+
+        params, error = JOB_PARAMS[kind](data)
+        if error:
+            return jsonify({"error": error[0]}), error[1]
+
+        try:
+            job = job_queue.submit(kind, params, tier)
+        except QueueFull as e:
+            response = jsonify({"error": "The job queue is full; try again later.", "retryAfter": e.retry_after})
+            response.headers['Retry-After'] = str(e.retry_after)
+            return response, 429
+
+        response = jsonify(job)
+        response.headers['Location'] = f"/api/jobs/{job['id']}"
+        return response, 202
+
+    except Exception as e:
+        logger.exception("Error in submit_job_endpoint")
+        return jsonify({"error": "An internal server error occurred."}), 500
+
+@app.route('/api/jobs/<job_id>', methods=['GET'])
+def get_job_endpoint(job_id):
+    """A job's status, and its result once it has succeeded."""
+    if job_queue is None:
+        return jsonify({"error": "Background jobs are disabled on this server."}), 503
+    job = job_queue.get(job_id)
+    if job is None:
+        return jsonify({"error": "Job not found"}), 404
+    response = jsonify(job)
+    response.headers['Cache-Control'] = 'no-store'
+    if job['status'] not in JOB_FINISHED:
+        # Polling hint for clients
+        response.headers['Retry-After'] = '1'
+    return response
+
+@app.route('/api/jobs/<job_id>', methods=['DELETE'])
+def cancel_job_endpoint(job_id):
+    """
+    Cancels a job. A queued job is cancelled at once; a running one is
+    marked `cancelRequested` and terminated by its runner within a second.
+    """
+    if job_queue is None:
+        return jsonify({"error": "Background jobs are disabled on this server."}), 503
+    job = job_queue.cancel(job_id)
+    if job is None:
+        return jsonify({"error": "Job not found"}), 404
+    if job['status'] in JOB_FINISHED and job['status'] != "cancelled":
+        return jsonify(dict(job, error=f"Job already {job['status']}")), 409
+    return jsonify(job)
+
+@app.route('/api/jobs/<job_id>/stream', methods=['GET'])
+def stream_job_endpoint(job_id):
+    """
+    Streams a job's status changes, ending with the finished job and its
+    result. Records are NDJSON, or Server-Sent Events when the client
+    accepts text/event-stream or passes ?format=sse. A stream is closed
+    after COSMIC_JOBS_STREAM_SECONDS with a `reconnect` record; SSE clients
+    reconnect on their own.
+    """
+    if job_queue is None:
+        return jsonify({"error": "Background jobs are disabled on this server."}), 503
+    if job_queue.get(job_id, include_result=False) is None:
+        return jsonify({"error": "Job not found"}), 404
+
+    def records():
+        deadline = time.monotonic() + JOB_STREAM_SECONDS
+        last = None
+        while True:
+            job = job_queue.get(job_id, include_result=False)
+            if job is None:
+                yield {"type": "error", "error": "Job not found"}
+                return
+            if job['status'] in JOB_FINISHED:
+                yield dict(job_queue.get(job_id), type="end")
+                return
+            state = (job['status'], job.get('position'), job['cancelRequested'])
+            if state != last:
+                yield dict(job, type="status")
+                last = state
+            if time.monotonic() >= deadline:
+                yield {"type": "reconnect", "id": job_id}
+                return
+            time.sleep(JOB_STREAM_INTERVAL)
+
+    return stream_records(records(), sse_retry=1000)
+
+@app.route('/api/geocode', methods=['GET'])
+def geocode_endpoint():
+    """
+    Place-name autocomplete from the offline gazetteer.
+
+    Query arguments: `q`, a name prefix optionally followed by comma-separated
+    region or country qualifiers, and `limit`. Each result carries a placeId
+    that the chart endpoints accept in place of coordinates.
+    """
+    query = request.args.get('q', '').strip()
+    if not query:
+        return jsonify({"error": "q is required"}), 400
+    try:
+        limit = int(request.args.get('limit', GEOCODE_DEFAULT_LIMIT))
+    except ValueError:
+        return jsonify({"error": "limit must be an integer"}), 400
+    if not 1 <= limit <= GEOCODE_MAX_LIMIT:
+        return jsonify({"error": f"limit must be between 1 and {GEOCODE_MAX_LIMIT}"}), 400
+    if geocoder is None:
+        return jsonify({"error": "Geocoder index not found on server."}), 503
+
+    with stage('geocode'):
+        results = geocoder.search(query, limit)
+    response = jsonify({"query": query, "results": results})
+    response.headers['Cache-Control'] = f"public, max-age={CHART_MAX_AGE}"
+    return response
+
+@app.route('/metrics', methods=['GET'])
+def metrics_endpoint():
+    """Stage latency histograms, request counts and cache hit ratios for Prometheus, summed over all workers."""
+    return Response(render_prometheus(), mimetype='text/plain; version=0.0.4')
+
 @app.route('/health', methods=['GET'])
 def health_check():
-    """Health check endpoint."""
-    return jsonify({"status": "healthy", "service": "cosmic-signature-api"}), 200
+    """Health check endpoint; reports 503 until this worker has warmed up."""
+    worker = readiness()
+    status = {
+        "status": "healthy" if worker["ready"] else "starting",
+        "service": "cosmic-signature-api",
+        "worker": worker
+    }
+    cache = get_chart_cache()
+    if cache is not None:
+        status["chartCache"] = cache.stats()
+    status["timezoneResolver"] = timezone_resolver.stats()
+    if geocoder is not None:
+        status["geocoder"] = {"places": len(geocoder)}
+    status["reportGenerator"] = report_generator.stats()
+    if job_queue is not None:
+        status["jobs"] = job_queue.stats()
+    return jsonify(status), 200 if worker["ready"] else 503
 
 if __name__ == '__main__':
+    # Development server; production runs under gunicorn (see gunicorn.conf.py)
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    warm_up(timezone_resolver)
     app.run(host='0.0.0.0', port=5000, debug=True)
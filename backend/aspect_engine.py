@@ -0,0 +1,281 @@
+#!/usr/bin/env python3
+"""
+aspect_engine.py: Vectorized aspect detection.
+
+Aspects are found by computing the full separation matrix between two sets
+of ecliptic longitudes in one NumPy expression and testing it against every
+configured aspect angle at once. The same kernel serves three shapes:
+
+- one chart against itself (natal aspects, upper triangle only),
+- one position set against another (natal vs transit, chart A vs chart B),
+- a stack of charts, where leading array dimensions are charts.
+
+find_parallels applies the same selection to declinations, for parallels
+and contraparallels.
+
+Nothing here touches Swiss Ephemeris; callers supply longitudes (and
+optionally daily speeds, for applying/separating) as arrays.
+"""
+
+from collections import namedtuple
+
+import numpy as np
+
+# --- Aspect Definitions ---
+
+Aspect = namedtuple('Aspect', ['name', 'angle', 'orb'])
+
+# The five Ptolemaic aspects with the single 8° orb the API has always used.
+MAJOR_ASPECTS = (
+    Aspect("Conjunction", 0.0, 8.0),
+    Aspect("Sextile", 60.0, 8.0),
+    Aspect("Square", 90.0, 8.0),
+    Aspect("Trine", 120.0, 8.0),
+    Aspect("Opposition", 180.0, 8.0),
+)
+
+MINOR_ASPECTS = (
+    Aspect("Semi-sextile", 30.0, 2.0),
+    Aspect("Semi-square", 45.0, 2.0),
+    Aspect("Quintile", 72.0, 2.0),
+    Aspect("Sesquiquadrate", 135.0, 2.0),
+    Aspect("Quincunx", 150.0, 3.0),
+)
+
+# Declination aspects, tested by find_parallels rather than by angle:
+# equal declinations (parallel) or equal and opposite (contraparallel).
+DECLINATION_ASPECTS = (
+    Aspect("Parallel", 0.0, 1.0),
+    Aspect("Contraparallel", 0.0, 1.0),
+)
+
+class AspectConfig:
+    """
+    A set of aspects plus optional per-planet orb scaling.
+
+    Args:
+        aspects (sequence): Aspect tuples to detect.
+        planet_orb_factors (dict, optional): Planet name -> multiplier applied
+            to every aspect orb involving that planet. When two planets both
+            have factors, the larger one wins (the customary "wider luminary
+            orb" rule). Planets not listed use 1.0.
+    """
+
+    def __init__(self, aspects=MAJOR_ASPECTS, planet_orb_factors=None):
+        self.aspects = tuple(aspects)
+        self.planet_orb_factors = dict(planet_orb_factors or {})
+        self.names = [aspect.name for aspect in self.aspects]
+        self.angles = np.array([aspect.angle for aspect in self.aspects], dtype=np.float64)
+        self.orbs = np.array([aspect.orb for aspect in self.aspects], dtype=np.float64)
+
+    def orb_matrix(self, names_a=None, names_b=None):
+        """
+        Effective orbs for every (planet a, planet b, aspect) combination.
+
+        Returns:
+            ndarray: Shape (n, m, k), or (1, 1, k) when no per-planet factors apply.
+        """
+        if not self.planet_orb_factors or names_a is None:
+            return self.orbs[None, None, :]
+        names_b = names_a if names_b is None else names_b
+        factor_a = np.array([self.planet_orb_factors.get(name, 1.0) for name in names_a])
+        factor_b = np.array([self.planet_orb_factors.get(name, 1.0) for name in names_b])
+        factor = np.maximum(factor_a[:, None], factor_b[None, :])
+        return factor[:, :, None] * self.orbs[None, None, :]
+
+DEFAULT_CONFIG = AspectConfig()
+
+DECLINATION_CONFIG = AspectConfig(DECLINATION_ASPECTS)
+
+# --- Kernel ---
+
+AspectMatrix = namedtuple('AspectMatrix', ['aspect', 'orb', 'separation', 'applying'])
+AspectMatrix.__doc__ = """
+Result of `find_aspects`, with shape (..., n, m) for every field.
+
+aspect      int8 index into config.aspects, or -1 where no aspect holds
+orb         distance from exact in degrees (NaN where no aspect holds)
+separation  shorter-arc separation in degrees, 0..180
+applying    True where the aspect is tightening; None if no speeds were given
+"""
+
+def signed_separation(lon_a, lon_b):
+    """Signed shorter-arc difference lon_b - lon_a for every pair, in (-180, 180]."""
+    lon_a = np.asarray(lon_a, dtype=np.float64)
+    lon_b = np.asarray(lon_b, dtype=np.float64)
+    delta = (lon_b[..., None, :] - lon_a[..., :, None]) % 360.0
+    return np.where(delta > 180.0, delta - 360.0, delta)
+
+def separation_matrix(lon_a, lon_b=None):
+    """
+    Shorter-arc separation between every pair of longitudes.
+
+    Args:
+        lon_a (array-like): Shape (..., n).
+        lon_b (array-like, optional): Shape (..., m); defaults to `lon_a`.
+
+    Returns:
+        ndarray: Shape (..., n, m), values in 0..180.
+    """
+    return np.abs(signed_separation(lon_a, lon_a if lon_b is None else lon_b))
+
+def _closest_within(deviation, orbs, same_set):
+    """
+    Picks, per pair, the aspect closest to exact among those within orb.
+
+    Args:
+        deviation (ndarray): Distance from exact, shape (..., n, m, k).
+        orbs (ndarray): Orbs broadcastable to `deviation`.
+        same_set (bool): Keep only pairs i < j.
+
+    Returns:
+        tuple: (best, aspect, orb, found), each of shape (..., n, m).
+    """
+    deviation = np.where(deviation <= orbs, deviation, np.inf)
+    best = deviation.argmin(axis=-1)
+    orb = np.take_along_axis(deviation, best[..., None], axis=-1)[..., 0]
+    found = np.isfinite(orb)
+    if same_set:
+        n = deviation.shape[-2]
+        found &= np.triu(np.ones((n, n), dtype=bool), k=1)
+
+    aspect = np.where(found, best, -1).astype(np.int8)
+    orb = np.where(found, orb, np.nan)
+    return best, aspect, orb, found
+
+def find_aspects(lon_a, lon_b=None, speed_a=None, speed_b=None,
+                 names_a=None, names_b=None, config=DEFAULT_CONFIG):
+    """
+    Detects aspects between two position sets, or within one.
+
+    Leading dimensions broadcast, so a (charts, n) stack can be tested against
+    a single (m,) transit vector without copying it per chart. When `lon_b`
+    is omitted the set is compared with itself and only pairs i < j count.
+
+    Where several aspects fall within orb (possible with minor aspects), the
+    one closest to exact is reported.
+
+    Args:
+        lon_a, lon_b (array-like): Ecliptic longitudes, shapes (..., n) and (..., m).
+        speed_a, speed_b (array-like, optional): Daily longitude speeds with the
+            same shapes. Both are needed to classify applying/separating.
+        names_a, names_b (list, optional): Planet names, used for orb factors.
+        config (AspectConfig): The aspects and orbs to test.
+
+    Returns:
+        AspectMatrix: Per-pair results, each of shape (..., n, m).
+    """
+    same_set = lon_b is None
+    if same_set:
+        lon_b, speed_b, names_b = lon_a, speed_a, names_a
+
+    delta = signed_separation(lon_a, lon_b)
+    separation = np.abs(delta)
+
+    deviation = np.abs(separation[..., None] - config.angles)
+    best, aspect, orb, found = _closest_within(deviation, config.orb_matrix(names_a, names_b), same_set)
+
+    applying = None
+    if speed_a is not None and speed_b is not None:
+        speed_a = np.asarray(speed_a, dtype=np.float64)
+        speed_b = np.asarray(speed_b, dtype=np.float64)
+        # d(separation)/dt, then whether that moves us towards the exact angle
+        separation_rate = np.sign(delta) * (speed_b[..., None, :] - speed_a[..., :, None])
+        exact_angle = config.angles[best]
+        applying = found & (np.sign(separation - exact_angle) * separation_rate < 0)
+
+    return AspectMatrix(aspect, orb, separation, applying)
+
+def find_parallels(dec_a, dec_b=None, speed_a=None, speed_b=None,
+                   names_a=None, names_b=None, config=DECLINATION_CONFIG):
+    """
+    Detects parallels and contraparallels of declination.
+
+    The declination counterpart of find_aspects, with the same shapes and
+    broadcasting: a parallel is |dec_a - dec_b| within orb, a
+    contraparallel |dec_a + dec_b|. The config's first aspect is taken as
+    the parallel and its second as the contraparallel; their angles are
+    not used.
+
+    Args:
+        dec_a, dec_b (array-like): Declinations, shapes (..., n) and (..., m).
+        speed_a, speed_b (array-like, optional): Daily declination speeds.
+        names_a, names_b (list, optional): Planet names, used for orb factors.
+        config (AspectConfig): Parallel and contraparallel orbs.
+
+    Returns:
+        AspectMatrix: Per-pair results; `separation` holds ||dec_a| - |dec_b||,
+                      the quantity both aspects bring to zero.
+    """
+    same_set = dec_b is None
+    if same_set:
+        dec_b, speed_b, names_b = dec_a, speed_a, names_a
+    dec_a = np.asarray(dec_a, dtype=np.float64)[..., :, None]
+    dec_b = np.asarray(dec_b, dtype=np.float64)[..., None, :]
+
+    difference = dec_b - dec_a
+    total = dec_b + dec_a
+    deviation = np.stack([np.abs(difference), np.abs(total)], axis=-1)
+    best, aspect, orb, found = _closest_within(deviation, config.orb_matrix(names_a, names_b)[..., :2], same_set)
+    separation = np.abs(np.abs(dec_b) - np.abs(dec_a))
+
+    applying = None
+    if speed_a is not None and speed_b is not None:
+        speed_a = np.asarray(speed_a, dtype=np.float64)[..., :, None]
+        speed_b = np.asarray(speed_b, dtype=np.float64)[..., None, :]
+        rate = np.where(best == 0,
+                        np.sign(difference) * (speed_b - speed_a),
+                        np.sign(total) * (speed_b + speed_a))
+        applying = found & (rate < 0)
+
+    return AspectMatrix(aspect, orb, separation, applying)
+
+def aspect_hits(matrix):
+    """
+    Index arrays for every detected aspect.
+
+    Returns:
+        tuple: One index array per dimension of the matrix (as np.nonzero),
+               e.g. (chart, i, j) for a stack.
+    """
+    return np.nonzero(matrix.aspect >= 0)
+
+def aspect_records(matrix, names_a, names_b=None, config=DEFAULT_CONFIG):
+    """
+    Formats a single chart's AspectMatrix as the API's list of aspect dicts.
+
+    Args:
+        matrix (AspectMatrix): Result for one chart, fields of shape (n, m).
+        names_a, names_b (list): Planet names for rows and columns.
+
+    Returns:
+        list: Aspect dictionaries ordered by row then column.
+    """
+    names_b = names_a if names_b is None else names_b
+    rows, cols = aspect_hits(matrix)
+
+    # Pull every field out as Python lists once; per-element NumPy indexing
+    # would dominate the cost for a single chart.
+    aspects = matrix.aspect[rows, cols].tolist()
+    separations = matrix.separation[rows, cols].tolist()
+    orbs = matrix.orb[rows, cols].tolist()
+    applying = matrix.applying[rows, cols].tolist() if matrix.applying is not None else None
+
+    records = []
+    for n, (i, j) in enumerate(zip(rows.tolist(), cols.tolist())):
+        planet1 = names_a[i]
+        planet2 = names_b[j]
+        aspect_name = config.names[aspects[n]]
+        record = {
+            "planet1": planet1,
+            "planet2": planet2,
+            "aspect": aspect_name,
+            "angle": round(separations[n], 2),
+            "orb": round(orbs[n], 2),
+            "planets": f"{planet1} {aspect_name} {planet2}",
+            "influence": f"{planet1} forms a {aspect_name.lower()} with {planet2}"
+        }
+        if applying is not None:
+            record["applying"] = applying[n]
+        records.append(record)
+    return records
@@ -0,0 +1,238 @@
+#!/usr/bin/env python3
+"""
+aspect_patterns.py: Multi-planet aspect configurations.
+
+The aspect graph of a chart is stored as one bitmask per planet and aspect
+type: bit j of trine[i] is set when planets i and j are in trine. Pattern
+searches then become a few ANDs per candidate, e.g. the planets that
+complete a Grand Trine on the trine (i, j) are the set bits of
+trine[i] & trine[j].
+
+Two entry points share these definitions:
+
+- find_patterns lists the configurations of one chart, walking set bits
+  with Python integers;
+- pattern_counts counts them for a (charts, planets) stack, running the same
+  searches as NumPy operations over the chart axis; a million charts take
+  about 20 seconds on one core, most of it in find_aspects.
+
+Each configuration is reported once, however many ways its vertices could
+be ordered.
+"""
+
+import numpy as np
+
+from aspect_engine import MAJOR_ASPECTS, MINOR_ASPECTS, AspectConfig, find_aspects
+
+# --- Constants and Configuration ---
+
+# The major aspects plus the quincunx, which Yods need.
+PATTERN_CONFIG = AspectConfig(
+    MAJOR_ASPECTS + tuple(aspect for aspect in MINOR_ASPECTS if aspect.name == "Quincunx")
+)
+
+PATTERNS = ("Grand Trine", "T-Square", "Grand Cross", "Yod", "Mystic Rectangle", "Kite")
+
+# Bitsets are uint32.
+MAX_POINTS = 32
+
+# Charts per find_aspects call in pattern_counts; bounds the (chunk, n, n, k)
+# temporaries to a few tens of megabytes.
+CHARTS_PER_CHUNK = 20000
+
+# Set bits of every 16-bit value, for popcount on NumPy < 2.0.
+_POPCOUNT16 = np.array([bin(value).count('1') for value in range(1 << 16)], dtype=np.uint8)
+
+# --- Helper Functions ---
+
+def _popcount(bits):
+    """Number of set bits of each element of a uint32 array."""
+    return _POPCOUNT16[bits & 0xFFFF].astype(np.int32) + _POPCOUNT16[bits >> 16]
+
+def _set_bits(bits):
+    """Indices of the set bits of a Python integer, ascending."""
+    while bits:
+        low = bits & -bits
+        yield low.bit_length() - 1
+        bits ^= low
+
+def _above(index, count):
+    """Mask of the bits above `index` among `count` points."""
+    return ((1 << count) - 1) & ~((1 << (index + 1)) - 1)
+
+def adjacency_bitsets(aspect, config=PATTERN_CONFIG):
+    """
+    Per-aspect adjacency bitsets from a find_aspects result.
+
+    Args:
+        aspect (ndarray): AspectMatrix.aspect of a chart compared with
+            itself, shape (..., n, n) with hits in the upper triangle.
+        config (AspectConfig): The config the matrix was computed with.
+
+    Returns:
+        dict: Aspect name -> uint32 array of shape (..., n); bit j of
+              element i is set when planets i and j form that aspect.
+    """
+    count = aspect.shape[-1]
+    if count > MAX_POINTS:
+        raise ValueError(f"At most {MAX_POINTS} points are supported, got {count}")
+    weights = np.left_shift(np.uint32(1), np.arange(count, dtype=np.uint32))
+    bitsets = {}
+    for index, name in enumerate(config.names):
+        hit = aspect == index
+        hit = hit | np.swapaxes(hit, -1, -2)
+        bitsets[name] = (hit * weights).sum(axis=-1, dtype=np.uint32)
+    return bitsets
+
+# --- Single Chart ---
+
+def find_patterns(longitudes, names, config=PATTERN_CONFIG):
+    """
+    Lists the aspect configurations in one chart.
+
+    Args:
+        longitudes (array-like): Shape (n,).
+        names (list): Point names, matching `longitudes`.
+        config (AspectConfig): Must define Trine, Square, Opposition,
+            Sextile and Quincunx.
+
+    Returns:
+        list: Dicts with `pattern`, `planets` (in order around the figure)
+              and, for T-Squares, Yods and Kites, the `apex` planet.
+    """
+    matrix = find_aspects(longitudes, names_a=names, config=config)
+    bitsets = adjacency_bitsets(matrix.aspect, config)
+    trine, square, opposition, sextile, quincunx = (
+        [int(bits) for bits in bitsets[name].tolist()]
+        for name in ("Trine", "Square", "Opposition", "Sextile", "Quincunx")
+    )
+    n = len(names)
+    found = []
+
+    def record(pattern, vertices, apex=None):
+        entry = {"pattern": pattern, "planets": [names[v] for v in vertices]}
+        if apex is not None:
+            entry["apex"] = names[apex]
+        found.append(entry)
+
+    for a in range(n):
+        above_a = _above(a, n)
+        for b in _set_bits(trine[a] & above_a):
+            for c in _set_bits(trine[a] & trine[b] & _above(b, n)):
+                record("Grand Trine", (a, b, c))
+        for c in _set_bits(opposition[a] & above_a):
+            for apex in _set_bits(square[a] & square[c]):
+                record("T-Square", (a, c, apex), apex)
+            # Four-point figures are reported from their lowest-index vertex
+            cross = square[a] & square[c] & above_a
+            for b in _set_bits(cross):
+                for d in _set_bits(opposition[b] & cross & _above(b, n)):
+                    record("Grand Cross", (a, b, c, d))
+            for b in _set_bits(sextile[a] & trine[c] & above_a):
+                for d in _set_bits(opposition[b] & trine[a] & sextile[c] & above_a):
+                    record("Mystic Rectangle", (a, b, c, d))
+        for b in _set_bits(sextile[a] & above_a):
+            for apex in _set_bits(quincunx[a] & quincunx[b]):
+                record("Yod", (a, b, apex), apex)
+        for tail in _set_bits(opposition[a]):
+            wings = trine[a] & sextile[tail]
+            for b in _set_bits(wings):
+                for c in _set_bits(trine[b] & wings & _above(b, n)):
+                    record("Kite", (a, b, c, tail), a)
+    return found
+
+# --- Chart Stacks ---
+
+def _count_stack(bitsets, n):
+    """Pattern counts for one chunk of bitsets, each (charts, n)."""
+    # Planet-major copies, so each trine[a] below is a contiguous row
+    trine, square, opposition, sextile, quincunx = (
+        np.ascontiguousarray(bitsets[name].T) for name in ("Trine", "Square", "Opposition", "Sextile", "Quincunx")
+    )
+    charts = trine.shape[1]
+    counts = {pattern: np.zeros(charts, dtype=np.int32) for pattern in PATTERNS}
+    above = [np.uint32(_above(index, n)) for index in range(n)]
+
+    def charts_with(bits, index):
+        """Indices of the charts whose `bits` have bit `index` set."""
+        return np.flatnonzero((bits >> np.uint32(index)) & np.uint32(1))
+
+    # Each search narrows to the charts that have the edge it extends, which
+    # is a small fraction for any one planet pair
+    for a in range(n):
+        for b in range(a + 1, n):
+            rows = charts_with(trine[a], b)
+            counts["Grand Trine"][rows] += _popcount(trine[a, rows] & trine[b, rows] & above[b])
+            rows = charts_with(sextile[a], b)
+            counts["Yod"][rows] += _popcount(quincunx[a, rows] & quincunx[b, rows])
+
+        for c in range(n):
+            rows = charts_with(opposition[a], c)
+            if not rows.size:
+                continue
+            if c > a:
+                counts["T-Square"][rows] += _popcount(square[a, rows] & square[c, rows])
+                cross = square[a, rows] & square[c, rows] & above[a]
+                rectangle = sextile[a, rows] & trine[c, rows] & above[a]
+                corners = trine[a, rows] & sextile[c, rows] & above[a]
+                for b in range(a + 1, n):
+                    hit = charts_with(cross, b)
+                    counts["Grand Cross"][rows[hit]] += _popcount(opposition[b, rows[hit]] & cross[hit] & above[b])
+                    hit = charts_with(rectangle, b)
+                    counts["Mystic Rectangle"][rows[hit]] += _popcount(opposition[b, rows[hit]] & corners[hit])
+
+            # Kite with apex a and tail c
+            wings = trine[a, rows] & sextile[c, rows]
+            for b in range(n):
+                hit = charts_with(wings, b)
+                counts["Kite"][rows[hit]] += _popcount(trine[b, rows[hit]] & wings[hit] & above[b])
+    return counts
+
+def pattern_counts(longitudes, names=None, config=PATTERN_CONFIG, chunk=CHARTS_PER_CHUNK):
+    """
+    Counts each configuration in every chart of a stack.
+
+    Args:
+        longitudes (array-like): Shape (charts, n).
+        names (list, optional): Point names, used for per-planet orb factors.
+        config (AspectConfig): As for find_patterns.
+        chunk (int): Charts per vectorized pass.
+
+    Returns:
+        dict: Pattern name -> int32 array of shape (charts,), the number of
+              distinct instances of that pattern in each chart.
+    """
+    longitudes = np.asarray(longitudes, dtype=np.float64)
+    charts, n = longitudes.shape
+    counts = {pattern: np.zeros(charts, dtype=np.int32) for pattern in PATTERNS}
+    for start in range(0, charts, chunk):
+        stop = min(start + chunk, charts)
+        matrix = find_aspects(longitudes[start:stop], names_a=names, config=config)
+        for pattern, values in _count_stack(adjacency_bitsets(matrix.aspect, config), n).items():
+            counts[pattern][start:stop] = values
+    return counts
+
+def pattern_frequencies(longitudes, names=None, config=PATTERN_CONFIG):
+    """
+    Share of charts in a stack that contain each configuration at least once.
+
+    Returns:
+        dict: Pattern name -> fraction of charts.
+    """
+    counts = pattern_counts(longitudes, names, config)
+    return {pattern: float(np.mean(values > 0)) if values.size else 0.0 for pattern, values in counts.items()}
+
+# --- Public API ---
+
+def chart_patterns(planets_data, config=PATTERN_CONFIG):
+    """
+    Aspect configurations among a chart's planets.
+
+    Args:
+        planets_data (dict): Planet name -> data with at least a 'longitude'.
+
+    Returns:
+        list: As for find_patterns.
+    """
+    names = list(planets_data.keys())
+    return find_patterns([planets_data[name]['longitude'] for name in names], names, config)
@@ -0,0 +1,433 @@
+#!/usr/bin/env python3
+"""
+astro_weather.py: Daily "Astro-Weather" batch pipeline.
+
+Every subscriber's daily email needs the day's transits against their natal
+chart. The sky is the same for everyone, so this job computes the transiting
+positions once, then evaluates transit-to-natal aspects for all subscribers
+as NumPy arrays, one chunk of users at a time, streaming results to JSONL or
+SQLite for the email step.
+
+The pipeline has two stages:
+
+1. build-store: converts subscriber birth data into a natal store, i.e. an
+   (N, 12) array of natal longitudes (ten planets, Ascendant, Midheaven)
+   plus the matching user IDs. This is rebuilt only when subscribers change.
+2. run: evaluates one day against the store. Progress is checkpointed after
+   every chunk, so an interrupted run resumes where it stopped.
+
+Usage:
+    python astro_weather.py build-store subscribers.jsonl --store natal_store/
+    python astro_weather.py run --store natal_store/ --date 2026-10-18 --output weather.jsonl
+"""
+
+import argparse
+import json
+import math
+import os
+import sqlite3
+import sys
+import time
+from datetime import datetime, date
+
+import numpy as np
+import swisseph as swe
+
+from aspect_engine import Aspect, AspectConfig, MAJOR_ASPECTS, find_aspects
+from astrology_core import PLANET_IDS, calculate_planetary_positions_many, ephe_path_exists, EPHE_PATH
+from fingerprint import validate_coordinates
+from time_conversion import convert_local_times
+
+# --- Constants and Configuration ---
+
+NATAL_POINTS = list(PLANET_IDS) + ['Ascendant', 'Midheaven']
+TRANSIT_BODIES = list(PLANET_IDS)
+
+# Transits use much tighter orbs than natal aspects.
+DEFAULT_ORB = 2.0
+
+# Users per vectorized chunk. Peak memory is roughly chunk_size * 5 KB.
+DEFAULT_CHUNK_SIZE = 10000
+
+# Daily positions are taken at noon UT, the middle of the day for most subscribers.
+TRANSIT_HOUR_UT = 12.0
+
+# --- Natal Store ---
+
+class NatalStore:
+    """
+    Natal longitudes for every subscriber, memory-mapped from disk.
+
+    Attributes:
+        user_ids (list): Subscriber IDs, aligned with the rows of `longitudes`.
+        longitudes (ndarray): Shape (N, len(NATAL_POINTS)).
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(os.path.join(path, 'user_ids.txt')) as f:
+            self.user_ids = f.read().splitlines()
+        self.longitudes = np.load(os.path.join(path, 'natal_longitudes.npy'), mmap_mode='r')
+        if len(self.user_ids) != len(self.longitudes):
+            raise ValueError(f"Natal store at {path} is inconsistent")
+
+    def __len__(self):
+        return len(self.user_ids)
+
+def _natal_chunk(records):
+    """
+    Computes natal longitudes for a list of parsed subscribers.
+
+    Args:
+        records (list): (user_id, jd_ut, lat, lon) tuples.
+
+    Returns:
+        ndarray: Shape (len(records), len(NATAL_POINTS)).
+    """
+    jds = np.array([record[1] for record in records])
+    positions = calculate_planetary_positions_many(jds)
+    longitudes = np.empty((len(records), len(NATAL_POINTS)))
+    for column, name in enumerate(PLANET_IDS):
+        longitudes[:, column] = positions[name][:, 0]
+    for row, (_, jd_ut, lat, lon) in enumerate(records):
+        _, ascmc = swe.houses(jd_ut, lat, lon, b'P')
+        longitudes[row, -2] = ascmc[0]
+        longitudes[row, -1] = ascmc[1]
+    return longitudes
+
+def _convert_pending(pending, get_timezones):
+    """
+    Converts a chunk of parsed subscribers to natal records in bulk.
+
+    Args:
+        pending (list): (line_number, user_id, birth_date, birth_time, lat, lon) tuples.
+        get_timezones (callable): Bulk coordinate -> zone name lookup.
+
+    Returns:
+        list: (user_id, jd_ut, lat, lon) tuples for the valid subscribers.
+    """
+    zones = get_timezones([record[4] for record in pending], [record[5] for record in pending])
+    jds, _ = convert_local_times([record[2] for record in pending], [record[3] for record in pending], zones)
+
+    records = []
+    for (line_number, user_id, _, _, lat, lon), jd in zip(pending, jds.tolist()):
+        if math.isnan(jd):
+            print(f"Skipping subscriber on line {line_number}: invalid birth date/time", file=sys.stderr)
+            continue
+        records.append((user_id, jd, lat, lon))
+    return records
+
+def build_natal_store(subscribers_path, store_path, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Builds a natal store from a JSONL file of subscribers.
+
+    Each line holds `user_id`, `birthDate`, `birthTime`, `latitude` and
+    `longitude`. Lines that cannot be parsed are skipped and counted.
+
+    Returns:
+        dict: Counts of stored and skipped subscribers.
+    """
+    # Imported here so the daily run does not pay for timezone data it never uses
+    from timezone_resolver import TimezoneResolver
+
+    resolver = TimezoneResolver()
+    os.makedirs(store_path, exist_ok=True)
+    user_ids, blocks, pending = [], [], []
+    skipped = 0
+
+    def flush():
+        nonlocal skipped
+        records = _convert_pending(pending, resolver.resolve_many)
+        skipped += len(pending) - len(records)
+        if records:
+            blocks.append(_natal_chunk(records))
+            user_ids.extend(record[0] for record in records)
+        pending.clear()
+
+    with open(subscribers_path) as f:
+        for line_number, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            try:
+                subscriber = json.loads(line)
+                lat, lon = validate_coordinates(subscriber['latitude'], subscriber['longitude'])
+                pending.append((line_number, str(subscriber['user_id']),
+                                subscriber['birthDate'], subscriber['birthTime'], lat, lon))
+            except (ValueError, KeyError, TypeError) as e:
+                print(f"Skipping subscriber on line {line_number}: {e}", file=sys.stderr)
+                skipped += 1
+                continue
+
+            if len(pending) >= chunk_size:
+                flush()
+
+    if pending:
+        flush()
+
+    longitudes = np.concatenate(blocks) if blocks else np.empty((0, len(NATAL_POINTS)))
+    np.save(os.path.join(store_path, 'natal_longitudes.npy'), longitudes)
+    with open(os.path.join(store_path, 'user_ids.txt'), 'w') as f:
+        f.write('\n'.join(user_ids) + ('\n' if user_ids else ''))
+
+    return {"stored": len(user_ids), "skipped": skipped}
+
+# --- Output Writers ---
+
+class JSONLWriter:
+    """
+    Appends one JSON line per subscriber, checkpointing after every chunk.
+
+    The checkpoint records the byte offset of the last complete chunk; on
+    resume the file is truncated back to it, discarding any partial chunk.
+    """
+
+    def __init__(self, path, run_key, resume=True):
+        self.path = path
+        self.checkpoint_path = path + '.progress.json'
+        self.run_key = run_key
+        self.chunks_done = 0
+        offset = 0
+
+        if resume and os.path.exists(self.checkpoint_path) and os.path.exists(path):
+            with open(self.checkpoint_path) as f:
+                checkpoint = json.load(f)
+            if checkpoint.get('run') == run_key:
+                self.chunks_done = checkpoint['chunks_done']
+                offset = checkpoint['offset']
+
+        self._file = open(path, 'r+b' if offset else 'wb')
+        self._file.truncate(offset)
+        self._file.seek(offset)
+
+    def write_chunk(self, index, rows):
+        lines = []
+        for user_id, day, aspects in rows:
+            lines.append(json.dumps({"user_id": user_id, "date": day, "aspects": aspects}))
+        if lines:
+            self._file.write(('\n'.join(lines) + '\n').encode('utf-8'))
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+        checkpoint = {"run": self.run_key, "chunks_done": index + 1, "offset": self._file.tell()}
+        with open(self.checkpoint_path + '.tmp', 'w') as f:
+            json.dump(checkpoint, f)
+        os.replace(self.checkpoint_path + '.tmp', self.checkpoint_path)
+
+    def close(self, completed):
+        self._file.close()
+        if completed and os.path.exists(self.checkpoint_path):
+            os.remove(self.checkpoint_path)
+
+class SQLiteWriter:
+    """
+    Writes one row per transit aspect; each chunk commits with its checkpoint.
+
+    Rows are tagged with the natal store they were computed from, so runs
+    for other stores sharing the database are left alone when a run restarts.
+    """
+
+    def __init__(self, path, run_key, resume=True):
+        self.run_key = run_key
+        self.store = json.loads(run_key)['store']
+        self.conn = sqlite3.connect(path)
+        self.conn.executescript("""
+            CREATE TABLE IF NOT EXISTS astro_weather (
+                user_id TEXT NOT NULL,
+                date TEXT NOT NULL,
+                transit TEXT NOT NULL,
+                natal TEXT NOT NULL,
+                aspect TEXT NOT NULL,
+                orb REAL NOT NULL,
+                applying INTEGER NOT NULL,
+                store TEXT NOT NULL DEFAULT ''
+            );
+            CREATE INDEX IF NOT EXISTS astro_weather_user ON astro_weather (user_id, date);
+            CREATE TABLE IF NOT EXISTS astro_weather_progress (
+                run TEXT PRIMARY KEY,
+                chunks_done INTEGER NOT NULL
+            );
+        """)
+        # Databases written before rows were tagged; their rows keep an empty store
+        if 'store' not in [column[1] for column in self.conn.execute("PRAGMA table_info(astro_weather)")]:
+            with self.conn:
+                self.conn.execute("ALTER TABLE astro_weather ADD COLUMN store TEXT NOT NULL DEFAULT ''")
+        self.conn.execute("CREATE INDEX IF NOT EXISTS astro_weather_run ON astro_weather (store, date)")
+
+        row = self.conn.execute(
+            "SELECT chunks_done FROM astro_weather_progress WHERE run = ?", (run_key,)
+        ).fetchone()
+        day = json.loads(run_key)['date']
+        if resume and row:
+            self.chunks_done = row[0]
+        else:
+            self.chunks_done = 0
+            with self.conn:
+                self.conn.execute("DELETE FROM astro_weather WHERE store = ? AND date = ?", (self.store, day))
+                self.conn.execute("DELETE FROM astro_weather_progress WHERE run = ?", (run_key,))
+
+    def write_chunk(self, index, rows):
+        values = [
+            (user_id, day, a['transit'], a['natal'], a['aspect'], a['orb'], int(a['applying']), self.store)
+            for user_id, day, aspects in rows for a in aspects
+        ]
+        with self.conn:
+            self.conn.executemany(
+                "INSERT INTO astro_weather (user_id, date, transit, natal, aspect, orb, applying, store) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)", values
+            )
+            self.conn.execute(
+                "INSERT OR REPLACE INTO astro_weather_progress (run, chunks_done) VALUES (?, ?)",
+                (self.run_key, index + 1)
+            )
+
+    def close(self, completed):
+        if completed:
+            with self.conn:
+                self.conn.execute("DELETE FROM astro_weather_progress WHERE run = ?", (self.run_key,))
+        self.conn.close()
+
+def _open_writer(output, run_key, resume):
+    if output.endswith(('.db', '.sqlite', '.sqlite3')):
+        return SQLiteWriter(output, run_key, resume)
+    return JSONLWriter(output, run_key, resume)
+
+# --- Pipeline ---
+
+def compute_sky(day):
+    """
+    Computes the day's transiting positions once.
+
+    Args:
+        day (date): The calendar day (positions are taken at noon UT).
+
+    Returns:
+        tuple: (longitudes, speeds) arrays ordered as TRANSIT_BODIES.
+    """
+    jd = swe.julday(day.year, day.month, day.day, TRANSIT_HOUR_UT)
+    positions = calculate_planetary_positions_many([jd], TRANSIT_BODIES)
+    longitudes = np.array([positions[name][0, 0] for name in TRANSIT_BODIES])
+    speeds = np.array([positions[name][0, 3] for name in TRANSIT_BODIES])
+    return longitudes, speeds
+
+def evaluate_chunk(natal_longitudes, sky_longitudes, sky_speeds, config):
+    """
+    Evaluates transit-to-natal aspects for a block of subscribers.
+
+    Args:
+        natal_longitudes (ndarray): Shape (users, len(NATAL_POINTS)).
+        sky_longitudes, sky_speeds (ndarray): Shape (len(TRANSIT_BODIES),).
+        config (AspectConfig): Aspects and orbs to test.
+
+    Returns:
+        list: One list of aspect dicts per user, in row order.
+    """
+    # Natal points are fixed, so only the transit speeds matter for applying
+    matrix = find_aspects(natal_longitudes, sky_longitudes,
+                          speed_a=np.zeros(natal_longitudes.shape[-1]), speed_b=sky_speeds,
+                          config=config)
+    users, natal_index, transit_index = np.nonzero(matrix.aspect >= 0)
+    aspect_index = matrix.aspect[users, natal_index, transit_index].tolist()
+    orbs = np.round(matrix.orb[users, natal_index, transit_index], 2).tolist()
+    applying = matrix.applying[users, natal_index, transit_index].tolist()
+
+    results = [[] for _ in range(len(natal_longitudes))]
+    for n, (user, i, j) in enumerate(zip(users.tolist(), natal_index.tolist(), transit_index.tolist())):
+        results[user].append({
+            "transit": TRANSIT_BODIES[j],
+            "natal": NATAL_POINTS[i],
+            "aspect": config.names[aspect_index[n]],
+            "orb": orbs[n],
+            "applying": applying[n]
+        })
+    return results
+
+def run_daily_pipeline(store_path, day, output, chunk_size=DEFAULT_CHUNK_SIZE,
+                       orb=DEFAULT_ORB, resume=True, progress=True):
+    """
+    Evaluates one day's transits for every subscriber in a natal store.
+
+    Args:
+        store_path (str): Directory written by build_natal_store.
+        day (date): The day to evaluate.
+        output (str): Destination; *.db/*.sqlite writes SQLite, anything else JSONL.
+        chunk_size (int): Subscribers per vectorized chunk.
+        orb (float): Orb in degrees for every major aspect.
+        resume (bool): Continue an interrupted run of the same day and store.
+        progress (bool): Report progress on stderr.
+
+    Returns:
+        dict: Summary with users processed, aspects found and elapsed seconds.
+    """
+    store = NatalStore(store_path)
+    config = AspectConfig([Aspect(a.name, a.angle, orb) for a in MAJOR_ASPECTS])
+    sky_longitudes, sky_speeds = compute_sky(day)
+    day_str = day.isoformat()
+
+    run_key = json.dumps({
+        "date": day_str,
+        "store": os.path.abspath(store_path),
+        "users": len(store),
+        "chunk_size": chunk_size,
+        "orb": orb
+    }, sort_keys=True)
+    writer = _open_writer(output, run_key, resume)
+
+    total_chunks = -(-len(store) // chunk_size)
+    started = time.perf_counter()
+    aspects_found = 0
+    completed = False
+    try:
+        for index in range(writer.chunks_done, total_chunks):
+            begin = index * chunk_size
+            end = min(begin + chunk_size, len(store))
+            results = evaluate_chunk(np.asarray(store.longitudes[begin:end]), sky_longitudes, sky_speeds, config)
+            aspects_found += sum(len(aspects) for aspects in results)
+            writer.write_chunk(index, [
+                (store.user_ids[begin + row], day_str, aspects) for row, aspects in enumerate(results)
+            ])
+            if progress:
+                processed = end - writer.chunks_done * chunk_size
+                rate = processed / max(time.perf_counter() - started, 1e-9)
+                print(f"[astro-weather {day_str}] chunk {index + 1}/{total_chunks}, "
+                      f"{end}/{len(store)} users, {rate:.0f} users/s", file=sys.stderr)
+        completed = True
+    finally:
+        writer.close(completed)
+
+    return {
+        "date": day_str,
+        "users": len(store),
+        "resumedFromChunk": writer.chunks_done,
+        "aspects": aspects_found,
+        "seconds": round(time.perf_counter() - started, 3)
+    }
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Daily Astro-Weather batch pipeline.")
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    store_parser = sub.add_parser('build-store', help="Compute natal longitudes for all subscribers")
+    store_parser.add_argument('subscribers', help="JSONL file with user_id, birthDate, birthTime, latitude, longitude")
+    store_parser.add_argument('--store', required=True)
+    store_parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE)
+
+    run_parser = sub.add_parser('run', help="Evaluate one day's transits for every subscriber")
+    run_parser.add_argument('--store', required=True)
+    run_parser.add_argument('--date', default=date.today().isoformat(), help="YYYY-MM-DD (default: today)")
+    run_parser.add_argument('--output', required=True, help="*.jsonl or *.db")
+    run_parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE)
+    run_parser.add_argument('--orb', type=float, default=DEFAULT_ORB)
+    run_parser.add_argument('--no-resume', action='store_true', help="Start over even if a checkpoint exists")
+    run_parser.add_argument('--quiet', action='store_true')
+
+    args = parser.parse_args()
+    if not ephe_path_exists():
+        sys.exit(f"Ephemeris data not found at configured path: {EPHE_PATH}")
+
+    if args.command == 'build-store':
+        print(json.dumps(build_natal_store(args.subscribers, args.store, args.chunk_size)))
+    else:
+        day = datetime.strptime(args.date, "%Y-%m-%d").date()
+        summary = run_daily_pipeline(args.store, day, args.output, args.chunk_size, args.orb,
+                                     resume=not args.no_resume, progress=not args.quiet)
+        print(json.dumps(summary))
@@ -0,0 +1,189 @@
+#!/usr/bin/env python3
+"""
+astrocartography.py: Planetary angle lines and relocated angles over the globe.
+
+For a single moment, sidereal time and the obliquity of the ecliptic are the
+same everywhere, so they are computed once (swe.sidtime and one ECL_NUT call)
+and every location is handled with NumPy spherical trigonometry instead of a
+swe.houses call per point:
+
+- MC/IC lines are meridians: a planet culminates where the local sidereal
+  time equals its right ascension.
+- ASC/DSC lines are curves: at latitude φ a planet of declination δ rises
+  and sets at hour angles ∓H0, where cos H0 = -tan φ tan δ. Where
+  |tan φ tan δ| > 1 the planet is circumpolar or never rises.
+- The angle field gives the relocated Ascendant and Midheaven for every
+  point of a lat/lon grid.
+
+Lines are "in mundo" (actual rising, setting and culmination), as on
+conventional astrocartography maps; atmospheric refraction is ignored.
+"""
+
+import numpy as np
+import swisseph as swe
+
+from astrology_core import PLANET_IDS, calculate_planetary_positions_many, ecliptic_to_equatorial, get_obliquity
+
+# --- Constants and Configuration ---
+
+# Rising/setting curves run off to infinity near the poles; maps stop here.
+MAX_LATITUDE = 80.0
+
+DEFAULT_LINE_STEP = 1.0
+DEFAULT_FIELD_STEP = 5.0
+
+# --- Helper Functions ---
+
+def _wrap180(angle):
+    """Wraps angles to [-180, 180)."""
+    return (angle + 180.0) % 360.0 - 180.0
+
+def sky_frame(jd_ut):
+    """
+    The location-independent quantities for one moment.
+
+    Returns:
+        tuple: (Greenwich apparent sidereal time in degrees, true obliquity in degrees)
+    """
+    gast = swe.sidtime(jd_ut) * 15.0
+    obliquity = get_obliquity(jd_ut)
+    return gast, obliquity
+
+def relocated_angles(armc, lat, obliquity):
+    """
+    Ascendant and Midheaven longitudes from local sidereal time.
+
+    Args:
+        armc (array-like): Right ascension of the MC (local sidereal time), degrees.
+        lat (array-like): Geographic latitude, degrees; broadcasts with `armc`.
+        obliquity (float): Obliquity of the ecliptic, degrees.
+
+    Returns:
+        tuple: (ascendant, midheaven) ecliptic longitudes in [0, 360).
+    """
+    armc, lat, eps = np.radians(armc), np.radians(lat), np.radians(obliquity)
+    mc = np.arctan2(np.sin(armc), np.cos(armc) * np.cos(eps))
+    asc = np.arctan2(np.cos(armc), -(np.sin(armc) * np.cos(eps) + np.tan(lat) * np.sin(eps)))
+    return np.degrees(asc) % 360.0, np.degrees(mc) % 360.0
+
+# --- Public API ---
+
+def planet_lines(jd_ut, latitudes=None, names=None):
+    """
+    Computes MC, IC, ASC and DSC lines for every planet.
+
+    Args:
+        jd_ut (float): The Julian Day in Universal Time.
+        latitudes (array-like, optional): Latitudes at which to sample the
+            ASC/DSC curves; defaults to every DEFAULT_LINE_STEP degrees
+            within ±MAX_LATITUDE.
+        names (list, optional): Planets; defaults to all of PLANET_IDS.
+
+    Returns:
+        dict: `latitudes` (the sample latitudes) and `lines`, mapping each
+              planet to `MC` and `IC` (geographic longitudes of the meridian
+              lines) and `ASC` and `DSC` (longitude per sample latitude, NaN
+              where the planet does not rise or set).
+    """
+    if latitudes is None:
+        latitudes = np.arange(-MAX_LATITUDE, MAX_LATITUDE + DEFAULT_LINE_STEP / 2, DEFAULT_LINE_STEP)
+    latitudes = np.asarray(latitudes, dtype=np.float64)
+    names = list(names or PLANET_IDS)
+
+    gast, obliquity = sky_frame(jd_ut)
+    positions = calculate_planetary_positions_many(np.array([jd_ut]), names)
+    lon = np.array([positions[name][0, 0] for name in names])
+    lat = np.array([positions[name][0, 1] for name in names])
+    ra, dec = ecliptic_to_equatorial(lon, lat, obliquity)
+
+    # Culmination: local sidereal time (gast + geographic longitude) == RA
+    mc = _wrap180(ra - gast)
+    ic = _wrap180(mc + 180.0)
+
+    # Semi-diurnal arc for every (planet, latitude) pair at once
+    with np.errstate(invalid='ignore'):
+        cos_h0 = -np.tan(np.radians(latitudes))[None, :] * np.tan(np.radians(dec))[:, None]
+        h0 = np.degrees(np.arccos(np.where(np.abs(cos_h0) <= 1.0, cos_h0, np.nan)))
+    asc = _wrap180(mc[:, None] - h0)
+    dsc = _wrap180(mc[:, None] + h0)
+
+    lines = {}
+    for index, name in enumerate(names):
+        lines[name] = {
+            "MC": float(mc[index]),
+            "IC": float(ic[index]),
+            "ASC": asc[index],
+            "DSC": dsc[index],
+            "rightAscension": float(ra[index]),
+            "declination": float(dec[index])
+        }
+    return {"latitudes": latitudes, "lines": lines}
+
+def angle_field(jd_ut, latitudes, longitudes):
+    """
+    Relocated Ascendant and Midheaven over a latitude/longitude grid.
+
+    Args:
+        jd_ut (float): The Julian Day in Universal Time.
+        latitudes (array-like): Grid latitudes (rows).
+        longitudes (array-like): Grid longitudes (columns).
+
+    Returns:
+        dict: `ascendant`, shape (rows, columns), and `midheaven`, shape
+              (columns,), since the MC depends only on longitude.
+    """
+    latitudes = np.asarray(latitudes, dtype=np.float64)
+    longitudes = np.asarray(longitudes, dtype=np.float64)
+    gast, obliquity = sky_frame(jd_ut)
+    armc = (gast + longitudes) % 360.0
+    asc, _ = relocated_angles(armc[None, :], latitudes[:, None], obliquity)
+    _, mc = relocated_angles(armc, 0.0, obliquity)
+    return {"ascendant": asc, "midheaven": mc}
+
+def _compact(values, decimals):
+    """Rounds an array into a JSON-friendly list, with None for NaN."""
+    rounded = np.round(values, decimals)
+    return [None if value != value else value for value in rounded.tolist()]
+
+def astrocartography_map(jd_ut, line_step=DEFAULT_LINE_STEP, field_step=None, decimals=2):
+    """
+    Builds the JSON payload for the astrocartography endpoint.
+
+    ASC/DSC curves are sent as one longitude array per line against a single
+    shared latitude array, rather than as coordinate pairs.
+
+    Args:
+        jd_ut (float): The Julian Day in Universal Time.
+        line_step (float): Latitude spacing of the ASC/DSC samples, degrees.
+        field_step (float, optional): Grid spacing of the angle field; omitted if None.
+        decimals (int): Rounding of all returned angles.
+
+    Returns:
+        dict: `latitudes`, `lines` and, when requested, `field`.
+    """
+    latitudes = np.arange(-MAX_LATITUDE, MAX_LATITUDE + line_step / 2, line_step)
+    result = planet_lines(jd_ut, latitudes)
+    payload = {
+        "latitudes": _compact(result['latitudes'], decimals),
+        "lines": {
+            name: {
+                "MC": round(line['MC'], decimals),
+                "IC": round(line['IC'], decimals),
+                "ASC": _compact(line['ASC'], decimals),
+                "DSC": _compact(line['DSC'], decimals)
+            }
+            for name, line in result['lines'].items()
+        }
+    }
+
+    if field_step:
+        field_lats = np.arange(-MAX_LATITUDE, MAX_LATITUDE + field_step / 2, field_step)
+        field_lons = np.arange(-180.0, 180.0, field_step)
+        field = angle_field(jd_ut, field_lats, field_lons)
+        payload["field"] = {
+            "latitudes": _compact(field_lats, decimals),
+            "longitudes": _compact(field_lons, decimals),
+            "ascendant": np.round(field['ascendant'], decimals).tolist(),
+            "midheaven": _compact(field['midheaven'], decimals)
+        }
+    return payload
@@ -12,9 +12,16 @@ necessary astrological data. It does one thing, and it does it perfectly.
 """
 
 import swisseph as swe
+import numpy as np
 import os
 from datetime import datetime
 
+from aspect_engine import DECLINATION_CONFIG, DEFAULT_CONFIG, find_aspects, find_parallels, aspect_records
+from aspect_patterns import chart_patterns
+from chart_cache import cache_from_environment
+from ephemeris_table import load_ephemeris_table
+from metrics import record_cache, stage
+
 # --- Constants and Configuration ---
 
 # Ensure the ephemeris path is set correctly
@@ -40,6 +47,14 @@ PLANET_IDS = {
     'Pluto': swe.PLUTO
 }
 
+# Layered planet/house cache shared by every chart computed in this process.
+# Configured from the environment; see chart_cache.cache_from_environment.
+_chart_cache = cache_from_environment()
+
+# Memory-mapped interpolation table for PLANET_IDS, or None if not built.
+# Bodies outside its range or error bound fall back to swe.calc_ut.
+_ephemeris_table = load_ephemeris_table()
+
 # --- Helper Functions ---
 
 def get_zodiac_sign(longitude):
@@ -75,60 +90,166 @@ def get_aspect_name(angle, orb=8):
             return name
     return None
 
-def calculate_aspects(planets_data):
-    """Calculate major aspects between planets."""
-    aspects = []
-    planet_names = list(planets_data.keys())
+def calculate_aspects(planets_data, config=DEFAULT_CONFIG):
+    """
+    Calculate aspects between planets.
     
-    for i, planet1 in enumerate(planet_names):
-        for planet2 in planet_names[i+1:]:
-            lon1 = planets_data[planet1]['longitude']
-            lon2 = planets_data[planet2]['longitude']
-            
-            angle = calculate_aspect_angle(lon1, lon2)
-            aspect_name = get_aspect_name(angle)
-            
-            if aspect_name:
-                aspects.append({
-                    "planet1": planet1,
-                    "planet2": planet2,
-                    "aspect": aspect_name,
-                    "angle": round(angle, 2),
-                    "planets": f"{planet1} {aspect_name} {planet2}",
-                    "influence": f"{planet1} forms a {aspect_name.lower()} with {planet2}"
-                })
+    Args:
+        planets_data (dict): Planet name -> data with at least a 'longitude'.
+            If every planet also carries a 'speed', aspects are marked as
+            applying or separating.
+        config (AspectConfig): Aspects and orbs to test; defaults to the five
+            major aspects with an 8° orb.
+        
+    Returns:
+        list: Aspect dictionaries, one per aspected pair.
+    """
+    names = list(planets_data.keys())
+    longitudes = [planets_data[name]['longitude'] for name in names]
+    speeds = None
+    if all('speed' in planets_data[name] for name in names):
+        speeds = [planets_data[name]['speed'] for name in names]
     
-    return aspects
+    matrix = find_aspects(longitudes, speed_a=speeds, names_a=names, config=config)
+    return aspect_records(matrix, names, config=config)
+
+def calculate_parallels(planets_data, config=DECLINATION_CONFIG):
+    """
+    Parallels and contraparallels of declination between planets.
+
+    Args:
+        planets_data (dict): Planet name -> data with 'declination' and,
+            optionally, 'declinationSpeed' for applying/separating.
+        config (AspectConfig): Parallel and contraparallel orbs.
+
+    Returns:
+        list: Aspect dictionaries in the format of calculate_aspects.
+    """
+    names = list(planets_data.keys())
+    declinations = [planets_data[name]['declination'] for name in names]
+    speeds = None
+    if all('declinationSpeed' in planets_data[name] for name in names):
+        speeds = [planets_data[name]['declinationSpeed'] for name in names]
+
+    matrix = find_parallels(declinations, speed_a=speeds, names_a=names, config=config)
+    return aspect_records(matrix, names, config=config)
 
 # --- Core Calculation Functions ---
 
+def get_obliquity(jd_ut):
+    """True obliquity of the ecliptic in degrees, from one ECL_NUT call."""
+    return swe.calc_ut(jd_ut, swe.ECL_NUT)[0][0]
+
+def ecliptic_to_equatorial(lon, lat, obliquity):
+    """
+    Converts ecliptic coordinates to right ascension and declination.
+
+    Args:
+        lon, lat (array-like): Ecliptic longitude and latitude, degrees.
+        obliquity (float): Obliquity of the ecliptic, degrees.
+
+    Returns:
+        tuple: (right ascension in [0, 360), declination), degrees.
+    """
+    lon, lat, eps = np.radians(lon), np.radians(lat), np.radians(obliquity)
+    sin_dec = np.sin(lat) * np.cos(eps) + np.cos(lat) * np.sin(eps) * np.sin(lon)
+    ra = np.arctan2(np.sin(lon) * np.cos(eps) - np.tan(lat) * np.sin(eps), np.cos(lon))
+    return np.degrees(ra) % 360.0, np.degrees(np.arcsin(np.clip(sin_dec, -1.0, 1.0)))
+
+def declination_speed(lon, lat, dec, lon_speed, lat_speed, obliquity):
+    """
+    Daily change in declination from the ecliptic speeds.
+
+    Differentiates sin(dec) = sin(lat)cos(eps) + cos(lat)sin(eps)sin(lon),
+    with the obliquity constant over the day.
+
+    Returns:
+        ndarray: Degrees per day.
+    """
+    lon, lat, dec, eps = np.radians(lon), np.radians(lat), np.radians(dec), np.radians(obliquity)
+    d_lat = np.cos(lat) * np.cos(eps) - np.sin(lat) * np.sin(eps) * np.sin(lon)
+    d_lon = np.cos(lat) * np.sin(eps) * np.cos(lon)
+    return (d_lat * np.asarray(lat_speed) + d_lon * np.asarray(lon_speed)) / np.cos(dec)
+
 def calculate_all_planetary_positions(jd_ut):
     """
     Calculates the positions of all planets for a given Julian Day.
+
+    One ephemeris lookup per body gives ecliptic positions and speeds;
+    equatorial coordinates are converted from them with a single obliquity,
+    rather than by a second swe.calc_ut call per body with FLG_EQUATORIAL.
     
     Args:
         jd_ut (float): The Julian Day in Universal Time.
         
     Returns:
-        dict: A dictionary containing data for each planet.
+        dict: A dictionary containing data for each planet, including speed,
+              retrograde, right ascension, declination (with its speed) and
+              out-of-bounds status (|declination| beyond the obliquity).
     """
-    planets_data = {}
+    table = _ephemeris_table
+    rows = []
     for name, planet_id in PLANET_IDS.items():
-        # swe.calc_ut returns a tuple of values; we need the first element which contains position info
-        result = swe.calc_ut(jd_ut, planet_id)
-        longitude = result[0][0]
-        latitude = result[0][1]
-        distance = result[0][2]
+        if table is not None and table.covers(name, jd_ut):
+            rows.append(table.position(name, jd_ut))
+        else:
+            # swe.calc_ut returns a tuple of values; we need the first element which contains position info
+            rows.append(swe.calc_ut(jd_ut, planet_id)[0])
+    positions = np.array(rows, dtype=np.float64)
+
+    obliquity = get_obliquity(jd_ut)
+    ra, dec = ecliptic_to_equatorial(positions[:, 0], positions[:, 1], obliquity)
+    dec_speed = declination_speed(positions[:, 0], positions[:, 1], dec, positions[:, 3], positions[:, 4], obliquity)
+
+    planets_data = {}
+    for index, name in enumerate(PLANET_IDS):
+        longitude, latitude, distance, speed = rows[index][:4]
+        declination = float(dec[index])
         
         planets_data[name] = {
             "longitude": longitude,
             "latitude": latitude,
             "distance_au": distance,
             "sign": get_zodiac_sign(longitude),
-            "degree": get_zodiac_degree(longitude)
+            "degree": get_zodiac_degree(longitude),
+            "speed": speed,
+            "retrograde": speed < 0,
+            "rightAscension": float(ra[index]),
+            "declination": declination,
+            "declinationSpeed": float(dec_speed[index]),
+            "outOfBounds": abs(declination) > obliquity
         }
     return planets_data
 
+def calculate_planetary_positions_many(jds, names=None):
+    """
+    Calculates raw positions for every planet over a vector of Julian Days.
+    
+    Uses the ephemeris table in one vectorized pass where it applies, and
+    swe.calc_ut for any body or date outside it.
+    
+    Args:
+        jds (array-like): Julian Days in Universal Time.
+        names (list, optional): Planets to calculate; defaults to all of PLANET_IDS.
+        
+    Returns:
+        dict: Planet name -> array of shape (len(jds), 6) with columns
+              (longitude, latitude, distance, lon speed, lat speed, dist speed).
+    """
+    jds = np.atleast_1d(np.asarray(jds, dtype=np.float64))
+    table = _ephemeris_table
+    in_range = (table is not None and jds.size > 0
+                and jds.min() >= table.start_jd and jds.max() <= table.end_jd)
+
+    positions = {}
+    for name in (names or PLANET_IDS):
+        planet_id = PLANET_IDS[name]
+        if in_range and name in table.usable:
+            positions[name] = table.positions(jds, [name])[name]
+        else:
+            positions[name] = np.array([swe.calc_ut(jd, planet_id)[0] for jd in jds]).reshape(len(jds), 6)
+    return positions
+
 def calculate_houses_and_angles(jd_ut, lat, lon):
     """
     Calculates house cusps and major angles (Ascendant, Midheaven).
@@ -169,7 +290,7 @@ def calculate_houses_and_angles(jd_ut, lat, lon):
 
 # --- Master Function ---
 
-def get_astrological_data(jd_ut, lat, lon):
+def get_astrological_data(jd_ut, lat, lon, include_harmonics=False):
     """
     The main function to get a complete astrological chart.
     This is the single entry point for all calculations.
@@ -178,6 +299,8 @@ def get_astrological_data(jd_ut, lat, lon):
         jd_ut (float): The Julian Day in Universal Time.
         lat (float): Latitude of the birth location.
         lon (float): Longitude of the birth location.
+        include_harmonics (bool): Also add `harmonics` (5H–16H charts) and
+            `midpoints` (midpoint set and planetary pictures); see harmonics.py.
         
     Returns:
         dict: A comprehensive dictionary of all astrological data.
@@ -185,21 +308,92 @@ def get_astrological_data(jd_ut, lat, lon):
     if not ephe_path_exists():
         raise FileNotFoundError(f"Ephemeris data not found at configured path: {EPHE_PATH}")
 
-    planets = calculate_all_planetary_positions(jd_ut)
-    houses = calculate_houses_and_angles(jd_ut, lat, lon)
-    aspects = calculate_aspects(planets)
+    cache = _chart_cache
+
+    # Location-independent layer: positions, aspects, parallels and aspect patterns
+    planet_layer = cache.get_planets(jd_ut) if cache is not None else None
+    if cache is not None:
+        record_cache('planets', planet_layer is not None)
+    if planet_layer is None:
+        with stage('planets'):
+            planets = calculate_all_planetary_positions(jd_ut)
+        with stage('aspects'):
+            planet_layer = {
+                "planets": planets,
+                "aspects": calculate_aspects(planets),
+                "parallels": calculate_parallels(planets),
+                "patterns": chart_patterns(planets)
+            }
+        if cache is not None:
+            cache.put_planets(jd_ut, planet_layer)
+
+    # Location-dependent layer: cusps and angles
+    houses = cache.get_houses(jd_ut, lat, lon) if cache is not None else None
+    if cache is not None:
+        record_cache('houses', houses is not None)
+    if houses is None:
+        with stage('houses'):
+            houses = calculate_houses_and_angles(jd_ut, lat, lon)
+        if cache is not None:
+            cache.put_houses(jd_ut, lat, lon, houses)
     
     # Combine all data into a single, clean object
     chart_data = {
-        "planets": planets,
+        "planets": planet_layer['planets'],
         "houses": houses['cusps'],
         "ascendant": houses['angles']['ascendant'],
         "midheaven": houses['angles']['midheaven'],
-        "aspects": aspects
+        "aspects": planet_layer['aspects'],
+        "parallels": planet_layer['parallels'],
+        "patterns": planet_layer['patterns']
     }
+
+    if include_harmonics:
+        from harmonics import harmonic_analysis
+        with stage('harmonics'):
+            chart_data.update(harmonic_analysis(chart_data))
     
     return chart_data
 
+def configure_chart_cache(cache):
+    """
+    Replaces the process-wide chart cache.
+
+    Args:
+        cache (LayeredChartCache or None): The cache to use; None disables caching.
+    """
+    global _chart_cache
+    _chart_cache = cache
+
+def configure_ephemeris_table(table):
+    """
+    Replaces the process-wide ephemeris table.
+
+    Args:
+        table (EphemerisTable or None): The table to use; None forces swe.calc_ut.
+    """
+    global _ephemeris_table
+    _ephemeris_table = table
+
+def get_ephemeris_table():
+    """Returns the active ephemeris table, or None if positions come from swe.calc_ut."""
+    return _ephemeris_table
+
+def get_chart_cache():
+    """Returns the active chart cache, or None if caching is disabled."""
+    return _chart_cache
+
+def reset_ephemeris():
+    """
+    Closes and reopens the Swiss Ephemeris data files.
+
+    Swiss Ephemeris keeps its files open between calls, so a process forked
+    after a calculation shares those descriptors (and their file offsets)
+    with its parent and siblings. Every forked worker calls this first.
+    """
+    swe.close()
+    swe.set_ephe_path(EPHE_PATH)
+
 def ephe_path_exists():
     """Checks if the configured ephemeris path is valid."""
     return os.path.exists(EPHE_PATH)
@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""
+batch.py: Bulk chart computation over a bounded process pool.
+
+The Flask layer resolves timezones and Julian days for a whole batch up
+front, then hands this module a flat list of (jd_ut, lat, lon) tasks.
+Charts are computed by astrology_core in worker processes and returned
+in input order, one (chart, error) pair per task, so a single bad record
+never fails the rest of the batch.
+"""
+
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+from astrology_core import get_astrological_data, reset_ephemeris
+
+# --- Constants and Configuration ---
+
+# Upper bound on records accepted by a single batch request.
+MAX_BATCH_RECORDS = int(os.environ.get('COSMIC_BATCH_MAX_RECORDS', 5000))
+
+# Number of worker processes. Every web worker has its own pool, so by
+# default the cores are divided between the web workers (WEB_CONCURRENCY)
+# rather than each pool taking all of them.
+BATCH_WORKERS = int(os.environ.get(
+    'COSMIC_BATCH_WORKERS', max(1, (os.cpu_count() or 1) // int(os.environ.get('WEB_CONCURRENCY', 1)))
+))
+
+# Batches smaller than this are computed inline; forking work out to the
+# pool costs more than the handful of charts it would parallelise.
+INLINE_THRESHOLD = 16
+
+# Each worker receives roughly this many chunks per batch, which keeps
+# the pool balanced without paying pickling overhead per chart.
+CHUNKS_PER_WORKER = 4
+
+_pool = None
+_pool_lock = threading.Lock()
+
+# --- Worker Functions ---
+
+def _init_worker():
+    """Reopens the ephemeris files, which a worker shares with the forkserver."""
+    reset_ephemeris()
+
+def _compute_chart(task):
+    """Computes one chart, returning a (chart, error) pair instead of raising."""
+    jd_ut, lat, lon = task
+    try:
+        return get_astrological_data(jd_ut, lat, lon), None
+    except Exception as e:
+        return None, str(e)
+
+def _compute_chunk(tasks):
+    """Computes a contiguous slice of a batch inside a worker process."""
+    return [_compute_chart(task) for task in tasks]
+
+# --- Pool Management ---
+
+def get_pool():
+    """
+    Returns the shared process pool, creating it on first use.
+
+    Pool processes come from a forkserver rather than being forked from the
+    web worker: by the first batch the worker already runs threads (report
+    generation, connection flushers), and a fork taken while another thread
+    holds a lock leaves that lock held forever in the child. The forkserver
+    is single-threaded and has this module preloaded, so workers still
+    start with the ephemeris code imported.
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            context = multiprocessing.get_context('forkserver')
+            context.set_forkserver_preload(['batch'])
+            _pool = ProcessPoolExecutor(max_workers=BATCH_WORKERS, mp_context=context, initializer=_init_worker)
+        return _pool
+
+def shutdown_pool():
+    """Shuts the shared pool down; the next batch will start a new one."""
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=True)
+            _pool = None
+
+# --- Public API ---
+
+def compute_charts(tasks):
+    """
+    Computes charts for a list of tasks, preserving input order.
+
+    Args:
+        tasks (list): A list of (jd_ut, lat, lon) tuples.
+
+    Returns:
+        list: A list of (chart, error) tuples aligned with `tasks`. Exactly one
+              element of each pair is None.
+    """
+    if not tasks:
+        return []
+
+    if len(tasks) < INLINE_THRESHOLD or BATCH_WORKERS <= 1:
+        return _compute_chunk(tasks)
+
+    chunk_size = max(1, -(-len(tasks) // (BATCH_WORKERS * CHUNKS_PER_WORKER)))
+    chunks = [tasks[i:i + chunk_size] for i in range(0, len(tasks), chunk_size)]
+
+    results = []
+    for chunk_results in get_pool().map(_compute_chunk, chunks):
+        results.extend(chunk_results)
+    return results
@@ -0,0 +1,332 @@
+#!/usr/bin/env python3
+"""
+benchmark.py: Micro-benchmarks for the chart pipeline, with regression checks.
+
+A deterministic synthetic corpus of birth records (dates from 1800 to 2400,
+places spread evenly over the globe, so every latitude band is represented
+by its area) is pushed through each stage of a chart request:
+
+- timezone_jd: coordinates -> zone name -> Julian day;
+- positions: calculate_all_planetary_positions;
+- houses: calculate_houses_and_angles;
+- aspects: calculate_aspects on precomputed positions;
+- chart: get_astrological_data;
+- endpoint: POST /api/cosmic-signature through the Flask test client.
+
+The chart cache is disabled while benchmarks run, so every call computes.
+Each call is timed on its own, over a few rounds of the corpus, and the
+fastest round's results (ops/sec and latency percentiles) are written as
+JSON; as with timeit, slower rounds mostly measure other processes. A later run is compared with a saved one
+on median latency, which is steadier than the mean on a shared machine, and
+the comparison fails if any benchmark slowed by more than the threshold.
+
+Placidus cusps are undefined near the poles; calls that raise are counted
+as errors and left out of the timings.
+
+Usage:
+    python benchmark.py run [--charts 300] [--seed 1] [--rounds 3] [--out benchmark.json]
+                            [--only NAME ...] [--compare BASELINE [--threshold 0.15]]
+    python benchmark.py compare BASELINE CURRENT [--threshold 0.15]
+"""
+
+import argparse
+import json
+import logging
+import platform
+import sys
+import time
+from datetime import datetime, timezone
+
+import numpy as np
+import swisseph as swe
+
+import astrology_core
+from astrology_core import (
+    calculate_all_planetary_positions, calculate_aspects, calculate_houses_and_angles, get_astrological_data
+)
+from time_conversion import local_to_julian_day
+from timezone_resolver import TimezoneResolver
+
+# --- Constants and Configuration ---
+
+RESULTS_VERSION = 1
+
+DEFAULT_CHARTS = 300
+DEFAULT_SEED = 1
+
+# Birth years covered by the corpus, inclusive.
+CORPUS_YEARS = (1800, 2400)
+
+# Timed passes over the corpus per benchmark; the fastest is reported.
+DEFAULT_ROUNDS = 3
+
+# Untimed calls before each benchmark, to fill caches the process keeps anyway
+# (zone transition tables, ephemeris file buffers).
+WARMUP_CALLS = 20
+
+PERCENTILES = (50, 90, 99)
+
+# A benchmark regresses when its median latency grows by more than this fraction.
+DEFAULT_THRESHOLD = 0.15
+
+BENCHMARKS = ("timezone_jd", "positions", "houses", "aspects", "chart", "endpoint")
+
+# --- Corpus ---
+
+def generate_corpus(count=DEFAULT_CHARTS, seed=DEFAULT_SEED, years=CORPUS_YEARS):
+    """
+    Deterministic synthetic birth records.
+
+    Latitudes are uniform in sine, i.e. uniform by area, and dates are
+    uniform over whole days in `years`.
+
+    Returns:
+        list: Dicts with birthDate, birthTime, latitude and longitude, as
+              posted to /api/cosmic-signature.
+    """
+    rng = np.random.default_rng(seed)
+    first = np.datetime64(f"{years[0]:04d}-01-01", 'D')
+    days = int((np.datetime64(f"{years[1] + 1:04d}-01-01", 'D') - first).astype(np.int64))
+    dates = first + rng.integers(0, days, count)
+    minutes = rng.integers(0, 1440, count)
+    latitudes = np.degrees(np.arcsin(rng.uniform(-1.0, 1.0, count)))
+    longitudes = rng.uniform(-180.0, 180.0, count)
+    return [
+        {
+            "birthDate": str(date),
+            "birthTime": f"{minute // 60:02d}:{minute % 60:02d}",
+            "latitude": round(lat, 4),
+            "longitude": round(lon, 4)
+        }
+        for date, minute, lat, lon in zip(dates, minutes.tolist(), latitudes.tolist(), longitudes.tolist())
+    ]
+
+# --- Timing ---
+
+def summarize(durations, errors=0):
+    """
+    Throughput and latency percentiles of a list of call durations.
+
+    Args:
+        durations (list): Seconds per successful call.
+        errors (int): Calls that raised or returned an error status.
+
+    Returns:
+        dict: calls, errors, opsPerSec, meanUs, p50Us/p90Us/p99Us and maxUs.
+    """
+    values = np.asarray(durations, dtype=np.float64) * 1e6
+    result = {"calls": int(values.size), "errors": errors}
+    if not values.size:
+        return result
+    result["opsPerSec"] = round(1e6 / float(values.mean()), 1)
+    result["meanUs"] = round(float(values.mean()), 2)
+    for q, value in zip(PERCENTILES, np.percentile(values, PERCENTILES).tolist()):
+        result[f"p{q}Us"] = round(value, 2)
+    result["maxUs"] = round(float(values.max()), 2)
+    return result
+
+def _time_round(call, inputs):
+    """Durations of the successful calls and the number of failed ones."""
+    durations = []
+    errors = 0
+    clock = time.perf_counter
+    for item in inputs:
+        started = clock()
+        try:
+            ok = call(item) is not False
+        except Exception:
+            ok = False
+        elapsed = clock() - started
+        if ok:
+            durations.append(elapsed)
+        else:
+            errors += 1
+    return durations, errors
+
+def time_calls(call, inputs, rounds=DEFAULT_ROUNDS, warmup=WARMUP_CALLS):
+    """
+    Times `call` on every input separately.
+
+    Args:
+        call (callable): Takes one input; returns False or raises on failure.
+        inputs (list): Arguments, one per call.
+        rounds (int): Passes over `inputs`; the one with the lowest median is kept.
+
+    Returns:
+        dict: See summarize.
+    """
+    for item in inputs[:warmup]:
+        try:
+            call(item)
+        except Exception:
+            pass
+
+    passes = [_time_round(call, inputs) for _ in range(max(rounds, 1))]
+    durations, errors = min(passes, key=lambda result: np.median(result[0]) if result[0] else np.inf)
+    return summarize(durations, errors)
+
+def _prepare(corpus, resolver):
+    """Zone, Julian day and positions of every record, computed once for the later stages."""
+    prepared = []
+    for record in corpus:
+        zone = resolver.resolve(record['latitude'], record['longitude'])
+        jd, _ = local_to_julian_day(record['birthDate'], record['birthTime'], zone)
+        prepared.append({**record, "timezone": zone, "jd": jd, "planets": calculate_all_planetary_positions(jd)})
+    return prepared
+
+def _benchmark_calls(resolver):
+    """Benchmark name -> call taking one prepared record."""
+    def timezone_jd(record):
+        zone = resolver.resolve(record['latitude'], record['longitude'])
+        return local_to_julian_day(record['birthDate'], record['birthTime'], zone)
+
+    def endpoint(record):
+        body = {key: record[key] for key in ("birthDate", "birthTime", "latitude", "longitude")}
+        return _client().post('/api/cosmic-signature', json=body).status_code == 200
+
+    return {
+        "timezone_jd": timezone_jd,
+        "positions": lambda record: calculate_all_planetary_positions(record['jd']),
+        "houses": lambda record: calculate_houses_and_angles(record['jd'], record['latitude'], record['longitude']),
+        "aspects": lambda record: calculate_aspects(record['planets']),
+        "chart": lambda record: get_astrological_data(record['jd'], record['latitude'], record['longitude']),
+        "endpoint": endpoint
+    }
+
+_test_client = None
+
+def _client():
+    """Flask test client, created on first use so other benchmarks skip importing the app."""
+    global _test_client
+    if _test_client is None:
+        from app import app
+        _test_client = app.test_client()
+    return _test_client
+
+# --- Public API ---
+
+def run_benchmarks(charts=DEFAULT_CHARTS, seed=DEFAULT_SEED, only=None, rounds=DEFAULT_ROUNDS):
+    """
+    Runs the benchmarks on a fresh corpus.
+
+    Args:
+        charts (int): Corpus size; each benchmark makes this many timed calls.
+        seed (int): Corpus seed; runs to be compared should use the same one.
+        only (list, optional): Benchmark names to run; all by default.
+        rounds (int): Timed passes over the corpus per benchmark.
+
+    Returns:
+        dict: The results document written by `run`.
+    """
+    names = list(only or BENCHMARKS)
+    unknown = set(names) - set(BENCHMARKS)
+    if unknown:
+        raise ValueError(f"Unknown benchmarks: {', '.join(sorted(unknown))}")
+
+    resolver = TimezoneResolver()
+    corpus = _prepare(generate_corpus(charts, seed), resolver)
+    calls = _benchmark_calls(resolver)
+
+    # Polar charts fail by design; their logged tracebacks would bury the report
+    cache = astrology_core.get_chart_cache()
+    astrology_core.configure_chart_cache(None)
+    logging.disable(logging.ERROR)
+    try:
+        results = {name: time_calls(calls[name], corpus, rounds) for name in names}
+    finally:
+        logging.disable(logging.NOTSET)
+        astrology_core.configure_chart_cache(cache)
+
+    return {
+        "version": RESULTS_VERSION,
+        "created": datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        "environment": {
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "swisseph": swe.version,
+            "machine": platform.machine(),
+            "ephemerisTable": astrology_core.get_ephemeris_table() is not None
+        },
+        "corpus": {"charts": charts, "seed": seed, "years": list(CORPUS_YEARS)},
+        "rounds": rounds,
+        "benchmarks": results
+    }
+
+def compare_results(baseline, current, threshold=DEFAULT_THRESHOLD):
+    """
+    Median latency of each benchmark present in both results.
+
+    Returns:
+        list: Dicts with name, baselineUs, currentUs, change (fraction; positive
+              is slower) and regressed, in benchmark order.
+    """
+    rows = []
+    for name, result in current['benchmarks'].items():
+        before = baseline['benchmarks'].get(name, {}).get('p50Us')
+        after = result.get('p50Us')
+        if before is None or after is None:
+            continue
+        change = after / before - 1.0
+        rows.append({
+            "name": name, "baselineUs": before, "currentUs": after,
+            "change": round(change, 4), "regressed": change > threshold
+        })
+    return rows
+
+def print_results(results):
+    """Prints one line per benchmark."""
+    print(f"{'benchmark':12s} {'ops/sec':>10s} {'p50 us':>10s} {'p90 us':>10s} {'p99 us':>10s} {'errors':>7s}")
+    for name, result in results['benchmarks'].items():
+        if 'opsPerSec' not in result:
+            print(f"{name:12s} {'-':>10s} {'-':>10s} {'-':>10s} {'-':>10s} {result['errors']:>7d}")
+            continue
+        print(f"{name:12s} {result['opsPerSec']:>10.1f} {result['p50Us']:>10.1f} "
+              f"{result['p90Us']:>10.1f} {result['p99Us']:>10.1f} {result['errors']:>7d}")
+
+def print_comparison(rows, threshold):
+    """Prints the comparison and returns True if anything regressed."""
+    print(f"{'benchmark':12s} {'base p50':>10s} {'p50':>10s} {'change':>8s}")
+    for row in rows:
+        verdict = "  REGRESSED" if row['regressed'] else ""
+        print(f"{row['name']:12s} {row['baselineUs']:>10.1f} {row['currentUs']:>10.1f} {row['change']:>+8.1%}{verdict}")
+    regressed = [row['name'] for row in rows if row['regressed']]
+    if regressed:
+        print(f"Slower than baseline by more than {threshold:.0%}: {', '.join(regressed)}")
+    return bool(regressed)
+
+def _load(path):
+    with open(path) as f:
+        return json.load(f)
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Benchmark the chart pipeline.")
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    run_parser = sub.add_parser('run', help="Time every stage on a synthetic corpus")
+    run_parser.add_argument('--charts', type=int, default=DEFAULT_CHARTS)
+    run_parser.add_argument('--seed', type=int, default=DEFAULT_SEED)
+    run_parser.add_argument('--rounds', type=int, default=DEFAULT_ROUNDS)
+    run_parser.add_argument('--only', nargs='+', choices=BENCHMARKS)
+    run_parser.add_argument('--out', default='benchmark.json')
+    run_parser.add_argument('--compare', metavar='BASELINE', help="Fail if slower than this results file")
+    run_parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD)
+
+    compare_parser = sub.add_parser('compare', help="Compare two results files")
+    compare_parser.add_argument('baseline')
+    compare_parser.add_argument('current')
+    compare_parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD)
+
+    args = parser.parse_args()
+    if args.command == 'run':
+        results = run_benchmarks(args.charts, args.seed, args.only, args.rounds)
+        with open(args.out, 'w') as f:
+            json.dump(results, f, indent=2)
+        print_results(results)
+        baseline = _load(args.compare) if args.compare else None
+    else:
+        baseline, results = _load(args.baseline), _load(args.current)
+
+    if baseline is not None:
+        if baseline.get('corpus') != results.get('corpus'):
+            print("Warning: results were measured on different corpora")
+        sys.exit(1 if print_comparison(compare_results(baseline, results, args.threshold), args.threshold) else 0)
@@ -0,0 +1,306 @@
+#!/usr/bin/env python3
+"""
+chart_cache.py: Layered caching for astrological charts.
+
+A chart splits cleanly into two layers with different keys:
+
+- The planet layer (positions and aspects) depends only on the moment,
+  so it is keyed on the quantized Julian Day.
+- The house layer (cusps and angles) depends on the moment and the place,
+  so it is keyed on (jd, lat, lon).
+
+Keeping them apart means a user who only changes their birth city reuses
+the expensive planet layer and recomputes just the houses. Each layer is
+a size-bounded in-memory LRU; an optional SQLite file can sit behind them
+so that every gunicorn worker on a host shares one warm store.
+"""
+
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+# --- Constants and Configuration ---
+
+# Julian Days are rounded to this many decimals for the cache key.
+# 1e-6 days is ~0.09 seconds, far below the minute resolution of birth times.
+JD_PRECISION = 6
+
+# Coordinates are rounded to this many decimals (~11 m) for the house key.
+COORD_PRECISION = 4
+
+# Version of the cached layer contents. Bump it whenever a layer gains or
+# changes fields, so a disk store written by an older release is not served.
+LAYER_VERSION = 3
+
+# How many writes the disk backend accepts between eviction sweeps.
+DISK_EVICTION_INTERVAL = 256
+
+# Disk hits refresh their row's access time in batches: after this many
+# hits, or once the oldest pending refresh is this many seconds old.
+DISK_TOUCH_BATCH = 64
+DISK_TOUCH_INTERVAL = 5.0
+
+# --- Helper Functions ---
+
+def _clone(value):
+    """Copies the dict/list skeleton of a cached value so callers may mutate it."""
+    if isinstance(value, dict):
+        return {k: _clone(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_clone(v) for v in value]
+    return value
+
+# --- In-Memory LRU ---
+
+class LRUCache:
+    """A thread-safe, size-bounded LRU mapping with hit/miss accounting."""
+
+    def __init__(self, maxsize=1024):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key, default=None):
+        """Returns the cached value for `key`, or `default` on a miss."""
+        with self._lock:
+            try:
+                value = self._data[key]
+            except KeyError:
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value):
+        """Stores `value`, evicting the least recently used entry if full."""
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self.hits = self.misses = self.evictions = 0
+
+    def __len__(self):
+        return len(self._data)
+
+    def stats(self):
+        """Returns a snapshot of size and hit/miss counters."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_ratio": self.hits / lookups if lookups else 0.0
+            }
+
+# --- On-Disk Backend ---
+
+class SQLiteCacheBackend:
+    """
+    A JSON-valued key/value store in a single SQLite file.
+
+    Safe to share between processes: SQLite handles the locking, and each
+    process (and thread) opens its own connection, so the store survives
+    gunicorn forking workers after it was created.
+
+    Eviction drops the least recently used rows. Hits are not written one
+    by one; each process collects them and refreshes their access times in
+    one statement per DISK_TOUCH_BATCH hits or DISK_TOUCH_INTERVAL seconds.
+    """
+
+    def __init__(self, path, max_entries=200000):
+        self.path = path
+        self.max_entries = max_entries
+        self._local = threading.local()
+        self._writes = 0
+        self._touched = {}
+        self._touched_since = None
+        self._touch_lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self._connect().executescript("""
+            CREATE TABLE IF NOT EXISTS chart_cache (
+                layer TEXT NOT NULL,
+                key TEXT NOT NULL,
+                value TEXT NOT NULL,
+                accessed REAL NOT NULL,
+                PRIMARY KEY (layer, key)
+            );
+            CREATE INDEX IF NOT EXISTS chart_cache_accessed ON chart_cache (accessed);
+        """)
+
+    def _connect(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=5.0, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def get(self, layer, key):
+        """Returns the decoded value, or None if absent or unreadable."""
+        try:
+            row = self._connect().execute(
+                "SELECT value FROM chart_cache WHERE layer = ? AND key = ?", (layer, key)
+            ).fetchone()
+        except sqlite3.Error as e:
+            logger.warning("Chart cache read failed: %s", e)
+            return None
+        if row is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self._touch(layer, key)
+        return json.loads(row[0])
+
+    def _touch(self, layer, key):
+        """Queues an access-time refresh, writing the queue out when it is due."""
+        now = time.time()
+        with self._touch_lock:
+            self._touched[(layer, key)] = now
+            if self._touched_since is None:
+                self._touched_since = now
+            due = len(self._touched) >= DISK_TOUCH_BATCH or now - self._touched_since >= DISK_TOUCH_INTERVAL
+        if due:
+            try:
+                self.flush_touches(self._connect())
+            except sqlite3.Error as e:
+                logger.warning("Chart cache access update failed: %s", e)
+
+    def flush_touches(self, conn=None):
+        """Writes queued access times."""
+        with self._touch_lock:
+            touched, self._touched, self._touched_since = self._touched, {}, None
+        if touched:
+            (conn or self._connect()).executemany(
+                "UPDATE chart_cache SET accessed = MAX(accessed, ?) WHERE layer = ? AND key = ?",
+                [(accessed, layer, key) for (layer, key), accessed in touched.items()]
+            )
+
+    def put(self, layer, key, value):
+        """Writes a value through to disk; failures only cost a recompute later."""
+        try:
+            conn = self._connect()
+            conn.execute(
+                "INSERT OR REPLACE INTO chart_cache (layer, key, value, accessed) VALUES (?, ?, ?, ?)",
+                (layer, key, json.dumps(value), time.time())
+            )
+            self._writes += 1
+            if self._writes % DISK_EVICTION_INTERVAL == 0:
+                self._evict(conn)
+        except sqlite3.Error as e:
+            logger.warning("Chart cache write failed: %s", e)
+
+    def _evict(self, conn):
+        """Trims the least recently used rows once the store grows past `max_entries`."""
+        count = conn.execute("SELECT COUNT(*) FROM chart_cache").fetchone()[0]
+        excess = count - self.max_entries
+        if excess > 0:
+            self.flush_touches(conn)
+            conn.execute(
+                "DELETE FROM chart_cache WHERE rowid IN "
+                "(SELECT rowid FROM chart_cache ORDER BY accessed LIMIT ?)", (excess,)
+            )
+
+    def stats(self):
+        return {"path": self.path, "hits": self.hits, "misses": self.misses}
+
+# --- Layered Chart Cache ---
+
+class LayeredChartCache:
+    """
+    Caches the planet layer by Julian Day and the house layer by (jd, lat, lon).
+
+    Values handed out are copies, so callers are free to decorate the
+    returned dictionaries without corrupting the cache.
+    """
+
+    def __init__(self, planet_size=4096, house_size=16384, disk=None):
+        self.planets = LRUCache(planet_size)
+        self.houses = LRUCache(house_size)
+        self.disk = disk
+
+    @staticmethod
+    def planet_key(jd_ut):
+        return round(jd_ut, JD_PRECISION)
+
+    @staticmethod
+    def house_key(jd_ut, lat, lon):
+        return (round(jd_ut, JD_PRECISION), round(lat, COORD_PRECISION), round(lon, COORD_PRECISION))
+
+    def _get(self, memory, layer, key):
+        value = memory.get(key)
+        if value is None and self.disk is not None:
+            value = self.disk.get(f"{layer}/v{LAYER_VERSION}", repr(key))
+            if value is not None:
+                memory.put(key, value)
+        return None if value is None else _clone(value)
+
+    def _put(self, memory, layer, key, value):
+        value = _clone(value)
+        memory.put(key, value)
+        if self.disk is not None:
+            self.disk.put(f"{layer}/v{LAYER_VERSION}", repr(key), value)
+
+    def get_planets(self, jd_ut):
+        """Returns the cached planet layer for `jd_ut`, or None."""
+        return self._get(self.planets, 'planets', self.planet_key(jd_ut))
+
+    def put_planets(self, jd_ut, layer):
+        self._put(self.planets, 'planets', self.planet_key(jd_ut), layer)
+
+    def get_houses(self, jd_ut, lat, lon):
+        """Returns the cached house layer for a moment and place, or None."""
+        return self._get(self.houses, 'houses', self.house_key(jd_ut, lat, lon))
+
+    def put_houses(self, jd_ut, lat, lon, layer):
+        self._put(self.houses, 'houses', self.house_key(jd_ut, lat, lon), layer)
+
+    def clear(self):
+        """Clears the in-memory layers; the disk store is left untouched."""
+        self.planets.clear()
+        self.houses.clear()
+
+    def stats(self):
+        stats = {"planets": self.planets.stats(), "houses": self.houses.stats()}
+        if self.disk is not None:
+            stats["disk"] = self.disk.stats()
+        return stats
+
+def cache_from_environment():
+    """
+    Builds the chart cache described by the environment, or None if disabled.
+
+    COSMIC_CHART_CACHE_SIZE   planet-layer entries (0 disables caching)
+    COSMIC_HOUSE_CACHE_SIZE   house-layer entries (default 4x planet size)
+    COSMIC_CHART_CACHE_DB     optional SQLite path shared across workers
+    """
+    planet_size = int(os.environ.get('COSMIC_CHART_CACHE_SIZE', 4096))
+    if planet_size <= 0:
+        return None
+    house_size = int(os.environ.get('COSMIC_HOUSE_CACHE_SIZE', planet_size * 4))
+    db_path = os.environ.get('COSMIC_CHART_CACHE_DB')
+    disk = SQLiteCacheBackend(db_path) if db_path else None
+    return LayeredChartCache(planet_size, house_size, disk)
@@ -0,0 +1,336 @@
+#!/usr/bin/env python3
+"""
+ephemeris_table.py: Precomputed, memory-mapped planetary ephemeris.
+
+Sign-and-degree reporting needs arc-second accuracy at best, while every
+swe.calc_ut call pays for Swiss Ephemeris' full theory and file reads.
+This module samples each body's position and speed once, on a fixed
+per-body step over 1800-2400, and stores the samples as plain .npy files.
+At runtime the files are memory-mapped read-only (so all gunicorn workers
+share one copy in the page cache) and positions are recovered by cubic
+Hermite interpolation between neighbouring samples, using the stored
+speeds as the derivatives.
+
+The build step measures the interpolation error of every body against
+swe.calc_ut, and the lookup only serves bodies whose measured error is
+within the configured bound; anything else falls back to swe.calc_ut.
+
+Usage:
+    python ephemeris_table.py build [--out DIR] [--start-year 1800] [--end-year 2400]
+    python ephemeris_table.py verify [--table DIR] [--samples 20000]
+"""
+
+import argparse
+import json
+import logging
+import os
+import time
+
+import numpy as np
+import swisseph as swe
+
+logger = logging.getLogger(__name__)
+
+# --- Constants and Configuration ---
+
+EPHE_PATH = os.path.join(os.path.dirname(__file__), 'ephe')
+DEFAULT_TABLE_PATH = os.path.join(EPHE_PATH, 'table')
+
+TABLE_VERSION = 1
+
+# Sampling step in days per body; the Moon and inner planets move fastest
+# and need the densest sampling. Measured against swe.calc_ut over
+# 1800-2400, Hermite interpolation stays under 3e-5 degrees everywhere
+# except within about a degree of the Sun. There Swiss Ephemeris' light
+# deflection by the Sun moves the apparent position by up to ~1e-3 degrees
+# within hours, and the interpolation misses it: the build measured up to
+# 7e-4 degrees (Jupiter), and a 20,000-point verify finds up to 6e-3
+# degrees (Neptune) at conjunction. Steps short enough to follow that
+# would multiply the table size for a few hours around each conjunction.
+BODY_STEPS = {
+    'Sun': 2.0,
+    'Moon': 0.5,
+    'Mercury': 1.0,
+    'Venus': 1.0,
+    'Mars': 2.0,
+    'Jupiter': 2.0,
+    'Saturn': 2.0,
+    'Uranus': 2.0,
+    'Neptune': 2.0,
+    'Pluto': 2.0
+}
+
+# Columns mirror the tuple returned by swe.calc_ut with speeds. Longitude
+# keeps double precision; everything else fits comfortably in float32.
+SAMPLE_DTYPE = np.dtype([
+    ('lon', '<f8'),
+    ('lat', '<f4'),
+    ('dist', '<f4'),
+    ('lon_speed', '<f4'),
+    ('lat_speed', '<f4'),
+    ('dist_speed', '<f4')
+])
+
+CALC_FLAGS = swe.FLG_SWIEPH | swe.FLG_SPEED
+
+# Default error bound (degrees of longitude/latitude) for serving a body
+# from the table instead of swe.calc_ut. 0.001 degrees is 3.6 arc-seconds.
+DEFAULT_MAX_ERROR = float(os.environ.get('COSMIC_EPHEMERIS_MAX_ERROR', 0.001))
+
+# --- Helper Functions ---
+
+def _body_id(name):
+    """Maps a body name such as 'Moon' to its Swiss Ephemeris constant."""
+    return getattr(swe, name.upper())
+
+def _hermite(p0, m0, p1, m1, h, t):
+    """
+    Evaluates a cubic Hermite segment and its derivative.
+
+    Args:
+        p0, p1: Values at the segment ends.
+        m0, m1: Derivatives (per day) at the segment ends.
+        h: Segment length in days.
+        t: Position within the segment, 0..1.
+
+    Returns:
+        tuple: (value, derivative per day)
+    """
+    t2 = t * t
+    t3 = t2 * t
+    value = ((2 * t3 - 3 * t2 + 1) * p0 + (t3 - 2 * t2 + t) * h * m0
+             + (-2 * t3 + 3 * t2) * p1 + (t3 - t2) * h * m1)
+    slope = ((6 * t2 - 6 * t) * (p0 - p1) / h + (3 * t2 - 4 * t + 1) * m0
+             + (3 * t2 - 2 * t) * m1)
+    return value, slope
+
+def _angular_error(a, b):
+    """Absolute difference between two longitudes, accounting for wrap-around."""
+    return np.abs((np.asarray(a) - np.asarray(b) + 180.0) % 360.0 - 180.0)
+
+# --- Table ---
+
+class EphemerisTable:
+    """
+    Read-only access to a built table directory.
+
+    Args:
+        path (str): Directory containing meta.json and one .npy file per body.
+        max_error (float): Bodies whose measured interpolation error exceeds
+            this many degrees are not served from the table.
+    """
+
+    def __init__(self, path=DEFAULT_TABLE_PATH, max_error=DEFAULT_MAX_ERROR):
+        self.path = path
+        with open(os.path.join(path, 'meta.json')) as f:
+            self.meta = json.load(f)
+        if self.meta.get('version') != TABLE_VERSION:
+            raise ValueError(f"Unsupported ephemeris table version: {self.meta.get('version')}")
+
+        self.max_error = max_error
+        self.start_jd = self.meta['start_jd']
+        self.end_jd = self.meta['end_jd']
+        self.samples = {}
+        self.steps = {}
+        self.usable = set()
+        for name, info in self.meta['bodies'].items():
+            # A plain ndarray view of the memmap skips np.memmap's per-index overhead
+            samples = np.load(os.path.join(path, f'{name}.npy'), mmap_mode='r')
+            self.samples[name] = samples.view(np.ndarray)
+            self.steps[name] = info['step']
+            if info['max_error_deg'] <= max_error:
+                self.usable.add(name)
+
+    def covers(self, name, jd_ut):
+        """True if `name` at `jd_ut` can be served within the error bound."""
+        return name in self.usable and self.start_jd <= jd_ut <= self.end_jd
+
+    def position(self, name, jd_ut):
+        """
+        Interpolates one body at one Julian Day.
+
+        Returns:
+            tuple: (lon, lat, dist, lon_speed, lat_speed, dist_speed), in the
+                   same order as swe.calc_ut with FLG_SPEED.
+        """
+        samples = self.samples[name]
+        step = self.steps[name]
+        offset = (jd_ut - self.start_jd) / step
+        index = min(int(offset), len(samples) - 2)
+        t = offset - index
+
+        lon0, lat0, dist0, vlon0, vlat0, vdist0 = samples[index].item()
+        lon1, lat1, dist1, vlon1, vlat1, vdist1 = samples[index + 1].item()
+        lon1 = lon0 + (lon1 - lon0 + 180.0) % 360.0 - 180.0
+
+        lon, vlon = _hermite(lon0, vlon0, lon1, vlon1, step, t)
+        lat, vlat = _hermite(lat0, vlat0, lat1, vlat1, step, t)
+        dist, vdist = _hermite(dist0, vdist0, dist1, vdist1, step, t)
+        return lon % 360.0, lat, dist, vlon, vlat, vdist
+
+    def positions(self, jds, names=None):
+        """
+        Interpolates many Julian Days at once.
+
+        Args:
+            jds (array-like): Julian Days (UT), all within the table range.
+            names (list, optional): Bodies to return; defaults to all bodies.
+
+        Returns:
+            dict: Body name -> float64 array of shape (len(jds), 6), columns
+                  ordered as in `position`.
+        """
+        jds = np.atleast_1d(np.asarray(jds, dtype=np.float64))
+        if jds.size and (jds.min() < self.start_jd or jds.max() > self.end_jd):
+            raise ValueError("Julian Day outside the ephemeris table range")
+
+        result = {}
+        for name in (names or self.samples):
+            samples = self.samples[name]
+            step = self.steps[name]
+            offset = (jds - self.start_jd) / step
+            index = np.minimum(offset.astype(np.int64), len(samples) - 2)
+            t = offset - index
+            a = samples[index]
+            b = samples[index + 1]
+
+            out = np.empty((len(jds), 6))
+            lon1 = a['lon'] + (b['lon'] - a['lon'] + 180.0) % 360.0 - 180.0
+            lon, vlon = _hermite(a['lon'], a['lon_speed'], lon1, b['lon_speed'], step, t)
+            out[:, 0] = lon % 360.0
+            out[:, 3] = vlon
+            for value_col, speed_col, field in ((1, 4, 'lat'), (2, 5, 'dist')):
+                value, speed = _hermite(a[field].astype(np.float64), a[field + '_speed'],
+                                        b[field].astype(np.float64), b[field + '_speed'], step, t)
+                out[:, value_col] = value
+                out[:, speed_col] = speed
+            result[name] = out
+        return result
+
+def load_ephemeris_table(path=None, max_error=DEFAULT_MAX_ERROR):
+    """
+    Loads the table configured by COSMIC_EPHEMERIS_TABLE, if one exists.
+
+    Set COSMIC_EPHEMERIS_TABLE=off to force every lookup through swe.calc_ut.
+
+    Returns:
+        EphemerisTable or None: None if no table is built or it cannot be read.
+    """
+    path = path or os.environ.get('COSMIC_EPHEMERIS_TABLE', DEFAULT_TABLE_PATH)
+    if path == 'off' or not os.path.exists(os.path.join(path, 'meta.json')):
+        return None
+    try:
+        return EphemerisTable(path, max_error)
+    except Exception as e:
+        logger.error("Error loading ephemeris table from %s: %s", path, e)
+        return None
+
+# --- Build and Verification ---
+
+def _sample_body(name, jds):
+    """Samples swe.calc_ut for one body at every Julian Day in `jds`."""
+    body_id = _body_id(name)
+    samples = np.empty(len(jds), dtype=SAMPLE_DTYPE)
+    for i, jd in enumerate(jds):
+        samples[i] = swe.calc_ut(jd, body_id, CALC_FLAGS)[0]
+    return samples
+
+def measure_error(table, name, jds):
+    """
+    Compares interpolated positions of one body against swe.calc_ut.
+
+    Returns:
+        dict: Maximum and mean longitude/latitude errors in degrees.
+    """
+    body_id = _body_id(name)
+    interpolated = table.positions(jds, [name])[name]
+    exact = np.array([swe.calc_ut(jd, body_id, CALC_FLAGS)[0] for jd in jds])
+    lon_error = _angular_error(interpolated[:, 0], exact[:, 0])
+    lat_error = np.abs(interpolated[:, 1] - exact[:, 1])
+    return {
+        "max_lon_error_deg": float(lon_error.max()),
+        "mean_lon_error_deg": float(lon_error.mean()),
+        "max_lat_error_deg": float(lat_error.max())
+    }
+
+def build_table(out_dir=DEFAULT_TABLE_PATH, start_year=1800, end_year=2400, verify_samples=5000, seed=0):
+    """
+    Samples every body and writes the table directory.
+
+    Each body's interpolation error is measured at `verify_samples` random
+    instants and recorded in meta.json, where the loader uses it to decide
+    whether the body may be served from the table.
+    """
+    swe.set_ephe_path(EPHE_PATH)
+    os.makedirs(out_dir, exist_ok=True)
+    start_jd = swe.julday(start_year, 1, 1, 0.0)
+    end_jd = swe.julday(end_year, 1, 1, 0.0)
+    rng = np.random.default_rng(seed)
+
+    meta = {
+        "version": TABLE_VERSION,
+        "start_jd": start_jd,
+        "end_jd": end_jd,
+        "flags": CALC_FLAGS,
+        "swisseph_version": swe.version,
+        "bodies": {}
+    }
+
+    for name, step in BODY_STEPS.items():
+        began = time.perf_counter()
+        count = int(np.ceil((end_jd - start_jd) / step)) + 1
+        jds = start_jd + step * np.arange(count)
+        np.save(os.path.join(out_dir, f'{name}.npy'), _sample_body(name, jds))
+        meta["bodies"][name] = {"step": step, "count": count, "max_error_deg": 0.0}
+        print(f"{name:8s}: {count} samples in {time.perf_counter() - began:.1f}s")
+
+    # Measure against the freshly written files exactly as the runtime sees them
+    with open(os.path.join(out_dir, 'meta.json'), 'w') as f:
+        json.dump(meta, f, indent=2)
+    table = EphemerisTable(out_dir, max_error=float('inf'))
+    for name in BODY_STEPS:
+        errors = measure_error(table, name, rng.uniform(start_jd, end_jd, verify_samples))
+        meta["bodies"][name]["max_error_deg"] = max(errors["max_lon_error_deg"], errors["max_lat_error_deg"])
+        print(f"{name:8s}: max error {meta['bodies'][name]['max_error_deg']:.2e} deg")
+
+    with open(os.path.join(out_dir, 'meta.json'), 'w') as f:
+        json.dump(meta, f, indent=2)
+    return meta
+
+def verify_table(path=DEFAULT_TABLE_PATH, samples=20000, seed=1):
+    """
+    Re-checks a built table against swe.calc_ut at random instants.
+
+    Returns:
+        dict: Body name -> error summary from `measure_error`.
+    """
+    swe.set_ephe_path(EPHE_PATH)
+    table = EphemerisTable(path, max_error=float('inf'))
+    rng = np.random.default_rng(seed)
+    report = {}
+    for name in table.samples:
+        report[name] = measure_error(table, name, rng.uniform(table.start_jd, table.end_jd, samples))
+        verdict = "ok" if report[name]["max_lon_error_deg"] <= DEFAULT_MAX_ERROR else "OVER BOUND"
+        print(f"{name:8s}: max {report[name]['max_lon_error_deg']:.2e} deg, "
+              f"mean {report[name]['mean_lon_error_deg']:.2e} deg [{verdict}]")
+    return report
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Build or verify the precomputed ephemeris table.")
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    build_parser = sub.add_parser('build', help="Sample Swiss Ephemeris into .npy files")
+    build_parser.add_argument('--out', default=DEFAULT_TABLE_PATH)
+    build_parser.add_argument('--start-year', type=int, default=1800)
+    build_parser.add_argument('--end-year', type=int, default=2400)
+    build_parser.add_argument('--verify-samples', type=int, default=5000)
+
+    verify_parser = sub.add_parser('verify', help="Compare a built table with swe.calc_ut")
+    verify_parser.add_argument('--table', default=DEFAULT_TABLE_PATH)
+    verify_parser.add_argument('--samples', type=int, default=20000)
+
+    args = parser.parse_args()
+    if args.command == 'build':
+        build_table(args.out, args.start_year, args.end_year, args.verify_samples)
+    else:
+        verify_table(args.table, args.samples)
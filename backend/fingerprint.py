@@ -0,0 +1,190 @@
+#!/usr/bin/env python3
+"""
+fingerprint.py: Canonical chart inputs, chart fingerprints and ETags.
+
+A chart is a pure function of its birth inputs and of the engine that
+computed it: the calculation code, the Swiss Ephemeris release, the
+precomputed ephemeris table, the rarity index and the timezone rules. This
+module reduces the inputs to one canonical form (zero-padded date and time,
+coordinates at the chart cache's 4-decimal precision) and hashes them with
+a version string for that engine, so that
+
+- every spelling of the same birth maps to one URL and one cache key;
+- a fingerprint changes whenever any part of the engine does, and cached
+  charts from an older release are never served as current.
+
+Nothing here touches the ephemeris, so a request can be answered with
+304 Not Modified from its query string alone.
+"""
+
+import calendar
+import hashlib
+import json
+from importlib import metadata
+
+import pytz
+import swisseph as swe
+
+from chart_cache import COORD_PRECISION, LAYER_VERSION
+
+# --- Constants and Configuration ---
+
+# Bump when chart output changes in a way the versions below do not capture,
+# e.g. a new field or a changed interpretation text.
+ENGINE_VERSION = 1
+
+# Query parameters of the canonical chart URL, in order.
+CANONICAL_PARAMS = ("birthDate", "birthTime", "latitude", "longitude", "harmonics", "fields", "precision")
+
+# --- Helper Functions ---
+
+def _package_version(name):
+    try:
+        return metadata.version(name)
+    except metadata.PackageNotFoundError:
+        return None
+
+def _format_coordinate(value):
+    text = f"{value:.{COORD_PRECISION}f}"
+    # -0.0000 and 0.0000 are the same place
+    return text[1:] if text.startswith('-') and float(text) == 0.0 else text
+
+def canonical_date(date_str):
+    """'YYYY-MM-DD' from a date like '1990-1-5'; raises ValueError if invalid."""
+    try:
+        year, month, day = (int(part) for part in date_str.strip().split('-'))
+    except (AttributeError, ValueError):
+        raise ValueError(f"Invalid birthDate: {date_str!r}")
+    if not (1 <= year <= 9999 and 1 <= month <= 12 and 1 <= day <= calendar.monthrange(year, month)[1]):
+        raise ValueError(f"Invalid birthDate: {date_str!r}")
+    return f"{year:04d}-{month:02d}-{day:02d}"
+
+def canonical_time(time_str):
+    """
+    'HH:MM' from 'H:MM', 'HH:MM' or 'HH:MM:00'.
+
+    Birth times have minute resolution; a time with nonzero seconds is
+    rejected rather than silently truncated.
+    """
+    try:
+        parts = [int(part) for part in time_str.strip().split(':')]
+    except (AttributeError, ValueError):
+        raise ValueError(f"Invalid birthTime: {time_str!r}")
+    if len(parts) == 3 and parts[2] == 0:
+        parts = parts[:2]
+    if len(parts) != 2 or not (0 <= parts[0] <= 23 and 0 <= parts[1] <= 59):
+        raise ValueError(f"Invalid birthTime: {time_str!r}")
+    return f"{parts[0]:02d}:{parts[1]:02d}"
+
+# --- Public API ---
+
+def validate_coordinates(latitude, longitude):
+    """
+    Checks a birth place's coordinates.
+
+    Returns:
+        tuple: (latitude, longitude) as floats; longitude is wrapped to [-180, 180).
+
+    Raises:
+        ValueError: If either is not a number or is out of range.
+    """
+    try:
+        lat = float(latitude)
+        lon = float(longitude)
+    except (TypeError, ValueError):
+        raise ValueError("latitude and longitude must be numbers")
+    if not -90.0 <= lat <= 90.0:
+        raise ValueError("latitude must be between -90 and 90")
+    if not -1e6 < lon < 1e6:
+        raise ValueError("longitude must be a finite number of degrees")
+    return lat, (lon + 180.0) % 360.0 - 180.0
+
+def canonical_birth(birth_date, birth_time, latitude, longitude):
+    """
+    The canonical form of a birth record.
+
+    Returns:
+        dict: birthDate, birthTime, latitude and longitude as strings in
+              canonical form; longitude is wrapped to [-180, 180).
+
+    Raises:
+        ValueError: If any field is missing or out of range.
+    """
+    if not birth_date or not birth_time:
+        raise ValueError("birthDate and birthTime are required")
+    lat, lon = validate_coordinates(latitude, longitude)
+    return {
+        "birthDate": canonical_date(birth_date),
+        "birthTime": canonical_time(birth_time),
+        "latitude": _format_coordinate(lat),
+        "longitude": _format_coordinate(lon)
+    }
+
+def engine_version(ephemeris_table=None, rarity_index=None, geocoder=None):
+    """
+    Short hash of everything besides the inputs that a chart depends on.
+
+    Args:
+        ephemeris_table (EphemerisTable, optional): The table in use, if any.
+        rarity_index (RarityIndex, optional): The rarity index in use, if any.
+        geocoder (Geocoder, optional): The gazetteer in use, if any; known
+            places take their timezone from it.
+
+    Returns:
+        str: 12 hex digits.
+    """
+    parts = {
+        "engine": ENGINE_VERSION,
+        "layers": LAYER_VERSION,
+        "swisseph": swe.version,
+        "ephemerisTable": ephemeris_table.meta if ephemeris_table is not None else None,
+        "rarityIndex": rarity_index.meta if rarity_index is not None else None,
+        "gazetteer": geocoder.meta['sourceSha256'] if geocoder is not None else None,
+        "pytz": pytz.__version__,
+        "timezonefinder": _package_version('timezonefinder')
+    }
+    return hashlib.sha256(json.dumps(parts, sort_keys=True).encode()).hexdigest()[:12]
+
+def chart_fingerprint(canonical, version, include_harmonics=False):
+    """
+    Identity of a computed chart: canonical inputs plus engine version.
+
+    Args:
+        canonical (dict): From canonical_birth.
+        version (str): From engine_version.
+
+    Returns:
+        str: 32 hex digits.
+    """
+    key = "|".join([canonical['birthDate'], canonical['birthTime'], canonical['latitude'],
+                    canonical['longitude'], "h" if include_harmonics else "", version])
+    return hashlib.sha256(key.encode()).hexdigest()[:32]
+
+def representation_etag(fingerprint, response_format):
+    """
+    Strong ETag of one representation of a chart.
+
+    Projection, precision and media type each give different bytes, so each
+    gets its own tag.
+    """
+    fields = ",".join(response_format.fields) if response_format.fields else ""
+    precision = "" if response_format.precision is None else str(response_format.precision)
+    variant = hashlib.sha256(f"{fields}|{precision}|{response_format.mimetype}".encode()).hexdigest()[:8]
+    return f"{fingerprint}-{variant}"
+
+def canonical_query(canonical, include_harmonics=False, response_format=None):
+    """
+    The query string of the canonical chart URL.
+
+    Returns:
+        list: (name, value) pairs in CANONICAL_PARAMS order; options at their
+              defaults are left out.
+    """
+    query = [(name, canonical[name]) for name in CANONICAL_PARAMS[:4]]
+    if include_harmonics:
+        query.append(("harmonics", "1"))
+    if response_format is not None and response_format.fields:
+        query.append(("fields", ",".join(response_format.fields)))
+    if response_format is not None and response_format.precision is not None:
+        query.append(("precision", str(response_format.precision)))
+    return query
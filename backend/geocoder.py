@@ -0,0 +1,380 @@
+#!/usr/bin/env python3
+"""
+geocoder.py: Offline place-name autocomplete with precomputed timezones.
+
+The browser used to geocode against a handful of hardcoded cities and fall
+back to Nominatim for everything else. This module answers the same
+question on the server from a bundled gazetteer (data/gazetteer.csv, or a
+GeoNames `cities*.txt` dump for full coverage), compiled offline into a
+small set of memory-mapped arrays:
+
+- every name and alternate name of a place, folded to lowercase ASCII
+  (diacritics stripped, punctuation collapsed), in one sorted fixed-width
+  key array, so a prefix lookup is two binary searches;
+- places ordered by population, so the places under a prefix come out of
+  np.unique already ranked;
+- each place's IANA zone, resolved once at build time, so a chart for a
+  known place never needs TimezoneFinder.
+
+A query such as "springfield, il" matches "springfield" as a name prefix;
+every part after a comma must be a prefix of the place's region or country
+(name or code).
+
+Usage:
+    python geocoder.py build [--source data/gazetteer.csv | --geonames cities15000.txt] [--out DIR]
+"""
+
+import argparse
+import csv
+import hashlib
+import json
+import logging
+import os
+import time
+import unicodedata
+import zlib
+
+import numpy as np
+
+from chart_cache import COORD_PRECISION, LRUCache
+
+logger = logging.getLogger(__name__)
+
+# --- Constants and Configuration ---
+
+DATA_DIR = os.path.join(os.path.dirname(__file__), 'data')
+
+DEFAULT_SOURCE = os.path.join(DATA_DIR, 'gazetteer.csv')
+
+DEFAULT_INDEX_PATH = os.environ.get('COSMIC_GEOCODER_INDEX', os.path.join(DATA_DIR, 'geocoder'))
+
+INDEX_VERSION = 1
+
+DEFAULT_LIMIT = 10
+MAX_LIMIT = 50
+
+PLACE_DTYPE = np.dtype([
+    ('id', '<u4'), ('latitude', '<f8'), ('longitude', '<f8'),
+    ('population', '<u4'), ('zone', '<u2'), ('region', '<u4')
+])
+
+# Letters NFKD does not decompose into a base letter plus marks.
+_FOLD_TABLE = str.maketrans({
+    'ß': 'ss', 'æ': 'ae', 'ø': 'o', 'œ': 'oe', 'ł': 'l', 'đ': 'd', 'ð': 'd',
+    'þ': 'th', 'ı': 'i', 'ʻ': None, 'ʼ': None, "'": None, '’': None, '.': None
+})
+
+# --- Helper Functions ---
+
+def fold(text):
+    """
+    Search form of a name: lowercase, diacritics stripped, apostrophes and
+    periods dropped, any other run of punctuation or whitespace collapsed to
+    one space. 'Zürich' -> 'zurich', 'St. John's' -> 'st johns',
+    'Winston-Salem' -> 'winston salem'.
+    """
+    decomposed = unicodedata.normalize('NFKD', text.casefold().translate(_FOLD_TABLE))
+    kept = ''.join(
+        char if char.isalnum() else ' '
+        for char in decomposed.translate(_FOLD_TABLE) if not unicodedata.combining(char)
+    )
+    return ' '.join(kept.split())
+
+def _place_id(row):
+    """Stable id for a gazetteer row without a GeoNames id."""
+    return zlib.crc32(f"{row['country_code']}|{row['admin1_code']}|{row['name']}".encode())
+
+def read_gazetteer(path=DEFAULT_SOURCE):
+    """
+    Reads the bundled CSV gazetteer.
+
+    Columns: name, alternatenames (';'-separated), country_code, country,
+    admin1_code, admin1, latitude, longitude, population and, optionally,
+    timezone.
+
+    Returns:
+        list: Place dicts.
+    """
+    places = []
+    with open(path, encoding='utf-8', newline='') as f:
+        for row in csv.DictReader(f):
+            places.append({
+                "id": _place_id(row),
+                "name": row['name'],
+                "alternatenames": [name for name in row['alternatenames'].split(';') if name],
+                "country_code": row['country_code'],
+                "country": row['country'],
+                "admin1_code": row['admin1_code'],
+                "admin1": row['admin1'],
+                "latitude": float(row['latitude']),
+                "longitude": float(row['longitude']),
+                "population": int(row['population']),
+                "timezone": row.get('timezone') or None
+            })
+    return places
+
+def read_geonames(path):
+    """
+    Reads a GeoNames cities dump (tab-separated, e.g. cities15000.txt).
+
+    GeoNames rows carry admin1 and country codes only, so those codes double
+    as the region and country names.
+    """
+    places = []
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            fields = line.rstrip('\n').split('\t')
+            if len(fields) < 18:
+                continue
+            places.append({
+                "id": int(fields[0]),
+                "name": fields[1],
+                # Alternate names include airport codes and other languages; keep the Latin ones
+                "alternatenames": [fields[2]] + [
+                    name for name in fields[3].split(',') if name and len(name) > 3 and fold(name).isascii()
+                ],
+                "country_code": fields[8],
+                "country": fields[8],
+                "admin1_code": fields[10],
+                "admin1": fields[10],
+                "latitude": float(fields[4]),
+                "longitude": float(fields[5]),
+                "population": int(fields[14] or 0),
+                "timezone": fields[17] or None
+            })
+    return places
+
+def _label(name, admin1, country):
+    return ", ".join(part for part in (name, admin1, country) if part)
+
+# --- Index Build ---
+
+def build_index(out_dir=DEFAULT_INDEX_PATH, source=DEFAULT_SOURCE, geonames=None):
+    """
+    Compiles a gazetteer into the memory-mapped geocoder index.
+
+    Places without a timezone are resolved with TimezoneResolver (and so
+    TimezoneFinder) here, once, rather than per chart request.
+
+    Args:
+        out_dir (str): Output directory.
+        source (str): CSV gazetteer; ignored when `geonames` is given.
+        geonames (str, optional): GeoNames cities dump to build from instead.
+
+    Returns:
+        dict: The index metadata.
+
+    Raises:
+        ValueError: If two places share an id.
+    """
+    from timezone_resolver import TimezoneResolver
+
+    started = time.perf_counter()
+    source_path = geonames or source
+    places = read_geonames(geonames) if geonames else read_gazetteer(source)
+    places.sort(key=lambda place: (-place['population'], place['name'], place['id']))
+
+    ids = np.array([place['id'] for place in places], dtype=np.uint32)
+    if len(np.unique(ids)) != len(ids):
+        raise ValueError("Duplicate place ids in gazetteer; names must be unique per country and region")
+
+    missing = [place for place in places if not place['timezone']]
+    if missing:
+        zones = TimezoneResolver().resolve_many([place['latitude'] for place in missing],
+                                                [place['longitude'] for place in missing])
+        for place, zone in zip(missing, zones):
+            place['timezone'] = zone
+
+    zone_names = sorted({place['timezone'] for place in places})
+    regions = sorted({(place['country_code'], place['country'], place['admin1_code'], place['admin1'])
+                      for place in places})
+    zone_index = {zone: i for i, zone in enumerate(zone_names)}
+    region_index = {region: i for i, region in enumerate(regions)}
+
+    records = np.zeros(len(places), dtype=PLACE_DTYPE)
+    records['id'] = ids
+    records['latitude'] = [place['latitude'] for place in places]
+    records['longitude'] = [place['longitude'] for place in places]
+    records['population'] = [place['population'] for place in places]
+    records['zone'] = [zone_index[place['timezone']] for place in places]
+    records['region'] = [region_index[(place['country_code'], place['country'], place['admin1_code'], place['admin1'])]
+                         for place in places]
+
+    keys = []
+    for position, place in enumerate(places):
+        for key in {fold(name) for name in [place['name']] + place['alternatenames']}:
+            if key:
+                keys.append((key.encode('utf-8'), position))
+    keys.sort()
+
+    id_order = np.argsort(ids, kind='stable').astype(np.uint32)
+
+    os.makedirs(out_dir, exist_ok=True)
+    np.save(os.path.join(out_dir, 'places.npy'), records)
+    np.save(os.path.join(out_dir, 'names.npy'), np.array([place['name'].encode('utf-8') for place in places]))
+    np.save(os.path.join(out_dir, 'keys.npy'), np.array([key for key, _ in keys]))
+    np.save(os.path.join(out_dir, 'key_places.npy'), np.array([position for _, position in keys], dtype=np.uint32))
+    np.save(os.path.join(out_dir, 'id_order.npy'), id_order)
+
+    with open(source_path, 'rb') as f:
+        source_hash = hashlib.sha256(f.read()).hexdigest()[:16]
+    meta = {
+        "version": INDEX_VERSION,
+        "source": os.path.basename(source_path),
+        "sourceSha256": source_hash,
+        "places": len(places),
+        "keys": len(keys),
+        "zones": zone_names,
+        "regions": [list(region) for region in regions]
+    }
+    with open(os.path.join(out_dir, 'meta.json'), 'w') as f:
+        json.dump(meta, f, indent=2, ensure_ascii=False)
+
+    print(f"Built geocoder index: {len(places)} places, {len(keys)} names in {time.perf_counter() - started:.1f}s")
+    return meta
+
+# --- Runtime Lookup ---
+
+class Geocoder:
+    """
+    Memory-mapped gazetteer index with prefix search.
+
+    Args:
+        path (str): Directory written by build_index.
+
+    Raises:
+        FileNotFoundError: If the index has not been built.
+    """
+
+    def __init__(self, path=DEFAULT_INDEX_PATH):
+        with open(os.path.join(path, 'meta.json'), encoding='utf-8') as f:
+            self.meta = json.load(f)
+        load = lambda name: np.load(os.path.join(path, f"{name}.npy"), mmap_mode='r').view(np.ndarray)
+        self.places = load('places')
+        self.names = load('names')
+        self.keys = load('keys')
+        self.key_places = load('key_places')
+        self.id_order = load('id_order')
+        self.sorted_ids = self.places['id'][self.id_order]
+        self.zones = self.meta['zones']
+        self.regions = self.meta['regions']
+        self._folded_regions = [tuple(fold(part) for part in region) for region in self.regions]
+        self._region_masks = LRUCache(1024)
+
+        # Exact coordinates of known places, at the chart cache's precision
+        self._coordinate_zones = {
+            (round(lat, COORD_PRECISION), round(lon, COORD_PRECISION)): self.zones[zone]
+            for lat, lon, zone in zip(self.places['latitude'].tolist(), self.places['longitude'].tolist(),
+                                      self.places['zone'].tolist())
+        }
+
+    def __len__(self):
+        return len(self.places)
+
+    def _region_mask(self, qualifiers):
+        """Boolean mask over regions matching every qualifier as a prefix of one of their fields."""
+        mask = self._region_masks.get(qualifiers)
+        if mask is None:
+            mask = np.array([
+                all(any(part.startswith(qualifier) for part in region) for qualifier in qualifiers)
+                for region in self._folded_regions
+            ], dtype=bool)
+            self._region_masks.put(qualifiers, mask)
+        return mask
+
+    def _result(self, position):
+        record = self.places[position]
+        country_code, country, admin1_code, admin1 = self.regions[record['region']]
+        name = self.names[position].decode('utf-8')
+        return {
+            "placeId": int(record['id']),
+            "name": name,
+            "admin1": admin1 or None,
+            "admin1Code": admin1_code or None,
+            "country": country,
+            "countryCode": country_code,
+            "label": _label(name, admin1, country),
+            "latitude": float(record['latitude']),
+            "longitude": float(record['longitude']),
+            "timezone": self.zones[record['zone']],
+            "population": int(record['population'])
+        }
+
+    def search(self, query, limit=DEFAULT_LIMIT):
+        """
+        Places whose name starts with `query`, exact names first, then by
+        population.
+
+        Args:
+            query (str): A name prefix, optionally followed by comma-separated
+                region or country qualifiers ("portland, me").
+            limit (int): Maximum number of results.
+
+        Returns:
+            list: Result dicts with placeId, name, admin1, country, label,
+                  coordinates, timezone and population.
+        """
+        name, *qualifiers = query.split(',')
+        key = fold(name)
+        if not key:
+            return []
+        prefix = key.encode('utf-8')
+
+        # UTF-8 never contains 0xff, so prefix + 0xff sorts after every key that starts with prefix
+        lo = int(np.searchsorted(self.keys, prefix, 'left'))
+        exact = int(np.searchsorted(self.keys, prefix, 'right'))
+        hi = int(np.searchsorted(self.keys, prefix + b'\xff', 'left'))
+        if lo == hi:
+            return []
+
+        # Place positions are in population order, so np.unique also ranks them
+        exact_places = np.unique(self.key_places[lo:exact])
+        candidates = np.concatenate([exact_places, np.setdiff1d(self.key_places[exact:hi], exact_places)])
+
+        qualifiers = tuple(folded for folded in (fold(part) for part in qualifiers) if folded)
+        if qualifiers:
+            candidates = candidates[self._region_mask(qualifiers)[self.places['region'][candidates]]]
+
+        return [self._result(position) for position in candidates[:limit].tolist()]
+
+    def place(self, place_id):
+        """
+        Looks up a place by its placeId.
+
+        Returns:
+            dict: As in search(), or None if the id is unknown or malformed.
+        """
+        try:
+            place_id = int(place_id)
+        except (TypeError, ValueError):
+            return None
+        if not 0 <= place_id <= 0xFFFFFFFF:
+            return None
+        i = int(np.searchsorted(self.sorted_ids, place_id))
+        if i == len(self.sorted_ids) or self.sorted_ids[i] != place_id:
+            return None
+        return self._result(int(self.id_order[i]))
+
+    def timezone_at(self, lat, lon):
+        """The precomputed zone of a known place at these coordinates, or None."""
+        return self._coordinate_zones.get((round(lat, COORD_PRECISION), round(lon, COORD_PRECISION)))
+
+def load_geocoder(path=DEFAULT_INDEX_PATH):
+    """Loads the geocoder index, or returns None if it is missing or unreadable."""
+    if not os.path.exists(os.path.join(path, 'meta.json')):
+        return None
+    try:
+        return Geocoder(path)
+    except Exception as e:
+        logger.error("Error loading geocoder index from %s: %s", path, e)
+        return None
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Build the offline geocoder index.")
+    sub = parser.add_subparsers(dest='command', required=True)
+    build_parser = sub.add_parser('build')
+    build_parser.add_argument('--source', default=DEFAULT_SOURCE, help="CSV gazetteer")
+    build_parser.add_argument('--geonames', default=None, help="GeoNames cities dump to build from instead")
+    build_parser.add_argument('--out', default=DEFAULT_INDEX_PATH)
+    args = parser.parse_args()
+    build_index(args.out, args.source, args.geonames)
@@ -0,0 +1,74 @@
+"""
+gunicorn.conf.py: Production server configuration.
+
+The app is preloaded in the master so TimezoneFinder's polygon data, the
+memory-mapped ephemeris table and the imported modules are shared by every
+worker copy-on-write. Each worker then warms up (reopening the ephemeris
+files and computing one chart) before it accepts requests.
+
+The master also starts the job runner (see jobs.py), which runs queued
+background jobs in their own niced processes next to the web workers.
+
+All settings can be overridden from the environment; see
+BACKEND_INTEGRATION.md for per-worker memory figures.
+"""
+
+import os
+import tempfile
+
+wsgi_app = "wsgi:app"
+bind = os.environ.get('COSMIC_BIND', f"0.0.0.0:{os.environ.get('PORT', '5000')}")
+
+# Chart calculation is CPU-bound, so one sync worker per core.
+workers = int(os.environ.get('WEB_CONCURRENCY', os.cpu_count() or 1))
+# batch.py divides the cores between the workers' process pools by this
+os.environ['WEB_CONCURRENCY'] = str(workers)
+worker_class = 'sync'
+# A sync worker is killed if one request outlasts this, so long streams (job
+# status, reports) close before it and the client reconnects.
+timeout = int(os.environ.get('COSMIC_WORKER_TIMEOUT', 60))
+graceful_timeout = 30
+keepalive = 5
+
+preload_app = True
+
+accesslog = '-'
+errorlog = '-'
+loglevel = os.environ.get('COSMIC_LOG_LEVEL', 'info')
+
+# Every worker records metrics into its own memory-mapped file here, and
+# /metrics sums them all. Set before the app is imported so metrics.py sees it.
+os.environ.setdefault('COSMIC_METRICS_DIR', os.path.join(tempfile.gettempdir(), 'cosmic-metrics'))
+
+def on_starting(server):
+    """Clears metric files left by a previous run."""
+    from metrics import reset_directory
+    reset_directory(os.environ['COSMIC_METRICS_DIR'])
+
+def when_ready(server):
+    """Starts the job runner, under a supervisor that restarts it, once the master is up."""
+    from jobs import start_runner_process
+    server.job_runner = start_runner_process()
+    if server.job_runner is not None:
+        server.log.info("Job runner supervisor started: %s", server.job_runner.pid)
+
+def on_exit(server):
+    """Stops the job runner; it requeues whatever it was running."""
+    runner = getattr(server, 'job_runner', None)
+    if runner is not None:
+        runner.terminate()
+        runner.join(timeout=graceful_timeout)
+
+def post_worker_init(worker):
+    """Warms the worker up before it is handed any connections."""
+    from app import timezone_resolver
+    from warmup import readiness, warm_up
+
+    warm_up(timezone_resolver)
+    worker.log.info("Worker %s warm: %s", worker.pid, readiness())
+
+def child_exit(server, worker):
+    """Folds a dead worker's metrics, and those of its batch pool, into the aggregate."""
+    from metrics import mark_process_dead, sweep_dead_processes
+    mark_process_dead(worker.pid, directory=os.environ['COSMIC_METRICS_DIR'])
+    sweep_dead_processes(os.environ['COSMIC_METRICS_DIR'])
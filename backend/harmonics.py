@@ -0,0 +1,232 @@
+#!/usr/bin/env python3
+"""
+harmonics.py: Harmonic charts and midpoint structures.
+
+Both are derived from a chart's longitudes alone, without further ephemeris
+calls:
+
+- The Nth harmonic chart multiplies every longitude by N (mod 360). All the
+  requested harmonics come out of one broadcast multiply, and their aspects
+  from one find_aspects call over the (harmonics, planets) stack.
+- Midpoints are kept in a MidpointIndex sorted on the dial (360° for direct
+  midpoints, 90° for the hard-aspect dial), so the midpoints within orb of a
+  point are a contiguous run found by binary search instead of comparing
+  every point with every pair.
+"""
+
+import numpy as np
+
+from aspect_engine import DEFAULT_CONFIG, AspectMatrix, find_aspects, aspect_records
+from aspect_patterns import find_patterns
+from astrology_core import ZODIAC_SIGNS
+
+# --- Constants and Configuration ---
+
+# The harmonic charts the report prompt asks for.
+HARMONICS = (5, 7, 9, 11, 13, 16)
+
+# Midpoint dials: direct midpoints, and the 90° dial on which conjunctions,
+# squares and oppositions to a midpoint coincide.
+DIALS = (360.0, 90.0)
+
+# Orb for a point to occupy a midpoint, degrees on the dial.
+MIDPOINT_ORB = 1.5
+
+# --- Helper Functions ---
+
+def _wrap180(angle):
+    """Wraps angles to [-180, 180)."""
+    return (angle + 180.0) % 360.0 - 180.0
+
+def _sign_and_degree(longitudes):
+    """Sign names and degrees within sign for an array of longitudes."""
+    signs = [ZODIAC_SIGNS[int(index) % 12] for index in (np.asarray(longitudes) // 30.0).ravel()]
+    return signs, np.asarray(longitudes) % 30.0
+
+# --- Harmonics ---
+
+def harmonic_positions(longitudes, harmonics=HARMONICS):
+    """
+    Harmonic longitudes for every requested harmonic at once.
+
+    Args:
+        longitudes (array-like): Shape (..., n).
+        harmonics (sequence): Harmonic numbers.
+
+    Returns:
+        ndarray: Shape (..., len(harmonics), n), values in [0, 360).
+    """
+    longitudes = np.asarray(longitudes, dtype=np.float64)
+    multipliers = np.asarray(harmonics, dtype=np.float64)
+    return (longitudes[..., None, :] * multipliers[:, None]) % 360.0
+
+def harmonic_charts(names, longitudes, harmonics=HARMONICS, config=DEFAULT_CONFIG):
+    """
+    Positions and aspects of each harmonic chart of one chart.
+
+    Args:
+        names (list): Point names.
+        longitudes (array-like): Shape (n,), matching `names`.
+        harmonics (sequence): Harmonic numbers.
+        config (AspectConfig): Aspects and orbs tested within each harmonic chart.
+
+    Returns:
+        dict: '<N>H' -> {'harmonic', 'planets', 'aspects', 'patterns'},
+              where planets maps each name to its harmonic longitude, sign
+              and degree, and aspects and patterns have the same records as
+              the natal chart.
+    """
+    positions = harmonic_positions(longitudes, harmonics)
+    matrix = find_aspects(positions, names_a=names, config=config)
+
+    charts = {}
+    for row, harmonic in enumerate(harmonics):
+        row_positions = positions[row]
+        signs, degrees = _sign_and_degree(row_positions)
+        row_matrix = AspectMatrix(matrix.aspect[row], matrix.orb[row], matrix.separation[row], None)
+        charts[f"{harmonic}H"] = {
+            "harmonic": harmonic,
+            "planets": {
+                name: {"longitude": lon, "sign": sign, "degree": degree}
+                for name, lon, sign, degree in zip(names, row_positions.tolist(), signs, degrees.tolist())
+            },
+            "aspects": aspect_records(row_matrix, names, config=config),
+            "patterns": find_patterns(row_positions, names)
+        }
+    return charts
+
+# --- Midpoints ---
+
+class MidpointIndex:
+    """
+    Every pairwise midpoint of a set of points, sorted on a dial.
+
+    A midpoint is the nearer one of the two on the circle. On a dial smaller
+    than 360° each midpoint is reduced modulo the dial, so a single sorted
+    array answers conjunctions to the midpoint and to its dial equivalents.
+
+    Args:
+        names (list): Point names.
+        longitudes (array-like): Shape (n,), matching `names`.
+        dial (float): Dial size in degrees; 360 or a divisor of it.
+    """
+
+    def __init__(self, names, longitudes, dial=360.0):
+        self.names = list(names)
+        self.dial = float(dial)
+        longitudes = np.asarray(longitudes, dtype=np.float64)
+        self.points = longitudes
+        pair_i, pair_j = np.triu_indices(len(self.names), k=1)
+        midpoints = (longitudes[pair_i] + 0.5 * _wrap180(longitudes[pair_j] - longitudes[pair_i])) % 360.0
+
+        order = np.argsort(midpoints % self.dial, kind='stable')
+        self.pair_i = pair_i[order]
+        self.pair_j = pair_j[order]
+        self.longitudes = midpoints[order]
+        self.keys = self.longitudes % self.dial
+
+        # One copy either side of the dial, so a window that crosses 0 is
+        # still one contiguous run of the sorted keys
+        self._extended = np.concatenate([self.keys - self.dial, self.keys, self.keys + self.dial])
+
+    def __len__(self):
+        return len(self.keys)
+
+    def near(self, longitudes, orb=MIDPOINT_ORB):
+        """
+        Midpoints within `orb` of each query longitude, by binary search.
+
+        Args:
+            longitudes (array-like): Shape (q,).
+            orb (float): Maximum distance on the dial; must be under half the dial.
+
+        Returns:
+            list: For each query, (midpoint index, distance) pairs sorted by
+                  dial position.
+        """
+        queries = np.atleast_1d(np.asarray(longitudes, dtype=np.float64)) % self.dial
+        lo = np.searchsorted(self._extended, queries - orb, side='left')
+        hi = np.searchsorted(self._extended, queries + orb, side='right')
+        count = len(self.keys)
+        results = []
+        for query, start, stop in zip(queries.tolist(), lo.tolist(), hi.tolist()):
+            window = np.arange(start, stop)
+            results.append(list(zip((window % count).tolist(), np.abs(self._extended[window] - query).tolist())))
+        return results
+
+    def pictures(self, orb=MIDPOINT_ORB):
+        """
+        Planetary pictures: points that occupy the midpoint of two others.
+
+        Returns:
+            list: Dicts with `point`, `midpoint` ('A/B'), `planets`, `orb`
+                  and the midpoint's `longitude`, ordered by point then orb.
+        """
+        pictures = []
+        for point, hits in enumerate(self.near(self.points, orb)):
+            for index, distance in sorted(hits, key=lambda hit: hit[1]):
+                a, b = int(self.pair_i[index]), int(self.pair_j[index])
+                if point in (a, b):
+                    continue
+                pictures.append({
+                    "point": self.names[point],
+                    "midpoint": f"{self.names[a]}/{self.names[b]}",
+                    "planets": [self.names[a], self.names[b]],
+                    "orb": distance,
+                    "longitude": float(self.longitudes[index])
+                })
+        return pictures
+
+def midpoint_structures(names, longitudes, orb=MIDPOINT_ORB, dials=DIALS):
+    """
+    The full midpoint set and the planetary pictures on each dial.
+
+    Args:
+        names (list): Point names (planets and, usually, the angles).
+        longitudes (array-like): Shape (n,), matching `names`.
+        orb (float): Midpoint orb, degrees on the dial.
+        dials (sequence): Dial sizes.
+
+    Returns:
+        dict: `midpoints` (every pair's midpoint, in zodiacal order) and
+              `pictures`, mapping 'dial360'/'dial90' to picture lists.
+    """
+    longitudes = np.asarray(longitudes, dtype=np.float64)
+    indexes = {dial: MidpointIndex(names, longitudes, dial) for dial in dials}
+    direct = indexes[360.0] if 360.0 in indexes else MidpointIndex(names, longitudes)
+    return {
+        "midpoints": [
+            {"midpoint": f"{names[a]}/{names[b]}", "longitude": lon}
+            for a, b, lon in zip(direct.pair_i.tolist(), direct.pair_j.tolist(), direct.longitudes.tolist())
+        ],
+        "pictures": {f"dial{int(dial)}": index.pictures(orb) for dial, index in indexes.items()}
+    }
+
+# --- Public API ---
+
+def harmonic_analysis(chart_data, harmonics=HARMONICS, orb=MIDPOINT_ORB):
+    """
+    Harmonic charts and midpoint structures for a core chart.
+
+    Harmonics use the planets; midpoints also include the Ascendant and
+    Midheaven when the chart has them.
+
+    Args:
+        chart_data (dict): A chart from astrology_core.get_astrological_data.
+
+    Returns:
+        dict: `harmonics` (see harmonic_charts) and `midpoints` (see midpoint_structures).
+    """
+    names = list(chart_data['planets'].keys())
+    longitudes = [chart_data['planets'][name]['longitude'] for name in names]
+
+    points, point_longitudes = list(names), list(longitudes)
+    for angle, label in (('ascendant', 'Ascendant'), ('midheaven', 'Midheaven')):
+        if isinstance(chart_data.get(angle), dict):
+            points.append(label)
+            point_longitudes.append(chart_data[angle]['longitude'])
+
+    return {
+        "harmonics": harmonic_charts(names, longitudes, harmonics),
+        "midpoints": midpoint_structures(points, point_longitudes, orb)
+    }
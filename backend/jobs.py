@@ -0,0 +1,646 @@
+#!/usr/bin/env python3
+"""
+jobs.py: Persistent job queue for heavy analyses, run on a bounded
+process pool.
+
+Year-long transit scans, relocation maps and full reports take seconds,
+which is too long to hold a sync gunicorn worker and too long for the
+proxy in front of it. Instead a request submits a job and gets its id
+back at once; the job waits in a SQLite table until a runner process
+claims it, and clients poll or stream its status until the result is
+ready.
+
+- Jobs are claimed in tier priority order (premium, standard, free),
+  oldest first within a tier, by one atomic UPDATE ... RETURNING, so any
+  number of runners can share a queue.
+- Each runner keeps at most `workers` jobs running, each in its own forked
+  and niced process, so batch work neither blocks request workers nor
+  competes with them on equal terms for CPU.
+- Submissions are refused with a Retry-After estimate once the queue is
+  full; lower tiers are refused first, leaving headroom for paying ones.
+- A queued job is cancelled in place; a running one is terminated by its
+  runner. Jobs left running by a runner that died are requeued when the
+  next runner starts. Runners are identified by pid and process start
+  time, so a runner that comes back with its predecessor's pid (as it
+  usually does after a container restart) still recovers its jobs.
+
+Run a runner with `python jobs.py run`; gunicorn.conf.py starts one next
+to the web workers unless COSMIC_JOBS_WORKERS is 0, under a supervisor
+process that restarts it if it dies.
+"""
+
+import json
+import logging
+import math
+import multiprocessing
+import multiprocessing.connection
+import os
+import signal
+import sys
+import threading
+import time
+import uuid
+
+from metrics import inc, mark_process_dead
+from report_store import ConnectionPool
+
+logger = logging.getLogger(__name__)
+
+# --- Constants and Configuration ---
+
+DEFAULT_DB_PATH = os.path.join(os.path.dirname(__file__), 'data', 'jobs.sqlite3')
+
+# Jobs run at once per runner; defaults to half the cores, leaving the rest to request workers.
+DEFAULT_WORKERS = max(1, (os.cpu_count() or 1) // 2)
+
+# Queued jobs accepted before submissions are refused.
+DEFAULT_MAX_QUEUED = 100
+
+# tier -> (claim priority, share of DEFAULT_MAX_QUEUED the tier may fill)
+TIERS = {
+    "premium": (0, 1.0),
+    "standard": (1, 0.75),
+    "free": (2, 0.5),
+}
+DEFAULT_TIER = "free"
+
+# Niceness added to every job process, so interactive requests win the CPU.
+JOB_NICENESS = int(os.environ.get('COSMIC_JOBS_NICE', 10))
+
+# A job whose runner died is retried this many times before it fails.
+MAX_ATTEMPTS = 3
+
+# Finished jobs are deleted after this many seconds.
+RETENTION = 86400
+
+# Assumed job duration, in seconds, until some jobs have finished.
+DEFAULT_DURATION = 5.0
+
+POLL_INTERVAL = 0.25
+
+# A runner that dies is restarted after this many seconds, doubling up to
+# MAX_RESTART_DELAY while it keeps dying within that long of starting.
+RESTART_DELAY = 1.0
+MAX_RESTART_DELAY = 60.0
+
+QUEUED, RUNNING, SUCCEEDED, FAILED, CANCELLED = "queued", "running", "succeeded", "failed", "cancelled"
+FINISHED = (SUCCEEDED, FAILED, CANCELLED)
+
+SCHEMA = """
+    CREATE TABLE IF NOT EXISTS jobs (
+        id TEXT PRIMARY KEY,
+        kind TEXT NOT NULL,
+        tier TEXT NOT NULL,
+        priority INTEGER NOT NULL,
+        status TEXT NOT NULL,
+        params TEXT NOT NULL,
+        result TEXT,
+        error TEXT,
+        cancel_requested INTEGER NOT NULL DEFAULT 0,
+        attempts INTEGER NOT NULL DEFAULT 0,
+        runner TEXT,
+        created REAL NOT NULL,
+        started REAL,
+        finished REAL
+    );
+    CREATE INDEX IF NOT EXISTS jobs_queue ON jobs (status, priority, created);
+"""
+
+COLUMNS = "id, kind, tier, priority, status, params, result, error, cancel_requested, attempts, runner, created, started, finished"
+
+class QueueFull(Exception):
+    """The queue is too deep to accept a job; `retry_after` is a suggested wait in seconds."""
+
+    def __init__(self, retry_after):
+        super().__init__(f"Job queue is full; retry in {retry_after} s")
+        self.retry_after = retry_after
+
+# --- Job Handlers ---
+#
+# Handlers run in the job process and take the params the API layer
+# validated; whatever they return is stored as the job's JSON result.
+
+def _transits_job(params):
+    from transits import iter_transit_timeline
+
+    records = list(iter_transit_timeline(params['natal'], params['startJd'], params['days'], orb=params['orb']))
+    return {"startDate": params['startDate'], "days": params['days'], "natal": params['natal'], "records": records}
+
+def _astrocartography_job(params):
+    from astrocartography import astrocartography_map
+
+    result = astrocartography_map(params['julianDay'], params['lineStep'], params['fieldStep'])
+    result['meta'] = params['meta']
+    return result
+
+def _report_job(params):
+    from report_generation import load_prompt, provider_from_environment
+    from report_store import make_record, store_from_environment
+
+    store = store_from_environment()
+    try:
+        stored = store.get(params['fingerprint']) if store is not None else None
+        if stored is not None and stored['generatedVersion'] == params['templateVersion'] and stored['report']:
+            text = stored['report']
+        else:
+            text = ''.join(provider_from_environment().stream(load_prompt(), params['chart']))
+            if store is not None:
+                store.upsert(make_record(params['fingerprint'], params['engineVersion'], params['canonical'],
+                                         params['chart'], text, params['templateVersion'],
+                                         generated_version=params['templateVersion']))
+    finally:
+        if store is not None:
+            store.close()
+    return {"fingerprint": params['fingerprint'], "templateVersion": params['templateVersion'], "report": text}
+
+HANDLERS = {
+    "transits": _transits_job,
+    "astrocartography": _astrocartography_job,
+    "report": _report_job,
+}
+
+def _run_job(conn, kind, params):
+    """Entry point of a job process: runs one handler and sends back ('ok', result JSON) or ('error', message)."""
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    try:
+        os.nice(JOB_NICENESS)
+    except OSError:
+        pass
+    try:
+        from astrology_core import reset_ephemeris
+        reset_ephemeris()
+        conn.send(("ok", json.dumps(HANDLERS[kind](params))))
+    except Exception as e:
+        conn.send(("error", str(e) or type(e).__name__))
+    finally:
+        conn.close()
+
+# --- Queue ---
+
+def _job_from_row(row, include_result=True):
+    (job_id, kind, tier, _, status, _, result, error, cancel_requested, attempts, _, created, started, finished) = row
+    job = {
+        "id": job_id,
+        "kind": kind,
+        "tier": tier,
+        "status": status,
+        "cancelRequested": bool(cancel_requested),
+        "attempts": attempts,
+        "createdAt": created,
+        "startedAt": started,
+        "finishedAt": finished,
+        "error": error,
+    }
+    if include_result:
+        job["result"] = json.loads(result) if result is not None else None
+    return job
+
+class JobQueue:
+    """
+    SQLite-backed job queue shared by the API and the runners.
+
+    Args:
+        path (str): Database file.
+        max_queued (int): Queued jobs accepted before premium submissions are
+            refused; lower tiers are refused at their share of it.
+        workers (int): Jobs the runners process at once, for Retry-After estimates.
+        pool_size (int): Connections per process.
+    """
+
+    def __init__(self, path, max_queued=DEFAULT_MAX_QUEUED, workers=DEFAULT_WORKERS, pool_size=4):
+        self.path = path
+        self.max_queued = max_queued
+        self.workers = workers
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.pool = ConnectionPool(path, pool_size, schema=SCHEMA)
+
+    def retry_after(self, conn, queued):
+        """Seconds until the runners are likely to have worked through `queued` jobs."""
+        row = conn.execute(
+            "SELECT AVG(finished - started) FROM (SELECT finished, started FROM jobs "
+            "WHERE status = ? AND started IS NOT NULL ORDER BY finished DESC LIMIT 20)", (SUCCEEDED,)
+        ).fetchone()
+        duration = row[0] or DEFAULT_DURATION
+        return min(300, max(1, math.ceil(duration * queued / max(self.workers, 1))))
+
+    def submit(self, kind, params, tier=DEFAULT_TIER):
+        """
+        Queues a job.
+
+        Args:
+            kind (str): A key of HANDLERS.
+            params (dict): JSON-serialisable handler input.
+            tier (str): A key of TIERS.
+
+        Returns:
+            dict: The queued job.
+
+        Raises:
+            ValueError: If the kind or tier is unknown.
+            QueueFull: If the queue has no room for this tier.
+        """
+        if kind not in HANDLERS:
+            raise ValueError(f"Unknown job kind: {kind}")
+        if tier not in TIERS:
+            raise ValueError(f"Unknown tier: {tier}")
+        priority, share = TIERS[tier]
+        job_id = uuid.uuid4().hex
+        with self.pool.connection() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            queued = conn.execute("SELECT COUNT(*) FROM jobs WHERE status = ?", (QUEUED,)).fetchone()[0]
+            if queued >= self.max_queued * share:
+                inc("cosmic_jobs_total", kind=kind, status="rejected")
+                raise QueueFull(self.retry_after(conn, queued))
+            row = conn.execute(
+                f"INSERT INTO jobs (id, kind, tier, priority, status, params, created) VALUES (?, ?, ?, ?, ?, ?, ?) "
+                f"RETURNING {COLUMNS}",
+                (job_id, kind, tier, priority, QUEUED, json.dumps(params), time.time())
+            ).fetchone()
+            conn.execute("COMMIT")
+        inc("cosmic_jobs_total", kind=kind, status=QUEUED)
+        return dict(_job_from_row(row), position=queued)
+
+    def get(self, job_id, include_result=True):
+        """
+        A job by id, or None. Queued jobs carry `position`, the number of jobs
+        that will be claimed before them.
+        """
+        with self.pool.connection() as conn:
+            row = conn.execute(f"SELECT {COLUMNS} FROM jobs WHERE id = ?", (job_id,)).fetchone()
+            if row is None:
+                return None
+            job = _job_from_row(row, include_result)
+            if job['status'] == QUEUED:
+                job['position'] = conn.execute(
+                    "SELECT COUNT(*) FROM jobs WHERE status = ? AND (priority < ? OR (priority = ? AND created < ?))",
+                    (QUEUED, row[3], row[3], row[11])
+                ).fetchone()[0]
+        return job
+
+    def cancel(self, job_id):
+        """
+        Cancels a job: a queued one at once, a running one by asking its
+        runner to terminate it. Finished jobs are left as they are.
+
+        Returns:
+            dict: The job after the request, or None if there is no such job.
+        """
+        with self.pool.connection() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.execute("UPDATE jobs SET status = ?, finished = ? WHERE id = ? AND status = ?",
+                         (CANCELLED, time.time(), job_id, QUEUED))
+            conn.execute("UPDATE jobs SET cancel_requested = 1 WHERE id = ? AND status = ?", (job_id, RUNNING))
+            conn.execute("COMMIT")
+        return self.get(job_id, include_result=False)
+
+    def claim(self, runner):
+        """
+        Marks the next job running under `runner` (from runner_identity) and
+        returns (job id, kind, params), or None if nothing is queued.
+        """
+        with self.pool.connection() as conn:
+            row = conn.execute(
+                "UPDATE jobs SET status = ?, runner = ?, started = ?, attempts = attempts + 1 "
+                "WHERE id = (SELECT id FROM jobs WHERE status = ? ORDER BY priority, created LIMIT 1) "
+                "AND status = ? RETURNING id, kind, params",
+                (RUNNING, runner, time.time(), QUEUED, QUEUED)
+            ).fetchone()
+        if row is None:
+            return None
+        return row[0], row[1], json.loads(row[2])
+
+    def finish(self, job_id, status, result=None, error=None):
+        """
+        Records the outcome of a running job.
+
+        Args:
+            job_id (str): The job.
+            status (str): SUCCEEDED, FAILED or CANCELLED.
+            result (str, optional): The result, already encoded as JSON.
+            error (str, optional): What went wrong.
+        """
+        with self.pool.connection() as conn:
+            updated = conn.execute(
+                "UPDATE jobs SET status = ?, result = ?, error = ?, finished = ? WHERE id = ? AND status = ? "
+                "RETURNING kind", (status, result, error, time.time(), job_id, RUNNING)
+            ).fetchone()
+        if updated is not None:
+            inc("cosmic_jobs_total", kind=updated[0], status=status)
+
+    def requeue(self, job_ids):
+        """Puts running jobs back in the queue, keeping their place."""
+        with self.pool.connection() as conn:
+            conn.executemany("UPDATE jobs SET status = ?, runner = NULL, started = NULL WHERE id = ? AND status = ?",
+                             [(QUEUED, job_id, RUNNING) for job_id in job_ids])
+
+    def cancel_requested(self, job_ids):
+        """The subset of `job_ids` that clients have asked to cancel."""
+        if not job_ids:
+            return set()
+        with self.pool.connection() as conn:
+            rows = conn.execute(
+                f"SELECT id FROM jobs WHERE cancel_requested = 1 AND id IN ({','.join('?' * len(job_ids))})",
+                list(job_ids)
+            ).fetchall()
+        return {row[0] for row in rows}
+
+    def recover(self, running=()):
+        """
+        Requeues jobs left running by runners that no longer exist, failing
+        those that have used up their attempts.
+
+        Args:
+            running (iterable): Ids of the jobs the calling process is running;
+                any other job claimed under its own identity is orphaned too.
+
+        Returns:
+            int: Number of jobs recovered.
+        """
+        identity, running = runner_identity(), set(running)
+        with self.pool.connection() as conn:
+            rows = conn.execute("SELECT id, runner, attempts, cancel_requested FROM jobs WHERE status = ?",
+                                (RUNNING,)).fetchall()
+            recovered = 0
+            for job_id, runner, attempts, cancel_requested in rows:
+                runner = None if runner is None else str(runner)
+                if runner == identity:
+                    if job_id in running:
+                        continue
+                elif runner is not None and _runner_alive(runner):
+                    continue
+                if cancel_requested:
+                    status, error = CANCELLED, None
+                elif attempts >= MAX_ATTEMPTS:
+                    status, error = FAILED, f"Runner died {attempts} times"
+                else:
+                    status, error = QUEUED, None
+                conn.execute("UPDATE jobs SET status = ?, error = ?, runner = NULL, started = NULL, "
+                             "finished = CASE WHEN ? = ? THEN NULL ELSE ? END WHERE id = ? AND status = ?",
+                             (status, error, status, QUEUED, time.time(), job_id, RUNNING))
+                recovered += 1
+        return recovered
+
+    def prune(self, max_age=RETENTION):
+        """Deletes jobs that finished more than `max_age` seconds ago."""
+        with self.pool.connection() as conn:
+            return conn.execute("DELETE FROM jobs WHERE status IN (?, ?, ?) AND finished < ?",
+                                (*FINISHED, time.time() - max_age)).rowcount
+
+    def depth(self):
+        """Job counts by status."""
+        with self.pool.connection() as conn:
+            counts = dict(conn.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall())
+        return {status: counts.get(status, 0) for status in (QUEUED, RUNNING) + FINISHED}
+
+    def stats(self):
+        return {"path": self.path, "maxQueued": self.max_queued, "workers": self.workers, "jobs": self.depth()}
+
+    def close(self):
+        self.pool.close()
+
+def _process_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+def _start_time(pid):
+    """A process's start time in clock ticks since boot, or None where /proc is unavailable."""
+    try:
+        with open(f"/proc/{pid}/stat") as f:
+            # The command name may contain spaces and parentheses; fields resume after the last ')'
+            return f.read().rsplit(')', 1)[1].split()[19]
+    except (OSError, IndexError):
+        return None
+
+def runner_identity(pid=None):
+    """
+    Identifies a process as 'pid:start time', or just 'pid' where the start
+    time cannot be read, so that a pid reused by a later process does not
+    pass for the runner that claimed a job.
+    """
+    pid = os.getpid() if pid is None else pid
+    start = _start_time(pid)
+    return str(pid) if start is None else f"{pid}:{start}"
+
+def _runner_alive(identity):
+    pid, _, start = identity.partition(':')
+    try:
+        pid = int(pid)
+    except ValueError:
+        return False
+    if not _process_alive(pid):
+        return False
+    # Rows written before start times were recorded carry only a pid
+    return not start or _start_time(pid) in (start, None)
+
+# --- Runner ---
+
+class JobRunner:
+    """
+    Claims jobs from a queue and runs each in its own process, at most
+    `workers` at a time.
+
+    Args:
+        queue (JobQueue): Where jobs come from.
+        workers (int): Job processes alive at once.
+        poll_interval (float): Seconds between checks for new jobs and cancellations.
+    """
+
+    def __init__(self, queue, workers=DEFAULT_WORKERS, poll_interval=POLL_INTERVAL):
+        self.queue = queue
+        self.workers = workers
+        self.poll_interval = poll_interval
+        self.running = {}  # job id -> (process, result connection)
+        self.identity = runner_identity()
+        self.completed = 0
+        self._context = multiprocessing.get_context('fork')
+        self._stop = threading.Event()
+
+    def _start(self, job_id, kind, params):
+        receiver, sender = self._context.Pipe(duplex=False)
+        process = self._context.Process(target=_run_job, args=(sender, kind, params),
+                                        name=f"cosmic-job-{job_id[:8]}", daemon=True)
+        process.start()
+        sender.close()
+        self.running[job_id] = (process, receiver)
+
+    def _collect(self, job_id):
+        process, receiver = self.running.pop(job_id)
+        try:
+            outcome, value = receiver.recv()
+        except EOFError:
+            outcome, value = "error", None
+        receiver.close()
+        process.join()
+        mark_process_dead(process.pid)
+        if outcome == "ok":
+            self.queue.finish(job_id, SUCCEEDED, result=value)
+        else:
+            self.queue.finish(job_id, FAILED, error=value or f"Job process exited with code {process.exitcode}")
+            logger.warning("Job %s failed: %s", job_id, value)
+        self.completed += 1
+
+    def _terminate(self, job_id):
+        process, receiver = self.running.pop(job_id)
+        process.terminate()
+        process.join()
+        mark_process_dead(process.pid)
+        receiver.close()
+
+    def step(self, timeout=None):
+        """
+        One pass of the scheduling loop: collects finished jobs, terminates
+        cancelled ones, starts queued ones into free slots, then waits up to
+        `timeout` seconds for a job to finish.
+        """
+        ready = multiprocessing.connection.wait(
+            [receiver for _, receiver in self.running.values()], timeout=0
+        ) if self.running else []
+        for job_id in [job_id for job_id, (_, receiver) in self.running.items() if receiver in ready]:
+            self._collect(job_id)
+
+        for job_id in self.queue.cancel_requested(list(self.running)):
+            self._terminate(job_id)
+            self.queue.finish(job_id, CANCELLED)
+            logger.info("Job %s cancelled while running", job_id)
+
+        while len(self.running) < self.workers:
+            job = self.queue.claim(self.identity)
+            if job is None:
+                break
+            self._start(*job)
+
+        if timeout:
+            if self.running:
+                multiprocessing.connection.wait([receiver for _, receiver in self.running.values()], timeout)
+            else:
+                self._stop.wait(timeout)
+
+    def run(self):
+        """Runs until `stop` is called, then requeues whatever is still running."""
+        recovered = self.queue.recover(self.running)
+        if recovered:
+            logger.info("Recovered %d jobs from a previous runner", recovered)
+        last_prune = 0.0
+        try:
+            while not self._stop.is_set():
+                self.step(self.poll_interval)
+                if time.monotonic() - last_prune > 3600:
+                    self.queue.prune()
+                    last_prune = time.monotonic()
+        finally:
+            self.shutdown()
+
+    def stop(self):
+        self._stop.set()
+
+    def shutdown(self):
+        """Terminates running jobs and puts them back in the queue for the next runner."""
+        job_ids = list(self.running)
+        for job_id in job_ids:
+            self._terminate(job_id)
+        if job_ids:
+            self.queue.requeue(job_ids)
+            logger.info("Requeued %d running jobs on shutdown", len(job_ids))
+
+# --- Public API ---
+
+def queue_from_environment():
+    """
+    Builds the job queue described by the environment, or None if disabled.
+
+    COSMIC_JOBS_DB           SQLite path (default backend/data/jobs.sqlite3; empty disables)
+    COSMIC_JOBS_WORKERS      job processes per runner (default half the cores)
+    COSMIC_JOBS_MAX_QUEUED   queued jobs accepted before submissions get 429 (default 100)
+    """
+    path = os.environ.get('COSMIC_JOBS_DB', DEFAULT_DB_PATH)
+    if not path:
+        return None
+    return JobQueue(
+        path,
+        max_queued=int(os.environ.get('COSMIC_JOBS_MAX_QUEUED', DEFAULT_MAX_QUEUED)),
+        workers=int(os.environ.get('COSMIC_JOBS_WORKERS', DEFAULT_WORKERS))
+    )
+
+def _reset_inherited_signals():
+    # A process forked from the gunicorn master inherits its signal handlers
+    for sig in (signal.SIGHUP, signal.SIGQUIT, signal.SIGUSR1, signal.SIGUSR2,
+                signal.SIGTTIN, signal.SIGTTOU, signal.SIGWINCH, signal.SIGCHLD):
+        signal.signal(sig, signal.SIG_DFL)
+
+def run_runner():
+    """Runs a job runner in this process until SIGTERM or SIGINT."""
+    queue = queue_from_environment()
+    if queue is None:
+        logger.error("COSMIC_JOBS_DB is empty; job queue disabled")
+        return
+    runner = JobRunner(queue, queue.workers)
+    _reset_inherited_signals()
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        signal.signal(sig, lambda signum, frame: runner.stop())
+    logger.info("Job runner %s started with %d workers on %s", os.getpid(), runner.workers, queue.path)
+    runner.run()
+    queue.close()
+
+def supervise_runner():
+    """
+    Runs a job runner in a child process until SIGTERM or SIGINT, starting a
+    new one whenever it dies. Each new runner requeues the jobs its
+    predecessor left running.
+    """
+    context = multiprocessing.get_context('fork')
+    state = {"stopping": False, "runner": None}
+
+    def stop(signum, frame):
+        state["stopping"] = True
+        if state["runner"] is not None and state["runner"].pid != os.getpid():
+            os.kill(state["runner"].pid, signal.SIGTERM)
+
+    _reset_inherited_signals()
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        signal.signal(sig, stop)
+
+    delay = RESTART_DELAY
+    while not state["stopping"]:
+        started = time.monotonic()
+        runner = context.Process(target=run_runner, name="cosmic-job-runner")
+        runner.start()
+        state["runner"] = runner
+        runner.join()
+        state["runner"] = None
+        # A runner only returns on its own after a stop signal, or when the queue is disabled
+        if state["stopping"] or runner.exitcode == 0:
+            break
+
+        if time.monotonic() - started > MAX_RESTART_DELAY:
+            delay = RESTART_DELAY
+        logger.error("Job runner %s exited with code %s; restarting in %g s", runner.pid, runner.exitcode, delay)
+        deadline = time.monotonic() + delay
+        while not state["stopping"] and time.monotonic() < deadline:
+            time.sleep(0.1)
+        delay = min(delay * 2, MAX_RESTART_DELAY)
+
+def start_runner_process():
+    """
+    Forks a process that runs and supervises the job runner; returns it, or
+    None if the queue is disabled. Terminating it stops the runner, which
+    requeues whatever it was running.
+    """
+    if not os.environ.get('COSMIC_JOBS_DB', DEFAULT_DB_PATH) or \
+            int(os.environ.get('COSMIC_JOBS_WORKERS', DEFAULT_WORKERS)) <= 0:
+        return None
+    process = multiprocessing.get_context('fork').Process(target=supervise_runner, name="cosmic-job-supervisor")
+    process.start()
+    return process
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    if sys.argv[1:] != ['run']:
+        print("usage: jobs.py run", file=sys.stderr)
+        sys.exit(2)
+    run_runner()
@@ -0,0 +1,413 @@
+#!/usr/bin/env python3
+"""
+loadtest.py: Open-loop load test of a locally started gunicorn server.
+
+For each worker count, the harness starts gunicorn with gunicorn.conf.py on
+a free loopback port, waits for /health, and replays a request mix at each
+requested arrival rate:
+
+- single: a new chart (POST /api/cosmic-signature);
+- repeat: a chart sent earlier in the run, which the chart cache answers;
+- batch: BATCH_RECORDS new charts in one POST /api/cosmic-signature/batch;
+- transit: a TRANSIT_DAYS-day timeline, read to the end of the stream.
+
+Requests are sent on a fixed schedule whether or not earlier ones have
+completed (open loop), and each one's latency runs from the time it was
+scheduled, not from when a connection became free. A closed-loop client
+that waits for responses slows down with the server and hides the queueing
+it causes ("coordinated omission"); measuring from the schedule counts it.
+The uncorrected p99, from the actual send time, is reported alongside for
+comparison.
+
+Birth records are drawn like rarity.py's: population-weighted cities and
+birth years over living generations, so the rarity and timezone paths see
+realistic inputs.
+
+The client runs in this process with one thread per connection; on a small
+machine it competes with the server for CPU, so leave it a core if you can.
+
+Usage:
+    python loadtest.py [--workers 1 2 4] [--rates 5 10 20] [--duration 30]
+                       [--mix single=55,repeat=25,batch=10,transit=10] [--slo-ms 500] [--out loadtest.json]
+"""
+
+import argparse
+import http.client
+import json
+import math
+import os
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
+import numpy as np
+
+from rarity import BIRTH_YEARS, LOCATION_JITTER, POPULATION_CENTRES
+
+# --- Constants and Configuration ---
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+
+DEFAULT_WORKERS = (1, 2)
+DEFAULT_RATES = (5.0, 10.0, 20.0)
+DEFAULT_DURATION = 30.0
+
+# Share of requests of each kind.
+DEFAULT_MIX = {"single": 55, "repeat": 25, "batch": 10, "transit": 10}
+
+BATCH_RECORDS = 20
+TRANSIT_DAYS = 30
+TRANSIT_START = "2026-01-01"
+
+# Client threads; requests beyond this many in flight wait in the client,
+# and that wait is part of their measured latency.
+DEFAULT_CONNECTIONS = 64
+REQUEST_TIMEOUT = 60.0
+
+# A rate is sustained when p99 stays under the SLO, nothing fails and the
+# server completes at least this share of the offered rate.
+DEFAULT_SLO_MS = 500.0
+SUSTAINED_SHARE = 0.95
+
+SERVER_START_TIMEOUT = 120.0
+
+# Pause between rates so one step's backlog does not spill into the next.
+SETTLE_SECONDS = 2.0
+
+# --- Latency Histogram ---
+
+class LatencyHistogram:
+    """
+    Log-bucketed latency histogram.
+
+    Bucket bounds grow by `precision` (1%) from `lowest` to `highest`, so
+    percentiles are within 1% at any scale in a fixed few thousand counters,
+    however many requests are recorded.
+    """
+
+    def __init__(self, lowest=1e-5, highest=300.0, precision=0.01):
+        self.lowest = lowest
+        self.growth = math.log1p(precision)
+        self.counts = np.zeros(int(math.ceil(math.log(highest / lowest) / self.growth)) + 2, dtype=np.int64)
+        self.total = 0
+        self.max = 0.0
+        self._lock = threading.Lock()
+
+    def _index(self, seconds):
+        if seconds <= self.lowest:
+            return 0
+        return min(int(math.log(seconds / self.lowest) / self.growth) + 1, len(self.counts) - 1)
+
+    def _upper_bound(self, index):
+        return self.lowest * math.exp(self.growth * index)
+
+    def record(self, seconds):
+        index = self._index(seconds)
+        with self._lock:
+            self.counts[index] += 1
+            self.total += 1
+            self.max = max(self.max, seconds)
+
+    def percentile(self, q):
+        """Upper bound of the bucket holding the q-th percentile, in seconds; None if empty."""
+        if not self.total:
+            return None
+        rank = max(int(math.ceil(q / 100.0 * self.total)), 1)
+        index = int(np.searchsorted(np.cumsum(self.counts), rank))
+        return min(self._upper_bound(index), self.max)
+
+    def buckets(self):
+        """(upper bound seconds, count) for every non-empty bucket."""
+        return [(self._upper_bound(int(index)), int(self.counts[index])) for index in np.flatnonzero(self.counts)]
+
+# --- Request Mix ---
+
+def parse_mix(text):
+    """Parses 'single=55,repeat=25,...' into a dict of kind -> weight."""
+    mix = {}
+    for part in text.split(','):
+        kind, _, weight = part.partition('=')
+        if kind.strip() not in DEFAULT_MIX:
+            raise ValueError(f"Unknown request kind {kind.strip()!r}; expected one of {', '.join(DEFAULT_MIX)}")
+        mix[kind.strip()] = float(weight)
+    if sum(mix.values()) <= 0:
+        raise ValueError("Mix weights must add up to more than zero")
+    return mix
+
+def _birth_records(rng, count):
+    """Birth records from population-weighted cities and living birth years."""
+    weights = np.array([city[3] for city in POPULATION_CENTRES])
+    cities = rng.choice(len(POPULATION_CENTRES), size=count, p=weights / weights.sum())
+    first = np.datetime64(f"{BIRTH_YEARS[0]:04d}-01-01", 'D')
+    days = int((np.datetime64(f"{BIRTH_YEARS[1] + 1:04d}-01-01", 'D') - first).astype(np.int64))
+    dates = first + rng.integers(0, days, count)
+    minutes = rng.integers(0, 1440, count)
+    jitter = rng.uniform(-LOCATION_JITTER, LOCATION_JITTER, (count, 2))
+    return [
+        {
+            "birthDate": str(date),
+            "birthTime": f"{minute // 60:02d}:{minute % 60:02d}",
+            "latitude": round(POPULATION_CENTRES[city][1] + dlat, 4),
+            "longitude": round(POPULATION_CENTRES[city][2] + dlon, 4)
+        }
+        for date, minute, city, (dlat, dlon) in zip(dates, minutes.tolist(), cities.tolist(), jitter.tolist())
+    ]
+
+def build_schedule(rate, duration, mix=DEFAULT_MIX, seed=1):
+    """
+    The requests of one load step, evenly spaced at `rate` per second.
+
+    Returns:
+        list: (offset seconds, kind, path, JSON body bytes) in send order.
+    """
+    rng = np.random.default_rng(seed)
+    count = max(int(rate * duration), 1)
+    kinds = list(mix)
+    weights = np.array([mix[kind] for kind in kinds], dtype=np.float64)
+    choices = rng.choice(len(kinds), size=count, p=weights / weights.sum())
+
+    schedule = []
+    sent = []
+    for position, choice in enumerate(choices.tolist()):
+        kind = kinds[choice]
+        if kind == "repeat" and not sent:
+            kind = "single"
+        if kind == "repeat":
+            path, body = "/api/cosmic-signature", sent[int(rng.integers(len(sent)))]
+        elif kind == "single":
+            path, body = "/api/cosmic-signature", _birth_records(rng, 1)[0]
+            sent.append(body)
+        elif kind == "batch":
+            path, body = "/api/cosmic-signature/batch", {"records": _birth_records(rng, BATCH_RECORDS)}
+        else:
+            body = dict(_birth_records(rng, 1)[0], startDate=TRANSIT_START, days=TRANSIT_DAYS)
+            path = "/api/transits/timeline"
+        schedule.append((position / rate, kind, path, json.dumps(body).encode()))
+    return schedule
+
+# --- Load Generation ---
+
+def _send(host, port, path, body):
+    """POSTs one request and reads the whole response; returns the status code."""
+    connection = http.client.HTTPConnection(host, port, timeout=REQUEST_TIMEOUT)
+    try:
+        connection.request("POST", path, body=body, headers={"Content-Type": "application/json"})
+        response = connection.getresponse()
+        response.read()
+        return response.status
+    finally:
+        connection.close()
+
+def run_load(host, port, rate, duration, mix=DEFAULT_MIX, seed=1, connections=DEFAULT_CONNECTIONS):
+    """
+    Sends one step of open-loop load and measures it.
+
+    Returns:
+        dict: Offered and achieved rates, error count, corrected latency
+              percentiles overall and per kind (milliseconds), the
+              uncorrected p99, and the overall histogram buckets.
+    """
+    schedule = build_schedule(rate, duration, mix, seed)
+    corrected = LatencyHistogram()
+    uncorrected = LatencyHistogram()
+    # Every kind, as repeats fall back to singles until a chart has been sent
+    by_kind = {kind: LatencyHistogram() for kind in DEFAULT_MIX}
+    errors = {}
+    finished = [0.0]
+    lock = threading.Lock()
+
+    def issue(kind, path, body, scheduled):
+        sent = time.perf_counter()
+        try:
+            status = _send(host, port, path, body)
+        except (OSError, http.client.HTTPException) as e:
+            status = type(e).__name__
+        done = time.perf_counter()
+        if status != 200:
+            with lock:
+                errors[str(status)] = errors.get(str(status), 0) + 1
+            return
+        corrected.record(done - scheduled)
+        uncorrected.record(done - sent)
+        by_kind[kind].record(done - scheduled)
+        with lock:
+            finished[0] = max(finished[0], done)
+
+    started = time.perf_counter() + 0.05
+    with ThreadPoolExecutor(max_workers=connections) as pool:
+        for offset, kind, path, body in schedule:
+            scheduled = started + offset
+            delay = scheduled - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            pool.submit(issue, kind, path, body, scheduled)
+
+    def milliseconds(histogram, q):
+        value = histogram.percentile(q)
+        return round(value * 1000.0, 2) if value is not None else None
+
+    elapsed = max(finished[0] - started, len(schedule) / rate)
+    return {
+        "offeredRate": rate,
+        "requests": len(schedule),
+        "throughput": round(corrected.total / elapsed, 2),
+        "errors": sum(errors.values()),
+        "errorsByStatus": errors,
+        "p50Ms": milliseconds(corrected, 50),
+        "p90Ms": milliseconds(corrected, 90),
+        "p99Ms": milliseconds(corrected, 99),
+        "p999Ms": milliseconds(corrected, 99.9),
+        "maxMs": round(corrected.max * 1000.0, 2),
+        "uncorrectedP99Ms": milliseconds(uncorrected, 99),
+        "byKind": {
+            kind: {"count": histogram.total, "p50Ms": milliseconds(histogram, 50), "p99Ms": milliseconds(histogram, 99)}
+            for kind, histogram in by_kind.items() if histogram.total
+        },
+        "histogram": [[round(bound * 1000.0, 3), count] for bound, count in corrected.buckets()]
+    }
+
+# --- Local Server ---
+
+def _free_port():
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+class LocalServer:
+    """
+    gunicorn on a loopback port with a given number of workers.
+
+    Used as a context manager; the server's output goes to a log file in the
+    temp directory, whose path is shown if it fails to start.
+    """
+
+    def __init__(self, workers):
+        self.workers = workers
+        self.host = "127.0.0.1"
+        self.port = _free_port()
+        self.process = None
+        self.log_path = os.path.join(tempfile.gettempdir(), f"cosmic-loadtest-{self.port}.log")
+
+    def __enter__(self):
+        env = dict(os.environ, WEB_CONCURRENCY=str(self.workers), COSMIC_BIND=f"{self.host}:{self.port}",
+                   COSMIC_METRICS_DIR=os.path.join(tempfile.gettempdir(), f"cosmic-loadtest-metrics-{self.port}"))
+        with open(self.log_path, 'wb') as log:
+            self.process = subprocess.Popen(
+                [sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py"],
+                cwd=BACKEND_DIR, env=env, stdout=log, stderr=subprocess.STDOUT
+            )
+        try:
+            self._wait_ready()
+        except Exception:
+            self.__exit__(None, None, None)
+            raise
+        return self
+
+    def _wait_ready(self):
+        """Waits until several /health checks in a row succeed, so every worker has warmed up."""
+        deadline = time.monotonic() + SERVER_START_TIMEOUT
+        streak = 0
+        while streak < 3 * self.workers:
+            if self.process.poll() is not None:
+                raise RuntimeError(f"gunicorn exited during startup; see {self.log_path}")
+            if time.monotonic() > deadline:
+                raise RuntimeError(f"gunicorn not ready after {SERVER_START_TIMEOUT:.0f}s; see {self.log_path}")
+            try:
+                connection = http.client.HTTPConnection(self.host, self.port, timeout=5)
+                connection.request("GET", "/health")
+                streak = streak + 1 if connection.getresponse().status == 200 else 0
+                connection.close()
+            except (OSError, http.client.HTTPException):
+                streak = 0
+            if streak < 3 * self.workers:
+                time.sleep(0.2)
+
+    def __exit__(self, *exc_info):
+        if self.process is not None and self.process.poll() is None:
+            self.process.send_signal(signal.SIGTERM)
+            try:
+                self.process.wait(timeout=30)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+                self.process.wait()
+        return False
+
+# --- Public API ---
+
+def sustained_rate(steps, slo_ms=DEFAULT_SLO_MS):
+    """Highest offered rate that met the SLO without errors, or None."""
+    rates = [
+        step['offeredRate'] for step in steps
+        if not step['errors'] and step['p99Ms'] is not None and step['p99Ms'] <= slo_ms
+        and step['throughput'] >= SUSTAINED_SHARE * step['offeredRate']
+    ]
+    return max(rates) if rates else None
+
+def run_load_test(workers=DEFAULT_WORKERS, rates=DEFAULT_RATES, duration=DEFAULT_DURATION, mix=DEFAULT_MIX,
+                  slo_ms=DEFAULT_SLO_MS, connections=DEFAULT_CONNECTIONS, seed=1):
+    """
+    Runs every rate against a fresh server for every worker count.
+
+    Each step uses the same seed, so every configuration sees the same requests.
+
+    Returns:
+        dict: The report written by the command line: per worker count, the
+              steps (see run_load) and the highest sustained rate.
+    """
+    configurations = []
+    for count in workers:
+        steps = []
+        with LocalServer(count) as server:
+            for rate in sorted(rates):
+                step = run_load(server.host, server.port, rate, duration, mix, seed, connections)
+                steps.append(step)
+                print(f"workers={count} rate={rate:g}/s: {step['throughput']:.1f}/s done, "
+                      f"p50 {step['p50Ms']} ms, p99 {step['p99Ms']} ms, errors {step['errors']}", flush=True)
+                time.sleep(SETTLE_SECONDS)
+        configurations.append({"workers": count, "sustainedRate": sustained_rate(steps, slo_ms), "steps": steps})
+
+    return {
+        "created": datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        "durationSeconds": duration,
+        "mix": mix,
+        "sloMs": slo_ms,
+        "cpuCount": os.cpu_count(),
+        "configurations": configurations
+    }
+
+def print_report(report):
+    """Prints throughput against p50/p99 for every worker count and rate."""
+    print(f"{'workers':>7s} {'offered/s':>9s} {'done/s':>8s} {'p50 ms':>9s} {'p99 ms':>9s} "
+          f"{'p99.9 ms':>9s} {'raw p99':>9s} {'errors':>6s}")
+    for configuration in report['configurations']:
+        for step in configuration['steps']:
+            print(f"{configuration['workers']:>7d} {step['offeredRate']:>9g} {step['throughput']:>8.1f} "
+                  f"{step['p50Ms'] or 0:>9.1f} {step['p99Ms'] or 0:>9.1f} {step['p999Ms'] or 0:>9.1f} "
+                  f"{step['uncorrectedP99Ms'] or 0:>9.1f} {step['errors']:>6d}")
+    for configuration in report['configurations']:
+        rate = configuration['sustainedRate']
+        verdict = f"{rate:g} requests/s" if rate is not None else "none of the tested rates"
+        print(f"{configuration['workers']} worker(s) sustain {verdict} within p99 <= {report['sloMs']:g} ms")
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Open-loop load test of a local gunicorn server.")
+    parser.add_argument('--workers', type=int, nargs='+', default=list(DEFAULT_WORKERS))
+    parser.add_argument('--rates', type=float, nargs='+', default=list(DEFAULT_RATES), help="Requests per second")
+    parser.add_argument('--duration', type=float, default=DEFAULT_DURATION, help="Seconds per rate")
+    parser.add_argument('--mix', type=parse_mix, default=DEFAULT_MIX)
+    parser.add_argument('--slo-ms', type=float, default=DEFAULT_SLO_MS)
+    parser.add_argument('--connections', type=int, default=DEFAULT_CONNECTIONS)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--out', default='loadtest.json')
+    args = parser.parse_args()
+
+    report = run_load_test(args.workers, args.rates, args.duration, args.mix, args.slo_ms, args.connections, args.seed)
+    with open(args.out, 'w') as f:
+        json.dump(report, f, indent=2)
+    print_report(report)
@@ -0,0 +1,420 @@
+#!/usr/bin/env python3
+"""
+metrics.py: Per-stage latency histograms and counters, shared across workers.
+
+Each process records into its own float64 array of slots. When
+COSMIC_METRICS_DIR is set (gunicorn.conf.py sets it for every worker) the
+array is a memory-mapped file, <dir>/metrics-<pid>.bin, with a JSON sidecar
+naming its slots, and a scrape of /metrics sums every process's file, so
+whichever worker answers reports the whole server. Without the directory
+the array lives in memory and only the current process is reported.
+
+Web workers come and go, and so do batch pool and job processes. When a
+process exits its counters and histograms are folded into one aggregate
+file, its gauges are dropped and its own files are deleted, so the
+directory holds one file per live process plus the aggregate.
+
+Recording is two perf_counter calls, a bisect over the bucket bounds and a
+few array increments under an uncontended lock: a few microseconds, against
+charts that take hundreds.
+
+Stage timings of the request in progress are also kept per thread, for the
+Server-Timing response header.
+"""
+
+import fcntl
+import glob
+import json
+import logging
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# --- Constants and Configuration ---
+
+METRICS_DIR = os.environ.get('COSMIC_METRICS_DIR')
+
+# Histogram bucket upper bounds, in seconds.
+BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+           0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Slots per process file: 150 histograms or 2,000 counters at float64.
+MAX_SLOTS = 4096
+
+# Totals of every process that has exited, in the same layout as a process file.
+AGGREGATE_NAME = "metrics-aggregate"
+
+# name -> (type, help) for every exported metric.
+METRICS = {
+    "cosmic_stage_duration_seconds": ("histogram", "Time spent in each stage of a chart request."),
+    "cosmic_request_duration_seconds": ("histogram", "Time to produce a response, by endpoint."),
+    "cosmic_requests_total": ("counter", "Responses by endpoint and status class."),
+    "cosmic_requests_in_flight": ("gauge", "Requests being handled right now."),
+    "cosmic_cache_lookups_total": ("counter", "Cache lookups by cache and result."),
+    "cosmic_report_generations_total": ("counter", "Report requests by where the text came from."),
+    "cosmic_jobs_total": ("counter", "Background jobs by kind and outcome (queued, rejected, succeeded, failed, cancelled)."),
+}
+
+# --- Storage ---
+
+def _label_string(labels):
+    """Renders labels as Prometheus text, sorted by name."""
+    return ",".join(f'{name}="{value}"' for name, value in sorted(labels.items()))
+
+def _parse_labels(label_string):
+    """Inverse of _label_string, for the simple values used here."""
+    if not label_string:
+        return {}
+    return {name: value.strip('"') for name, value in (part.split("=", 1) for part in label_string.split(","))}
+
+class _Store:
+    """
+    The slot array of one process, and the names of its slots.
+
+    Args:
+        directory (str, optional): Where to keep the memory-mapped file; in
+            memory if None.
+    """
+
+    def __init__(self, directory=None):
+        self.pid = os.getpid()
+        self.directory = directory
+        self.offsets = {}
+        self.slots = {}
+        self.used = 0
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+            self.path = os.path.join(directory, f"metrics-{self.pid}")
+            self._array = np.memmap(self.path + ".bin", dtype=np.float64, mode='w+', shape=(MAX_SLOTS,))
+        else:
+            self.path = None
+            self._array = np.zeros(MAX_SLOTS, dtype=np.float64)
+        # Element updates through a memoryview cost a fraction of NumPy
+        # scalar indexing, and write the same memory
+        self.values = memoryview(self._array)
+
+    def offset(self, metric, labels, size):
+        """
+        First slot of a series, allocating `size` slots for it on first use.
+
+        Args:
+            labels (tuple): (name, value) pairs, as passed at the call site;
+                looking these up directly avoids formatting the label string
+                on every observation.
+        """
+        key = (metric, labels)
+        offset = self.slots.get(key)
+        if offset is None:
+            offset = self.slots[key] = self._allocate(metric, _label_string(dict(labels)), size)
+        return offset
+
+    def _allocate(self, metric, labels, size):
+        offset = self.offsets.get((metric, labels))
+        if offset is None:
+            if self.used + size > MAX_SLOTS:
+                raise RuntimeError("Metric slots exhausted; raise MAX_SLOTS")
+            offset = self.offsets[(metric, labels)] = self.used
+            self.used += size
+            self._write_index()
+        return offset
+
+    def _write_index(self):
+        """Rewrites the sidecar atomically so readers never see half a file."""
+        if not self.path:
+            return
+        tmp = f"{self.path}.json.tmp"
+        with open(tmp, 'w') as f:
+            json.dump([[metric, labels, offset] for (metric, labels), offset in self.offsets.items()], f)
+        os.replace(tmp, self.path + ".json")
+
+_lock = threading.Lock()
+_store = None
+_request = threading.local()
+
+def _current_store():
+    """This process's store; a forked worker gets its own on first use."""
+    global _store
+    if _store is None or _store.pid != os.getpid():
+        _store = _Store(METRICS_DIR)
+    return _store
+
+# Histogram slots: one count per bucket, an overflow bucket, the sum and the count.
+HISTOGRAM_SLOTS = len(BUCKETS) + 3
+
+def _series_size(metric):
+    return HISTOGRAM_SLOTS if METRICS[metric][0] == "histogram" else 1
+
+# --- Recording ---
+
+def observe(metric, seconds, **labels):
+    """
+    Records one duration in a histogram.
+
+    Slots are one count per bucket plus an overflow bucket, then sum and count.
+    """
+    bucket = bisect_left(BUCKETS, seconds)
+    with _lock:
+        store = _current_store()
+        offset = store.offset(metric, tuple(labels.items()), HISTOGRAM_SLOTS)
+        values = store.values
+        values[offset + bucket] += 1.0
+        values[offset + HISTOGRAM_SLOTS - 2] += seconds
+        values[offset + HISTOGRAM_SLOTS - 1] += 1.0
+
+def inc(metric, amount=1.0, **labels):
+    """Adds to a counter or gauge."""
+    with _lock:
+        store = _current_store()
+        store.values[store.offset(metric, tuple(labels.items()), 1)] += amount
+
+def record_cache(cache, hit):
+    """Counts one lookup in a named cache."""
+    inc("cosmic_cache_lookups_total", cache=cache, result="hit" if hit else "miss")
+
+class stage:
+    """
+    Context manager timing a block as a request stage.
+
+    The duration goes into the stage histogram and, during a request, into
+    that request's Server-Timing entries. A class rather than a generator
+    based context manager, which would double the cost of each use.
+    """
+
+    __slots__ = ('name', 'started')
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        elapsed = time.perf_counter() - self.started
+        observe("cosmic_stage_duration_seconds", elapsed, stage=self.name)
+        timings = getattr(_request, 'timings', None)
+        if timings is not None:
+            timings.append((self.name, elapsed))
+        return False
+
+# --- Requests ---
+
+def start_request():
+    """Marks a request as in flight and starts collecting its stage timings."""
+    _request.started = time.perf_counter()
+    _request.timings = []
+    inc("cosmic_requests_in_flight", 1.0)
+
+def finish_request(endpoint, status_code):
+    """
+    Records a request's duration and outcome.
+
+    Returns:
+        str: The Server-Timing header value: every stage timed during the
+             request, in order, then the total; durations in milliseconds.
+    """
+    started = getattr(_request, 'started', None)
+    if started is None:
+        return None
+    elapsed = time.perf_counter() - started
+    endpoint = endpoint or "unmatched"
+    observe("cosmic_request_duration_seconds", elapsed, endpoint=endpoint)
+    inc("cosmic_requests_total", endpoint=endpoint, status=f"{status_code // 100}xx")
+
+    entries = [f"{name};dur={seconds * 1000.0:.3f}" for name, seconds in _request.timings]
+    entries.append(f"total;dur={elapsed * 1000.0:.3f}")
+    return ", ".join(entries)
+
+def end_request():
+    """Takes a request out of flight; safe to call whatever happened to it."""
+    if getattr(_request, 'started', None) is None:
+        return
+    _request.started = None
+    _request.timings = None
+    inc("cosmic_requests_in_flight", -1.0)
+
+# --- Collection ---
+
+def _read_process(path):
+    """(series, values) of one process file, or None if it vanished mid-read."""
+    try:
+        with open(path + ".json") as f:
+            index = json.load(f)
+        values = np.fromfile(path + ".bin", dtype=np.float64)
+    except (OSError, ValueError):
+        return None
+    return index, values
+
+@contextmanager
+def _directory_lock(directory, exclusive):
+    """
+    Serialises folding dead processes against reading the directory, so a
+    scrape never counts a process both in its own file and in the aggregate.
+    """
+    with open(os.path.join(directory, "metrics.lock"), 'a') as f:
+        fcntl.flock(f, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+        yield
+
+def _sum_sources(sources, totals=None, keep=lambda kind: True):
+    """Adds (index, values) pairs into `totals`, skipping unknown metrics and kinds `keep` rejects."""
+    totals = {} if totals is None else totals
+    for source in sources:
+        if source is None:
+            continue
+        index, values = source
+        for metric, labels, offset in index:
+            if metric not in METRICS or not keep(METRICS[metric][0]):
+                continue
+            series = values[offset:offset + _series_size(metric)]
+            key = (metric, labels)
+            totals[key] = totals[key] + series if key in totals else series.copy()
+    return totals
+
+def collect():
+    """
+    Sums every process's series, and the aggregate of exited ones.
+
+    Returns:
+        dict: (metric, label string) -> array of slot values.
+    """
+    if not METRICS_DIR:
+        with _lock:
+            store = _current_store()
+            return _sum_sources([([[m, l, o] for (m, l), o in store.offsets.items()], store._array.copy())])
+
+    sweep_dead_processes(METRICS_DIR)
+    with _directory_lock(METRICS_DIR, exclusive=False):
+        return _sum_sources(_read_process(index_path[:-len(".json")])
+                            for index_path in glob.glob(os.path.join(METRICS_DIR, "metrics-*.json")))
+
+def _format(value):
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+def render_prometheus():
+    """
+    All metrics in the Prometheus text exposition format (version 0.0.4).
+
+    Cache hit ratios are derived from the lookup counters as one gauge per cache.
+    """
+    totals = collect()
+    lines = []
+    for metric, (kind, help_text) in METRICS.items():
+        series = sorted((labels, values) for (name, labels), values in totals.items() if name == metric)
+        lines.append(f"# HELP {metric} {help_text}")
+        lines.append(f"# TYPE {metric} {kind}")
+        for labels, values in series:
+            if kind != "histogram":
+                lines.append(f"{metric}{{{labels}}} {_format(values[0])}" if labels else f"{metric} {_format(values[0])}")
+                continue
+            separator = "," if labels else ""
+            cumulative = np.cumsum(values[:len(BUCKETS) + 1])
+            for bound, count in zip(BUCKETS, cumulative):
+                lines.append(f'{metric}_bucket{{{labels}{separator}le="{bound}"}} {_format(count)}')
+            lines.append(f'{metric}_bucket{{{labels}{separator}le="+Inf"}} {_format(cumulative[-1])}')
+            lines.append(f"{metric}_sum{{{labels}}} {_format(values[len(BUCKETS) + 1])}")
+            lines.append(f"{metric}_count{{{labels}}} {_format(values[len(BUCKETS) + 2])}")
+
+    lookups = {}
+    for (metric, labels), values in totals.items():
+        if metric == "cosmic_cache_lookups_total":
+            parts = _parse_labels(labels)
+            hits, total = lookups.get(parts['cache'], (0.0, 0.0))
+            lookups[parts['cache']] = (hits + (values[0] if parts['result'] == "hit" else 0.0), total + values[0])
+    lines.append("# HELP cosmic_cache_hit_ratio Share of cache lookups that hit, across all workers.")
+    lines.append("# TYPE cosmic_cache_hit_ratio gauge")
+    for cache, (hits, total) in sorted(lookups.items()):
+        lines.append(f'cosmic_cache_hit_ratio{{cache="{cache}"}} {_format(hits / total if total else 0.0)}')
+    return "\n".join(lines) + "\n"
+
+# --- Process Lifecycle ---
+
+def reset_directory(directory=None):
+    """Removes files left by a previous server run; call from the master at startup."""
+    directory = directory or METRICS_DIR
+    if not directory:
+        return
+    os.makedirs(directory, exist_ok=True)
+    for path in glob.glob(os.path.join(directory, "metrics-*")):
+        try:
+            os.remove(path)
+        except OSError as e:
+            logger.warning("Could not remove stale metrics file %s: %s", path, e)
+
+def _process_path(directory, pid):
+    return os.path.join(directory, f"metrics-{pid}")
+
+def _remove_process_files(path):
+    for suffix in (".bin", ".json", ".json.tmp"):
+        try:
+            os.remove(path + suffix)
+        except FileNotFoundError:
+            pass
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+def mark_process_dead(*pids, directory=None):
+    """
+    Folds exited processes into the aggregate and deletes their files.
+
+    Counters and histograms keep counting in the aggregate; gauges are
+    dropped, so a worker killed mid-request does not leave its in-flight
+    count behind forever.
+    """
+    directory = directory or METRICS_DIR
+    if not directory or not pids:
+        return
+    aggregate_path = os.path.join(directory, AGGREGATE_NAME)
+    with _directory_lock(directory, exclusive=True):
+        paths = [path for path in (_process_path(directory, pid) for pid in pids)
+                 if os.path.exists(path + ".json") or os.path.exists(path + ".bin")]
+        if not paths:
+            return
+        totals = _sum_sources([_read_process(aggregate_path)])
+        _sum_sources([_read_process(path) for path in paths], totals, keep=lambda kind: kind != "gauge")
+
+        index, blocks, offset = [], [], 0
+        for (metric, labels), values in sorted(totals.items()):
+            index.append([metric, labels, offset])
+            blocks.append(values)
+            offset += len(values)
+        np.concatenate(blocks or [np.zeros(0)]).astype(np.float64).tofile(aggregate_path + ".bin.tmp")
+        with open(aggregate_path + ".json.tmp", 'w') as f:
+            json.dump(index, f)
+        os.replace(aggregate_path + ".bin.tmp", aggregate_path + ".bin")
+        os.replace(aggregate_path + ".json.tmp", aggregate_path + ".json")
+        for path in paths:
+            _remove_process_files(path)
+
+def sweep_dead_processes(directory=None):
+    """
+    Folds the files of every process that no longer exists.
+
+    Job processes are folded by the runner that reaps them, and web workers
+    by gunicorn's child_exit hook; this catches batch pool processes, which
+    exit with their pool, and anything else that died unnoticed.
+    """
+    directory = directory or METRICS_DIR
+    if not directory:
+        return
+    dead = []
+    for index_path in glob.glob(os.path.join(directory, "metrics-*.json")):
+        try:
+            pid = int(os.path.basename(index_path)[len("metrics-"):-len(".json")])
+        except ValueError:
+            continue  # the aggregate
+        if not _pid_alive(pid):
+            dead.append(pid)
+    mark_process_dead(*dead, directory=directory)
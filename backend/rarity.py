@@ -0,0 +1,356 @@
+#!/usr/bin/env python3
+"""
+rarity.py: Statistical rarity of a chart from a precomputed distribution index.
+
+An offline job samples a large number of birth moments, with birth places
+drawn from a population-weighted list of cities and birth years spread over
+living generations, computes each chart through astrology_core, and counts
+how often each feature occurs:
+
+- the Sun/Moon/Ascendant sign triple (12 x 12 x 12 cells);
+- sign concentration: the most planets sharing one sign;
+- tight aspects: the number of major aspects within 1° between planets;
+- aspect frequency for every planet pair and major aspect;
+- aspect patterns (see aspect_patterns.py): how many instances of each
+  configuration a chart has, from none to PATTERN_COUNT_CAP or more;
+- a joint table of triple x concentration bucket x tight-aspect bucket,
+  which gives the headline "1 in N births" figure.
+
+The counts are saved as .npy files plus meta.json. At request time they are
+memory-mapped and a chart is scored with a handful of array lookups.
+
+Usage:
+    python rarity.py build [--samples 1000000] [--seed 1] [--out DIR]
+"""
+
+import argparse
+import json
+import logging
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import swisseph as swe
+
+from aspect_engine import DEFAULT_CONFIG, find_aspects
+from aspect_patterns import PATTERNS, find_patterns, pattern_counts
+from astrology_core import PLANET_IDS, calculate_planetary_positions_many
+
+logger = logging.getLogger(__name__)
+
+# --- Constants and Configuration ---
+
+DEFAULT_INDEX_PATH = os.environ.get(
+    'COSMIC_RARITY_INDEX', os.path.join(os.path.dirname(__file__), 'data', 'rarity')
+)
+
+# Bumped whenever the tables change shape or meaning; older indexes are refused.
+INDEX_VERSION = 2
+
+DEFAULT_SAMPLES = 1000000
+SAMPLES_PER_CHUNK = 20000
+
+# Birth years sampled uniformly; roughly the living adult population.
+BIRTH_YEARS = (1940, 2015)
+
+# Major aspects within this orb count as tight.
+TIGHT_ORB = 1.0
+
+# Joint-table buckets: lower edges of each bucket.
+CONCENTRATION_EDGES = np.array([1, 3, 4, 5])   # <=2, 3, 4, 5+ planets in one sign
+TIGHT_EDGES = np.array([0, 2, 4, 6])           # 0-1, 2-3, 4-5, 6+ tight aspects
+
+# Pattern instances per chart are counted up to this many; more count as this many.
+PATTERN_COUNT_CAP = 4
+
+# Birth places are jittered by up to this many degrees around each city.
+LOCATION_JITTER = 1.0
+
+# Large metropolitan areas with approximate populations (millions), used as
+# a proxy for where births happen. Latitude matters most: it skews the
+# distribution of rising signs.
+POPULATION_CENTRES = [
+    ("Tokyo", 35.68, 139.69, 37.2), ("Delhi", 28.61, 77.21, 32.9), ("Shanghai", 31.23, 121.47, 29.2),
+    ("Dhaka", 23.81, 90.41, 23.2), ("Sao Paulo", -23.55, -46.63, 22.6), ("Cairo", 30.04, 31.24, 22.2),
+    ("Mexico City", 19.43, -99.13, 22.3), ("Beijing", 39.90, 116.41, 21.8), ("Mumbai", 19.08, 72.88, 21.3),
+    ("Osaka", 34.69, 135.50, 19.0), ("Chongqing", 29.56, 106.55, 17.3), ("Karachi", 24.86, 67.01, 17.2),
+    ("Kinshasa", -4.44, 15.27, 16.3), ("Lagos", 6.52, 3.38, 15.9), ("Istanbul", 41.01, 28.98, 15.8),
+    ("Buenos Aires", -34.60, -58.38, 15.5), ("Kolkata", 22.57, 88.36, 15.3), ("Manila", 14.60, 120.98, 14.7),
+    ("Guangzhou", 23.13, 113.26, 14.3), ("Tianjin", 39.34, 117.36, 14.0), ("Lahore", 31.55, 74.34, 13.9),
+    ("Bangalore", 12.97, 77.59, 13.6), ("Rio de Janeiro", -22.91, -43.17, 13.7), ("Shenzhen", 22.54, 114.06, 13.1),
+    ("Moscow", 55.76, 37.62, 12.7), ("Chennai", 13.08, 80.27, 11.8), ("Bogota", 4.71, -74.07, 11.5),
+    ("Jakarta", -6.21, 106.85, 11.2), ("Lima", -12.05, -77.04, 11.2), ("Paris", 48.86, 2.35, 11.2),
+    ("Bangkok", 13.76, 100.50, 11.1), ("Hyderabad", 17.39, 78.49, 10.8), ("Seoul", 37.57, 126.98, 10.0),
+    ("Nagoya", 35.18, 136.91, 9.5), ("London", 51.51, -0.13, 9.6), ("Chengdu", 30.57, 104.07, 9.5),
+    ("Tehran", 35.69, 51.39, 9.5), ("Luanda", -8.84, 13.23, 9.3), ("Ho Chi Minh City", 10.82, 106.63, 9.3),
+    ("Kuala Lumpur", 3.14, 101.69, 8.6), ("New York", 40.71, -74.01, 18.9), ("Los Angeles", 34.05, -118.24, 12.5),
+    ("Chicago", 41.88, -87.63, 8.9), ("Houston", 29.76, -95.37, 7.1), ("Toronto", 43.65, -79.38, 6.3),
+    ("Madrid", 40.42, -3.70, 6.7), ("Baghdad", 33.31, 44.37, 7.5), ("Riyadh", 24.71, 46.68, 7.5),
+    ("Khartoum", 15.50, 32.56, 6.2), ("Nairobi", -1.29, 36.82, 5.1), ("Addis Ababa", 9.03, 38.74, 5.2),
+    ("Johannesburg", -26.20, 28.05, 6.2), ("Dar es Salaam", -6.79, 39.21, 7.4), ("Santiago", -33.45, -70.67, 6.9),
+    ("Sydney", -33.87, 151.21, 5.1), ("Melbourne", -37.81, 144.96, 5.0), ("Berlin", 52.52, 13.40, 3.6),
+    ("Rome", 41.90, 12.50, 4.3), ("Stockholm", 59.33, 18.07, 1.7), ("Saint Petersburg", 59.93, 30.34, 5.5),
+    ("Abidjan", 5.36, -4.01, 5.5), ("Casablanca", 33.57, -7.59, 3.8), ("Accra", 5.60, -0.19, 2.6),
+    ("Ankara", 39.93, 32.86, 5.3), ("Yangon", 16.84, 96.17, 5.6), ("Singapore", 1.35, 103.82, 5.9),
+]
+
+# --- Features ---
+
+def sign_index(longitudes):
+    """Zodiac sign index (0 = Aries) for longitudes of any shape."""
+    return (np.asarray(longitudes) // 30.0).astype(np.int64) % 12
+
+def chart_features(planet_lon, asc_lon):
+    """
+    Computes the indexed features for one chart or a stack of charts.
+
+    Args:
+        planet_lon (ndarray): Shape (..., len(PLANET_IDS)), in PLANET_IDS order.
+        asc_lon (ndarray): Shape (...).
+
+    Returns:
+        dict: Integer arrays of shape (...): `triple`, `concentration`,
+              `tight`; plus `pair_aspects`, the (..., n, n) aspect index
+              matrix from find_aspects under the default config.
+    """
+    planet_lon = np.asarray(planet_lon, dtype=np.float64)
+    signs = sign_index(planet_lon)
+    names = list(PLANET_IDS)
+    triple = (signs[..., names.index('Sun')] * 144 + signs[..., names.index('Moon')] * 12
+              + sign_index(asc_lon))
+
+    per_sign = (signs[..., None] == np.arange(12)).sum(axis=-2)
+    concentration = per_sign.max(axis=-1)
+
+    # Major aspects are far apart, so a pair within the tight orb of one is
+    # always reported as that aspect by the default config too.
+    matrix = find_aspects(planet_lon, config=DEFAULT_CONFIG)
+    tight = ((matrix.aspect >= 0) & (matrix.orb <= TIGHT_ORB)).sum(axis=(-2, -1))
+
+    return {"triple": triple, "concentration": concentration, "tight": tight, "pair_aspects": matrix.aspect}
+
+def _bucket(values, edges):
+    return np.searchsorted(edges, values, side='right') - 1
+
+# --- Index Build ---
+
+def _sample_chunk(args):
+    """Samples one chunk of birth moments and returns its partial counts (worker process)."""
+    seed, count = args
+    rng = np.random.default_rng(seed)
+
+    weights = np.array([city[3] for city in POPULATION_CENTRES])
+    cities = rng.choice(len(POPULATION_CENTRES), size=count, p=weights / weights.sum())
+    lats = np.array([POPULATION_CENTRES[c][1] for c in cities]) + rng.uniform(-LOCATION_JITTER, LOCATION_JITTER, count)
+    lons = np.array([POPULATION_CENTRES[c][2] for c in cities]) + rng.uniform(-LOCATION_JITTER, LOCATION_JITTER, count)
+
+    start = swe.julday(BIRTH_YEARS[0], 1, 1, 0.0)
+    end = swe.julday(BIRTH_YEARS[1] + 1, 1, 1, 0.0)
+    jds = rng.uniform(start, end, count)
+
+    positions = calculate_planetary_positions_many(jds)
+    planet_lon = np.stack([positions[name][:, 0] for name in PLANET_IDS], axis=-1)
+    asc_lon = np.array([swe.houses(jd, lat, lon, b'P')[1][0] for jd, lat, lon in zip(jds.tolist(), lats.tolist(), lons.tolist())])
+
+    features = chart_features(planet_lon, asc_lon)
+    n = len(PLANET_IDS)
+    joint = np.zeros((1728, len(CONCENTRATION_EDGES), len(TIGHT_EDGES)), dtype=np.int64)
+    np.add.at(joint, (features['triple'],
+                      _bucket(features['concentration'], CONCENTRATION_EDGES),
+                      _bucket(features['tight'], TIGHT_EDGES)), 1)
+
+    pair_counts = np.zeros((n, n, len(DEFAULT_CONFIG.names)), dtype=np.int64)
+    chart, i, j = np.nonzero(features['pair_aspects'] >= 0)
+    np.add.at(pair_counts, (i, j, features['pair_aspects'][chart, i, j]), 1)
+
+    instances = pattern_counts(planet_lon, list(PLANET_IDS))
+    pattern_table = np.stack([
+        np.bincount(np.minimum(instances[pattern], PATTERN_COUNT_CAP), minlength=PATTERN_COUNT_CAP + 1)
+        for pattern in PATTERNS
+    ]).astype(np.int64)
+
+    return {
+        "joint": joint,
+        "concentration": np.bincount(features['concentration'], minlength=n + 1),
+        "tight": np.bincount(features['tight'], minlength=n * (n - 1) // 2 + 1),
+        "pairs": pair_counts,
+        "patterns": pattern_table
+    }
+
+def build_index(out_dir=DEFAULT_INDEX_PATH, samples=DEFAULT_SAMPLES, seed=1, workers=None):
+    """
+    Builds the rarity index by Monte Carlo sampling.
+
+    Chunks are seeded from `seed` and their position, so a build is
+    reproducible regardless of the number of workers.
+
+    Returns:
+        dict: The index metadata written to meta.json.
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    started = time.perf_counter()
+    chunks = [(seed * 1000003 + i, min(SAMPLES_PER_CHUNK, samples - start))
+              for i, start in enumerate(range(0, samples, SAMPLES_PER_CHUNK))]
+
+    totals = None
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for done, partial in enumerate(pool.map(_sample_chunk, chunks), 1):
+            if totals is None:
+                totals = partial
+            else:
+                for key in totals:
+                    totals[key] += partial[key]
+            print(f"Sampled chunk {done}/{len(chunks)}")
+
+    for key, array in totals.items():
+        np.save(os.path.join(out_dir, f"{key}_counts.npy"), array)
+
+    meta = {
+        "version": INDEX_VERSION,
+        "samples": samples,
+        "seed": seed,
+        "birthYears": list(BIRTH_YEARS),
+        "tightOrb": TIGHT_ORB,
+        "concentrationEdges": CONCENTRATION_EDGES.tolist(),
+        "tightEdges": TIGHT_EDGES.tolist(),
+        "aspects": DEFAULT_CONFIG.names,
+        "planets": list(PLANET_IDS),
+        "patterns": list(PATTERNS),
+        "patternCountCap": PATTERN_COUNT_CAP
+    }
+    with open(os.path.join(out_dir, 'meta.json'), 'w') as f:
+        json.dump(meta, f, indent=2)
+
+    print(f"Built rarity index from {samples} samples in {time.perf_counter() - started:.0f}s")
+    return meta
+
+# --- Runtime Lookup ---
+
+def _one_in(probability):
+    return int(round(1.0 / probability)) if probability > 0 else None
+
+class RarityIndex:
+    """
+    Memory-mapped rarity tables with O(1) scoring.
+
+    Args:
+        path (str): Directory written by build_index.
+
+    Raises:
+        FileNotFoundError: If the index has not been built.
+        ValueError: If it was built by a release with a different INDEX_VERSION.
+    """
+
+    def __init__(self, path=DEFAULT_INDEX_PATH):
+        with open(os.path.join(path, 'meta.json')) as f:
+            self.meta = json.load(f)
+        if self.meta.get('version') != INDEX_VERSION:
+            raise ValueError(f"index version {self.meta.get('version')} does not match {INDEX_VERSION}; "
+                             f"rebuild it with `python rarity.py build`")
+        load = lambda name: np.load(os.path.join(path, f"{name}_counts.npy"), mmap_mode='r').view(np.ndarray)
+        self.joint = load('joint')
+        self.concentration = load('concentration')
+        self.tight = load('tight')
+        self.pairs = load('pairs')
+        self.patterns = load('patterns')
+        self.samples = self.meta['samples']
+
+        # Tail counts, P(X >= k), for the one-dimensional distributions
+        self.concentration_tail = np.cumsum(self.concentration[::-1])[::-1]
+        self.tight_tail = np.cumsum(self.tight[::-1])[::-1]
+        self.pattern_tail = np.cumsum(self.patterns[:, ::-1], axis=1)[:, ::-1]
+        self.triple = self.joint.sum(axis=(1, 2))
+
+    def _probability(self, count, cells):
+        # Add-one smoothing keeps unseen cells finite
+        return (float(count) + 1.0) / (self.samples + cells)
+
+    def score(self, planet_lon, asc_lon):
+        """
+        Scores one chart.
+
+        Args:
+            planet_lon (sequence): Longitudes in PLANET_IDS order.
+            asc_lon (float): Ascendant longitude.
+
+        Returns:
+            dict: `oneIn` (the headline figure) plus per-feature detail;
+                  `patterns` lists the configurations the chart has, rarest
+                  first, each with the share of charts that have at least
+                  as many.
+        """
+        features = chart_features(np.asarray(planet_lon, dtype=np.float64), np.float64(asc_lon))
+        triple = int(features['triple'])
+        concentration = int(features['concentration'])
+        tight = int(features['tight'])
+
+        joint_p = self._probability(
+            self.joint[triple, _bucket(concentration, CONCENTRATION_EDGES), _bucket(tight, TIGHT_EDGES)],
+            self.joint.size
+        )
+        triple_p = self._probability(self.triple[triple], self.triple.size)
+        concentration_p = float(self.concentration_tail[concentration]) / self.samples
+        tight_p = float(self.tight_tail[tight]) / self.samples
+
+        rarest = None
+        i, j = np.nonzero(features['pair_aspects'] >= 0)
+        if i.size:
+            aspects = features['pair_aspects'][i, j]
+            probabilities = (self.pairs[i, j, aspects] + 1.0) / (self.samples + 1.0)
+            k = int(probabilities.argmin())
+            names = self.meta['planets']
+            rarest = {
+                "planets": [names[i[k]], names[j[k]]],
+                "aspect": self.meta['aspects'][aspects[k]],
+                "probability": round(float(probabilities[k]), 6),
+                "oneIn": _one_in(float(probabilities[k]))
+            }
+
+        found = [pattern['pattern'] for pattern in find_patterns(planet_lon, self.meta['planets'])]
+        patterns = []
+        for row, name in enumerate(self.meta['patterns']):
+            count = found.count(name)
+            if count:
+                at_least = self.pattern_tail[row, min(count, self.meta['patternCountCap'])]
+                probability = (float(at_least) + 1.0) / (self.samples + 1.0)
+                patterns.append({"pattern": name, "count": count, "probability": round(probability, 6),
+                                 "oneIn": _one_in(probability)})
+        patterns.sort(key=lambda pattern: pattern['probability'])
+
+        return {
+            "oneIn": _one_in(joint_p),
+            "probability": joint_p,
+            "signature": {"probability": round(triple_p, 6), "oneIn": _one_in(triple_p)},
+            "concentration": {"planets": concentration, "probability": round(concentration_p, 6)},
+            "tightAspects": {"count": tight, "probability": round(tight_p, 6)},
+            "rarestAspect": rarest,
+            "patterns": patterns,
+            "samples": self.samples
+        }
+
+    def score_chart(self, chart_data):
+        """Scores a chart as returned by astrology_core.get_astrological_data."""
+        planet_lon = [chart_data['planets'][name]['longitude'] for name in self.meta['planets']]
+        return self.score(planet_lon, chart_data['ascendant']['longitude'])
+
+def load_rarity_index(path=DEFAULT_INDEX_PATH):
+    """Loads the rarity index, or returns None if it is missing or unreadable."""
+    if not os.path.exists(os.path.join(path, 'meta.json')):
+        return None
+    try:
+        return RarityIndex(path)
+    except Exception as e:
+        logger.error("Error loading rarity index from %s: %s", path, e)
+        return None
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Build the statistical rarity index.")
+    sub = parser.add_subparsers(dest='command', required=True)
+    build_parser = sub.add_parser('build')
+    build_parser.add_argument('--samples', type=int, default=DEFAULT_SAMPLES)
+    build_parser.add_argument('--seed', type=int, default=1)
+    build_parser.add_argument('--out', default=DEFAULT_INDEX_PATH)
+    build_parser.add_argument('--workers', type=int, default=None)
+    args = parser.parse_args()
+    build_index(args.out, args.samples, args.seed, args.workers)
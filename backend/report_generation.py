@@ -0,0 +1,612 @@
+#!/usr/bin/env python3
+"""
+report_generation.py: Narrative report generation behind a provider
+interface, with single-flight coalescing and a result cache.
+
+The cosmic blueprint used to be generated in the browser, one full model
+call per page view. A report is a function of the chart and of the
+template that produced it (prompt, provider, model and sampling settings),
+so here it is keyed by (chart fingerprint, template version):
+
+- finished reports are kept in an LRU, and in the report store when one is
+  configured, and are never generated twice;
+- concurrent requests for a report that is still being generated attach
+  to the running generation instead of starting their own, and each
+  receives every chunk from the first one on;
+- generations run on a small thread pool, detached from the request that
+  started them, so a client that disconnects does not waste the work.
+
+gunicorn's sync workers serve one request each, so two identical requests
+always land in different processes. Generations are therefore also leased
+in a SQLite ledger (the report store's database): the process that wins
+the lease generates and appends its chunks to the ledger, and every other
+process follows those rows instead of calling the provider. A lease whose
+owner stops heartbeating for LEASE_TTL seconds can be taken over.
+
+Providers stream text chunks. The stub provider builds a deterministic
+report locally and needs no network or key; the OpenAI provider needs the
+optional `openai` package and OPENAI_API_KEY.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    import openai
+except ImportError:
+    openai = None
+
+from astrology_core import ZODIAC_SIGNS
+from chart_cache import LRUCache
+from metrics import inc
+from report_store import DEFAULT_DB_PATH, ConnectionPool
+
+logger = logging.getLogger(__name__)
+
+# --- Constants and Configuration ---
+
+PROMPT_PATH = os.path.join(os.path.dirname(__file__), 'prompts', 'cosmic_blueprint.md')
+
+TEMPLATE_NAME = "cosmic-blueprint"
+
+DEFAULT_CACHE_SIZE = 256
+DEFAULT_CONCURRENCY = 4
+
+# Longest a reader waits for the next chunk of a running generation, in seconds.
+CHUNK_TIMEOUT = 120.0
+
+# A leased generation whose owner has not written for this long is presumed dead.
+LEASE_TTL = 60.0
+
+# How often the owner writes buffered chunks to the ledger, and followers read them, in seconds.
+LEDGER_FLUSH_INTERVAL = 0.1
+LEDGER_POLL_INTERVAL = 0.1
+
+# Finished ledger entries are deleted after this many seconds; by then the
+# report store has the report.
+LEDGER_RETENTION = 600.0
+
+LEDGER_SCHEMA = """
+    CREATE TABLE IF NOT EXISTS generations (
+        key TEXT PRIMARY KEY,
+        token TEXT NOT NULL,
+        status TEXT NOT NULL,
+        error TEXT,
+        heartbeat REAL NOT NULL
+    );
+    CREATE TABLE IF NOT EXISTS generation_chunks (
+        key TEXT NOT NULL,
+        seq INTEGER NOT NULL,
+        text TEXT NOT NULL,
+        PRIMARY KEY (key, seq)
+    );
+"""
+
+# Sampling settings sent with every OpenAI request; part of the template version.
+OPENAI_SETTINGS = {"max_tokens": 4000, "temperature": 0.8, "presence_penalty": 0.1, "frequency_penalty": 0.1}
+DEFAULT_OPENAI_MODEL = "gpt-4o"
+
+ELEMENTS = ("Fire", "Earth", "Air", "Water")
+
+# Chart fields the prompt is given; the rest is display text.
+PROMPT_FIELDS = (
+    "planets", "houses", "ascendantData", "midheaven", "aspects", "parallels", "patterns",
+    "sunSign", "moonSign", "ascendant", "rarity", "meta"
+)
+
+# --- Helper Functions ---
+
+def load_prompt(path=PROMPT_PATH):
+    with open(path, encoding='utf-8') as f:
+        return f.read()
+
+def chart_prompt_input(chart):
+    """The user message for a chart: its analysable fields as canonical JSON."""
+    return json.dumps({key: chart[key] for key in PROMPT_FIELDS if key in chart},
+                      sort_keys=True, separators=(',', ':'))
+
+def dominant_element(chart):
+    """The element holding the most of the chart's planets."""
+    counts = dict.fromkeys(ELEMENTS, 0)
+    for planet in chart.get('planets', {}).values():
+        if planet.get('sign') in ZODIAC_SIGNS:
+            counts[ELEMENTS[ZODIAC_SIGNS.index(planet['sign']) % 4]] += 1
+    return max(ELEMENTS, key=lambda element: counts[element])
+
+# --- Providers ---
+
+class ReportProvider:
+    """
+    Interface of a report text generator.
+
+    Subclasses set `version`, which identifies everything about the provider
+    that changes its output, and implement `stream`.
+    """
+
+    name = None
+    version = None
+
+    def stream(self, prompt, chart):
+        """
+        Generates a report.
+
+        Args:
+            prompt (str): The system prompt.
+            chart (dict): The chart response.
+
+        Yields:
+            str: Text chunks, in order.
+        """
+        raise NotImplementedError
+
+class StubProvider(ReportProvider):
+    """
+    Local, deterministic provider: fills the fallback blueprint from the
+    chart and streams it word by word.
+
+    Args:
+        delay (float): Seconds to wait between chunks, to exercise streaming.
+    """
+
+    name = "stub"
+    version = "stub-1"
+
+    def __init__(self, delay=0.0):
+        self.delay = delay
+
+    def render(self, chart):
+        rarity = chart.get('rarity') or {}
+        one_in = f"{rarity['oneIn']:,}" if rarity.get('oneIn') else "a million"
+        return f"""# Your Hash Clock Cosmic Blueprint
+
+## Foundational Cosmic Identity
+
+You emerge as a {chart.get('sunSign')} Sun with the emotional depths of a {chart.get('moonSign')} Moon, anchored through a {chart.get('ascendant')} Rising. This trinity forms your cosmic signature—a unique frequency in the symphony of existence.
+
+Your {dominant_element(chart)} elemental dominance reveals the primary energy through which you interface with reality, while your chart's geometric patterns create a sacred mandala of potential.
+
+## Soul Evolution Timeline
+
+Your birth moment captures a specific harmonic in the cosmic web—one that occurs roughly 1 in {one_in} times. This statistical rarity suggests you carry encoded instructions for evolutionary leaps in consciousness.
+
+## Multi-Dimensional Geometry
+
+The angles between your planets create a unique resonance pattern, a cosmic fingerprint that has never existed before and never will again. This geometry is your soul's blueprint for manifestation.
+
+## Practical Navigation
+
+Trust the geometric patterns of your life. When synchronicities cluster around dates that resonate with your natal numbers, pay attention—these are cosmic download moments.
+
+## Closing Transmission
+
+You are not just born under the stars—you are stardust organized into conscious awareness, here to participate in the universe's awakening to itself.
+"""
+
+    def stream(self, prompt, chart):
+        words = self.render(chart).split(' ')
+        for i, word in enumerate(words):
+            if self.delay:
+                time.sleep(self.delay)
+            yield word if i == len(words) - 1 else word + ' '
+
+class OpenAIProvider(ReportProvider):
+    """
+    Streams chat completions from OpenAI.
+
+    Args:
+        api_key (str): OpenAI API key.
+        model (str): Chat model name.
+
+    Raises:
+        RuntimeError: If the `openai` package is not installed.
+    """
+
+    name = "openai"
+
+    def __init__(self, api_key, model=DEFAULT_OPENAI_MODEL):
+        if openai is None:
+            raise RuntimeError("The openai package is not installed")
+        self.client = openai.OpenAI(api_key=api_key)
+        self.model = model
+        self.version = f"openai:{model}:{json.dumps(OPENAI_SETTINGS, sort_keys=True)}"
+
+    def stream(self, prompt, chart):
+        response = self.client.chat.completions.create(
+            model=self.model,
+            messages=[
+                {"role": "system", "content": prompt},
+                {"role": "user", "content": chart_prompt_input(chart)}
+            ],
+            stream=True,
+            **OPENAI_SETTINGS
+        )
+        for chunk in response:
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
+
+def provider_from_environment():
+    """
+    The provider chosen by the environment.
+
+    COSMIC_REPORT_PROVIDER   'stub' or 'openai' (default: openai when a key and
+                             the package are available, otherwise stub)
+    COSMIC_REPORT_MODEL      OpenAI model (default gpt-4o)
+    COSMIC_STUB_DELAY        stub seconds per chunk (default 0)
+    """
+    choice = os.environ.get('COSMIC_REPORT_PROVIDER')
+    api_key = os.environ.get('OPENAI_API_KEY')
+    if choice == 'openai' or (choice is None and api_key and openai is not None):
+        return OpenAIProvider(api_key, os.environ.get('COSMIC_REPORT_MODEL', DEFAULT_OPENAI_MODEL))
+    return StubProvider(float(os.environ.get('COSMIC_STUB_DELAY', 0)))
+
+# --- Cross-Process Ledger ---
+
+class GenerationLedger:
+    """
+    Leases report generations across processes and relays their chunks.
+
+    Each generation is one `generations` row, owned by the holder of its
+    token, plus its chunks in `generation_chunks`. Rows are keyed by
+    "fingerprint:template version".
+
+    Args:
+        path (str): SQLite database file, usually the report store's.
+    """
+
+    def __init__(self, path, pool_size=2):
+        self.path = path
+        self.pool = ConnectionPool(path, pool_size, schema=LEDGER_SCHEMA)
+
+    def claim(self, key, token):
+        """
+        Takes the lease on `key` unless a live generation already holds it.
+
+        Returns:
+            tuple: (claimed, token of the generation that holds the lease).
+        """
+        now = time.time()
+        with self.pool.connection() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute(
+                "INSERT INTO generations (key, token, status, heartbeat) VALUES (?, ?, 'running', ?) "
+                "ON CONFLICT(key) DO UPDATE SET token = excluded.token, status = 'running', error = NULL, "
+                "heartbeat = excluded.heartbeat WHERE generations.status = 'failed' OR generations.heartbeat < ? "
+                "RETURNING token",
+                (key, token, now, now - LEASE_TTL)
+            ).fetchone()
+            if row is not None:
+                conn.execute("DELETE FROM generation_chunks WHERE key = ?", (key,))
+                conn.execute("DELETE FROM generation_chunks WHERE key IN "
+                             "(SELECT key FROM generations WHERE status != 'running' AND heartbeat < ?)",
+                             (now - LEDGER_RETENTION,))
+                conn.execute("DELETE FROM generations WHERE status != 'running' AND heartbeat < ?",
+                             (now - LEDGER_RETENTION,))
+                conn.execute("COMMIT")
+                return True, token
+            holder = conn.execute("SELECT token FROM generations WHERE key = ?", (key,)).fetchone()[0]
+            conn.execute("COMMIT")
+        return False, holder
+
+    def append(self, key, token, first_seq, chunks):
+        """
+        Writes chunks and renews the lease.
+
+        Returns:
+            bool: False if the lease was lost to another process.
+        """
+        with self.pool.connection() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            renewed = conn.execute("UPDATE generations SET heartbeat = ? WHERE key = ? AND token = ?",
+                                   (time.time(), key, token)).rowcount
+            if renewed:
+                conn.executemany("INSERT INTO generation_chunks (key, seq, text) VALUES (?, ?, ?)",
+                                 [(key, first_seq + i, chunk) for i, chunk in enumerate(chunks)])
+            conn.execute("COMMIT")
+        return bool(renewed)
+
+    def finish(self, key, token, error=None):
+        with self.pool.connection() as conn:
+            conn.execute("UPDATE generations SET status = ?, error = ?, heartbeat = ? WHERE key = ? AND token = ?",
+                         ('failed' if error is not None else 'done', error, time.time(), key, token))
+
+    def read(self, key, token, from_seq):
+        """
+        The state of a generation and its chunks from `from_seq` on.
+
+        Returns:
+            tuple: (status, error, heartbeat, chunks). A generation whose lease
+                   has passed to another token reads as failed.
+        """
+        with self.pool.connection() as conn:
+            conn.execute("BEGIN")
+            row = conn.execute("SELECT token, status, error, heartbeat FROM generations WHERE key = ?",
+                               (key,)).fetchone()
+            chunks = [text for (text,) in conn.execute(
+                "SELECT text FROM generation_chunks WHERE key = ? AND seq >= ? ORDER BY seq", (key, from_seq)
+            )]
+            conn.execute("COMMIT")
+        if row is None or row[0] != token:
+            return 'failed', "Generation was superseded", 0.0, []
+        return row[1], row[2], row[3], chunks
+
+# --- Single-Flight Generation ---
+
+class Generation:
+    """
+    One report being generated: the chunks so far, shared by every reader
+    in this process. `id` identifies the generation across processes.
+    """
+
+    def __init__(self, key, generation_id):
+        self.key = key
+        self.id = generation_id
+        self.chunks = []
+        self.done = False
+        self.error = None
+        self._cond = threading.Condition()
+
+    def append(self, chunk):
+        with self._cond:
+            self.chunks.append(chunk)
+            self._cond.notify_all()
+
+    def finish(self, error=None):
+        with self._cond:
+            self.done = True
+            self.error = error
+            self._cond.notify_all()
+
+    @property
+    def text(self):
+        return ''.join(self.chunks)
+
+    def follow(self, timeout=CHUNK_TIMEOUT, heartbeat=None):
+        """
+        Yields every chunk from the first, waiting for new ones until the
+        generation finishes.
+
+        Args:
+            timeout (float): Longest wait for a chunk.
+            heartbeat (float, optional): If set, None is yielded after every
+                `heartbeat` seconds without a chunk, so the reader can give up.
+
+        Raises:
+            RuntimeError: If the generation failed.
+            TimeoutError: If no chunk arrives within `timeout` seconds.
+        """
+        position = 0
+        last_chunk = time.monotonic()
+        while True:
+            with self._cond:
+                ready = lambda: position < len(self.chunks) or self.done
+                if not ready():
+                    wait = timeout - (time.monotonic() - last_chunk)
+                    if heartbeat is not None:
+                        wait = min(wait, heartbeat)
+                    self._cond.wait_for(ready, max(wait, 0))
+                chunks = self.chunks[position:]
+                done, error = self.done, self.error
+            if chunks:
+                position += len(chunks)
+                last_chunk = time.monotonic()
+                yield from chunks
+            elif not done:
+                if heartbeat is None or time.monotonic() - last_chunk >= timeout:
+                    raise TimeoutError("Report generation stalled")
+                yield None
+            if done:
+                if error is not None:
+                    raise RuntimeError(f"Report generation failed: {error}")
+                return
+
+class ReportGenerator:
+    """
+    Generates reports through a provider, at most once per key.
+
+    Args:
+        provider (ReportProvider): Where report text comes from.
+        prompt (str, optional): The system prompt; prompts/cosmic_blueprint.md by default.
+        cache_size (int): Finished reports kept in memory.
+        concurrency (int): Generations run at once per process.
+        ledger (GenerationLedger, optional): Shares generations with other
+            processes; without one, coalescing is per process.
+    """
+
+    def __init__(self, provider, prompt=None, cache_size=DEFAULT_CACHE_SIZE, concurrency=DEFAULT_CONCURRENCY,
+                 ledger=None):
+        self.provider = provider
+        self.prompt = load_prompt() if prompt is None else prompt
+        self.cache = LRUCache(cache_size)
+        self.concurrency = concurrency
+        self.ledger = ledger
+        self.template_version = (
+            f"{TEMPLATE_NAME}-"
+            + hashlib.sha256(f"{self.prompt}|{provider.version}".encode()).hexdigest()[:12]
+        )
+        self._inflight = {}
+        self._lock = threading.Lock()
+        self._executor = None
+        self._executor_pid = None
+        self.counts = {"cache": 0, "coalesced": 0, "followed": 0, "generated": 0, "failed": 0}
+
+    def _count(self, source):
+        self.counts[source] += 1
+        inc("cosmic_report_generations_total", source=source)
+
+    def _submit(self, fn, *args):
+        # Threads do not survive a fork, so each worker process gets its own pool
+        if self._executor_pid != os.getpid():
+            self._executor = ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="report")
+            self._executor_pid = os.getpid()
+        self._executor.submit(fn, *args)
+
+    def cached(self, fingerprint):
+        """The finished report for a fingerprint under this template, or None."""
+        return self.cache.get((fingerprint, self.template_version))
+
+    def remember(self, fingerprint, text):
+        """Adds a report finished elsewhere (e.g. loaded from the report store) to the cache."""
+        self.cache.put((fingerprint, self.template_version), text)
+
+    def _end(self, generation, error=None):
+        if error is None:
+            self.cache.put(generation.key, generation.text)
+        with self._lock:
+            self._inflight.pop(generation.key, None)
+        generation.finish(error=error)
+
+    def _run(self, generation, chart, on_complete):
+        ledger_key = ':'.join(generation.key)
+        pending, written, last_flush = [], 0, time.monotonic()
+
+        def flush():
+            nonlocal pending, written, last_flush
+            if self.ledger is not None and pending:
+                if not self.ledger.append(ledger_key, generation.id, written, pending):
+                    logger.warning("Lost the lease on report generation %s", ledger_key)
+                written += len(pending)
+            pending, last_flush = [], time.monotonic()
+
+        try:
+            for chunk in self.provider.stream(self.prompt, chart):
+                generation.append(chunk)
+                pending.append(chunk)
+                if time.monotonic() - last_flush >= LEDGER_FLUSH_INTERVAL:
+                    flush()
+            flush()
+        except Exception as e:
+            logger.error("Report generation with %s failed: %s", self.provider.name, e)
+            self._count("failed")
+            if self.ledger is not None:
+                self.ledger.finish(ledger_key, generation.id, error=str(e))
+            self._end(generation, error=str(e))
+            return
+
+        if on_complete is not None:
+            # Before readers are released, so a finished stream means a stored report
+            try:
+                on_complete(generation.text)
+            except Exception as e:
+                logger.error("Storing generated report failed: %s", e)
+        if self.ledger is not None:
+            self.ledger.finish(ledger_key, generation.id)
+        self._end(generation)
+
+    def _relay(self, generation):
+        """Copies the chunks of a generation running in another process into `generation`."""
+        ledger_key = ':'.join(generation.key)
+        position = 0
+        try:
+            while True:
+                status, error, heartbeat, chunks = self.ledger.read(ledger_key, generation.id, position)
+                for chunk in chunks:
+                    generation.append(chunk)
+                position += len(chunks)
+                if status == 'done':
+                    self._end(generation)
+                    return
+                if status == 'failed':
+                    self._end(generation, error=error)
+                    return
+                if time.time() - heartbeat > LEASE_TTL:
+                    self._end(generation, error="Generating process stopped responding")
+                    return
+                time.sleep(LEDGER_POLL_INTERVAL)
+        except Exception as e:
+            logger.error("Following report generation %s failed: %s", ledger_key, e)
+            self._end(generation, error=str(e))
+
+    def stream(self, fingerprint, load_chart, on_complete=None, heartbeat=None):
+        """
+        Streams the report for a chart.
+
+        A cached report comes back as a single chunk. Otherwise the caller
+        joins the generation already running for this key, in this process
+        or (through the ledger) in another one, or starts one.
+
+        Args:
+            fingerprint (str): The chart fingerprint.
+            load_chart (callable): Returns the chart response. Only called,
+                in the calling thread, when this call starts a generation;
+                whatever it raises is raised here.
+            on_complete (callable, optional): Called with the full text once,
+                by whichever call started the generation, after it succeeds.
+            heartbeat (float, optional): See Generation.follow.
+
+        Returns:
+            tuple: (chunk iterator, source, generation id), where source is
+                   'cache', 'coalesced' (joined a generation in this process),
+                   'followed' (joined one in another process) or 'generated'.
+                   The id is None for cached reports.
+        """
+        key = (fingerprint, self.template_version)
+        text = self.cache.get(key)
+        if text is not None:
+            self._count("cache")
+            return iter([text]), "cache", None
+
+        with self._lock:
+            generation = self._inflight.get(key)
+            started = generation is None
+            if started:
+                generation = Generation(key, uuid.uuid4().hex)
+                self._inflight[key] = generation
+        if not started:
+            self._count("coalesced")
+            return generation.follow(heartbeat=heartbeat), "coalesced", generation.id
+
+        try:
+            claimed = True
+            if self.ledger is not None:
+                claimed, generation.id = self.ledger.claim(':'.join(key), generation.id)
+            if not claimed:
+                self._count("followed")
+                threading.Thread(target=self._relay, args=(generation,), name="report-relay", daemon=True).start()
+                return generation.follow(heartbeat=heartbeat), "followed", generation.id
+            chart = load_chart()
+        except Exception as e:
+            if claimed and self.ledger is not None:
+                self.ledger.finish(':'.join(key), generation.id, error=str(e))
+            self._end(generation, error=str(e))
+            raise
+        self._count("generated")
+        self._submit(self._run, generation, chart, on_complete)
+        return generation.follow(heartbeat=heartbeat), "generated", generation.id
+
+    def generate(self, fingerprint, load_chart, on_complete=None):
+        """The full report text; blocks until it is ready."""
+        chunks, _, _ = self.stream(fingerprint, load_chart, on_complete)
+        return ''.join(chunks)
+
+    def stats(self):
+        return {
+            "provider": self.provider.name,
+            "templateVersion": self.template_version,
+            "shared": self.ledger is not None,
+            "inFlight": len(self._inflight),
+            "requests": dict(self.counts),
+            "cache": self.cache.stats()
+        }
+
+def generator_from_environment():
+    """
+    The report generator described by the environment.
+
+    COSMIC_REPORT_GEN_CACHE_SIZE   finished reports kept in memory (default 256)
+    COSMIC_REPORT_CONCURRENCY      generations run at once per worker (default 4)
+    COSMIC_REPORT_DB               the ledger shares generations between workers through
+                                   this database (see report_store.py; empty disables it)
+    """
+    path = os.environ.get('COSMIC_REPORT_DB', DEFAULT_DB_PATH)
+    return ReportGenerator(
+        provider_from_environment(),
+        cache_size=int(os.environ.get('COSMIC_REPORT_GEN_CACHE_SIZE', DEFAULT_CACHE_SIZE)),
+        concurrency=int(os.environ.get('COSMIC_REPORT_CONCURRENCY', DEFAULT_CONCURRENCY)),
+        ledger=GenerationLedger(path) if path else None
+    )
@@ -0,0 +1,449 @@
+#!/usr/bin/env python3
+"""
+report_store.py: Persistent cosmic reports keyed by chart fingerprint.
+
+The browser used to look a report up by its raw birth fields and insert it
+in a second round trip, which raced whenever two identical requests arrived
+together and missed whenever the same birth was spelled differently. Here a
+report is stored under its chart fingerprint (see fingerprint.py), so every
+spelling of one birth on one engine release maps to exactly one row, and
+every write is a single upsert statement that cannot race:
+
+- the chart is content-addressed and never rewritten once stored;
+- a report text (with the version of the template that produced it)
+  replaces the stored one; a write without a report keeps it;
+- `generated_version` is set only when the server generated the report
+  itself, so a report posted by a client is never served as generated.
+
+Hot reports are answered from an in-process LRU without touching SQLite.
+Writes from request handlers go through `put`, which updates the LRU at
+once and hands the row to a background flusher that upserts pending rows
+in batches, one transaction per batch. Connections come from a small
+bounded pool that is rebuilt after a fork, so the store can be created in
+the gunicorn master.
+"""
+
+import atexit
+import json
+import logging
+import os
+import queue
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+from chart_cache import LRUCache
+
+logger = logging.getLogger(__name__)
+
+# --- Constants and Configuration ---
+
+DEFAULT_DB_PATH = os.path.join(os.path.dirname(__file__), 'data', 'reports.sqlite3')
+
+DEFAULT_POOL_SIZE = 4
+DEFAULT_CACHE_SIZE = 1024
+
+# Pending writes are flushed when this many have queued up, or after
+# FLUSH_INTERVAL seconds, whichever comes first.
+DEFAULT_BATCH_SIZE = 64
+FLUSH_INTERVAL = 0.5
+
+SCHEMA = """
+    CREATE TABLE IF NOT EXISTS reports (
+        fingerprint TEXT PRIMARY KEY,
+        engine_version TEXT NOT NULL,
+        birth_date TEXT NOT NULL,
+        birth_time TEXT NOT NULL,
+        latitude TEXT NOT NULL,
+        longitude TEXT NOT NULL,
+        sun_sign TEXT,
+        moon_sign TEXT,
+        ascendant TEXT,
+        chart TEXT NOT NULL,
+        report TEXT,
+        report_version TEXT,
+        generated_version TEXT,
+        created REAL NOT NULL,
+        updated REAL NOT NULL
+    );
+"""
+
+COLUMNS = (
+    "fingerprint", "engine_version", "birth_date", "birth_time", "latitude", "longitude",
+    "sun_sign", "moon_sign", "ascendant", "chart", "report", "report_version",
+    "generated_version", "created", "updated"
+)
+
+# One statement: insert, or keep the stored chart and take the new report if there is one.
+UPSERT = f"""
+    INSERT INTO reports ({", ".join(COLUMNS)}) VALUES ({", ".join("?" for _ in COLUMNS)})
+    ON CONFLICT (fingerprint) DO UPDATE SET
+        report = COALESCE(excluded.report, report),
+        report_version = CASE WHEN excluded.report IS NULL THEN report_version ELSE excluded.report_version END,
+        generated_version = CASE WHEN excluded.report IS NULL THEN generated_version ELSE excluded.generated_version END,
+        updated = excluded.updated
+"""
+
+# --- Records ---
+
+def make_record(fingerprint, engine_version, canonical, chart, report=None, report_version=None,
+                generated_version=None):
+    """
+    A report record as the store hands it out.
+
+    Args:
+        fingerprint (str): From fingerprint.chart_fingerprint.
+        engine_version (str): The engine version in the fingerprint.
+        canonical (dict): From fingerprint.canonical_birth.
+        chart (dict): The chart response.
+        report (str or dict, optional): Report content; any JSON value.
+        report_version (str, optional): Version of the template that produced it.
+        generated_version (str, optional): The template version, for a report
+            the server generated itself; never taken from a client.
+    """
+    now = time.time()
+    return {
+        "fingerprint": fingerprint,
+        "engineVersion": engine_version,
+        "birthDate": canonical['birthDate'],
+        "birthTime": canonical['birthTime'],
+        "latitude": canonical['latitude'],
+        "longitude": canonical['longitude'],
+        "sunSign": chart.get('sunSign'),
+        "moonSign": chart.get('moonSign'),
+        "ascendant": chart.get('ascendant') if isinstance(chart.get('ascendant'), str) else None,
+        "chart": chart,
+        "report": report,
+        "reportVersion": report_version if report is not None else None,
+        "generatedVersion": generated_version if report is not None else None,
+        "createdAt": now,
+        "updatedAt": now
+    }
+
+def _merge(stored, new):
+    """What the upsert leaves in the table when `new` is written over `stored`."""
+    if stored is None:
+        return new
+    merged = dict(stored, updatedAt=new['updatedAt'])
+    if new['report'] is not None:
+        merged['report'] = new['report']
+        merged['reportVersion'] = new['reportVersion']
+        merged['generatedVersion'] = new['generatedVersion']
+    return merged
+
+def _to_row(record):
+    return (
+        record['fingerprint'], record['engineVersion'], record['birthDate'], record['birthTime'],
+        record['latitude'], record['longitude'], record['sunSign'], record['moonSign'], record['ascendant'],
+        json.dumps(record['chart'], separators=(',', ':')),
+        None if record['report'] is None else json.dumps(record['report']),
+        record['reportVersion'], record['generatedVersion'], record['createdAt'], record['updatedAt']
+    )
+
+def _from_row(row):
+    (fingerprint, engine_version, birth_date, birth_time, latitude, longitude, sun_sign, moon_sign,
+     ascendant, chart, report, report_version, generated_version, created, updated) = row
+    return {
+        "fingerprint": fingerprint,
+        "engineVersion": engine_version,
+        "birthDate": birth_date,
+        "birthTime": birth_time,
+        "latitude": latitude,
+        "longitude": longitude,
+        "sunSign": sun_sign,
+        "moonSign": moon_sign,
+        "ascendant": ascendant,
+        "chart": json.loads(chart),
+        "report": None if report is None else json.loads(report),
+        "reportVersion": report_version,
+        "generatedVersion": generated_version,
+        "createdAt": created,
+        "updatedAt": updated
+    }
+
+def _migrate(conn):
+    """Adds columns missing from databases written by earlier releases."""
+    # Reports stored before generated_version existed are all treated as client-supplied
+    if 'generated_version' not in [column[1] for column in conn.execute("PRAGMA table_info(reports)")]:
+        try:
+            conn.execute("ALTER TABLE reports ADD COLUMN generated_version TEXT")
+        except sqlite3.OperationalError as e:
+            if 'duplicate column' not in str(e):  # another process got there first
+                raise
+
+# --- Connection Pool ---
+
+class ConnectionPool:
+    """
+    A bounded pool of SQLite connections.
+
+    Connections are opened on demand up to `size` and reused; a caller that
+    finds them all in use waits up to `timeout` seconds. A forked child
+    never touches its parent's connections and opens its own. Each new
+    connection runs `schema`, then `migrate(conn)` if given, so the tables
+    exist before first use.
+    """
+
+    def __init__(self, path, size=DEFAULT_POOL_SIZE, timeout=5.0, schema=SCHEMA, migrate=None):
+        self.path = path
+        self.size = size
+        self.timeout = timeout
+        self.schema = schema
+        self.migrate = migrate
+        self.opened = 0
+        self._reset()
+
+    def _reset(self):
+        self._pid = os.getpid()
+        self._idle = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(self.size)
+
+    def _open(self):
+        conn = sqlite3.connect(self.path, timeout=self.timeout, isolation_level=None, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.executescript(self.schema)
+        if self.migrate is not None:
+            self.migrate(conn)
+        self.opened += 1
+        return conn
+
+    @contextmanager
+    def connection(self):
+        """
+        Borrows a connection for the duration of a `with` block.
+
+        Raises:
+            sqlite3.OperationalError: If no connection frees up in time.
+        """
+        if self._pid != os.getpid():
+            self._reset()
+        if not self._slots.acquire(timeout=self.timeout):
+            raise sqlite3.OperationalError("SQLite connection pool exhausted")
+        try:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                conn = self._open()
+            try:
+                yield conn
+            finally:
+                if conn.in_transaction:
+                    conn.execute("ROLLBACK")
+                self._idle.put(conn)
+        finally:
+            self._slots.release()
+
+    def close(self):
+        if self._pid != os.getpid():
+            return
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                break
+
+# --- Report Store ---
+
+class ReportStore:
+    """
+    SQLite-backed report store with an LRU of hot reports and batched writes.
+
+    Records are shared with the cache; treat them as read-only.
+
+    Args:
+        path (str): SQLite database file; created if missing.
+        pool_size (int): Maximum open connections per process.
+        cache_size (int): Reports kept in memory.
+        batch_size (int): Pending writes that trigger an early flush.
+        flush_interval (float): Longest a write waits before it is flushed.
+    """
+
+    def __init__(self, path=DEFAULT_DB_PATH, pool_size=DEFAULT_POOL_SIZE, cache_size=DEFAULT_CACHE_SIZE,
+                 batch_size=DEFAULT_BATCH_SIZE, flush_interval=FLUSH_INTERVAL):
+        self.path = path
+        self.pool = ConnectionPool(path, pool_size, migrate=_migrate)
+        self.cache = LRUCache(cache_size)
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._pending = {}
+        self._pending_lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._flusher = None
+        self._flusher_pid = None
+        self._closed = False
+        self.reads = 0
+        self.batches = 0
+        self.written = 0
+        atexit.register(self.close)
+
+    # Reads
+
+    def get(self, fingerprint):
+        """The stored record for a fingerprint, or None."""
+        record = self.cache.get(fingerprint)
+        if record is not None:
+            return record
+        with self._pending_lock:
+            record = self._pending.get(fingerprint)
+        if record is None:
+            record = self.get_many([fingerprint]).get(fingerprint)
+        if record is not None:
+            self.cache.put(fingerprint, record)
+        return record
+
+    def get_many(self, fingerprints):
+        """
+        Stored records for many fingerprints in one query.
+
+        Returns:
+            dict: fingerprint -> record, for the fingerprints that are stored.
+        """
+        fingerprints = list(dict.fromkeys(fingerprints))
+        if not fingerprints:
+            return {}
+        self.reads += 1
+        with self.pool.connection() as conn:
+            rows = conn.execute(
+                f"SELECT {', '.join(COLUMNS)} FROM reports WHERE fingerprint IN ({', '.join('?' for _ in fingerprints)})",
+                fingerprints
+            ).fetchall()
+        return {row[0]: _from_row(row) for row in rows}
+
+    # Writes
+
+    def upsert(self, record):
+        """
+        Writes one record now, in a single statement, and returns the stored row.
+
+        Concurrent upserts of the same fingerprint are safe: the first inserts
+        the chart and later ones only refresh the report.
+        """
+        with self.pool.connection() as conn:
+            row = conn.execute(
+                UPSERT + f" RETURNING {', '.join(COLUMNS)}", _to_row(record)
+            ).fetchone()
+        stored = _from_row(row)
+        self.written += 1
+        self.cache.put(stored['fingerprint'], stored)
+        return stored
+
+    def upsert_many(self, records):
+        """
+        Writes many records in one transaction.
+
+        Returns:
+            int: Number of records written.
+        """
+        rows = [_to_row(record) for record in records]
+        if not rows:
+            return 0
+        with self.pool.connection() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.executemany(UPSERT, rows)
+            conn.execute("COMMIT")
+        self.batches += 1
+        self.written += len(rows)
+        return len(rows)
+
+    def put(self, record):
+        """
+        Queues a record for the next batched write and returns what the store
+        will hold for it. Reads see the write immediately.
+        """
+        fingerprint = record['fingerprint']
+        if record['report'] is None and self.cache.get(fingerprint) is None:
+            # Only a stored row can say which report a chart-only write keeps
+            self.get(fingerprint)
+        with self._pending_lock:
+            merged = _merge(self._pending.get(fingerprint) or self.cache.get(fingerprint), record)
+            self._pending[fingerprint] = merged
+            self.cache.put(fingerprint, merged)
+            pending = len(self._pending)
+        self._ensure_flusher()
+        if pending >= self.batch_size:
+            self._wake.set()
+        return merged
+
+    def flush(self):
+        """Writes every pending record; returns how many were written."""
+        with self._flush_lock:
+            with self._pending_lock:
+                batch, self._pending = self._pending, {}
+            try:
+                return self.upsert_many(batch.values())
+            except sqlite3.Error as e:
+                logger.error("Report store flush of %d records failed: %s", len(batch), e)
+                with self._pending_lock:
+                    # Keep the failed records for the next attempt, unless newer writes replaced them
+                    for fingerprint, record in batch.items():
+                        self._pending[fingerprint] = _merge(record, self._pending[fingerprint]) \
+                            if fingerprint in self._pending else record
+                return 0
+
+    def pending(self):
+        return len(self._pending)
+
+    def _ensure_flusher(self):
+        if self._flusher_pid == os.getpid() or self._closed:
+            return
+        with self._pending_lock:
+            if self._flusher_pid == os.getpid() or self._closed:
+                return
+            flusher = threading.Thread(target=self._flush_loop, name="report-store-flusher", daemon=True)
+            flusher.start()
+            self._flusher, self._flusher_pid = flusher, os.getpid()
+
+    def _flush_loop(self):
+        while not self._closed:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            if self._pending:
+                self.flush()
+
+    def close(self):
+        """Flushes pending writes and closes this process's connections."""
+        with self._pending_lock:
+            if self._closed:
+                return
+            self._closed = True
+            flusher = self._flusher if self._flusher_pid == os.getpid() else None
+        self._wake.set()
+        if flusher is not None:
+            flusher.join(timeout=5.0)
+        if self._pending:
+            self.flush()
+        self.pool.close()
+
+    def stats(self):
+        with self.pool.connection() as conn:
+            count = conn.execute("SELECT COUNT(*) FROM reports").fetchone()[0]
+        return {
+            "path": self.path,
+            "reports": count,
+            "pending": self.pending(),
+            "reads": self.reads,
+            "batches": self.batches,
+            "written": self.written,
+            "connections": self.pool.opened,
+            "cache": self.cache.stats()
+        }
+
+def store_from_environment():
+    """
+    Builds the report store described by the environment, or None if disabled.
+
+    COSMIC_REPORT_DB          SQLite path (default backend/data/reports.sqlite3; empty disables)
+    COSMIC_REPORT_POOL_SIZE   connections per worker (default 4)
+    COSMIC_REPORT_CACHE_SIZE  reports kept in memory per worker (default 1024)
+    """
+    path = os.environ.get('COSMIC_REPORT_DB', DEFAULT_DB_PATH)
+    if not path:
+        return None
+    return ReportStore(
+        path,
+        pool_size=int(os.environ.get('COSMIC_REPORT_POOL_SIZE', DEFAULT_POOL_SIZE)),
+        cache_size=int(os.environ.get('COSMIC_REPORT_CACHE_SIZE', DEFAULT_CACHE_SIZE))
+    )
@@ -0,0 +1,267 @@
+#!/usr/bin/env python3
+"""
+response_format.py: Field projection, float precision and compact encodings
+for chart responses.
+
+A chart response is shaped in three independent steps, all chosen by the
+client:
+
+- projection: `?fields=planets,aspects` keeps only those top-level fields;
+- precision: `?precision=4` rounds every float to that many decimals;
+- representation, negotiated through the Accept header:
+
+    application/json                       the full JSON document (default)
+    application/msgpack                    the same document as MessagePack
+    application/vnd.cosmic.compact+json    the compact array layout, as JSON
+    application/vnd.cosmic.compact+msgpack the compact array layout, as MessagePack
+
+The compact layout ("compact-1") keeps the numbers and drops everything a
+client can derive or render itself: signs and degrees (from longitudes),
+the display strings and the prose `overview`; the Ascendant and Midheaven
+become bare longitudes. Planets become rows under a shared column list, and aspects and
+parallels become [planet index, planet index, aspect index, orb, applying]
+rows. A chart shrinks to under a third of its JSON size.
+
+MessagePack needs the optional `msgpack` package; without it those types are
+not offered and clients get JSON. JSON is written with `orjson` when it is
+installed, which serializes charts several times faster than the standard
+library.
+"""
+
+import json
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# --- Constants and Configuration ---
+
+JSON = "application/json"
+MSGPACK = "application/msgpack"
+COMPACT_JSON = "application/vnd.cosmic.compact+json"
+COMPACT_MSGPACK = "application/vnd.cosmic.compact+msgpack"
+
+COMPACT_LAYOUT = "compact-1"
+
+# Top-level fields a chart response can have, for validating ?fields=.
+CHART_FIELDS = (
+    "planets", "houses", "ascendant", "midheaven", "aspects", "parallels", "patterns",
+    "harmonics", "midpoints", "sunSign", "moonSign", "ascendantData", "formattedBirthDate",
+    "formattedTime", "overview", "rarity", "meta"
+)
+
+# Planet columns of the compact layout, in row order.
+PLANET_COLUMNS = (
+    "longitude", "latitude", "distance_au", "speed", "rightAscension", "declination",
+    "declinationSpeed", "retrograde", "outOfBounds"
+)
+
+MAX_PRECISION = 12
+
+# Accept-header aliases for the MessagePack types.
+_ALIASES = {"application/x-msgpack": MSGPACK}
+
+# --- Options ---
+
+def offered_types():
+    """The media types this server can produce, preferred first."""
+    if msgpack is None:
+        return [JSON, COMPACT_JSON]
+    return [JSON, COMPACT_JSON, MSGPACK, COMPACT_MSGPACK]
+
+class ResponseFormat:
+    """
+    How a client asked for its charts.
+
+    Args:
+        fields (tuple, optional): Top-level fields to keep; all if None.
+        precision (int, optional): Decimals to round floats to; None keeps full precision.
+        mimetype (str): One of the media types in offered_types().
+    """
+
+    def __init__(self, fields=None, precision=None, mimetype=JSON):
+        self.fields = fields
+        self.precision = precision
+        self.mimetype = mimetype
+
+    @property
+    def compact(self):
+        return self.mimetype in (COMPACT_JSON, COMPACT_MSGPACK)
+
+    @property
+    def is_default(self):
+        return self.fields is None and self.precision is None and self.mimetype == JSON
+
+    @classmethod
+    def from_request(cls, args, accept):
+        """
+        Reads ?fields=, ?precision= and the Accept header.
+
+        Args:
+            args (Mapping): Query arguments.
+            accept (werkzeug MIMEAccept, optional): Parsed Accept header.
+                Clients that accept none of the offered types get JSON.
+
+        Raises:
+            ValueError: If fields or precision are invalid.
+        """
+        fields = None
+        if args.get('fields'):
+            requested = {field.strip() for field in args['fields'].split(',') if field.strip()}
+            unknown = sorted(requested.difference(CHART_FIELDS))
+            if unknown:
+                raise ValueError(f"Unknown fields: {', '.join(unknown)}")
+            # One spelling per projection: CHART_FIELDS order, no repeats
+            fields = tuple(field for field in CHART_FIELDS if field in requested)
+
+        precision = None
+        if args.get('precision') not in (None, ''):
+            try:
+                precision = int(args['precision'])
+            except ValueError:
+                raise ValueError("precision must be an integer")
+            if not 0 <= precision <= MAX_PRECISION:
+                raise ValueError(f"precision must be between 0 and {MAX_PRECISION}")
+
+        mimetype = JSON
+        if accept:
+            offers = offered_types()
+            aliased = [(_ALIASES.get(value, value), quality) for value, quality in accept]
+            best = type(accept)(aliased).best_match(offers)
+            mimetype = best or JSON
+        return cls(fields, precision, mimetype)
+
+# --- Shaping ---
+
+def project(chart, fields):
+    """The chart with only `fields` kept; the chart itself if fields is None."""
+    if fields is None:
+        return chart
+    return {field: chart[field] for field in fields if field in chart}
+
+def _round_small(value, digits):
+    """`value` to `digits` significant digits; for values that round to zero."""
+    return float(f"{value:.{max(digits, 1)}g}") if value else value
+
+def _round_floats(value, scale, digits):
+    kind = type(value)
+    if kind is dict:
+        return {
+            key: (round(item * scale) / scale or _round_small(item, digits)) if type(item) is float
+            else _round_floats(item, scale, digits) if type(item) in (dict, list) else item
+            for key, item in value.items()
+        }
+    if kind is list:
+        return [
+            (round(item * scale) / scale or _round_small(item, digits)) if type(item) is float
+            else _round_floats(item, scale, digits) if type(item) in (dict, list) else item
+            for item in value
+        ]
+    if kind is float:
+        return round(value * scale) / scale or _round_small(value, digits)
+    return value
+
+def round_floats(value, digits):
+    """
+    Copy of a JSON-like value with every float rounded to `digits` decimals.
+
+    Small nonzero values, such as rarity probabilities, keep `digits`
+    significant digits instead of collapsing to zero.
+    """
+    # round(x, digits) formats and reparses a decimal string; scaling to an
+    # integer and dividing by the (exact) power of ten gives the same nearest
+    # double several times faster. Floats are handled inline, since a call
+    # per value would double the cost again.
+    return _round_floats(value, 10.0 ** digits, digits)
+
+def _aspect_rows(records, index, names):
+    """Aspect records as [planet index, planet index, aspect index, orb, applying] rows."""
+    rows = []
+    for record in records:
+        aspect = record['aspect']
+        if aspect not in names:
+            names.append(aspect)
+        rows.append([index[record['planet1']], index[record['planet2']], names.index(aspect),
+                     record['orb'], record.get('applying')])
+    return rows
+
+def compact_chart(chart, planet_names=None):
+    """
+    A chart in the compact-1 array layout.
+
+    Fields absent from `chart` (after projection) are absent here too; fields
+    without a compact form (rarity, meta, harmonics, midpoints) are copied.
+
+    Args:
+        planet_names (list, optional): Planet order for the index columns;
+            taken from chart['planets'] by default. Pass it when planets
+            were projected away but aspects were not.
+    """
+    out = {"layout": COMPACT_LAYOUT}
+    if planet_names is None:
+        planet_names = list(chart['planets']) if isinstance(chart.get('planets'), dict) else []
+    names = list(planet_names)
+    index = {name: position for position, name in enumerate(names)}
+    aspect_names = []
+    if names:
+        out['planetNames'] = names
+
+    for key, value in chart.items():
+        if key == 'planets':
+            out['planetColumns'] = list(PLANET_COLUMNS)
+            out['planets'] = [[value[name].get(column) for column in PLANET_COLUMNS] for name in names]
+        elif key in ('ascendant', 'midheaven') and isinstance(value, dict):
+            out[key] = value['longitude']
+        elif key == 'ascendantData':
+            out['ascendant'] = value['longitude']
+        elif key == 'ascendant' and 'ascendantData' not in chart:
+            # The display response replaces the angle with its sign name
+            out[key] = value
+        elif key in ('aspects', 'parallels') and index:
+            out[key] = _aspect_rows(value, index, aspect_names)
+        elif key == 'patterns' and index:
+            out[key] = [
+                [pattern['pattern'], [index[name] for name in pattern['planets']],
+                 index[pattern['apex']] if 'apex' in pattern else None]
+                for pattern in value
+            ]
+        elif key in ('houses', 'rarity', 'meta', 'harmonics', 'midpoints'):
+            out[key] = value
+        # sunSign, moonSign, ascendantData, formatted strings and overview are derivable or prose
+    if aspect_names:
+        out['aspectNames'] = aspect_names
+    return out
+
+def shape_chart(chart, response_format):
+    """Applies a ResponseFormat's projection, layout and precision to one chart."""
+    planet_names = list(chart['planets']) if isinstance(chart.get('planets'), dict) else None
+    chart = project(chart, response_format.fields)
+    if response_format.compact:
+        chart = compact_chart(chart, planet_names)
+    if response_format.precision is not None:
+        chart = round_floats(chart, response_format.precision)
+    return chart
+
+# --- Encoding ---
+
+def encode(payload, mimetype=JSON):
+    """
+    Serializes a response body.
+
+    Returns:
+        bytes: MessagePack for the msgpack types, otherwise JSON.
+    """
+    if mimetype in (MSGPACK, COMPACT_MSGPACK):
+        return msgpack.packb(payload, use_bin_type=True)
+    if orjson is not None:
+        try:
+            return orjson.dumps(payload)
+        except TypeError:
+            pass
+    return json.dumps(payload, separators=(',', ':')).encode()
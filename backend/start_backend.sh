@@ -3,6 +3,15 @@
 # Install required packages
 pip install -r requirements.txt
 
-# Start the Flask backend
-echo "Starting Flask backend on port 5000..."
-python app.py
+# Start the backend under gunicorn (see gunicorn.conf.py).
+# Set COSMIC_DEV=1 to run the Flask development server instead.
+if [ "$COSMIC_DEV" = "1" ]; then
+    echo "Starting Flask development server on port 5000..."
+    # Background jobs run in their own process (gunicorn.conf.py starts it in production)
+    python jobs.py run &
+    trap "kill $!" EXIT
+    python app.py
+else
+    echo "Starting gunicorn on port ${PORT:-5000}..."
+    exec gunicorn -c gunicorn.conf.py
+fi
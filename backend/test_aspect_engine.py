@@ -0,0 +1,102 @@
+import unittest
+import os
+import sys
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import numpy as np
+
+import swisseph as swe
+
+from aspect_engine import (AspectConfig, DECLINATION_CONFIG, MAJOR_ASPECTS, MINOR_ASPECTS, aspect_records,
+                           find_aspects, find_parallels, separation_matrix)
+from astrology_core import (PLANET_IDS, calculate_all_planetary_positions, calculate_aspect_angle,
+                            get_aspect_name, get_astrological_data)
+
+NAMES = ['Sun', 'Moon', 'Mercury', 'Venus']
+
+class TestAspectEngine(unittest.TestCase):
+    def test_matches_legacy_pairwise_rules(self):
+        """Every pair agrees with calculate_aspect_angle/get_aspect_name."""
+        rng = np.random.default_rng(7)
+        for _ in range(50):
+            lons = rng.uniform(0, 360, 10)
+            matrix = find_aspects(lons)
+            for i in range(10):
+                for j in range(i + 1, 10):
+                    expected = get_aspect_name(calculate_aspect_angle(lons[i], lons[j]))
+                    index = matrix.aspect[i, j]
+                    actual = MAJOR_ASPECTS[index].name if index >= 0 else None
+                    self.assertEqual(actual, expected)
+
+    def test_wraps_around_aries_point(self):
+        self.assertAlmostEqual(separation_matrix([359.0], [1.0])[0, 0], 2.0)
+        records = aspect_records(find_aspects([359.0, 1.0]), ['Sun', 'Moon'])
+        self.assertEqual(records[0]['aspect'], "Conjunction")
+        self.assertEqual(records[0]['orb'], 2.0)
+
+    def test_applying_and_separating(self):
+        # Moon 5° behind the Sun and faster: applying to the conjunction
+        applying = find_aspects([100.0, 95.0], speed_a=[1.0, 13.0])
+        self.assertTrue(applying.applying[0, 1])
+        # Moon 5° past the Sun: separating
+        separating = find_aspects([100.0, 105.0], speed_a=[1.0, 13.0])
+        self.assertFalse(separating.applying[0, 1])
+
+    def test_two_sets_and_stack_agree_with_single_chart(self):
+        rng = np.random.default_rng(3)
+        natal = rng.uniform(0, 360, (20, 12))
+        transit = rng.uniform(0, 360, 10)
+        stacked = find_aspects(natal, transit)
+        self.assertEqual(stacked.aspect.shape, (20, 12, 10))
+        for chart in range(20):
+            single = find_aspects(natal[chart], transit)
+            np.testing.assert_array_equal(stacked.aspect[chart], single.aspect)
+
+    def test_minor_aspects_and_planet_orb_factors(self):
+        config = AspectConfig(MAJOR_ASPECTS + MINOR_ASPECTS, planet_orb_factors={'Sun': 1.5})
+        lons = [0.0, 151.0, 230.0, 11.0]
+        records = aspect_records(find_aspects(lons, names_a=NAMES, config=config), NAMES, config=config)
+        found = {(r['planet1'], r['planet2']): r['aspect'] for r in records}
+        self.assertEqual(found[('Sun', 'Moon')], "Quincunx")
+        # 11° exceeds the plain 8° orb but not the Sun's 12°
+        self.assertEqual(found[('Sun', 'Venus')], "Conjunction")
+        self.assertNotIn(('Mercury', 'Venus'), found)
+
+class TestDeclinations(unittest.TestCase):
+    def test_parallels_and_contraparallels(self):
+        matrix = find_parallels([20.0, 20.6, -19.5, 5.0], speed_a=[0.1, -0.2, 0.0, 0.0])
+        records = aspect_records(matrix, NAMES, config=DECLINATION_CONFIG)
+        found = {(r['planet1'], r['planet2']): r for r in records}
+        self.assertEqual(set(found), {('Sun', 'Moon'), ('Sun', 'Mercury')})  # Moon/Mercury are 1.1° apart
+        self.assertEqual(found[('Sun', 'Moon')]['aspect'], "Parallel")
+        self.assertTrue(found[('Sun', 'Moon')]['applying'])
+        self.assertEqual(found[('Sun', 'Mercury')]['aspect'], "Contraparallel")
+        self.assertAlmostEqual(found[('Sun', 'Mercury')]['orb'], 0.5)
+
+    def test_parallel_stack_agrees_with_single_chart(self):
+        stack = np.random.default_rng(5).uniform(-25, 25, (30, 10))
+        stacked = find_parallels(stack)
+        for chart in range(30):
+            np.testing.assert_array_equal(stacked.aspect[chart], find_parallels(stack[chart]).aspect)
+
+    def test_equatorial_coordinates_match_swe(self):
+        jd = 2445123.8930555554
+        planets = calculate_all_planetary_positions(jd)
+        obliquity = swe.calc_ut(jd, swe.ECL_NUT)[0][0]
+        for name, planet_id in PLANET_IDS.items():
+            equatorial = swe.calc_ut(jd, planet_id, swe.FLG_SWIEPH | swe.FLG_SPEED | swe.FLG_EQUATORIAL)[0]
+            self.assertAlmostEqual(planets[name]['rightAscension'], equatorial[0], places=4)
+            self.assertAlmostEqual(planets[name]['declination'], equatorial[1], places=4)
+            self.assertAlmostEqual(planets[name]['declinationSpeed'], equatorial[4], places=4)
+            self.assertEqual(planets[name]['retrograde'], planets[name]['speed'] < 0)
+            self.assertEqual(planets[name]['outOfBounds'], abs(equatorial[1]) > obliquity)
+        self.assertTrue(planets['Mercury']['retrograde'])  # retrograde late May to mid June 1982
+        self.assertFalse(planets['Sun']['retrograde'])
+
+    def test_chart_has_parallels(self):
+        chart = get_astrological_data(2445123.8930555554, 43.7508, -87.7145)
+        pairs = {(p['planet1'], p['planet2'], p['aspect']) for p in chart['parallels']}
+        self.assertIn(('Sun', 'Neptune', 'Contraparallel'), pairs)
+
+if __name__ == '__main__':
+    unittest.main()
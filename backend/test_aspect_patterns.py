@@ -0,0 +1,89 @@
+import unittest
+import os
+import sys
+import itertools
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import numpy as np
+
+from aspect_engine import find_aspects
+from aspect_patterns import PATTERN_CONFIG, PATTERNS, find_patterns, pattern_counts, pattern_frequencies
+from astrology_core import get_astrological_data
+
+NAMES = [f"P{i}" for i in range(10)]
+
+def brute_force_counts(longitudes):
+    """Counts three-point patterns by testing every triple of planets."""
+    aspect = find_aspects(longitudes, config=PATTERN_CONFIG).aspect
+    def between(i, j):
+        index = aspect[min(i, j), max(i, j)]
+        return PATTERN_CONFIG.names[index] if index >= 0 else None
+
+    counts = {"Grand Trine": 0, "T-Square": 0, "Yod": 0}
+    for a, b, c in itertools.combinations(range(len(longitudes)), 3):
+        if between(a, b) == between(b, c) == between(a, c) == "Trine":
+            counts["Grand Trine"] += 1
+        for x, y, apex in ((a, b, c), (a, c, b), (b, c, a)):
+            if between(x, y) == "Opposition" and between(x, apex) == between(y, apex) == "Square":
+                counts["T-Square"] += 1
+            if between(x, y) == "Sextile" and between(x, apex) == between(y, apex) == "Quincunx":
+                counts["Yod"] += 1
+    return counts
+
+def patterns_by_name(longitudes, names=NAMES):
+    found = find_patterns(longitudes, names)
+    return {pattern: [p for p in found if p['pattern'] == pattern] for pattern in PATTERNS}
+
+class TestAspectPatterns(unittest.TestCase):
+    def test_grand_trine_and_kite(self):
+        found = patterns_by_name([0.0, 120.0, 240.0, 180.0, 45.0], ['A', 'B', 'C', 'D', 'E'])
+        self.assertEqual([p['planets'] for p in found['Grand Trine']], [['A', 'B', 'C']])
+        self.assertEqual(len(found['Kite']), 1)
+        self.assertEqual(found['Kite'][0]['apex'], 'A')
+        self.assertEqual(found['Kite'][0]['planets'][-1], 'D')
+
+    def test_grand_cross_contains_four_t_squares(self):
+        found = patterns_by_name([10.0, 100.0, 190.0, 280.0], ['A', 'B', 'C', 'D'])
+        self.assertEqual(len(found['Grand Cross']), 1)
+        self.assertEqual(len(found['T-Square']), 4)
+
+    def test_yod(self):
+        found = patterns_by_name([0.0, 60.0, 210.0], ['A', 'B', 'C'])
+        self.assertEqual(found['Yod'], [{"pattern": "Yod", "planets": ['A', 'B', 'C'], "apex": 'C'}])
+
+    def test_mystic_rectangle(self):
+        found = patterns_by_name([0.0, 60.0, 180.0, 240.0], ['A', 'B', 'C', 'D'])
+        self.assertEqual(len(found['Mystic Rectangle']), 1)
+
+    def test_matches_brute_force(self):
+        rng = np.random.default_rng(11)
+        # Clustered near multiples of 30° so that patterns are common
+        stack = (rng.integers(0, 12, (200, 10)) * 30.0 + rng.normal(0, 3, (200, 10))) % 360.0
+        for longitudes in stack:
+            found = patterns_by_name(longitudes)
+            for pattern, count in brute_force_counts(longitudes).items():
+                self.assertEqual(len(found[pattern]), count)
+
+    def test_stack_counts_match_single_chart(self):
+        rng = np.random.default_rng(12)
+        stack = (rng.integers(0, 12, (300, 10)) * 30.0 + rng.normal(0, 3, (300, 10))) % 360.0
+        counts = pattern_counts(stack, NAMES, chunk=64)
+        for row, longitudes in enumerate(stack):
+            found = patterns_by_name(longitudes)
+            for pattern in PATTERNS:
+                self.assertEqual(int(counts[pattern][row]), len(found[pattern]))
+
+    def test_frequencies(self):
+        stack = np.random.default_rng(13).uniform(0, 360, (2000, 10))
+        frequencies = pattern_frequencies(stack)
+        self.assertEqual(set(frequencies), set(PATTERNS))
+        self.assertGreater(frequencies['T-Square'], frequencies['Grand Cross'])
+
+    def test_chart_has_patterns(self):
+        chart = get_astrological_data(2445123.8930555554, 43.7508, -87.7145)
+        names = list(chart['planets'])
+        expected = find_patterns([chart['planets'][name]['longitude'] for name in names], names)
+        self.assertEqual(chart['patterns'], expected)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,104 @@
+import unittest
+import os
+import sys
+import json
+import sqlite3
+import tempfile
+from datetime import date
+from unittest import mock
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import numpy as np
+
+import astro_weather
+from aspect_engine import find_aspects, AspectConfig, Aspect, MAJOR_ASPECTS
+
+DAY = date(2026, 10, 18)
+
+class TestAstroWeather(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.store = os.path.join(self.tmp.name, 'store')
+        os.makedirs(self.store)
+        rng = np.random.default_rng(11)
+        np.save(os.path.join(self.store, 'natal_longitudes.npy'), rng.uniform(0, 360, (250, 12)))
+        with open(os.path.join(self.store, 'user_ids.txt'), 'w') as f:
+            f.write('\n'.join(f"user-{i}" for i in range(250)) + '\n')
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def read_jsonl(self, path):
+        with open(path) as f:
+            return [json.loads(line) for line in f]
+
+    def test_chunk_matches_per_user_evaluation(self):
+        store = astro_weather.NatalStore(self.store)
+        sky, speeds = astro_weather.compute_sky(DAY)
+        config = AspectConfig([Aspect(a.name, a.angle, 2.0) for a in MAJOR_ASPECTS])
+        results = astro_weather.evaluate_chunk(np.asarray(store.longitudes[:40]), sky, speeds, config)
+        for row in range(40):
+            single = find_aspects(store.longitudes[row], sky, config=config)
+            self.assertEqual(len(results[row]), int((single.aspect >= 0).sum()))
+
+    def test_interrupted_run_resumes_to_identical_output(self):
+        reference = os.path.join(self.tmp.name, 'reference.jsonl')
+        astro_weather.run_daily_pipeline(self.store, DAY, reference, chunk_size=60, progress=False)
+
+        output = os.path.join(self.tmp.name, 'weather.jsonl')
+        original = astro_weather.evaluate_chunk
+        calls = []
+        def failing(*args):
+            calls.append(1)
+            if len(calls) == 3:
+                raise KeyboardInterrupt
+            return original(*args)
+        with mock.patch.object(astro_weather, 'evaluate_chunk', failing):
+            with self.assertRaises(KeyboardInterrupt):
+                astro_weather.run_daily_pipeline(self.store, DAY, output, chunk_size=60, progress=False)
+        self.assertTrue(os.path.exists(output + '.progress.json'))
+
+        summary = astro_weather.run_daily_pipeline(self.store, DAY, output, chunk_size=60, progress=False)
+        self.assertEqual(summary['resumedFromChunk'], 2)
+        self.assertEqual(self.read_jsonl(output), self.read_jsonl(reference))
+        self.assertFalse(os.path.exists(output + '.progress.json'))
+
+    def test_sqlite_output_matches_jsonl(self):
+        jsonl = os.path.join(self.tmp.name, 'weather.jsonl')
+        db = os.path.join(self.tmp.name, 'weather.db')
+        astro_weather.run_daily_pipeline(self.store, DAY, jsonl, chunk_size=100, progress=False)
+        astro_weather.run_daily_pipeline(self.store, DAY, db, chunk_size=100, progress=False)
+        expected = sum(len(row['aspects']) for row in self.read_jsonl(jsonl))
+        count = sqlite3.connect(db).execute("SELECT COUNT(*) FROM astro_weather").fetchone()[0]
+        self.assertEqual(count, expected)
+
+    def test_sqlite_rerun_keeps_other_stores_rows(self):
+        db = os.path.join(self.tmp.name, 'weather.db')
+        other = os.path.join(self.tmp.name, 'other')
+        os.makedirs(other)
+        np.save(os.path.join(other, 'natal_longitudes.npy'), np.load(os.path.join(self.store, 'natal_longitudes.npy')))
+        with open(os.path.join(other, 'user_ids.txt'), 'w') as f:
+            f.write('\n'.join(f"other-{i}" for i in range(250)) + '\n')
+
+        astro_weather.run_daily_pipeline(self.store, DAY, db, chunk_size=100, progress=False)
+        astro_weather.run_daily_pipeline(other, DAY, db, chunk_size=100, progress=False)
+        astro_weather.run_daily_pipeline(self.store, DAY, db, chunk_size=100, progress=False)
+        counts = dict(sqlite3.connect(db).execute(
+            "SELECT substr(user_id, 1, 5), COUNT(*) FROM astro_weather GROUP BY 1"
+        ).fetchall())
+        self.assertEqual(counts['other'], counts['user-'])
+
+    def test_build_store_skips_invalid_subscribers(self):
+        subscribers = os.path.join(self.tmp.name, 'subscribers.jsonl')
+        birth = {"birthDate": "1990-01-15", "birthTime": "14:30", "latitude": 40.7128, "longitude": -74.006}
+        with open(subscribers, 'w') as f:
+            for record in (dict(birth, user_id="a"), dict(birth, user_id="b", latitude=95),
+                           dict(birth, user_id="c", longitude="NaN"), dict(birth, user_id="d", longitude=285.994)):
+                f.write(json.dumps(record) + '\n')
+        store_path = os.path.join(self.tmp.name, 'built')
+        self.assertEqual(astro_weather.build_natal_store(subscribers, store_path), {"stored": 2, "skipped": 2})
+        store = astro_weather.NatalStore(store_path)
+        np.testing.assert_allclose(store.longitudes[0], store.longitudes[1])
+
+if __name__ == '__main__':
+    unittest.main()
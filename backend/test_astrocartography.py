@@ -0,0 +1,72 @@
+import unittest
+import os
+import sys
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import numpy as np
+import swisseph as swe
+
+from astrocartography import (
+    PLANET_IDS, angle_field, astrocartography_map, ecliptic_to_equatorial, planet_lines, sky_frame
+)
+
+JD = 2445123.8930555554
+
+def horizon(jd, name, lat, lon):
+    """Azimuth (from south, westward) and true altitude of a planet, via Swiss Ephemeris."""
+    position = swe.calc_ut(jd, PLANET_IDS[name])[0]
+    azimuth, altitude, _ = swe.azalt(jd, swe.ECL2HOR, (lon, lat, 0), 0, 0, position[:3])
+    return azimuth, altitude
+
+class TestAstrocartography(unittest.TestCase):
+    def test_angle_field_matches_swe_houses(self):
+        lats = np.array([-50.0, -10.0, 0.0, 35.0, 60.0])
+        lons = np.array([-170.0, -87.7, 0.0, 45.0, 139.7])
+        field = angle_field(JD, lats, lons)
+        for row, lat in enumerate(lats):
+            for col, lon in enumerate(lons):
+                ascmc = swe.houses(JD, lat, lon, b'P')[1]
+                self.assertAlmostEqual(field['ascendant'][row, col], ascmc[0], places=8)
+                self.assertAlmostEqual(field['midheaven'][col], ascmc[1], places=8)
+
+    def test_equatorial_conversion_matches_swe(self):
+        _, obliquity = sky_frame(JD)
+        for planet_id in (swe.SUN, swe.MOON, swe.PLUTO):
+            ecliptic = swe.calc_ut(JD, planet_id)[0]
+            equatorial = swe.calc_ut(JD, planet_id, swe.FLG_SWIEPH | swe.FLG_EQUATORIAL)[0]
+            ra, dec = ecliptic_to_equatorial(ecliptic[0], ecliptic[1], obliquity)
+            self.assertAlmostEqual(float(ra), equatorial[0], places=8)
+            self.assertAlmostEqual(float(dec), equatorial[1], places=8)
+
+    def test_planets_are_on_the_horizon_along_asc_and_dsc_lines(self):
+        result = planet_lines(JD, np.arange(-60.0, 61.0, 15.0), ['Sun', 'Moon', 'Venus'])
+        for name, line in result['lines'].items():
+            for lat, asc, dsc in zip(result['latitudes'], line['ASC'], line['DSC']):
+                asc_azimuth, asc_altitude = horizon(JD, name, lat, asc)
+                dsc_azimuth, dsc_altitude = horizon(JD, name, lat, dsc)
+                self.assertAlmostEqual(asc_altitude, 0.0, places=4)
+                self.assertAlmostEqual(dsc_altitude, 0.0, places=4)
+                self.assertGreater(asc_azimuth, 180.0)  # rising in the east
+                self.assertLess(dsc_azimuth, 180.0)     # setting in the west
+
+    def test_planets_culminate_on_mc_line(self):
+        result = planet_lines(JD, [0.0])
+        for name, line in result['lines'].items():
+            azimuth, altitude = horizon(JD, name, 0.0, line['MC'])
+            self.assertAlmostEqual(abs((azimuth + 90.0) % 180.0 - 90.0), 0.0, places=4)
+            self.assertGreater(altitude, 0.0)
+
+    def test_circumpolar_latitudes_have_no_rising_line(self):
+        result = planet_lines(JD, [-80.0, 0.0, 80.0], ['Sun'])  # Sun near +22° declination
+        asc = result['lines']['Sun']['ASC']
+        self.assertTrue(np.isnan(asc[0]) and np.isnan(asc[2]))
+        self.assertFalse(np.isnan(asc[1]))
+
+    def test_map_payload_is_json_friendly(self):
+        payload = astrocartography_map(JD, line_step=10.0, field_step=20.0)
+        self.assertEqual(len(payload['latitudes']), len(payload['lines']['Sun']['ASC']))
+        self.assertIn(None, payload['lines']['Sun']['ASC'])
+        self.assertEqual(len(payload['field']['ascendant']), len(payload['field']['latitudes']))
+
+if __name__ == '__main__':
+    unittest.main()
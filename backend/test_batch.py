@@ -0,0 +1,69 @@
+import unittest
+import os
+import sys
+from unittest import mock
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import batch
+from app import app
+from astrology_core import ephe_path_exists
+
+SHEBOYGAN = {
+    "birthDate": "1982-06-03",
+    "birthTime": "04:26",
+    "latitude": 43.7508,
+    "longitude": -87.7145
+}
+
+@unittest.skipUnless(ephe_path_exists(), "Ephemeris data not installed")
+class TestBatchEndpoint(unittest.TestCase):
+    def setUp(self):
+        self.app = app.test_client()
+        self.app.testing = True
+
+    def test_results_keep_input_order_and_errors(self):
+        """Bad records report an error without failing their neighbours."""
+        records = [
+            dict(SHEBOYGAN, id="a"),
+            {"birthDate": "1982-06-03", "latitude": 43.7508, "longitude": -87.7145},
+            dict(SHEBOYGAN, birthDate="1990-01-15", id="c"),
+        ]
+        response = self.app.post('/api/cosmic-signature/batch', json={"records": records})
+        self.assertEqual(response.status_code, 200)
+
+        body = response.get_json()
+        self.assertEqual(body['count'], 3)
+        self.assertEqual(body['failed'], 1)
+        self.assertEqual([r['index'] for r in body['results']], [0, 1, 2])
+        self.assertEqual(body['results'][0]['id'], "a")
+        self.assertEqual(body['results'][0]['data']['sunSign'], "Gemini")
+        self.assertIn('error', body['results'][1])
+        self.assertEqual(body['results'][2]['data']['sunSign'], "Capricorn")
+
+    def test_matches_single_chart_endpoint(self):
+        """A batch entry is identical to the single-chart response."""
+        single = self.app.post('/api/cosmic-signature', json=SHEBOYGAN).get_json()
+        body = self.app.post('/api/cosmic-signature/batch', json=[SHEBOYGAN]).get_json()
+        self.assertEqual(body['results'][0]['data'], single)
+
+    def test_rejects_empty_and_oversized_batches(self):
+        self.assertEqual(self.app.post('/api/cosmic-signature/batch', json=[]).status_code, 400)
+        oversized = [SHEBOYGAN] * (batch.MAX_BATCH_RECORDS + 1)
+        self.assertEqual(self.app.post('/api/cosmic-signature/batch', json=oversized).status_code, 413)
+
+@unittest.skipUnless(ephe_path_exists(), "Ephemeris data not installed")
+class TestComputeCharts(unittest.TestCase):
+    def tearDown(self):
+        batch.shutdown_pool()
+
+    def test_pool_path_preserves_order(self):
+        """Batches above the inline threshold go through the process pool."""
+        tasks = [(2445123.89 + day, 43.75, -87.71) for day in range(batch.INLINE_THRESHOLD * 2)]
+        with mock.patch.object(batch, 'BATCH_WORKERS', 2):
+            results = batch.compute_charts(tasks)
+        self.assertIsNotNone(batch._pool)
+        inline = [batch._compute_chart(task) for task in tasks]
+        self.assertEqual(results, inline)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,49 @@
+import unittest
+import os
+import sys
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import astrology_core
+from benchmark import compare_results, generate_corpus, run_benchmarks, summarize
+
+class TestBenchmark(unittest.TestCase):
+    def test_corpus_is_deterministic_and_spans_range(self):
+        corpus = generate_corpus(2000, seed=3)
+        self.assertEqual(corpus, generate_corpus(2000, seed=3))
+        self.assertNotEqual(corpus, generate_corpus(2000, seed=4))
+
+        years = [int(record['birthDate'][:4]) for record in corpus]
+        self.assertGreaterEqual(min(years), 1800)
+        self.assertLessEqual(max(years), 2400)
+        self.assertGreater(max(years) - min(years), 550)
+        latitudes = [record['latitude'] for record in corpus]
+        self.assertLess(min(latitudes), -60)
+        self.assertGreater(max(latitudes), 60)
+
+    def test_summarize(self):
+        result = summarize([0.001] * 99 + [0.002], errors=2)
+        self.assertEqual(result['calls'], 100)
+        self.assertEqual(result['errors'], 2)
+        self.assertAlmostEqual(result['p50Us'], 1000.0)
+        self.assertAlmostEqual(result['maxUs'], 2000.0)
+        self.assertAlmostEqual(result['opsPerSec'], 990.1, places=1)
+
+    def test_compare_flags_regressions(self):
+        baseline = {"benchmarks": {"positions": {"p50Us": 100.0}, "houses": {"p50Us": 20.0}}}
+        current = {"benchmarks": {"positions": {"p50Us": 110.0}, "houses": {"p50Us": 30.0}, "endpoint": {"p50Us": 1.0}}}
+        rows = {row['name']: row for row in compare_results(baseline, current, threshold=0.15)}
+        self.assertEqual(set(rows), {"positions", "houses"})
+        self.assertFalse(rows['positions']['regressed'])
+        self.assertTrue(rows['houses']['regressed'])
+
+    def test_run_restores_cache(self):
+        cache = astrology_core.get_chart_cache()
+        results = run_benchmarks(charts=30, only=['positions', 'aspects'], rounds=1)
+        self.assertIs(astrology_core.get_chart_cache(), cache)
+        self.assertEqual(set(results['benchmarks']), {'positions', 'aspects'})
+        self.assertEqual(results['benchmarks']['positions']['calls'], 30)
+        with self.assertRaises(ValueError):
+            run_benchmarks(charts=5, only=['nonsense'])
+
+if __name__ == '__main__':
+    unittest.main()
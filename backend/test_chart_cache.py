@@ -0,0 +1,97 @@
+import unittest
+import os
+import sys
+import tempfile
+from unittest import mock
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import astrology_core
+import chart_cache
+from astrology_core import ephe_path_exists, get_astrological_data
+from chart_cache import LRUCache, LayeredChartCache, SQLiteCacheBackend
+
+JD_TEST = 2445123.8930555554
+
+class TestLRUCache(unittest.TestCase):
+    def test_evicts_least_recently_used(self):
+        cache = LRUCache(maxsize=2)
+        cache.put('a', 1)
+        cache.put('b', 2)
+        cache.get('a')
+        cache.put('c', 3)
+        self.assertEqual(cache.get('a'), 1)
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual(cache.stats()['evictions'], 1)
+        self.assertEqual(cache.stats()['hits'], 2)
+        self.assertEqual(cache.stats()['misses'], 1)
+
+class TestSQLiteBackend(unittest.TestCase):
+    def test_values_are_shared_between_instances(self):
+        """A second instance (e.g. another worker) sees the first one's writes."""
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'cache.db')
+            SQLiteCacheBackend(path).put('planets', '1.5', {"x": [1, 2]})
+            self.assertEqual(SQLiteCacheBackend(path).get('planets', '1.5'), {"x": [1, 2]})
+
+    def test_eviction_keeps_recently_read_rows(self):
+        with tempfile.TemporaryDirectory() as tmp, \
+                mock.patch.object(chart_cache, 'DISK_EVICTION_INTERVAL', 4):
+            store = SQLiteCacheBackend(os.path.join(tmp, 'cache.db'), max_entries=3)
+            for key in "abc":
+                store.put('planets', key, key)
+            store.get('planets', 'a')
+            store.put('planets', 'd', 'd')
+            self.assertEqual(store.get('planets', 'a'), 'a')
+            self.assertIsNone(store.get('planets', 'b'))
+
+    def test_hits_are_written_in_batches(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            store = SQLiteCacheBackend(os.path.join(tmp, 'cache.db'))
+            keys = [str(i) for i in range(chart_cache.DISK_TOUCH_BATCH)]
+            for key in keys:
+                store.put('planets', key, key)
+            newest = "SELECT MAX(accessed) FROM chart_cache"
+            written = store._connect().execute(newest).fetchone()[0]
+            for key in keys[:-1]:
+                store.get('planets', key)
+            self.assertEqual(store._connect().execute(newest).fetchone()[0], written)
+            store.get('planets', keys[-1])
+            self.assertGreater(store._connect().execute(newest).fetchone()[0], written)
+
+@unittest.skipUnless(ephe_path_exists(), "Ephemeris data not installed")
+class TestLayeredChartCache(unittest.TestCase):
+    def setUp(self):
+        self.previous = astrology_core.get_chart_cache()
+        self.cache = LayeredChartCache(planet_size=8, house_size=8)
+        astrology_core.configure_chart_cache(self.cache)
+
+    def tearDown(self):
+        astrology_core.configure_chart_cache(self.previous)
+
+    def test_location_change_reuses_planet_layer(self):
+        first = get_astrological_data(JD_TEST, 43.7508, -87.7145)
+        second = get_astrological_data(JD_TEST, 51.5074, -0.1278)
+        stats = self.cache.stats()
+        self.assertEqual(stats['planets']['hits'], 1)
+        self.assertEqual(stats['houses']['misses'], 2)
+        self.assertEqual(first['planets'], second['planets'])
+        self.assertNotEqual(first['ascendant'], second['ascendant'])
+
+    def test_cached_chart_matches_uncached(self):
+        cached_miss = get_astrological_data(JD_TEST, 43.7508, -87.7145)
+        cached_hit = get_astrological_data(JD_TEST, 43.7508, -87.7145)
+        astrology_core.configure_chart_cache(None)
+        uncached = get_astrological_data(JD_TEST, 43.7508, -87.7145)
+        self.assertEqual(cached_miss, uncached)
+        self.assertEqual(cached_hit, uncached)
+
+    def test_callers_cannot_corrupt_cache(self):
+        chart = get_astrological_data(JD_TEST, 43.7508, -87.7145)
+        chart['planets']['Sun']['sign'] = "Tampered"
+        chart['ascendant'] = "Tampered"
+        again = get_astrological_data(JD_TEST, 43.7508, -87.7145)
+        self.assertEqual(again['planets']['Sun']['sign'], "Gemini")
+        self.assertEqual(again['ascendant']['sign'], "Taurus")
+
+if __name__ == '__main__':
+    unittest.main()
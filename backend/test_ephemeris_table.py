@@ -0,0 +1,68 @@
+import unittest
+import os
+import sys
+import tempfile
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import numpy as np
+import swisseph as swe
+
+import astrology_core
+from ephemeris_table import EphemerisTable, build_table, measure_error
+
+JD_TEST = 2445123.8930555554
+
+class TestEphemerisTable(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.tmp = tempfile.TemporaryDirectory()
+        build_table(cls.tmp.name, start_year=1982, end_year=1983, verify_samples=200)
+        cls.table = EphemerisTable(cls.tmp.name, max_error=float('inf'))
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.tmp.cleanup()
+
+    def test_scalar_lookup_matches_calc_ut(self):
+        for name in ('Sun', 'Moon', 'Mercury', 'Pluto'):
+            interpolated = self.table.position(name, JD_TEST)
+            exact = swe.calc_ut(JD_TEST, getattr(swe, name.upper()))[0]
+            self.assertLess(abs((interpolated[0] - exact[0] + 180) % 360 - 180), 1e-3)
+            self.assertAlmostEqual(interpolated[1], exact[1], places=3)
+            self.assertAlmostEqual(interpolated[3], exact[3], places=3)
+
+    def test_vector_lookup_matches_scalar(self):
+        jds = JD_TEST + np.linspace(0, 150, 50)
+        vector = self.table.positions(jds, ['Moon'])['Moon']
+        scalar = np.array([self.table.position('Moon', jd) for jd in jds])
+        np.testing.assert_allclose(vector, scalar, atol=1e-9)
+
+    def test_measured_error_within_bound(self):
+        errors = measure_error(self.table, 'Moon', JD_TEST + np.linspace(0, 150, 100))
+        self.assertLess(errors['max_lon_error_deg'], 1e-3)
+
+    def test_error_bound_and_range_gate_lookups(self):
+        strict = EphemerisTable(self.tmp.name, max_error=0.0)
+        self.assertFalse(strict.covers('Moon', JD_TEST))
+        self.assertTrue(self.table.covers('Moon', JD_TEST))
+        self.assertFalse(self.table.covers('Moon', JD_TEST + 1000))
+        with self.assertRaises(ValueError):
+            self.table.positions([JD_TEST + 1000])
+
+    def test_core_uses_table_with_same_signs(self):
+        previous = astrology_core.get_ephemeris_table()
+        try:
+            astrology_core.configure_ephemeris_table(None)
+            exact = astrology_core.calculate_all_planetary_positions(JD_TEST)
+            astrology_core.configure_ephemeris_table(self.table)
+            interpolated = astrology_core.calculate_all_planetary_positions(JD_TEST)
+            many = astrology_core.calculate_planetary_positions_many([JD_TEST, JD_TEST + 1])
+        finally:
+            astrology_core.configure_ephemeris_table(previous)
+        for name in exact:
+            self.assertEqual(exact[name]['sign'], interpolated[name]['sign'])
+            self.assertAlmostEqual(exact[name]['longitude'], interpolated[name]['longitude'], places=3)
+            self.assertAlmostEqual(many[name][0, 0], interpolated[name]['longitude'], places=6)
+
+if __name__ == '__main__':
+    unittest.main()
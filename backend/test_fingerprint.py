@@ -0,0 +1,111 @@
+import unittest
+import os
+import sys
+from unittest import mock
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import app as app_module
+from app import app
+from fingerprint import canonical_birth, canonical_query, chart_fingerprint, engine_version, representation_etag
+from response_format import COMPACT_JSON, ResponseFormat
+
+CANONICAL_URL = '/api/cosmic-signature?birthDate=1990-01-15&birthTime=14:30&latitude=40.7128&longitude=-74.0060'
+
+class TestCanonicalInputs(unittest.TestCase):
+    def test_spellings_of_one_birth_agree(self):
+        expected = {"birthDate": "1990-01-15", "birthTime": "14:30", "latitude": "40.7128", "longitude": "-74.0060"}
+        self.assertEqual(canonical_birth("1990-1-15", "14:30:00", "40.71280", -74.006), expected)
+        self.assertEqual(canonical_birth(" 1990-01-15", "14:30", 40.712801, 285.994), expected)
+        self.assertEqual(canonical_birth("2000-01-01", "0:05", -0.00001, 180)["longitude"], "-180.0000")
+        self.assertEqual(canonical_birth("2000-01-01", "0:05", -0.00001, 0)["latitude"], "0.0000")
+
+    def test_invalid_inputs(self):
+        for args in (("1990-02-30", "14:30", 0, 0), ("1990-01-15", "14:30:15", 0, 0),
+                     ("1990-01-15", "24:00", 0, 0), ("1990-01-15", "14:30", 91, 0),
+                     ("1990-01-15", "14:30", "north", 0), (None, "14:30", 0, 0)):
+            with self.assertRaises(ValueError):
+                canonical_birth(*args)
+
+    def test_fingerprints_follow_inputs_and_engine(self):
+        canonical = canonical_birth("1990-01-15", "14:30", 40.7128, -74.006)
+        base = chart_fingerprint(canonical, "v1")
+        self.assertEqual(base, chart_fingerprint(dict(canonical), "v1"))
+        self.assertNotEqual(base, chart_fingerprint(canonical, "v2"))
+        self.assertNotEqual(base, chart_fingerprint(canonical, "v1", include_harmonics=True))
+        self.assertNotEqual(base, chart_fingerprint(dict(canonical, birthTime="14:31"), "v1"))
+
+        rarity = mock.Mock(meta={"version": 1, "samples": 1000})
+        self.assertNotEqual(engine_version(), engine_version(rarity_index=rarity))
+        self.assertNotEqual(representation_etag(base, ResponseFormat()),
+                            representation_etag(base, ResponseFormat(mimetype=COMPACT_JSON)))
+
+    def test_canonical_query_omits_defaults(self):
+        canonical = canonical_birth("1990-01-15", "14:30", 40.7128, -74.006)
+        self.assertEqual([name for name, _ in canonical_query(canonical)],
+                         ["birthDate", "birthTime", "latitude", "longitude"])
+        query = canonical_query(canonical, True, ResponseFormat(fields=("planets",), precision=3))
+        self.assertEqual(query[4:], [("harmonics", "1"), ("fields", "planets"), ("precision", "3")])
+
+class TestCacheableEndpoint(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.client = app.test_client()
+
+    def test_redirects_to_canonical_url(self):
+        response = self.client.get('/api/cosmic-signature?latitude=40.71280&longitude=-74.006'
+                                   '&birthDate=1990-1-15&birthTime=14:30:00&utm_source=share')
+        self.assertEqual(response.status_code, 301)
+        self.assertTrue(response.headers['Location'].endswith(CANONICAL_URL))
+
+    def test_fields_have_one_canonical_spelling(self):
+        canonical = self.client.get(CANONICAL_URL + "&fields=planets,aspects")
+        self.assertEqual(canonical.status_code, 200)
+        for fields in ("aspects,planets", "planets,planets,aspects", "planets,aspects,"):
+            response = self.client.get(f"{CANONICAL_URL}&fields={fields}")
+            self.assertEqual(response.status_code, 301)
+            self.assertTrue(response.headers['Location'].endswith(CANONICAL_URL + "&fields=planets,aspects"))
+
+    def test_etag_and_cache_headers(self):
+        response = self.client.get(CANONICAL_URL)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.headers['ETag'].startswith('"'))
+        self.assertIn('max-age=', response.headers['Cache-Control'])
+        self.assertIn('Accept', response.headers['Vary'])
+        post = self.client.post('/api/cosmic-signature', json={
+            "birthDate": "1990-01-15", "birthTime": "14:30", "latitude": 40.7128, "longitude": -74.006
+        })
+        self.assertEqual(response.get_json()['planets'], post.get_json()['planets'])
+
+        again = self.client.get(CANONICAL_URL)
+        self.assertEqual(again.headers['ETag'], response.headers['ETag'])
+        compact = self.client.get(CANONICAL_URL, headers={"Accept": COMPACT_JSON})
+        self.assertNotEqual(compact.headers['ETag'], response.headers['ETag'])
+
+    def test_not_modified_skips_chart_work(self):
+        etag = self.client.get(CANONICAL_URL).headers['ETag']
+        with mock.patch.object(app_module, 'compute_chart_response', side_effect=AssertionError("computed")), \
+                mock.patch.object(app_module, 'get_timezone_from_coordinates', side_effect=AssertionError("resolved")):
+            response = self.client.get(CANONICAL_URL, headers={"If-None-Match": f'"other", {etag}'})
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.headers['ETag'], etag)
+        self.assertEqual(response.data, b'')
+        self.assertEqual(self.client.get(CANONICAL_URL, headers={"If-None-Match": '"other"'}).status_code, 200)
+
+    def test_invalid_query(self):
+        response = self.client.get('/api/cosmic-signature?birthDate=1990-01-15&birthTime=14:30&latitude=95&longitude=0')
+        self.assertEqual(response.status_code, 400)
+
+    def test_post_and_batch_validate_coordinates_like_get(self):
+        for latitude, longitude in ((95, 0), ("NaN", 0), (0, "inf")):
+            record = {"birthDate": "1990-01-15", "birthTime": "14:30", "latitude": latitude, "longitude": longitude}
+            self.assertEqual(self.client.post('/api/cosmic-signature', json=record).status_code, 400)
+            body = self.client.post('/api/cosmic-signature/batch', json=[record]).get_json()
+            self.assertRegex(body['results'][0]['error'], "latitude|longitude")
+
+    def test_malformed_dates_are_rejected(self):
+        for birth_date in ("+1982-06-03", "1_982-06-03", " 1982-06-03"):
+            record = {"birthDate": birth_date, "birthTime": "04:26", "latitude": 43.75, "longitude": -87.71}
+            self.assertEqual(self.client.post('/api/cosmic-signature', json=record).status_code, 400)
+
+if __name__ == '__main__':
+    unittest.main()
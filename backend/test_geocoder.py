@@ -0,0 +1,160 @@
+import unittest
+import os
+import sys
+import tempfile
+from unittest import mock
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import app as app_module
+from app import app
+from geocoder import Geocoder, build_index, fold, load_geocoder
+
+GAZETTEER = """name,alternatenames,country_code,country,admin1_code,admin1,latitude,longitude,population,timezone
+Paris,,FR,France,IDF,Île-de-France,48.8566,2.3522,2165423,Europe/Paris
+Paris,,US,United States,TX,Texas,33.6609,-95.5555,24476,America/Chicago
+Parma,,IT,Italy,EMR,Emilia-Romagna,44.8015,10.3279,198292,Europe/Rome
+Zürich,Zurich,CH,Switzerland,ZH,Zurich,47.3769,8.5417,421878,Europe/Zurich
+Portland,,US,United States,OR,Oregon,45.5152,-122.6784,652503,
+Portland,,US,United States,ME,Maine,43.6591,-70.2568,68408,
+Winston-Salem,,US,United States,NC,North Carolina,36.0999,-80.2442,249545,America/New_York
+"""
+
+# GeoNames rows: id, name, asciiname, alternatenames, lat, lon, class, code, country, cc2, admin1..4, population, elevation, dem, timezone, modified
+GEONAMES = "\t".join(["2988507", "Paris", "Paris", "Lutece,Paname", "48.85341", "2.3488", "P", "PPLC", "FR", "",
+                      "11", "75", "751", "75056", "2138551", "", "42", "Europe/Paris", "2024-01-01"]) + "\n"
+
+class TestGeocoder(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.tmp = tempfile.TemporaryDirectory()
+        source = os.path.join(cls.tmp.name, 'gazetteer.csv')
+        with open(source, 'w', encoding='utf-8') as f:
+            f.write(GAZETTEER)
+        cls.path = os.path.join(cls.tmp.name, 'index')
+        build_index(cls.path, source)
+        cls.geocoder = Geocoder(cls.path)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.tmp.cleanup()
+
+    def test_fold(self):
+        self.assertEqual(fold("Zürich"), "zurich")
+        self.assertEqual(fold("  St. John's "), "st johns")
+        self.assertEqual(fold("Winston-Salem"), "winston salem")
+        self.assertEqual(fold("Łódź"), "lodz")
+        self.assertEqual(fold("Straße"), "strasse")
+
+    def test_prefix_search_ranks_by_population(self):
+        self.assertEqual([r['label'] for r in self.geocoder.search("par")],
+                         ["Paris, Île-de-France, France", "Parma, Emilia-Romagna, Italy", "Paris, Texas, United States"])
+        self.assertEqual(self.geocoder.search("par", limit=1)[0]['countryCode'], "FR")
+        self.assertEqual(self.geocoder.search("nowhere"), [])
+        self.assertEqual(self.geocoder.search(" , "), [])
+
+    def test_exact_names_come_first(self):
+        labels = [r['label'] for r in self.geocoder.search("paris")]
+        self.assertEqual(labels, ["Paris, Île-de-France, France", "Paris, Texas, United States"])
+
+    def test_diacritics_and_punctuation(self):
+        self.assertEqual(self.geocoder.search("ZURI")[0]['name'], "Zürich")
+        self.assertEqual(len(self.geocoder.search("zurich")), 1)
+        self.assertEqual(self.geocoder.search("winston sa")[0]['name'], "Winston-Salem")
+
+    def test_qualifiers(self):
+        self.assertEqual([r['admin1'] for r in self.geocoder.search("portland, me")], ["Maine"])
+        self.assertEqual([r['admin1'] for r in self.geocoder.search("portland, oreg")], ["Oregon"])
+        self.assertEqual([r['country'] for r in self.geocoder.search("paris, united")], ["United States"])
+        self.assertEqual(self.geocoder.search("paris, de"), [])
+
+    def test_timezones_are_precomputed(self):
+        maine = self.geocoder.search("portland, maine")[0]
+        self.assertEqual(maine['timezone'], "America/New_York")
+        self.assertEqual(self.geocoder.search("portland, or")[0]['timezone'], "America/Los_Angeles")
+        self.assertEqual(self.geocoder.timezone_at(43.6591, -70.2568), "America/New_York")
+        self.assertEqual(self.geocoder.timezone_at(43.65914, -70.25679), "America/New_York")
+        self.assertIsNone(self.geocoder.timezone_at(43.7, -70.3))
+
+    def test_place_ids_are_stable(self):
+        place = self.geocoder.search("parma")[0]
+        self.assertEqual(self.geocoder.place(place['placeId']), place)
+        self.assertEqual(self.geocoder.place(str(place['placeId'])), place)
+        self.assertIsNone(self.geocoder.place("nope"))
+        self.assertIsNone(self.geocoder.place(-1))
+
+        with tempfile.TemporaryDirectory() as other:
+            source = os.path.join(other, 'gazetteer.csv')
+            with open(source, 'w', encoding='utf-8') as f:
+                f.write(GAZETTEER.replace("198292", "9"))
+            build_index(other, source)
+            self.assertEqual(Geocoder(other).place(place['placeId'])['name'], "Parma")
+
+    def test_geonames_source(self):
+        with tempfile.TemporaryDirectory() as other:
+            source = os.path.join(other, 'cities15000.txt')
+            with open(source, 'w', encoding='utf-8') as f:
+                f.write(GEONAMES)
+            build_index(other, geonames=source)
+            geocoder = Geocoder(other)
+            self.assertEqual(geocoder.search("lutece")[0]['placeId'], 2988507)
+            self.assertEqual(geocoder.place(2988507)['timezone'], "Europe/Paris")
+
+    def test_missing_index(self):
+        with tempfile.TemporaryDirectory() as empty:
+            self.assertIsNone(load_geocoder(empty))
+
+@unittest.skipIf(app_module.geocoder is None, "geocoder index is not built")
+class TestGeocodeEndpoints(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.client = app.test_client()
+        cls.sheboygan = app_module.geocoder.search("sheboygan")[0]
+
+    def test_geocode(self):
+        response = self.client.get('/api/geocode?q=sheboy&limit=3')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('max-age=', response.headers['Cache-Control'])
+        result = response.get_json()['results'][0]
+        self.assertEqual(result['label'], "Sheboygan, Wisconsin, United States")
+        self.assertEqual(result['timezone'], "America/Chicago")
+
+        self.assertEqual(self.client.get('/api/geocode').status_code, 400)
+        self.assertEqual(self.client.get('/api/geocode?q=x&limit=0').status_code, 400)
+        self.assertEqual(self.client.get('/api/geocode?q=x&limit=ten').status_code, 400)
+
+    def test_place_id_skips_timezone_resolver(self):
+        birth = {"birthDate": "1982-04-12", "birthTime": "09:26"}
+        expected = self.client.post('/api/cosmic-signature', json=dict(
+            birth, latitude=self.sheboygan['latitude'], longitude=self.sheboygan['longitude'])).get_json()
+        with mock.patch.object(app_module.timezone_resolver, 'resolve', side_effect=AssertionError("resolved")), \
+                mock.patch.object(app_module.timezone_resolver, 'resolve_many', side_effect=AssertionError("resolved")):
+            response = self.client.post('/api/cosmic-signature', json=dict(birth, placeId=self.sheboygan['placeId']))
+            batch = self.client.post('/api/cosmic-signature/batch', json=[dict(birth, placeId=self.sheboygan['placeId'])])
+        data = response.get_json()
+        self.assertEqual(data['meta']['timezone'], "America/Chicago")
+        self.assertEqual(data['planets'], expected['planets'])
+        self.assertEqual(batch.get_json()['results'][0]['data']['planets'], expected['planets'])
+
+    def test_unknown_time_accepts_place_id(self):
+        birth = {"birthDate": "1982-04-12"}
+        expected = self.client.post('/api/cosmic-signature/unknown-time', json=dict(
+            birth, latitude=self.sheboygan['latitude'], longitude=self.sheboygan['longitude'])).get_json()
+        response = self.client.post('/api/cosmic-signature/unknown-time', json=dict(birth, placeId=self.sheboygan['placeId']))
+        self.assertEqual(response.get_json(), expected)
+
+    def test_unknown_place_id(self):
+        response = self.client.post('/api/cosmic-signature', json={
+            "birthDate": "1982-04-12", "birthTime": "09:26", "placeId": 12
+        })
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('placeId', response.get_json()['error'])
+
+    def test_get_redirects_place_id_to_coordinates(self):
+        response = self.client.get(
+            f"/api/cosmic-signature?birthDate=1982-04-12&birthTime=09:26&placeId={self.sheboygan['placeId']}"
+        )
+        self.assertEqual(response.status_code, 301)
+        self.assertIn("latitude=43.7508&longitude=-87.7145", response.headers['Location'])
+
+if __name__ == '__main__':
+    unittest.main()
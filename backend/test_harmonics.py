@@ -0,0 +1,80 @@
+import unittest
+import os
+import sys
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import numpy as np
+
+from astrology_core import get_astrological_data
+from harmonics import MidpointIndex, harmonic_charts, harmonic_positions, midpoint_structures
+
+SHEBOYGAN_JD = 2445123.8930555554
+
+def brute_force_pictures(names, longitudes, dial, orb):
+    """Every (point, pair) whose dial distance is within orb, by checking all triples."""
+    found = set()
+    for p, point in enumerate(longitudes):
+        for a in range(len(names)):
+            for b in range(a + 1, len(names)):
+                if p in (a, b):
+                    continue
+                gap = (longitudes[b] - longitudes[a] + 180.0) % 360.0 - 180.0
+                midpoint = (longitudes[a] + gap / 2.0) % 360.0
+                distance = abs((point - midpoint + dial / 2.0) % dial - dial / 2.0)
+                if distance <= orb:
+                    found.add((names[p], f"{names[a]}/{names[b]}"))
+    return found
+
+class TestHarmonics(unittest.TestCase):
+    def test_harmonic_positions(self):
+        positions = harmonic_positions([10.0, 100.0, 359.0], harmonics=(5, 16))
+        np.testing.assert_allclose(positions[0], [50.0, 140.0, 355.0])
+        np.testing.assert_allclose(positions[1], [160.0, 160.0, 344.0])
+
+    def test_harmonic_positions_stack(self):
+        stack = np.random.default_rng(0).uniform(0, 360, (4, 10))
+        positions = harmonic_positions(stack)
+        self.assertEqual(positions.shape, (4, 6, 10))
+        np.testing.assert_allclose(positions[2, 1], (stack[2] * 7) % 360.0)
+
+    def test_harmonic_conjunction(self):
+        # 72° apart is a quintile: a conjunction in the 5th harmonic
+        charts = harmonic_charts(['A', 'B'], [10.0, 82.0], harmonics=(5, 7))
+        self.assertEqual([a['aspect'] for a in charts['5H']['aspects']], ['Conjunction'])
+        self.assertEqual(charts['5H']['planets']['B']['sign'], 'Taurus')  # 410° -> 50°
+
+    def test_midpoints_are_the_nearer_midpoint(self):
+        index = MidpointIndex(['A', 'B'], [350.0, 20.0])
+        self.assertAlmostEqual(float(index.longitudes[0]), 5.0)
+
+    def test_pictures_match_brute_force(self):
+        rng = np.random.default_rng(7)
+        names = [f"P{i}" for i in range(12)]
+        for _ in range(20):
+            longitudes = rng.uniform(0, 360, 12).tolist()
+            for dial in (360.0, 90.0):
+                pictures = MidpointIndex(names, longitudes, dial).pictures(orb=2.0)
+                self.assertEqual({(p['point'], p['midpoint']) for p in pictures},
+                                 brute_force_pictures(names, longitudes, dial, 2.0))
+
+    def test_window_wraps_around_the_dial(self):
+        index = MidpointIndex(['A', 'B', 'C'], [0.0, 179.0, 0.5], dial=90.0)
+        hits = index.near([89.8], orb=1.0)[0]
+        self.assertIn(0, [index.pair_i[i] for i, _ in hits])
+
+    def test_midpoint_structures(self):
+        result = midpoint_structures(['A', 'B', 'C', 'D'], [0.0, 90.0, 200.0, 45.0])
+        self.assertEqual(len(result['midpoints']), 6)
+        self.assertIn(('D', 'A/B'), {(p['point'], p['midpoint']) for p in result['pictures']['dial360']})
+        self.assertEqual(sorted(result['pictures']), ['dial360', 'dial90'])
+
+    def test_opt_in(self):
+        self.assertNotIn('harmonics', get_astrological_data(SHEBOYGAN_JD, 43.7508, -87.7145))
+        chart = get_astrological_data(SHEBOYGAN_JD, 43.7508, -87.7145, include_harmonics=True)
+        self.assertEqual(list(chart['harmonics']), ['5H', '7H', '9H', '11H', '13H', '16H'])
+        self.assertEqual(len(chart['midpoints']['midpoints']), 66)  # 10 planets + ASC + MC
+        sun = chart['planets']['Sun']['longitude']
+        self.assertAlmostEqual(chart['harmonics']['9H']['planets']['Sun']['longitude'], (sun * 9) % 360.0)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,261 @@
+import unittest
+import json
+import os
+import signal
+import subprocess
+import sys
+import tempfile
+import time
+from unittest import mock
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import app as app_module
+import jobs
+import metrics
+from app import app
+from jobs import CANCELLED, FAILED, QUEUED, RUNNING, SUCCEEDED, JobQueue, JobRunner, QueueFull
+
+def _sleep_job(params):
+    time.sleep(params['seconds'])
+    return {"slept": params['seconds']}
+
+def _failing_job(params):
+    raise ValueError("bad input")
+
+def _counting_job(params):
+    metrics.inc("cosmic_requests_total", endpoint="job", status="2xx")
+    return {}
+
+def _crash_runner_job(params):
+    # Kills the runner the first time; the supervisor's next runner retries the job
+    if not os.path.exists(params['marker']):
+        open(params['marker'], 'w').close()
+        os.kill(os.getppid(), signal.SIGKILL)
+        os._exit(1)
+    return {"attempt": 2}
+
+TEST_HANDLERS = {"sleep": _sleep_job, "fail": _failing_job, "count": _counting_job, "crash": _crash_runner_job}
+
+class QueueTestCase(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.queue = JobQueue(os.path.join(self.tmp.name, 'jobs.sqlite3'), max_queued=4, workers=2)
+        patcher = mock.patch.dict(jobs.HANDLERS, TEST_HANDLERS)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        self.queue.close()
+        self.tmp.cleanup()
+
+    def run_until(self, runner, job_id, statuses=(SUCCEEDED, FAILED, CANCELLED), timeout=30):
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            runner.step(0.05)
+            job = self.queue.get(job_id)
+            if job['status'] in statuses:
+                return job
+        self.fail(f"job {job_id} still {self.queue.get(job_id)['status']}")
+
+class TestJobQueue(QueueTestCase):
+    def test_claims_by_tier_then_age(self):
+        free = self.queue.submit("sleep", {"seconds": 0}, "free")
+        first = self.queue.submit("sleep", {"seconds": 0}, "standard")
+        second = self.queue.submit("sleep", {"seconds": 0}, "standard")
+        premium = self.queue.submit("sleep", {"seconds": 0}, "premium")
+        self.assertEqual(self.queue.get(free['id'])['position'], 3)
+        self.assertEqual(self.queue.get(premium['id'])['position'], 0)
+
+        claimed = [self.queue.claim(os.getpid())[0] for _ in range(4)]
+        self.assertEqual(claimed, [premium['id'], first['id'], second['id'], free['id']])
+        self.assertIsNone(self.queue.claim(os.getpid()))
+        self.assertEqual(self.queue.depth()[RUNNING], 4)
+
+    def test_full_queue_refuses_lower_tiers_first(self):
+        for _ in range(2):
+            self.queue.submit("sleep", {"seconds": 0}, "free")
+        with self.assertRaises(QueueFull) as refused:
+            self.queue.submit("sleep", {"seconds": 0}, "free")
+        self.assertGreaterEqual(refused.exception.retry_after, 1)
+        self.queue.submit("sleep", {"seconds": 0}, "standard")
+        self.queue.submit("sleep", {"seconds": 0}, "premium")
+        with self.assertRaises(QueueFull):
+            self.queue.submit("sleep", {"seconds": 0}, "premium")
+        self.assertEqual(self.queue.depth()[QUEUED], 4)
+
+    def test_unknown_kind_and_tier(self):
+        with self.assertRaises(ValueError):
+            self.queue.submit("nope", {})
+        with self.assertRaises(ValueError):
+            self.queue.submit("sleep", {}, "gold")
+
+    def test_cancel_queued(self):
+        job = self.queue.submit("sleep", {"seconds": 0})
+        self.assertEqual(self.queue.cancel(job['id'])['status'], CANCELLED)
+        self.assertIsNone(self.queue.claim(os.getpid()))
+        self.assertIsNone(self.queue.cancel("0" * 32))
+
+    def test_recover_requeues_jobs_of_dead_runners(self):
+        dead = subprocess.Popen([sys.executable, "-c", "pass"])
+        dead.wait()
+        alive = subprocess.Popen([sys.executable, "-c", "import time; time.sleep(30)"])
+        self.addCleanup(alive.wait)
+        self.addCleanup(alive.kill)
+        retried = self.queue.submit("sleep", {"seconds": 0}, "premium")
+        exhausted = self.queue.submit("sleep", {"seconds": 0}, "premium")
+        other = self.queue.submit("sleep", {"seconds": 0}, "premium")
+        for _ in range(3):
+            self.queue.claim(jobs.runner_identity(dead.pid))
+        with self.queue.pool.connection() as conn:
+            conn.execute("UPDATE jobs SET attempts = ? WHERE id = ?", (jobs.MAX_ATTEMPTS, exhausted['id']))
+            conn.execute("UPDATE jobs SET runner = ? WHERE id = ?", (jobs.runner_identity(alive.pid), other['id']))
+
+        self.assertEqual(self.queue.recover(), 2)
+        self.assertEqual(self.queue.get(retried['id'])['status'], QUEUED)
+        self.assertEqual(self.queue.get(exhausted['id'])['status'], FAILED)
+        self.assertEqual(self.queue.get(other['id'])['status'], RUNNING)
+
+    def test_recover_requeues_jobs_of_an_earlier_process_with_this_pid(self):
+        # After a container restart the new runner usually gets its predecessor's pid
+        earlier = self.queue.submit("sleep", {"seconds": 0})
+        self.queue.claim(f"{os.getpid()}:1")
+        mine = self.queue.submit("sleep", {"seconds": 0})
+        orphaned = self.queue.submit("sleep", {"seconds": 0})
+        self.queue.claim(jobs.runner_identity())
+        self.queue.claim(jobs.runner_identity())
+
+        self.assertEqual(self.queue.recover(running=[mine['id']]), 2)
+        self.assertEqual([self.queue.get(job['id'])['status'] for job in (earlier, mine, orphaned)],
+                         [QUEUED, RUNNING, QUEUED])
+
+class TestJobRunner(QueueTestCase):
+    def test_runs_jobs_in_processes(self):
+        runner = JobRunner(self.queue, workers=2)
+        ok = self.queue.submit("sleep", {"seconds": 0.1})
+        bad = self.queue.submit("fail", {})
+        self.assertEqual(self.run_until(runner, ok['id'])['result'], {"slept": 0.1})
+        failed = self.run_until(runner, bad['id'])
+        self.assertEqual((failed['status'], failed['error']), (FAILED, "bad input"))
+
+    def test_finished_processes_fold_their_metrics(self):
+        with tempfile.TemporaryDirectory() as directory, mock.patch.object(metrics, 'METRICS_DIR', directory), \
+                mock.patch.object(metrics, '_store', None):
+            runner = JobRunner(self.queue, workers=1)
+            for _ in range(2):
+                self.run_until(runner, self.queue.submit("count", {})['id'])
+            self.assertEqual(sorted(name for name in os.listdir(directory)
+                                    if name.startswith("metrics-") and str(os.getpid()) not in name),
+                             ["metrics-aggregate.bin", "metrics-aggregate.json"])
+            totals = metrics.collect()
+            self.assertEqual(totals[("cosmic_requests_total", 'endpoint="job",status="2xx"')][0], 2)
+
+    def test_bounded_workers(self):
+        runner = JobRunner(self.queue, workers=1)
+        ids = [self.queue.submit("sleep", {"seconds": 0.3}, "premium")['id'] for _ in range(2)]
+        runner.step()
+        self.assertEqual(len(runner.running), 1)
+        self.assertEqual([self.queue.get(i)['status'] for i in ids], [RUNNING, QUEUED])
+        self.run_until(runner, ids[1])
+        self.assertEqual(runner.completed, 2)
+
+    def test_cancel_running_terminates(self):
+        runner = JobRunner(self.queue, workers=1)
+        job = self.queue.submit("sleep", {"seconds": 30})
+        runner.step()
+        process, _ = runner.running[job['id']]
+        self.assertTrue(self.queue.cancel(job['id'])['cancelRequested'])
+        self.assertEqual(self.run_until(runner, job['id'], timeout=5)['status'], CANCELLED)
+        self.assertFalse(process.is_alive())
+
+    def test_shutdown_requeues(self):
+        runner = JobRunner(self.queue, workers=1)
+        job = self.queue.submit("sleep", {"seconds": 30})
+        runner.step()
+        runner.shutdown()
+        self.assertEqual(self.queue.get(job['id'])['status'], QUEUED)
+        self.assertEqual(runner.running, {})
+
+    def test_transit_scan(self):
+        runner = JobRunner(self.queue, workers=1)
+        job = self.queue.submit("transits", {"natal": {"Sun": 295.0}, "startDate": "2025-01-01",
+                                             "startJd": 2460676.5, "days": 3, "orb": 1.0})
+        result = self.run_until(runner, job['id'])['result']
+        self.assertEqual(result['days'], 3)
+        self.assertEqual(sum(1 for record in result['records'] if record['type'] == "day"), 3)
+
+    def test_supervisor_restarts_a_dead_runner(self):
+        job = self.queue.submit("crash", {"marker": os.path.join(self.tmp.name, 'crashed')})
+        environment = {'COSMIC_JOBS_DB': self.queue.path, 'COSMIC_JOBS_WORKERS': '1'}
+        with mock.patch.dict(os.environ, environment), mock.patch.object(jobs, 'RESTART_DELAY', 0.1):
+            supervisor = jobs.start_runner_process()
+        try:
+            deadline = time.monotonic() + 30
+            while self.queue.get(job['id'])['status'] != SUCCEEDED and time.monotonic() < deadline:
+                time.sleep(0.1)
+            done = self.queue.get(job['id'])
+            self.assertEqual((done['status'], done['attempts'], done['result']), (SUCCEEDED, 2, {"attempt": 2}))
+            self.assertTrue(supervisor.is_alive())
+        finally:
+            supervisor.terminate()
+            supervisor.join(timeout=10)
+        self.assertEqual(supervisor.exitcode, 0)
+
+BIRTH = {"birthDate": "1990-01-15", "birthTime": "14:30", "latitude": 40.7128, "longitude": -74.006}
+
+class TestJobEndpoints(QueueTestCase):
+    def setUp(self):
+        super().setUp()
+        for name, value in (('job_queue', self.queue), ('JOB_STREAM_SECONDS', 0.2)):
+            patcher = mock.patch.object(app_module, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.client = app.test_client()
+
+    def test_submit_poll_and_stream(self):
+        response = self.client.post('/api/jobs', json=dict(BIRTH, kind="astrocartography", lineStep=5),
+                                    headers={"X-Cosmic-Tier": "Premium"})
+        self.assertEqual(response.status_code, 202)
+        job = response.get_json()
+        self.assertEqual((job['status'], job['tier']), (QUEUED, "premium"))
+        self.assertEqual(response.headers['Location'], f"/api/jobs/{job['id']}")
+
+        polled = self.client.get(response.headers['Location'])
+        self.assertEqual(polled.headers['Retry-After'], '1')
+        lines = self.client.get(f"/api/jobs/{job['id']}/stream").get_data(as_text=True).splitlines()
+        self.assertEqual([json.loads(line)['type'] for line in lines], ["status", "reconnect"])
+
+        done = self.run_until(JobRunner(self.queue, workers=1), job['id'])
+        self.assertEqual(done['status'], SUCCEEDED)
+        direct = self.client.post('/api/astrocartography', json=dict(BIRTH, lineStep=5)).get_json()
+        self.assertEqual(done['result'], direct)
+
+        body = self.client.get(f"/api/jobs/{job['id']}/stream?format=sse").get_data(as_text=True)
+        self.assertTrue(body.startswith("retry: 1000\n\nevent: end\n"))
+        self.assertNotIn('Retry-After', self.client.get(f"/api/jobs/{job['id']}").headers)
+        self.assertEqual(self.client.delete(f"/api/jobs/{job['id']}").status_code, 409)
+
+    def test_backpressure(self):
+        for _ in range(2):
+            self.assertEqual(self.client.post('/api/jobs', json=dict(BIRTH, kind="transits", days=7)).status_code, 202)
+        response = self.client.post('/api/jobs', json=dict(BIRTH, kind="transits", days=7))
+        self.assertEqual(response.status_code, 429)
+        self.assertGreaterEqual(int(response.headers['Retry-After']), 1)
+        self.assertEqual(self.client.post('/api/jobs', json=dict(BIRTH, kind="transits", days=7),
+                                          headers={"X-Cosmic-Tier": "premium"}).status_code, 202)
+
+    def test_cancel(self):
+        job = self.client.post('/api/jobs', json=dict(BIRTH, kind="report")).get_json()
+        self.assertEqual(self.client.delete(f"/api/jobs/{job['id']}").get_json()['status'], CANCELLED)
+        self.assertEqual(self.client.delete('/api/jobs/' + "0" * 32).status_code, 404)
+        self.assertEqual(self.client.get('/api/jobs/' + "0" * 32).status_code, 404)
+
+    def test_invalid_requests(self):
+        self.assertEqual(self.client.post('/api/jobs', json=dict(BIRTH, kind="sleep")).status_code, 400)
+        self.assertEqual(self.client.post('/api/jobs', json=dict(BIRTH, kind="transits"),
+                                          headers={"X-Cosmic-Tier": "gold"}).status_code, 400)
+        self.assertEqual(self.client.post('/api/jobs', json=dict(BIRTH, kind="transits", days=0)).status_code, 400)
+        with mock.patch.object(app_module, 'job_queue', None):
+            self.assertEqual(self.client.post('/api/jobs', json=dict(BIRTH, kind="transits")).status_code, 503)
+
+if __name__ == '__main__':
+    unittest.main()
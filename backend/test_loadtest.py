@@ -0,0 +1,68 @@
+import unittest
+import os
+import sys
+import threading
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import numpy as np
+from werkzeug.serving import make_server
+
+from loadtest import LatencyHistogram, build_schedule, parse_mix, run_load, sustained_rate
+
+class TestLoadTest(unittest.TestCase):
+    def test_histogram_percentiles_within_precision(self):
+        latencies = np.random.default_rng(2).lognormal(np.log(0.02), 1.0, 20000)
+        histogram = LatencyHistogram()
+        for value in latencies.tolist():
+            histogram.record(value)
+        for q in (50, 90, 99, 99.9):
+            expected = np.percentile(latencies, q, method='inverted_cdf')
+            self.assertAlmostEqual(histogram.percentile(q) / expected, 1.0, delta=0.011)
+        self.assertEqual(histogram.total, 20000)
+        self.assertEqual(sum(count for _, count in histogram.buckets()), 20000)
+        self.assertIsNone(LatencyHistogram().percentile(50))
+
+    def test_schedule_is_open_loop_and_deterministic(self):
+        schedule = build_schedule(50.0, 20.0, seed=4)
+        self.assertEqual(schedule, build_schedule(50.0, 20.0, seed=4))
+        self.assertEqual(len(schedule), 1000)
+        self.assertTrue(np.allclose(np.diff([offset for offset, *_ in schedule]), 0.02))
+
+        kinds = [kind for _, kind, _, _ in schedule]
+        self.assertAlmostEqual(kinds.count('single') / len(kinds), 0.55, delta=0.05)
+        self.assertAlmostEqual(kinds.count('batch') / len(kinds), 0.10, delta=0.03)
+        singles = {body for _, kind, _, body in schedule if kind == 'single'}
+        self.assertTrue(all(body in singles for _, kind, _, body in schedule if kind == 'repeat'))
+
+    def test_parse_mix(self):
+        self.assertEqual(parse_mix("single=3,repeat=1"), {"single": 3.0, "repeat": 1.0})
+        with self.assertRaises(ValueError):
+            parse_mix("bogus=1")
+        with self.assertRaises(ValueError):
+            parse_mix("single=0")
+
+    def test_sustained_rate(self):
+        steps = [
+            {"offeredRate": 10, "throughput": 10.0, "errors": 0, "p99Ms": 80.0},
+            {"offeredRate": 20, "throughput": 19.8, "errors": 0, "p99Ms": 300.0},
+            {"offeredRate": 40, "throughput": 30.0, "errors": 0, "p99Ms": 2000.0}
+        ]
+        self.assertEqual(sustained_rate(steps, slo_ms=500), 20)
+        self.assertIsNone(sustained_rate(steps, slo_ms=50))
+
+    def test_run_load_against_local_server(self):
+        from app import app
+        server = make_server("127.0.0.1", 0, app, threaded=True)
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        try:
+            step = run_load("127.0.0.1", server.server_port, rate=20.0, duration=1.0, seed=3)
+        finally:
+            server.shutdown()
+        self.assertEqual(step['requests'], 20)
+        self.assertEqual(step['errors'], 0)
+        self.assertEqual(sum(kind['count'] for kind in step['byKind'].values()), 20)
+        self.assertLessEqual(step['p50Ms'], step['p99Ms'])
+
+if __name__ == '__main__':
+    unittest.main()
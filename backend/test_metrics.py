@@ -0,0 +1,94 @@
+import unittest
+import os
+import sys
+import tempfile
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import metrics
+from app import app
+
+def sample(text, line_start):
+    """Value of the first exposition line starting with `line_start`."""
+    for line in text.splitlines():
+        if line.startswith(line_start):
+            return float(line.rsplit(' ', 1)[1])
+    return None
+
+class TestMetrics(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.previous = metrics.METRICS_DIR
+        metrics.METRICS_DIR = self.tmp.name
+        metrics._store = None
+
+    def tearDown(self):
+        metrics.METRICS_DIR = self.previous
+        metrics._store = None
+        self.tmp.cleanup()
+
+    def test_histogram_exposition(self):
+        metrics.observe("cosmic_stage_duration_seconds", 0.0003, stage="houses")
+        metrics.observe("cosmic_stage_duration_seconds", 0.2, stage="houses")
+        text = metrics.render_prometheus()
+        self.assertIn("# TYPE cosmic_stage_duration_seconds histogram", text)
+        self.assertEqual(sample(text, 'cosmic_stage_duration_seconds_bucket{stage="houses",le="0.00025"}'), 0)
+        self.assertEqual(sample(text, 'cosmic_stage_duration_seconds_bucket{stage="houses",le="0.0005"}'), 1)
+        self.assertEqual(sample(text, 'cosmic_stage_duration_seconds_bucket{stage="houses",le="+Inf"}'), 2)
+        self.assertAlmostEqual(sample(text, 'cosmic_stage_duration_seconds_sum{stage="houses"}'), 0.2003)
+        # Every sample is a plain number, whatever the NumPy scalar repr
+        for line in text.splitlines():
+            if not line.startswith('#'):
+                self.assertRegex(line.rsplit(' ', 1)[1], r'^-?[0-9][0-9.e+-]*$')
+
+    def test_processes_are_summed(self):
+        children = []
+        for _ in range(3):
+            pid = os.fork()
+            if pid == 0:
+                metrics.record_cache('planets', True)
+                metrics.inc("cosmic_requests_in_flight", 1.0)
+                os._exit(0)
+            children.append(pid)
+        for pid in children:
+            os.waitpid(pid, 0)
+        metrics.mark_process_dead(children[0])
+        self.assertFalse(os.path.exists(os.path.join(self.tmp.name, f"metrics-{children[0]}.bin")))
+
+        # The scrape sweeps the other two, which exited unannounced like pool processes
+        text = metrics.render_prometheus()
+        self.assertEqual(sample(text, 'cosmic_cache_lookups_total{cache="planets",result="hit"}'), 3)
+        self.assertEqual(sample(text, 'cosmic_cache_hit_ratio{cache="planets"}'), 1.0)
+        self.assertIn(sample(text, 'cosmic_requests_in_flight'), (None, 0))
+        self.assertEqual(sorted(name for name in os.listdir(self.tmp.name) if name.startswith("metrics-")),
+                         ["metrics-aggregate.bin", "metrics-aggregate.json"])
+
+        metrics.record_cache('planets', False)
+        text = metrics.render_prometheus()
+        self.assertEqual(sample(text, 'cosmic_cache_lookups_total{cache="planets",result="hit"}'), 3)
+        self.assertEqual(sample(text, 'cosmic_cache_lookups_total{cache="planets",result="miss"}'), 1)
+
+    def test_reset_directory(self):
+        metrics.inc("cosmic_requests_total", endpoint="x", status="2xx")
+        metrics.reset_directory(self.tmp.name)
+        self.assertEqual(os.listdir(self.tmp.name), [])
+
+    def test_server_timing_and_metrics_endpoint(self):
+        client = app.test_client()
+        response = client.post('/api/cosmic-signature', json={
+            "birthDate": "1982-06-03", "birthTime": "04:26", "latitude": 43.7508, "longitude": -87.7145
+        })
+        self.assertEqual(response.status_code, 200)
+        timing = response.headers['Server-Timing']
+        self.assertIn("julian_day;dur=", timing)
+        self.assertIn("serialize;dur=", timing)
+        self.assertTrue(timing.split(", ")[-1].startswith("total;dur="))
+
+        client.post('/api/cosmic-signature', json={})
+        text = client.get('/metrics').get_data(as_text=True)
+        self.assertEqual(sample(text, 'cosmic_requests_total{endpoint="cosmic_signature_endpoint",status="2xx"}'), 1)
+        self.assertEqual(sample(text, 'cosmic_requests_total{endpoint="cosmic_signature_endpoint",status="4xx"}'), 1)
+        # Only the scrape itself is in flight
+        self.assertEqual(sample(text, 'cosmic_requests_in_flight'), 1)
+
+if __name__ == '__main__':
+    unittest.main()
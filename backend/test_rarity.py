@@ -0,0 +1,83 @@
+import unittest
+import json
+import os
+import shutil
+import sys
+import tempfile
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import numpy as np
+
+from astrology_core import get_astrological_data
+from rarity import INDEX_VERSION, RarityIndex, build_index, chart_features, load_rarity_index
+
+SHEBOYGAN_JD = 2445123.8930555554
+
+class TestRarityIndex(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.tmp = tempfile.TemporaryDirectory()
+        build_index(cls.tmp.name, samples=4000, seed=3, workers=1)
+        cls.index = RarityIndex(cls.tmp.name)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.tmp.cleanup()
+
+    def test_tables_account_for_every_sample(self):
+        self.assertEqual(int(self.index.joint.sum()), 4000)
+        self.assertEqual(int(self.index.concentration.sum()), 4000)
+        self.assertEqual(int(self.index.tight.sum()), 4000)
+        np.testing.assert_array_equal(self.index.patterns.sum(axis=1), 4000)
+
+    def test_build_is_reproducible(self):
+        with tempfile.TemporaryDirectory() as other:
+            build_index(other, samples=4000, seed=3, workers=1)
+            np.testing.assert_array_equal(RarityIndex(other).joint, self.index.joint)
+
+    def test_chart_features(self):
+        planet_lon = np.array([5.0, 10.0, 15.0, 20.0, 25.0, 95.5, 200.0, 216.0, 305.5, 333.0])
+        features = chart_features(planet_lon, 45.0)
+        self.assertEqual(int(features['triple']), 0 * 144 + 0 * 12 + 1)  # Aries, Aries, Taurus
+        self.assertEqual(int(features['concentration']), 5)
+        # The Aries conjunctions are 5° apart; only the five aspects below are within 1°:
+        # 5/95.5 square, 5/305.5 sextile, 20/200 opposition, 95.5/216 trine, 216/305.5 square
+        self.assertEqual(int(features['tight']), 5)
+
+    def test_score_chart(self):
+        chart = get_astrological_data(SHEBOYGAN_JD, 43.7508, -87.7145)
+        score = self.index.score_chart(chart)
+        self.assertGreater(score['oneIn'], 1)
+        self.assertLess(score['probability'], score['signature']['probability'] + 1e-12)
+        self.assertEqual(score['concentration']['planets'],
+                         max(sum(1 for p in chart['planets'].values() if p['sign'] == sign)
+                             for sign in {p['sign'] for p in chart['planets'].values()}))
+        self.assertEqual(score['samples'], 4000)
+
+        # The chart's Yod is the only configuration it has
+        self.assertEqual([pattern['pattern'] for pattern in chart['patterns']], ["Yod"])
+        self.assertEqual([(p['pattern'], p['count']) for p in score['patterns']], [("Yod", 1)])
+        yod = self.index.meta['patterns'].index("Yod")
+        self.assertAlmostEqual(score['patterns'][0]['probability'],
+                               (4000 - self.index.patterns[yod, 0] + 1) / 4001, places=6)
+
+    def test_missing_index_returns_none(self):
+        with tempfile.TemporaryDirectory() as empty:
+            self.assertIsNone(load_rarity_index(empty))
+
+    def test_stale_index_is_refused(self):
+        with tempfile.TemporaryDirectory() as stale:
+            for name in os.listdir(self.tmp.name):
+                shutil.copy(os.path.join(self.tmp.name, name), stale)
+            with open(os.path.join(stale, 'meta.json')) as f:
+                meta = json.load(f)
+            with open(os.path.join(stale, 'meta.json'), 'w') as f:
+                json.dump(dict(meta, version=INDEX_VERSION - 1), f)
+            with self.assertLogs('rarity', 'ERROR'):
+                self.assertIsNone(load_rarity_index(stale))
+
+    def test_shipped_index_loads(self):
+        self.assertIsNotNone(load_rarity_index())
+
+if __name__ == '__main__':
+    unittest.main()
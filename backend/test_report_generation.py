@@ -0,0 +1,288 @@
+import unittest
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+from unittest import mock
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import app as app_module
+from app import app
+import report_generation
+from report_generation import GenerationLedger, ReportGenerator, ReportProvider, StubProvider, dominant_element
+from report_store import ReportStore
+
+CHART = {
+    "sunSign": "Capricorn", "moonSign": "Leo", "ascendant": "Gemini", "rarity": {"oneIn": 1234567},
+    "planets": {"Sun": {"sign": "Capricorn"}, "Moon": {"sign": "Leo"}, "Mars": {"sign": "Taurus"}}
+}
+
+class GatedProvider(ReportProvider):
+    """Yields two chunks, holding the second until released."""
+
+    name = "gated"
+    version = "gated-1"
+
+    def __init__(self, fail=False):
+        self.calls = 0
+        self.fail = fail
+        self.started = threading.Event()
+        self.release = threading.Event()
+
+    def stream(self, prompt, chart):
+        self.calls += 1
+        yield "first "
+        self.started.set()
+        self.release.wait(5)
+        if self.fail:
+            raise ValueError("upstream closed")
+        yield "second"
+
+class TestReportGenerator(unittest.TestCase):
+    def test_stub_is_deterministic(self):
+        generator = ReportGenerator(StubProvider(), prompt="prompt")
+        text = generator.generate("a" * 32, lambda: CHART)
+        self.assertIn("Capricorn Sun", text)
+        self.assertIn("1 in 1,234,567 times", text)
+        self.assertIn("Earth elemental dominance", text)
+        self.assertEqual(ReportGenerator(StubProvider(), prompt="prompt").generate("a" * 32, lambda: CHART), text)
+        self.assertEqual(dominant_element(CHART), "Earth")
+
+    def test_template_version_follows_prompt_and_provider(self):
+        version = ReportGenerator(StubProvider(), prompt="prompt").template_version
+        self.assertEqual(ReportGenerator(StubProvider(), prompt="prompt").template_version, version)
+        self.assertNotEqual(ReportGenerator(StubProvider(), prompt="other").template_version, version)
+        self.assertNotEqual(ReportGenerator(GatedProvider(), prompt="prompt").template_version, version)
+        self.assertTrue(ReportGenerator(StubProvider()).template_version.startswith("cosmic-blueprint-"))
+
+    def test_concurrent_requests_share_one_generation(self):
+        provider = GatedProvider()
+        generator = ReportGenerator(provider, prompt="prompt")
+        persisted = []
+        results, sources = [], []
+
+        def read():
+            chunks, source, _ = generator.stream("b" * 32, lambda: CHART, persisted.append)
+            sources.append(source)
+            results.append(''.join(chunks))
+
+        threads = [threading.Thread(target=read) for _ in range(8)]
+        threads[0].start()
+        provider.started.wait(5)
+        for thread in threads[1:]:
+            thread.start()
+        provider.release.set()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(provider.calls, 1)
+        self.assertEqual(results, ["first second"] * 8)
+        self.assertEqual(sorted(sources), ["coalesced"] * 7 + ["generated"])
+        self.assertEqual(persisted, ["first second"])
+
+        chunks, source, generation_id = generator.stream("b" * 32, lambda: CHART)
+        self.assertEqual((list(chunks), source, generation_id), (["first second"], "cache", None))
+        self.assertEqual(provider.calls, 1)
+
+    def test_failed_generation_is_not_cached(self):
+        provider = GatedProvider(fail=True)
+        provider.release.set()
+        generator = ReportGenerator(provider, prompt="prompt")
+        with self.assertRaises(RuntimeError):
+            generator.generate("c" * 32, lambda: CHART)
+        self.assertIsNone(generator.cached("c" * 32))
+        self.assertEqual(generator.stats()['inFlight'], 0)
+
+        provider.fail = False
+        self.assertEqual(generator.generate("c" * 32, lambda: CHART), "first second")
+        self.assertEqual(provider.calls, 2)
+
+    def test_chart_is_loaded_only_to_start_a_generation(self):
+        generator = ReportGenerator(StubProvider(), prompt="prompt", cache_size=1)
+        generator.generate("f" * 32, lambda: CHART)
+        unused = mock.Mock(side_effect=AssertionError("loaded"))
+        self.assertIn("Capricorn Sun", generator.generate("f" * 32, unused))
+
+        with self.assertRaises(ValueError):
+            generator.stream("g" * 32, mock.Mock(side_effect=ValueError("bad birth")))
+        self.assertEqual(generator.stats()['inFlight'], 0)
+        generator.cache.put(("x", "y"), "evicts f")
+        self.assertIn("Capricorn Sun", generator.generate("f" * 32, lambda: CHART))
+
+    def test_cache_evicts(self):
+        generator = ReportGenerator(StubProvider(), prompt="prompt", cache_size=1)
+        generator.generate("d" * 32, lambda: CHART)
+        generator.generate("e" * 32, lambda: CHART)
+        self.assertIsNone(generator.cached("d" * 32))
+        self.assertIsNotNone(generator.cached("e" * 32))
+
+class TestGenerationLedger(unittest.TestCase):
+    """Two generators sharing a ledger stand in for two gunicorn workers."""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, 'reports.sqlite3')
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_workers_share_one_generation(self):
+        provider = GatedProvider()
+        owner = ReportGenerator(provider, prompt="prompt", ledger=GenerationLedger(self.path))
+        other = ReportGenerator(provider, prompt="prompt", ledger=GenerationLedger(self.path))
+        persisted = []
+
+        chunks, source, generation_id = owner.stream("h" * 32, lambda: CHART, persisted.append)
+        self.assertEqual(source, "generated")
+        provider.started.wait(5)
+        unused = mock.Mock(side_effect=AssertionError("loaded"))
+        followed, followed_source, followed_id = other.stream("h" * 32, unused)
+        self.assertEqual((followed_source, followed_id), ("followed", generation_id))
+        provider.release.set()
+
+        self.assertEqual(''.join(chunks), "first second")
+        self.assertEqual(''.join(followed), "first second")
+        self.assertEqual(provider.calls, 1)
+        self.assertEqual(persisted, ["first second"])
+        self.assertEqual(other.cached("h" * 32), "first second")
+
+    def test_failure_is_relayed_and_lease_released(self):
+        provider = GatedProvider(fail=True)
+        owner = ReportGenerator(provider, prompt="prompt", ledger=GenerationLedger(self.path))
+        other = ReportGenerator(provider, prompt="prompt", ledger=GenerationLedger(self.path))
+        chunks, _, _ = owner.stream("i" * 32, lambda: CHART)
+        provider.started.wait(5)
+        followed, _, _ = other.stream("i" * 32, lambda: CHART)
+        provider.release.set()
+        for stream in (chunks, followed):
+            with self.assertRaises(RuntimeError):
+                ''.join(stream)
+
+        provider.fail = False
+        self.assertEqual(other.generate("i" * 32, lambda: CHART), "first second")
+        self.assertEqual(provider.calls, 2)
+
+    def test_stale_lease_is_taken_over(self):
+        ledger = GenerationLedger(self.path)
+        key = "j" * 32 + ":" + ReportGenerator(StubProvider(), prompt="prompt").template_version
+        self.assertEqual(ledger.claim(key, "dead"), (True, "dead"))
+        self.assertEqual(ledger.claim(key, "live"), (False, "dead"))
+
+        with mock.patch.object(report_generation.time, 'time', return_value=time.time() + 120):
+            generator = ReportGenerator(StubProvider(), prompt="prompt", ledger=ledger)
+            _, source, generation_id = generator.stream("j" * 32, lambda: CHART)
+        self.assertEqual(source, "generated")
+        self.assertNotEqual(generation_id, "dead")
+        self.assertFalse(ledger.append(key, "dead", 0, ["late"]))
+        self.assertIn("Capricorn Sun", generator.generate("j" * 32, lambda: CHART))
+
+BIRTH = {"birthDate": "1990-01-15", "birthTime": "14:30", "latitude": 40.7128, "longitude": -74.006}
+
+class TestGenerateEndpoint(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.store = ReportStore(os.path.join(self.tmp.name, 'reports.sqlite3'))
+        self.generator = ReportGenerator(StubProvider())
+        for name, value in (('report_store', self.store), ('report_generator', self.generator)):
+            patcher = mock.patch.object(app_module, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.client = app.test_client()
+
+    def tearDown(self):
+        self.store.close()
+        self.tmp.cleanup()
+
+    def test_streams_then_serves_stored_report(self):
+        response = self.client.post('/api/reports/generate', json=BIRTH)
+        self.assertEqual(response.mimetype, 'application/x-ndjson')
+        records = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+        self.assertEqual(records[0]['type'], "start")
+        self.assertFalse(records[0]['cached'])
+        self.assertEqual(records[-1]['type'], "end")
+        text = ''.join(r['text'] for r in records if r['type'] == "token")
+        self.assertIn("Capricorn Sun", text)
+
+        stored = self.store.get(records[0]['fingerprint'])
+        self.assertEqual((stored['report'], stored['reportVersion']), (text, self.generator.template_version))
+        self.assertEqual(stored['chart']['sunSign'], "Capricorn")
+
+        # A fresh worker finds the report in the store and computes nothing
+        fresh = ReportGenerator(StubProvider())
+        with mock.patch.object(app_module, 'report_generator', fresh), \
+                mock.patch.object(fresh.provider, 'stream', side_effect=AssertionError("generated")), \
+                mock.patch.object(app_module, 'compute_chart_response', side_effect=AssertionError("computed")):
+            again = self.client.post('/api/reports/generate?format=json', json=BIRTH).get_json()
+        self.assertTrue(again['cached'])
+        self.assertEqual(again['report'], text)
+
+    def test_client_reports_are_not_served_as_generated(self):
+        version = self.generator.template_version
+        posted = self.client.post('/api/reports', json=dict(BIRTH, report="INJECTED", reportVersion=version))
+        self.assertEqual(posted.get_json()['generatedVersion'], None)
+        self.store.flush()
+
+        result = self.client.post('/api/reports/generate?format=json', json=BIRTH).get_json()
+        self.assertFalse(result['cached'])
+        self.assertIn("Capricorn Sun", result['report'])
+        stored = self.store.get(result['fingerprint'])
+        self.assertEqual((stored['report'], stored['generatedVersion']), (result['report'], version))
+
+    def test_sse(self):
+        response = self.client.post('/api/reports/generate?format=sse', json=BIRTH)
+        self.assertEqual(response.mimetype, 'text/event-stream')
+        body = response.get_data(as_text=True)
+        self.assertTrue(body.startswith("event: start\n"))
+        self.assertIn("event: token\n", body)
+        self.assertRegex(body, r'event: end\ndata: \{"type": "end", "length": \d+\}\n\n$')
+
+    def test_provider_failure(self):
+        provider = GatedProvider(fail=True)
+        provider.release.set()
+        with mock.patch.object(app_module, 'report_generator', ReportGenerator(provider)):
+            response = self.client.post('/api/reports/generate', json=BIRTH)
+            records = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+            self.assertEqual([r['type'] for r in records], ["start", "token", "error"])
+            self.assertEqual(self.client.post('/api/reports/generate?format=json', json=BIRTH).status_code, 502)
+
+    def test_long_streams_reconnect_and_resume(self):
+        provider = GatedProvider()
+        generator = ReportGenerator(provider)
+        patcher = mock.patch.object(app_module, 'report_generator', generator)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        with mock.patch.object(app_module, 'REPORT_STREAM_SECONDS', 0), \
+                mock.patch.object(app_module, 'REPORT_STREAM_HEARTBEAT', 0.05):
+            first = [json.loads(line) for line in
+                     self.client.post('/api/reports/generate', json=BIRTH).get_data(as_text=True).splitlines()]
+            self.assertEqual(first[-1]['type'], "reconnect")
+            self.assertEqual(first[-1]['generation'], first[0]['generation'])
+
+            waiting = self.client.post('/api/reports/generate?format=json', json=BIRTH)
+            self.assertEqual((waiting.status_code, waiting.get_json()['status']), (202, "generating"))
+
+        threading.Timer(0.2, provider.release.set).start()
+        resumed = [json.loads(line) for line in self.client.post(
+            '/api/reports/generate', json=dict(BIRTH, generation=first[-1]['generation'], offset=first[-1]['offset'])
+        ).get_data(as_text=True).splitlines()]
+        self.assertTrue(resumed[0]['resumed'])
+        self.assertEqual(resumed[-1], {"type": "end", "length": len("first second")})
+        text = ''.join(r['text'] for r in first + resumed if r['type'] == "token")
+        self.assertEqual(text, "first second")
+        self.assertEqual(provider.calls, 1)
+
+        # A stale generation id starts over from the beginning
+        again = [json.loads(line) for line in self.client.post(
+            '/api/reports/generate', json=dict(BIRTH, generation="0" * 32, offset=6)
+        ).get_data(as_text=True).splitlines()]
+        self.assertFalse(again[0]['resumed'])
+        self.assertEqual(again[1]['text'], "first second")
+
+    def test_invalid_birth(self):
+        self.assertEqual(self.client.post('/api/reports/generate', json={"birthDate": "1990-01-15"}).status_code, 400)
+        self.assertEqual(self.client.post('/api/reports/generate', json=dict(BIRTH, offset=-1)).status_code, 400)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,170 @@
+import unittest
+import os
+import sqlite3
+import sys
+import tempfile
+import threading
+from unittest import mock
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import app as app_module
+from app import app
+from fingerprint import canonical_birth
+from report_store import ConnectionPool, ReportStore, make_record
+
+CANONICAL = canonical_birth("1990-01-15", "14:30", 40.7128, -74.006)
+CHART = {"sunSign": "Capricorn", "moonSign": "Leo", "ascendant": "Gemini", "planets": {"Sun": {"longitude": 295.1}}}
+
+def record(fingerprint="f" * 32, report=None, report_version=None, chart=CHART):
+    return make_record(fingerprint, "engine", CANONICAL, chart, report, report_version)
+
+class TestReportStore(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, 'reports.sqlite3')
+        self.store = ReportStore(self.path, flush_interval=60)
+
+    def tearDown(self):
+        self.store.close()
+        self.tmp.cleanup()
+
+    def fresh(self):
+        """A second store on the same file, with an empty cache."""
+        other = ReportStore(self.path)
+        self.addCleanup(other.close)
+        return other
+
+    def test_upsert_keeps_chart_and_takes_new_report(self):
+        first = self.store.upsert(record())
+        self.assertEqual(first['chart'], CHART)
+        self.assertIsNone(first['report'])
+
+        second = self.store.upsert(record(chart={"sunSign": "other"}, report="text", report_version="v1"))
+        self.assertEqual(second['chart'], CHART)
+        self.assertEqual((second['report'], second['reportVersion']), ("text", "v1"))
+        self.assertEqual(second['createdAt'], first['createdAt'])
+
+        third = self.store.upsert(record())
+        self.assertEqual((third['report'], third['reportVersion']), ("text", "v1"))
+        self.assertEqual(self.fresh().get("f" * 32)['report'], "text")
+
+    def test_client_write_clears_generated_version(self):
+        generated = make_record("f" * 32, "engine", CANONICAL, CHART, "text", "v1", generated_version="v1")
+        self.assertEqual(self.store.upsert(generated)['generatedVersion'], "v1")
+        self.assertEqual(self.store.upsert(record())['generatedVersion'], "v1")
+        self.assertIsNone(self.store.upsert(record(report="mine", report_version="v1"))['generatedVersion'])
+
+    def test_migrates_databases_without_generated_version(self):
+        path = os.path.join(self.tmp.name, 'old.sqlite3')
+        with sqlite3.connect(path) as conn:
+            conn.execute("CREATE TABLE reports (fingerprint TEXT PRIMARY KEY, engine_version TEXT NOT NULL, "
+                         "birth_date TEXT NOT NULL, birth_time TEXT NOT NULL, latitude TEXT NOT NULL, "
+                         "longitude TEXT NOT NULL, sun_sign TEXT, moon_sign TEXT, ascendant TEXT, chart TEXT NOT NULL, "
+                         "report TEXT, report_version TEXT, created REAL NOT NULL, updated REAL NOT NULL)")
+            conn.execute("INSERT INTO reports VALUES ('" + "f" * 32 + "', 'engine', '1990-01-15', '14:30', "
+                         "'40.7128', '-74.0060', NULL, NULL, NULL, '{}', '\"old\"', 'v1', 0, 0)")
+        store = ReportStore(path)
+        self.addCleanup(store.close)
+        stored = store.get("f" * 32)
+        self.assertEqual((stored['report'], stored['reportVersion'], stored['generatedVersion']), ("old", "v1", None))
+
+    def test_batched_writes(self):
+        self.assertEqual(self.store.upsert_many([record(f"{i:032x}", report={"n": i}) for i in range(50)]), 50)
+        found = self.fresh().get_many([f"{i:032x}" for i in (3, 7, 99)])
+        self.assertEqual(set(found), {f"{3:032x}", f"{7:032x}"})
+        self.assertEqual(found[f"{7:032x}"]['report'], {"n": 7})
+
+    def test_put_is_visible_before_flush(self):
+        self.store.put(record(report="draft", report_version="v1"))
+        self.store.put(record())
+        self.assertEqual(self.store.pending(), 1)
+        self.assertEqual(self.store.get("f" * 32)['report'], "draft")
+        self.assertIsNone(self.fresh().get("f" * 32))
+
+        self.assertEqual(self.store.flush(), 1)
+        self.assertEqual(self.store.pending(), 0)
+        self.assertEqual(self.fresh().get("f" * 32)['report'], "draft")
+
+    def test_full_batch_flushes_early(self):
+        store = ReportStore(self.path, batch_size=4, flush_interval=60)
+        self.addCleanup(store.close)
+        for i in range(4):
+            store.put(record(f"{i:032x}", report=i))
+        for _ in range(200):
+            if store.pending() == 0:
+                break
+            threading.Event().wait(0.01)
+        self.assertEqual(len(self.fresh().get_many([f"{i:032x}" for i in range(4)])), 4)
+
+    def test_close_flushes(self):
+        self.store.put(record(report="kept"))
+        self.store.close()
+        self.assertEqual(self.fresh().get("f" * 32)['report'], "kept")
+
+    def test_concurrent_identical_writes_make_one_row(self):
+        errors = []
+
+        def write():
+            try:
+                self.fresh().upsert(record(report="same"))
+            except Exception as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=write) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(errors, [])
+        self.assertEqual(self.store.stats()['reports'], 1)
+
+    def test_pool_is_bounded(self):
+        pool = ConnectionPool(self.path, size=2, timeout=0.05)
+        self.addCleanup(pool.close)
+        with pool.connection() as a, pool.connection() as b:
+            self.assertIsNot(a, b)
+            with self.assertRaises(sqlite3.OperationalError):
+                with pool.connection():
+                    pass
+        with pool.connection() as c:
+            self.assertIn(c, (a, b))
+        self.assertEqual(pool.opened, 2)
+
+BIRTH = {"birthDate": "1990-01-15", "birthTime": "14:30", "latitude": 40.7128, "longitude": -74.006}
+
+class TestReportEndpoints(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.store = ReportStore(os.path.join(self.tmp.name, 'reports.sqlite3'))
+        patcher = mock.patch.object(app_module, 'report_store', self.store)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.client = app.test_client()
+
+    def tearDown(self):
+        self.store.close()
+        self.tmp.cleanup()
+
+    def test_find_or_create(self):
+        created = self.client.post('/api/reports', json=BIRTH).get_json()
+        self.assertFalse(created['cached'])
+        self.assertEqual(created['chart']['sunSign'], "Capricorn")
+        self.assertIsNone(created['report'])
+
+        respelled = dict(BIRTH, birthDate="1990-1-15", latitude=40.71280001)
+        with mock.patch.object(app_module, 'compute_chart_response', side_effect=AssertionError("computed")):
+            again = self.client.post('/api/reports', json=respelled).get_json()
+            stored = self.client.post('/api/reports', json=dict(BIRTH, report={"text": "hi"}, reportVersion="t1")).get_json()
+        self.assertTrue(again['cached'])
+        self.assertEqual(again['fingerprint'], created['fingerprint'])
+        self.assertEqual(stored['report'], {"text": "hi"})
+
+        fetched = self.client.get(f"/api/reports/{created['fingerprint']}").get_json()
+        self.assertEqual((fetched['report'], fetched['reportVersion']), ({"text": "hi"}, "t1"))
+        self.assertEqual(self.client.get('/api/reports/' + "0" * 32).status_code, 404)
+
+    def test_invalid_birth(self):
+        self.assertEqual(self.client.post('/api/reports', json={"birthDate": "1990-01-15"}).status_code, 400)
+
+if __name__ == '__main__':
+    unittest.main()
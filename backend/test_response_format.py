@@ -0,0 +1,93 @@
+import unittest
+import os
+import sys
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import response_format
+from app import app
+from response_format import COMPACT_JSON, COMPACT_MSGPACK, JSON, MSGPACK, round_floats
+
+BIRTH = {"birthDate": "1990-01-15", "birthTime": "14:30", "latitude": 40.7128, "longitude": -74.0060}
+
+class TestResponseFormat(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.client = app.test_client()
+        cls.full = cls.client.post('/api/cosmic-signature', json=BIRTH).get_json()
+
+    def test_default_response_is_unchanged_json(self):
+        response = self.client.post('/api/cosmic-signature', json=BIRTH)
+        self.assertEqual(response.mimetype, JSON)
+        self.assertIn('Accept', response.headers['Vary'])
+        self.assertEqual(response.get_json()['planets'], self.full['planets'])
+
+    def test_field_projection(self):
+        response = self.client.post('/api/cosmic-signature?fields=planets,aspects', json=BIRTH)
+        self.assertEqual(set(response.get_json()), {'planets', 'aspects'})
+        response = self.client.post('/api/cosmic-signature?fields=planets,horoscope', json=BIRTH)
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('horoscope', response.get_json()['error'])
+
+    def test_precision(self):
+        data = self.client.post('/api/cosmic-signature?precision=2', json=BIRTH).get_json()
+        sun = self.full['planets']['Sun']['longitude']
+        self.assertEqual(data['planets']['Sun']['longitude'], round(sun, 2))
+        self.assertEqual(data['houses'], [round(cusp, 2) for cusp in self.full['houses']])
+        self.assertEqual(self.client.post('/api/cosmic-signature?precision=99', json=BIRTH).status_code, 400)
+
+    def test_small_values_keep_significant_digits(self):
+        self.assertEqual(round_floats({"p": 8.757862e-06, "lon": 295.39644, "n": 3, "s": "x"}, 3),
+                         {"p": 8.76e-06, "lon": 295.396, "n": 3, "s": "x"})
+        self.assertEqual(round_floats([0.0, 12.5], 0), [0.0, 12.0])
+
+    def test_compact_layout(self):
+        response = self.client.post('/api/cosmic-signature', json=BIRTH, headers={"Accept": COMPACT_JSON})
+        self.assertEqual(response.mimetype, COMPACT_JSON)
+        compact = response.get_json()
+        self.assertLess(len(response.data), len(self.client.post('/api/cosmic-signature', json=BIRTH).data) / 2)
+
+        self.assertEqual(compact['layout'], 'compact-1')
+        names, columns = compact['planetNames'], compact['planetColumns']
+        for name, row in zip(names, compact['planets']):
+            for column, value in zip(columns, row):
+                self.assertEqual(value, self.full['planets'][name][column])
+        self.assertEqual(compact['ascendant'], self.full['ascendantData']['longitude'])
+        self.assertEqual(compact['midheaven'], self.full['midheaven']['longitude'])
+
+        aspects = [(names[i], names[j], compact['aspectNames'][k], orb) for i, j, k, orb, _ in compact['aspects']]
+        self.assertEqual(aspects, [(a['planet1'], a['planet2'], a['aspect'], a['orb']) for a in self.full['aspects']])
+
+    def test_compact_projection_keeps_planet_index(self):
+        response = self.client.post('/api/cosmic-signature?fields=aspects', json=BIRTH, headers={"Accept": COMPACT_JSON})
+        compact = response.get_json()
+        self.assertEqual(set(compact), {'layout', 'planetNames', 'aspects', 'aspectNames'})
+        self.assertEqual(len(compact['aspects']), len(self.full['aspects']))
+
+    def test_unavailable_types_fall_back_to_json(self):
+        response = self.client.post('/api/cosmic-signature', json=BIRTH, headers={"Accept": "text/html"})
+        self.assertEqual(response.mimetype, JSON)
+        if response_format.msgpack is None:
+            response = self.client.post('/api/cosmic-signature', json=BIRTH, headers={"Accept": MSGPACK})
+            self.assertEqual(response.mimetype, JSON)
+
+    @unittest.skipIf(response_format.msgpack is None, "msgpack is not installed")
+    def test_msgpack(self):
+        for accept, expected in ((MSGPACK, MSGPACK), ("application/x-msgpack", MSGPACK), (COMPACT_MSGPACK, COMPACT_MSGPACK)):
+            response = self.client.post('/api/cosmic-signature', json=BIRTH, headers={"Accept": accept})
+            self.assertEqual(response.mimetype, expected)
+            decoded = response_format.msgpack.unpackb(response.data, raw=False)
+            self.assertIn('planets', decoded)
+
+    def test_batch_shapes_each_chart(self):
+        response = self.client.post('/api/cosmic-signature/batch?fields=sunSign,planets&precision=1',
+                                    json=[BIRTH, {"birthDate": "bad"}], headers={"Accept": COMPACT_JSON})
+        body = response.get_json()
+        self.assertEqual(response.mimetype, COMPACT_JSON)
+        self.assertEqual(body['succeeded'], 1)
+        data = body['results'][0]['data']
+        self.assertEqual(data['layout'], 'compact-1')
+        self.assertEqual(data['planets'][0][0], round(self.full['planets']['Sun']['longitude'], 1))
+        self.assertIn('error', body['results'][1])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,80 @@
+import unittest
+import os
+import random
+import sys
+from datetime import datetime
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import numpy as np
+import pytz
+import swisseph as swe
+
+from time_conversion import (
+    STATUS_AMBIGUOUS, STATUS_INVALID, STATUS_NONEXISTENT, STATUS_OK,
+    convert_local_times, local_to_julian_day
+)
+
+ZONES = ["America/New_York", "Europe/London", "Australia/Sydney", "Asia/Kolkata",
+         "America/Chicago", "Asia/Kathmandu", "UTC", "Etc/GMT+5"]
+
+def pytz_julian_day(date_str, time_str, zone_name):
+    """The conversion app.py used before time_conversion existed."""
+    local = datetime.strptime(f"{date_str} {time_str}", "%Y-%m-%d %H:%M")
+    utc = pytz.timezone(zone_name).localize(local).astimezone(pytz.UTC)
+    return swe.julday(utc.year, utc.month, utc.day, utc.hour + utc.minute / 60.0 + utc.second / 3600.0)
+
+class TestTimeConversion(unittest.TestCase):
+    def test_matches_pytz_on_random_times(self):
+        rng = random.Random(7)
+        dates, times, zones = [], [], []
+        for _ in range(2000):
+            dates.append(f"{rng.randint(1850, 2080)}-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}")
+            times.append(f"{rng.randint(0, 23):02d}:{rng.randint(0, 59):02d}")
+            zones.append(rng.choice(ZONES))
+
+        jds, statuses = convert_local_times(dates, times, zones)
+        expected = np.array([pytz_julian_day(*record) for record in zip(dates, times, zones)])
+        np.testing.assert_allclose(jds, expected, rtol=0, atol=1e-3 / 86400)
+        self.assertTrue(np.all(statuses >= STATUS_OK))
+
+    def test_dst_edge_cases(self):
+        # Clocks sprang forward over 02:00-03:00 and fell back over 01:00-02:00
+        cases = [
+            ("2021-03-14", "02:30", STATUS_NONEXISTENT),
+            ("2021-11-07", "01:30", STATUS_AMBIGUOUS),
+            ("2021-03-14", "03:00", STATUS_OK),
+            ("2021-11-07", "02:00", STATUS_OK),
+        ]
+        jds, statuses = convert_local_times(
+            [c[0] for c in cases], [c[1] for c in cases], ["America/New_York"] * len(cases)
+        )
+        self.assertEqual(statuses.tolist(), [c[2] for c in cases])
+        for (date_str, time_str, _), jd in zip(cases, jds):
+            self.assertAlmostEqual(jd, pytz_julian_day(date_str, time_str, "America/New_York"), delta=1e-8)
+
+    def test_ambiguous_time_uses_standard_offset(self):
+        jd, status = local_to_julian_day("2021-11-07", "01:30", "America/New_York")
+        self.assertEqual(status, "ambiguous")
+        self.assertAlmostEqual(jd, swe.julday(2021, 11, 7, 6.5), delta=1e-8)  # EST, UTC-5
+
+    def test_invalid_records_are_flagged(self):
+        jds, statuses = convert_local_times(
+            ["1990-02-30", "1990-01-15", "1990-01-15"],
+            ["10:00", "25:00", "10:00"],
+            ["UTC", "UTC", "Not/AZone"]
+        )
+        self.assertTrue(np.all(np.isnan(jds)))
+        self.assertTrue(np.all(statuses == STATUS_INVALID))
+        with self.assertRaises(ValueError):
+            local_to_julian_day("1990-01-15", "10:00", "Not/AZone")
+
+    def test_only_plain_ascii_fields_parse(self):
+        self.assertEqual(local_to_julian_day("1982-6-3", "4:26", "UTC")[1], "ok")
+        for date_str, time_str in (("+1982-06-03", "04:26"), ("1_982-06-03", "04:26"), (" 1982-06-03", "04:26"),
+                                   ("\u0661\u0669\u0668\u0662-06-03", "04:26"), ("1982-06-03", "4:2"),
+                                   ("1982-06-03", "04:26 "), ("1982-06-03", None)):
+            with self.assertRaises(ValueError):
+                local_to_julian_day(date_str, time_str, "UTC")
+
+if __name__ == '__main__':
+    unittest.main()
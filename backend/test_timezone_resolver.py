@@ -0,0 +1,90 @@
+import unittest
+import os
+import sys
+import tempfile
+from unittest import mock
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from timezonefinder import TimezoneFinder
+
+import timezone_resolver
+from timezone_resolver import TimezoneResolver, build_grid
+
+CITIES = [
+    (43.7508, -87.7145, "America/Chicago"),
+    (40.7128, -74.0060, "America/New_York"),
+    (51.5074, -0.1278, "Europe/London"),
+    (35.6762, 139.6503, "Asia/Tokyo"),
+    (-33.8688, 151.2093, "Australia/Sydney"),
+    (0.0, -30.0, "Etc/GMT+2"),
+]
+
+class TestTimezoneResolver(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.tmp = tempfile.TemporaryDirectory()
+        build_grid(cls.tmp.name, resolution=5.0)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.tmp.cleanup()
+
+    def test_resolves_known_cities(self):
+        resolver = TimezoneResolver(self.tmp.name)
+        for lat, lon, expected in CITIES:
+            self.assertEqual(resolver.resolve(lat, lon), expected)
+
+    def test_uniform_cells_skip_polygon_test(self):
+        resolver = TimezoneResolver(self.tmp.name)
+        self.assertEqual(resolver.resolve(-27.5, -32.5), "Etc/GMT+2")  # South Atlantic
+        self.assertEqual(resolver.stats()['gridHits'], 1)
+        self.assertEqual(resolver.stats()['polygonLookups'], 0)
+        self.assertIsNone(resolver._finder)
+
+    def test_resolve_many_matches_single_lookups(self):
+        resolver = TimezoneResolver(self.tmp.name)
+        lats = [lat for lat in range(-60, 70, 7) for _ in range(0, 360, 13)]
+        lons = [lon - 180 for _ in range(-60, 70, 7) for lon in range(0, 360, 13)]
+        zones = resolver.resolve_many(lats, lons)
+        fresh = TimezoneResolver(self.tmp.name)
+        self.assertEqual(zones, [fresh.resolve(lat, lon) for lat, lon in zip(lats, lons)])
+        self.assertGreater(resolver.stats()['gridHits'], 0)
+
+    def test_grid_agrees_with_timezonefinder(self):
+        resolver = TimezoneResolver(self.tmp.name)
+        finder = TimezoneFinder()
+        lats = [lat + 0.37 for lat in range(-89, 90, 3) for _ in range(-180, 180, 4)]
+        lons = [lon + 0.61 for _ in range(-89, 90, 3) for lon in range(-180, 180, 4)]
+        zones = resolver.resolve_many(lats, lons)
+        mismatches = sum(zone != finder.timezone_at(lat=lat, lng=lon) for lat, lon, zone in zip(lats, lons, zones))
+        self.assertEqual(mismatches, 0)
+        self.assertGreater(resolver.stats()['gridHits'], len(lats) // 4)
+
+    def test_shipped_grid_loads(self):
+        self.assertIsNotNone(TimezoneResolver().grid)
+
+    def test_grid_from_other_timezonefinder_is_ignored(self):
+        with mock.patch.object(timezone_resolver, 'timezonefinder_version', return_value="0.0.0"), \
+                self.assertLogs('timezone_resolver', 'ERROR'):
+            self.assertIsNone(TimezoneResolver(self.tmp.name).grid)
+
+    def test_without_grid_and_repeats_hit_cache(self):
+        with self.assertLogs('timezone_resolver', 'WARNING'):
+            resolver = TimezoneResolver(os.path.join(self.tmp.name, 'missing'))
+        self.assertEqual(resolver.resolve(43.7508, -87.7145), "America/Chicago")
+        self.assertEqual(resolver.resolve(43.7508, -87.7145), "America/Chicago")
+        self.assertEqual(resolver.stats()['polygonLookups'], 1)
+        self.assertEqual(resolver.stats()['cache']['hits'], 1)
+
+    def test_rejects_out_of_range(self):
+        resolver = TimezoneResolver(self.tmp.name)
+        with self.assertRaises(ValueError):
+            resolver.resolve(91.0, 0.0)
+        with self.assertRaises(ValueError):
+            resolver.resolve(float('nan'), 0.0)
+        for lats, lons in (([0.0], [181.0]), ([0.0, float('nan')], [0.0, 0.0]), ([0.0], [float('inf')])):
+            with self.assertRaises(ValueError):
+                resolver.resolve_many(lats, lons)
+
+if __name__ == '__main__':
+    unittest.main()
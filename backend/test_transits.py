@@ -0,0 +1,89 @@
+import unittest
+import os
+import sys
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import numpy as np
+import swisseph as swe
+
+from astrology_core import PLANET_IDS, get_zodiac_sign
+from transits import find_transit_events, iter_transit_timeline, jd_to_iso
+
+# Mercury stations retrograde on 2026-02-26 near 22° Pisces and direct on
+# 2026-03-20 near 8° Pisces.
+START = swe.julday(2026, 1, 1, 0.0)
+END = swe.julday(2026, 5, 1, 0.0)
+
+def longitude(name, jd):
+    return swe.calc_ut(jd, PLANET_IDS[name])[0][0]
+
+class TestTransitSearch(unittest.TestCase):
+    def test_retrograde_loop_gives_three_exact_passes(self):
+        natal = {'Venus': 345.0}  # 15° Pisces, inside Mercury's loop
+        events = find_transit_events(natal, START, END, bodies=['Mercury'],
+                                     include_ingresses=False, include_stations=False)
+        conjunctions = [e for e in events if e['aspect'] == "Conjunction"]
+        self.assertEqual(len(conjunctions), 3)
+        self.assertEqual([e['retrograde'] for e in conjunctions], [False, True, False])
+        for event in conjunctions:
+            self.assertAlmostEqual(longitude('Mercury', event['jd']), 345.0, places=4)
+
+    def test_stations_bracket_the_retrograde_passes(self):
+        events = find_transit_events({}, START, END, bodies=['Mercury'], include_ingresses=False)
+        stations = [e['direction'] for e in events if e['type'] == 'station']
+        self.assertEqual(stations, ["retrograde", "direct"])
+        self.assertTrue(events[0]['date'].startswith("2026-02-26"))
+
+    def test_moon_ingresses_match_hourly_scan(self):
+        end = START + 30
+        events = find_transit_events({}, START, end, bodies=['Moon'])
+        hours = START + np.arange(0, 30 * 24) / 24.0
+        signs = [get_zodiac_sign(longitude('Moon', jd)) for jd in hours]
+        changes = [signs[i + 1] for i in range(len(signs) - 1) if signs[i + 1] != signs[i]]
+        self.assertEqual([e['sign'] for e in events], changes)
+        for event in events:
+            self.assertEqual(get_zodiac_sign(longitude('Moon', event['jd'] + 1e-4)), event['sign'])
+
+    def test_every_aspect_event_is_exact(self):
+        natal = {'Sun': 72.48, 'Moon': 216.27, 'Ascendant': 57.51}
+        events = find_transit_events(natal, START, START + 60, include_ingresses=False,
+                                     include_stations=False)
+        self.assertTrue(events)
+        angles = {"Conjunction": 0, "Sextile": 60, "Square": 90, "Trine": 120, "Opposition": 180}
+        for event in events:
+            separation = abs((longitude(event['transit'], event['jd']) - natal[event['natal']] + 180) % 360 - 180)
+            self.assertAlmostEqual(separation, angles[event['aspect']], places=4)
+
+    def test_timeline_matches_single_search(self):
+        """Chunked streaming finds the same events as one search over the range."""
+        natal = {'Sun': 72.48, 'Moon': 216.27}
+        records = list(iter_transit_timeline(natal, START, 20, chunk_days=7))
+        days = [r for r in records if r['type'] == 'day']
+        events = [r for r in records if r['type'] != 'day']
+        self.assertEqual(len(days), 20)
+        self.assertEqual(days[0]['date'], "2026-01-01")
+        expected = find_transit_events(natal, START, START + 20)
+        self.assertEqual([(e['type'], e['transit']) for e in events],
+                         [(e['type'], e['transit']) for e in expected])
+        # Every event follows the summary of the day it falls on
+        current_day = None
+        for record in records:
+            if record['type'] == 'day':
+                current_day = record['date']
+            else:
+                self.assertEqual(record['date'][:10], current_day)
+
+    def test_daily_summary_aspects_are_within_orb(self):
+        natal = {'Sun': 72.48}
+        for day in iter_transit_timeline(natal, START, 5, orb=3.0):
+            if day['type'] != 'day':
+                continue
+            for aspect in day['aspects']:
+                self.assertLessEqual(aspect['orb'], 3.0)
+                self.assertEqual(aspect['natal'], 'Sun')
+
+    def test_jd_to_iso(self):
+        self.assertEqual(jd_to_iso(2451545.0), "2000-01-01T12:00:00Z")
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,97 @@
+import unittest
+import os
+import sys
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import numpy as np
+import swisseph as swe
+
+from aspect_engine import DEFAULT_CONFIG, find_aspects
+from astrology_core import PLANET_IDS, ZODIAC_SIGNS, calculate_planetary_positions_many
+from app import app
+from unknown_time import (
+    MAX_LATITUDE, ascendant_sign_intervals, aspect_intervals, local_day_bounds, planet_sign_intervals,
+    unknown_time_chart
+)
+
+LAT, LON, ZONE = 43.7508, -87.7145, 'America/Chicago'
+MINUTE = 1.0 / 1440.0
+
+class TestUnknownTime(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.start, cls.end = local_day_bounds('1982-06-03', ZONE)
+        cls.minutes = cls.start + MINUTE * np.arange(int(round((cls.end - cls.start) / MINUTE)))
+
+    def test_dst_day_is_23_hours(self):
+        start, end = local_day_bounds('2021-03-14', ZONE)
+        self.assertAlmostEqual((end - start) * 24.0, 23.0, places=6)
+
+    def test_ascendant_changes_match_swe_houses(self):
+        intervals = ascendant_sign_intervals(self.start, self.end, LAT, LON)
+        self.assertGreater(len(intervals), 10)
+        for (sign, _, until), (next_sign, since, _) in zip(intervals, intervals[1:]):
+            self.assertEqual(until, since)
+            before = swe.houses(until - 0.5 * MINUTE, LAT, LON, b'P')[1][0]
+            after = swe.houses(until + 0.5 * MINUTE, LAT, LON, b'P')[1][0]
+            self.assertEqual(ZODIAC_SIGNS[int(before // 30)], sign)
+            self.assertEqual(ZODIAC_SIGNS[int(after // 30)], next_sign)
+
+    def test_moon_sign_change_is_exact(self):
+        start, end = local_day_bounds('1982-06-05', ZONE)
+        moon = planet_sign_intervals(start, end, ['Moon'])['Moon']
+        self.assertEqual(len(moon), 2)
+        boundary = moon[0][2]
+        lon = swe.calc_ut(boundary, swe.MOON)[0][0]
+        self.assertAlmostEqual(abs((lon + 15.0) % 30.0 - 15.0), 0.0, places=4)
+
+    def test_aspects_match_minute_by_minute_scan(self):
+        names = list(PLANET_IDS)
+        positions = calculate_planetary_positions_many(self.minutes, names)
+        scanned = set()
+        for k in range(len(self.minutes)):
+            matrix = find_aspects(np.array([positions[name][k, 0] for name in names]), names_a=names)
+            for i, j in zip(*np.triu_indices(len(names), k=1)):
+                if matrix.aspect[i, j] >= 0:
+                    scanned.add((names[i], names[j], DEFAULT_CONFIG.names[matrix.aspect[i, j]]))
+
+        intervals = aspect_intervals(self.start, self.end)
+        self.assertEqual({interval[:3] for interval in intervals}, scanned)
+        for planet1, planet2, aspect, since, until in intervals:
+            self.assertLessEqual(since, until)
+            self.assertTrue(self.start <= since and until <= self.end)
+
+    def test_chart_payload(self):
+        chart = unknown_time_chart('2021-03-14', LAT, LON, ZONE)
+        self.assertEqual(chart['dayStart'], '2021-03-14T00:00:00-06:00')
+        self.assertEqual(chart['dayEnd'], '2021-03-15T00:00:00-05:00')
+        self.assertEqual(chart['moonSign'], chart['planetSigns']['Moon'])
+        self.assertEqual(chart['ascendantSign'][0]['start'], chart['dayStart'])
+        self.assertEqual(chart['ascendantSign'][-1]['end'], chart['dayEnd'])
+
+    def test_invalid_date(self):
+        with self.assertRaises(ValueError):
+            unknown_time_chart('1982-13-03', LAT, LON, ZONE)
+
+    def test_polar_latitudes_are_refused(self):
+        with self.assertRaises(ValueError):
+            unknown_time_chart('2021-03-14', 70.0, LON, ZONE)
+        # The bracketing grid still holds at the limit
+        start, end = local_day_bounds('2021-03-14', 'UTC')
+        intervals = ascendant_sign_intervals(start, end, MAX_LATITUDE, 0.0)
+        for (sign, _, until), (following, since, _) in zip(intervals, intervals[1:]):
+            self.assertEqual(until, since)
+            self.assertEqual(ZODIAC_SIGNS.index(following), (ZODIAC_SIGNS.index(sign) + 1) % 12)
+
+    def test_endpoint_validates_place(self):
+        client = app.test_client()
+        for place in ({"latitude": 95, "longitude": 0}, {"latitude": 70, "longitude": 20},
+                      {"latitude": "NaN", "longitude": 0}, {"latitude": 40}):
+            response = client.post('/api/cosmic-signature/unknown-time', json=dict(place, birthDate='2021-03-14'))
+            self.assertEqual(response.status_code, 400)
+        response = client.post('/api/cosmic-signature/unknown-time',
+                               json={"birthDate": '2021-03-14', "latitude": LAT, "longitude": LON})
+        self.assertEqual(response.get_json()['meta']['timezone'], ZONE)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,38 @@
+import unittest
+import os
+import sys
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import warmup
+from app import app, timezone_resolver
+from astrology_core import ephe_path_exists
+from timezone_resolver import TimezoneResolver
+
+@unittest.skipUnless(ephe_path_exists(), "Ephemeris data not installed")
+class TestWarmup(unittest.TestCase):
+    def setUp(self):
+        self.app = app.test_client()
+        self.app.testing = True
+        warmup._ready.clear()
+
+    def tearDown(self):
+        warmup._ready.clear()
+
+    def test_health_reports_starting_until_warm(self):
+        response = self.app.get('/health')
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response.get_json()['status'], "starting")
+
+        self.assertTrue(warmup.warm_up(timezone_resolver))
+        response = self.app.get('/health')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.get_json()['status'], "healthy")
+        self.assertIsNotNone(response.get_json()['worker']['warmupSeconds'])
+
+    def test_preload_loads_finder_in_memory(self):
+        resolver = TimezoneResolver()
+        warmup.preload(resolver)
+        self.assertTrue(resolver.finder.in_memory)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,374 @@
+#!/usr/bin/env python3
+"""
+timezone_resolver.py: Fast coordinate-to-timezone resolution.
+
+TimezoneFinder answers every query with a point-in-polygon test. Almost all
+of the globe, though, sits well inside a single zone, so this module keeps a
+coarse latitude/longitude grid of zone IDs built offline from
+TimezoneFinder's own polygons: a cell is uniform when no zone boundary
+crosses it, and such cells are answered straight from the grid. Only
+border cells (and any lookup made without a grid) fall through to
+TimezoneFinder, which is created lazily on first need.
+
+The grid ships in data/timezone_grid and must be rebuilt whenever the
+timezonefinder package (and so its zone data) is upgraded; a grid built
+from other data is ignored.
+
+Exact coordinates are memoised in an LRU, because popular birth cities
+repeat constantly, and `resolve_many` handles whole batches with a single
+vectorized grid lookup.
+
+Usage:
+    python timezone_resolver.py build [--resolution 0.5] [--out DIR]
+"""
+
+import argparse
+import json
+import logging
+import os
+import threading
+import time
+from importlib.metadata import PackageNotFoundError, version
+
+import numpy as np
+
+from chart_cache import LRUCache
+from metrics import record_cache, stage
+
+logger = logging.getLogger(__name__)
+
+# --- Constants and Configuration ---
+
+DEFAULT_GRID_PATH = os.environ.get(
+    'COSMIC_TIMEZONE_GRID', os.path.join(os.path.dirname(__file__), 'data', 'timezone_grid')
+)
+
+DEFAULT_RESOLUTION = 0.5
+
+# Grid value for cells that straddle a zone border.
+BORDER = -1
+
+# --- Helper Functions ---
+
+def timezonefinder_version():
+    """The installed timezonefinder version; a grid is only valid for the data it was built from."""
+    try:
+        return version('timezonefinder')
+    except PackageNotFoundError:
+        return None
+
+def offset_timezone(lon):
+    """Nautical timezone for a longitude, used when no zone polygon matches."""
+    offset_hours = round(lon / 15)
+    return f"Etc/GMT{-offset_hours if offset_hours >= 0 else f'+{abs(offset_hours)}'}"
+
+# --- Resolver ---
+
+class TimezoneResolver:
+    """
+    Resolves coordinates to IANA zone names using the grid, an LRU of exact
+    coordinates, and TimezoneFinder for border cells.
+
+    Args:
+        grid_path (str): Directory with grid.npy and zones.json; if missing,
+            every lookup goes to TimezoneFinder (still memoised).
+        cache_size (int): Number of exact coordinates to remember.
+    """
+
+    def __init__(self, grid_path=DEFAULT_GRID_PATH, cache_size=65536):
+        self.grid = None
+        self.zones = []
+        self.resolution = None
+        self._finder = None
+        self._finder_lock = threading.Lock()
+        self._cache = LRUCache(cache_size)
+        self.grid_hits = 0
+        self.polygon_lookups = 0
+
+        if not os.path.exists(os.path.join(grid_path, 'grid.npy')):
+            logger.warning("No timezone grid at %s; every lookup will run TimezoneFinder's polygon test. "
+                           "Build it with: python timezone_resolver.py build", grid_path)
+            return
+        try:
+            with open(os.path.join(grid_path, 'zones.json')) as f:
+                meta = json.load(f)
+            if meta.get('timezonefinder') != timezonefinder_version():
+                logger.error("Timezone grid at %s was built from timezonefinder %s, but %s is installed; "
+                             "ignoring it. Rebuild it with: python timezone_resolver.py build",
+                             grid_path, meta.get('timezonefinder'), timezonefinder_version())
+                return
+            self.zones = meta['zones']
+            self.resolution = meta['resolution']
+            self.grid = np.load(os.path.join(grid_path, 'grid.npy'), mmap_mode='r').view(np.ndarray)
+        except Exception as e:
+            logger.error("Error loading timezone grid from %s: %s", grid_path, e)
+            self.grid = None
+
+    @property
+    def finder(self):
+        """The TimezoneFinder instance, created on first use."""
+        if self._finder is None:
+            self.load_finder()
+        return self._finder
+
+    def load_finder(self, in_memory=False):
+        """
+        Creates the TimezoneFinder instance if it does not exist yet.
+
+        Args:
+            in_memory (bool): Read the polygon files fully into memory. By
+                default TimezoneFinder keeps them open and seeks on every
+                lookup, so a finder created before a fork would share file
+                offsets between processes; an in-memory finder is safe to
+                create in a pre-fork master and is shared copy-on-write.
+        """
+        with self._finder_lock:
+            if self._finder is None:
+                from timezonefinder import TimezoneFinder
+                self._finder = TimezoneFinder(in_memory=in_memory)
+        return self._finder
+
+    def _cells(self, lats, lons):
+        """Grid row/column indices for coordinate arrays."""
+        rows = np.clip(((lats + 90.0) / self.resolution).astype(np.int64), 0, self.grid.shape[0] - 1)
+        cols = np.clip(((lons + 180.0) / self.resolution).astype(np.int64), 0, self.grid.shape[1] - 1)
+        return rows, cols
+
+    def _polygon_lookup(self, lat, lon):
+        self.polygon_lookups += 1
+        with stage('timezone_polygon'):
+            return self.finder.timezone_at(lat=lat, lng=lon) or offset_timezone(lon)
+
+    def resolve(self, lat, lon):
+        """
+        Returns the IANA zone name for one coordinate.
+
+        Raises:
+            ValueError: If the coordinate is out of range.
+        """
+        if not (-90.0 <= lat <= 90.0 and -180.0 <= lon <= 180.0):
+            raise ValueError(f"Coordinates out of range: ({lat}, {lon})")
+
+        key = (lat, lon)
+        zone = self._cache.get(key)
+        record_cache('timezone', zone is not None)
+        if zone is not None:
+            return zone
+
+        zone_index = BORDER
+        if self.grid is not None:
+            rows, cols = self._cells(np.array([lat]), np.array([lon]))
+            zone_index = int(self.grid[rows[0], cols[0]])
+        if zone_index != BORDER:
+            self.grid_hits += 1
+            zone = self.zones[zone_index]
+        else:
+            zone = self._polygon_lookup(lat, lon)
+
+        self._cache.put(key, zone)
+        return zone
+
+    def resolve_many(self, lats, lons):
+        """
+        Resolves many coordinates at once.
+
+        Uniform cells are answered by one vectorized grid lookup; the
+        remaining coordinates are deduplicated and resolved individually.
+
+        Returns:
+            list: Zone names aligned with the inputs.
+
+        Raises:
+            ValueError: If any coordinate is out of range or not a number.
+        """
+        lats = np.asarray(lats, dtype=np.float64)
+        lons = np.asarray(lons, dtype=np.float64)
+        # NaN fails every comparison, so test for the valid range rather than against it
+        valid = np.isfinite(lats) & np.isfinite(lons) & (np.abs(lats) <= 90.0) & (np.abs(lons) <= 180.0)
+        if not valid.all():
+            position = int(np.argmin(valid))
+            raise ValueError(f"Coordinates out of range: ({lats[position]}, {lons[position]})")
+
+        result = [None] * len(lats)
+        pending = np.arange(len(lats))
+        if self.grid is not None and len(lats):
+            rows, cols = self._cells(lats, lons)
+            indices = self.grid[rows, cols]
+            uniform = indices != BORDER
+            self.grid_hits += int(uniform.sum())
+            for position, zone_index in zip(np.nonzero(uniform)[0].tolist(), indices[uniform].tolist()):
+                result[position] = self.zones[zone_index]
+            pending = np.nonzero(~uniform)[0]
+
+        for position in pending.tolist():
+            result[position] = self.resolve(float(lats[position]), float(lons[position]))
+        return result
+
+    def stats(self):
+        return {
+            "grid": self.grid is not None,
+            "gridHits": self.grid_hits,
+            "polygonLookups": self.polygon_lookups,
+            "cache": self._cache.stats()
+        }
+
+# --- Grid Build ---
+
+def _mark_edges(touched, xs, ys, resolution):
+    """
+    Marks every cell that a polygon ring's edges pass through.
+
+    Cells are half-open like the lookup in TimezoneResolver._cells, so an
+    edge lying on a grid line marks the cells that own that line.
+    """
+    rows, columns = touched.shape
+    x1, y1, x2, y2 = xs[:-1], ys[:-1], xs[1:], ys[1:]
+    col_lo = np.clip(((np.minimum(x1, x2) + 180.0) / resolution).astype(np.int64), 0, columns - 1)
+    col_hi = np.clip(((np.maximum(x1, x2) + 180.0) / resolution).astype(np.int64), 0, columns - 1)
+    row_lo = np.clip(((np.minimum(y1, y2) + 90.0) / resolution).astype(np.int64), 0, rows - 1)
+    row_hi = np.clip(((np.maximum(y1, y2) + 90.0) / resolution).astype(np.int64), 0, rows - 1)
+
+    # Almost every edge stays inside one cell
+    single = (col_lo == col_hi) & (row_lo == row_hi)
+    touched[row_lo[single], col_lo[single]] = True
+
+    # Longer edges: walk the columns they cross and mark the rows they span in each
+    for i in np.nonzero(~single)[0].tolist():
+        for col in range(col_lo[i], col_hi[i] + 1):
+            if x1[i] == x2[i]:
+                lat_lo, lat_hi = sorted((y1[i], y2[i]))
+            else:
+                left = max(min(x1[i], x2[i]), -180.0 + col * resolution)
+                right = min(max(x1[i], x2[i]), -180.0 + (col + 1) * resolution)
+                slope = (y2[i] - y1[i]) / (x2[i] - x1[i])
+                lat_lo, lat_hi = sorted((y1[i] + (left - x1[i]) * slope, y1[i] + (right - x1[i]) * slope))
+            first = min(max(int((lat_lo + 90.0) / resolution), 0), rows - 1)
+            last = min(max(int((lat_hi + 90.0) / resolution), 0), rows - 1)
+            touched[first:last + 1, col] = True
+
+def _shortcut_zone(finder, hex_id, inside):
+    """
+    What TimezoneFinder.timezone_at answers for a point in shortcut hex
+    `hex_id` that lies inside exactly the polygons for which `inside` is true.
+
+    timezone_at only tests the hex's candidate polygons, and not even those
+    of the last candidate zone, so near the poles, where the shortcut index
+    is incomplete, its answer depends on the hex as well as on the point.
+    """
+    from timezonefinder.utils import get_last_change_idx
+
+    polygons = finder.shortcut_mapping[hex_id]
+    if len(polygons) == 0:
+        return None
+    zone_ids = finder.zone_ids_of(polygons)
+    for i in range(get_last_change_idx(zone_ids)):
+        if inside(polygons[i]):
+            return finder.zone_name_from_id(zone_ids[i])
+    return finder.zone_name_from_id(zone_ids[-1])
+
+def _hexes_over(lat_lo, lat_hi, lon_lo, lon_hi, shortcut_res, boundaries):
+    """
+    Shortcut hexes that may overlap a cell: a flood fill from the hex at its
+    centre through every neighbour whose bounding box meets the cell, padded
+    for the curvature of hex edges.
+    """
+    import h3.api.basic_int as h3
+
+    centre_lon = (lon_lo + lon_hi) / 2
+    pad_lat = 0.05
+    pad_lon = min(pad_lat / max(np.cos(np.radians(max(abs(lat_lo), abs(lat_hi)))), 1e-3), 180.0)
+
+    def overlaps(hex_id):
+        if hex_id not in boundaries:
+            lats, lons = np.array(h3.h3_to_geo_boundary(hex_id)).T
+            poles = [pole for pole in (90.0, -90.0) if h3.geo_to_h3(pole, 0.0, shortcut_res) == hex_id]
+            boundaries[hex_id] = (lats, lons, poles)
+        lats, lons, poles = boundaries[hex_id]
+        top, bottom = max([lats.max(), *poles]), min([lats.min(), *poles])
+        if top < lat_lo - pad_lat or bottom > lat_hi + pad_lat:
+            return False
+        if poles:
+            return True
+        lons = (lons - centre_lon + 180.0) % 360.0 - 180.0 + centre_lon
+        return lons.max() >= lon_lo - pad_lon and lons.min() <= lon_hi + pad_lon
+
+    start = h3.geo_to_h3((lat_lo + lat_hi) / 2, centre_lon, shortcut_res)
+    seen, queue, found = {start}, [start], []
+    while queue:
+        hex_id = queue.pop()
+        if hex_id != start and not overlaps(hex_id):
+            continue
+        found.append(hex_id)
+        for neighbour in h3.k_ring(hex_id, 1):
+            if neighbour not in seen:
+                seen.add(neighbour)
+                queue.append(neighbour)
+    return found
+
+def build_grid(out_dir=DEFAULT_GRID_PATH, resolution=DEFAULT_RESOLUTION):
+    """
+    Builds the zone grid from TimezoneFinder's polygons.
+
+    Every edge of every zone polygon and hole is traced through the grid. A
+    cell that no edge touches lies entirely inside the same polygons, and is
+    uniform if TimezoneFinder gives that position the same answer in every
+    shortcut hex overlapping the cell; all other cells are borders. The
+    grid therefore never disagrees with TimezoneFinder.
+
+    Returns:
+        dict: Cell counts (uniform and border).
+    """
+    from timezonefinder import TimezoneFinder
+    from timezonefinder.configs import SHORTCUT_H3_RES
+    from timezonefinder.utils import coord2int
+
+    os.makedirs(out_dir, exist_ok=True)
+    rows = int(round(180.0 / resolution))
+    columns = int(round(360.0 / resolution))
+    started = time.perf_counter()
+    finder = TimezoneFinder(in_memory=True)
+
+    touched = np.zeros((rows, columns), dtype=bool)
+    for polygon in range(finder.nr_of_polygons):
+        # Rings as stored (degrees * 1e7); get_polygon converts them point by point
+        for ring in [finder.coords_of(polygon), *finder._holes_of_poly(polygon)]:
+            xs, ys = np.append(ring, ring[:, :1], axis=1) / 1e7  # closed
+            _mark_edges(touched, xs, ys, resolution)
+
+    zone_ids = {}
+    grid = np.full((rows, columns), BORDER, dtype=np.int16)
+    boundaries = {}
+    for row, col in np.argwhere(~touched).tolist():
+        lat_lo, lon_lo = -90.0 + row * resolution, -180.0 + col * resolution
+        x = coord2int(lon_lo + resolution / 2)
+        y = coord2int(lat_lo + resolution / 2)
+        membership = {}
+
+        def inside(polygon):
+            if polygon not in membership:
+                membership[polygon] = finder.inside_of_polygon(polygon, x, y)
+            return membership[polygon]
+
+        zones = {_shortcut_zone(finder, hex_id, inside) for hex_id in
+                 _hexes_over(lat_lo, lat_lo + resolution, lon_lo, lon_lo + resolution, SHORTCUT_H3_RES, boundaries)}
+        # Outside every polygon the zone follows the longitude, which may change inside the cell
+        if len(zones) == 1 and None not in zones:
+            grid[row, col] = zone_ids.setdefault(zones.pop(), len(zone_ids))
+
+    np.save(os.path.join(out_dir, 'grid.npy'), grid)
+    with open(os.path.join(out_dir, 'zones.json'), 'w') as f:
+        json.dump({"resolution": resolution, "timezonefinder": timezonefinder_version(), "zones": list(zone_ids)}, f)
+
+    border = int((grid == BORDER).sum())
+    print(f"Built {rows}x{columns} grid in {time.perf_counter() - started:.0f}s: "
+          f"{grid.size - border} uniform cells, {border} border cells, {len(zone_ids)} zones")
+    return {"uniform": grid.size - border, "border": border}
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Build the coarse timezone grid.")
+    sub = parser.add_subparsers(dest='command', required=True)
+    build_parser = sub.add_parser('build')
+    build_parser.add_argument('--resolution', type=float, default=DEFAULT_RESOLUTION)
+    build_parser.add_argument('--out', default=DEFAULT_GRID_PATH)
+    args = parser.parse_args()
+    build_grid(args.out, args.resolution)
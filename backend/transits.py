@@ -0,0 +1,364 @@
+#!/usr/bin/env python3
+"""
+transits.py: Exact transit, ingress and station search.
+
+Finds the moments at which transiting planets perfect an aspect to natal
+points, change sign, or station, over a window of Julian Days. Instead of
+stepping minute by minute, each planet is sampled on a coarse grid sized
+to its speed, stations are located first (where the sampled speed changes
+sign), and the grid is split at them so every sub-interval is monotonic in
+longitude. A monotonic interval crosses any given degree at most once, so
+bracketing reduces to a sign test against every target at once, and each
+bracket is polished by a safeguarded Newton iteration that uses the
+planet's speed as the derivative. Retrograde loops therefore produce their
+three passes naturally.
+
+All position lookups go through astrology_core, so the memory-mapped
+ephemeris table is used whenever it is available.
+
+`iter_transit_timeline` wraps the search in a generator that works through
+a date range a week at a time, interleaving daily summaries with the exact
+events, for the streaming timeline endpoint.
+"""
+
+from datetime import datetime, timedelta
+
+import numpy as np
+
+from aspect_engine import MAJOR_ASPECTS, AspectConfig, find_aspects
+from astrology_core import PLANET_IDS, ZODIAC_SIGNS, calculate_planetary_positions_many, get_zodiac_degree
+
+# --- Constants and Configuration ---
+
+# Coarse sampling step in days. Each is short enough that a body never
+# moves anywhere near 180° between samples, and far shorter than the gap
+# between two stations of the same body.
+SEARCH_STEPS = {
+    'Sun': 1.0,
+    'Moon': 0.25,
+    'Mercury': 1.0,
+    'Venus': 1.0,
+    'Mars': 2.0,
+    'Jupiter': 4.0,
+    'Saturn': 4.0,
+    'Uranus': 4.0,
+    'Neptune': 4.0,
+    'Pluto': 4.0
+}
+
+# Bodies that never station (geocentrically).
+NO_STATIONS = ('Sun', 'Moon')
+
+# Convergence tolerance for aspect/ingress roots, in degrees of longitude.
+LONGITUDE_TOLERANCE = 1e-6
+
+# Maximum refinement iterations; Newton usually converges in three.
+MAX_ITERATIONS = 12
+
+# Stations are bisected until the bracket is narrower than this (days).
+STATION_TOLERANCE = 1e-5
+
+JD_UNIX_EPOCH = 2440587.5
+
+# Timeline defaults: events are searched one chunk at a time, and daily
+# summaries list transit-to-natal aspects within this orb at noon UT.
+TIMELINE_CHUNK_DAYS = 7
+TIMELINE_ORB = 2.0
+SUMMARY_HOUR_UT = 12
+
+# --- Helper Functions ---
+
+def _wrap180(angle):
+    """Wraps angles to [-180, 180)."""
+    return (angle + 180.0) % 360.0 - 180.0
+
+def jd_to_iso(jd_ut):
+    """Formats a Julian Day (UT) as an ISO-8601 UTC timestamp, to the second."""
+    moment = datetime(1970, 1, 1) + timedelta(days=jd_ut - JD_UNIX_EPOCH)
+    return (moment + timedelta(microseconds=500000)).replace(microsecond=0).isoformat() + "Z"
+
+def natal_points_from_chart(chart_data):
+    """
+    Extracts the longitudes transits are measured against.
+
+    Args:
+        chart_data (dict): Output of get_astrological_data.
+
+    Returns:
+        dict: Point name -> ecliptic longitude, for the planets plus the
+              Ascendant and Midheaven.
+    """
+    points = {name: data['longitude'] for name, data in chart_data['planets'].items()}
+    ascendant = chart_data['ascendant']
+    if isinstance(ascendant, dict):
+        points['Ascendant'] = ascendant['longitude']
+    points['Midheaven'] = chart_data['midheaven']['longitude']
+    return points
+
+def _positions(name, jds):
+    """Longitude and longitude speed of one body at many instants."""
+    raw = calculate_planetary_positions_many(jds, [name])[name]
+    return raw[:, 0], raw[:, 3]
+
+def _aspect_targets(natal_points, aspects):
+    """
+    Expands natal points into the absolute longitudes that perfect each aspect.
+
+    Returns:
+        tuple: (target longitudes, natal point names, aspect names), aligned arrays.
+    """
+    longitudes, natal_names, aspect_names = [], [], []
+    for point, natal_lon in natal_points.items():
+        for aspect in aspects:
+            offsets = {aspect.angle % 360.0, -aspect.angle % 360.0}
+            for offset in sorted(offsets):
+                longitudes.append((natal_lon + offset) % 360.0)
+                natal_names.append(point)
+                aspect_names.append(aspect.name)
+    return np.array(longitudes), natal_names, aspect_names
+
+# --- Root Finding ---
+
+def _find_stations(name, grid, speeds):
+    """
+    Locates every station of a body inside the sampled grid.
+
+    Returns:
+        ndarray: Julian Days of the stations, in ascending order.
+    """
+    flips = np.nonzero(np.sign(speeds[:-1]) * np.sign(speeds[1:]) < 0)[0]
+    if not flips.size:
+        return np.empty(0)
+
+    lo = grid[flips]
+    hi = grid[flips + 1]
+    lo_sign = np.sign(speeds[flips])
+    while np.max(hi - lo) > STATION_TOLERANCE:
+        mid = 0.5 * (lo + hi)
+        _, mid_speed = _positions(name, mid)
+        same = np.sign(mid_speed) == lo_sign
+        lo = np.where(same, mid, lo)
+        hi = np.where(same, hi, mid)
+    return 0.5 * (lo + hi)
+
+def _refine_crossings(name, lo, hi, f_lo, f_hi, targets):
+    """
+    Polishes bracketed longitude crossings with safeguarded Newton steps.
+
+    Args:
+        lo, hi (ndarray): Bracket ends (Julian Days).
+        f_lo, f_hi (ndarray): Signed distance from target at the bracket ends.
+        targets (ndarray): Target longitudes.
+
+    Returns:
+        tuple: (Julian Days of the crossings, longitude speeds at them)
+    """
+    t = lo + (hi - lo) * f_lo / (f_lo - f_hi)
+    lo_negative = f_lo < 0
+    speed = np.zeros_like(t)
+    for _ in range(MAX_ITERATIONS):
+        lon, speed = _positions(name, t)
+        f = _wrap180(lon - targets)
+        if np.max(np.abs(f)) < LONGITUDE_TOLERANCE:
+            break
+        # Shrink the bracket around the root, then take a Newton step,
+        # falling back to bisection if it would leave the bracket
+        moves_lo = (f < 0) == lo_negative
+        lo = np.where(moves_lo, t, lo)
+        hi = np.where(moves_lo, hi, t)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            newton = t - f / speed
+        inside = (newton > lo) & (newton < hi)
+        t = np.where(inside, newton, 0.5 * (lo + hi))
+    return t, speed
+
+# --- Public API ---
+
+def find_transit_events(natal_points, start_jd, end_jd, bodies=None, aspects=MAJOR_ASPECTS,
+                        include_ingresses=True, include_stations=True):
+    """
+    Finds every exact transit, ingress and station in a window.
+
+    Args:
+        natal_points (dict): Point name -> natal longitude (see natal_points_from_chart).
+        start_jd, end_jd (float): Search window, Julian Days (UT).
+        bodies (list, optional): Transiting bodies; defaults to all of PLANET_IDS.
+        aspects (sequence): Aspect tuples to search for; orbs are ignored, only
+            exact perfections are reported.
+        include_ingresses (bool): Report sign changes.
+        include_stations (bool): Report retrograde and direct stations.
+
+    Returns:
+        list: Event dictionaries sorted by time. Every event has `type`
+              ('aspect', 'ingress' or 'station'), `jd`, `date` and `transit`.
+              Aspect events add `natal`, `aspect` and `retrograde`; ingress
+              events add `sign` and `retrograde`; stations add `direction`.
+    """
+    if end_jd <= start_jd:
+        return []
+
+    aspect_targets, natal_names, aspect_names = _aspect_targets(natal_points or {}, aspects)
+    sign_targets = np.arange(12) * 30.0 if include_ingresses else np.empty(0)
+    targets = np.concatenate([aspect_targets, sign_targets])
+
+    events = []
+    for name in (bodies or PLANET_IDS):
+        step = SEARCH_STEPS.get(name, 1.0)
+        count = int(np.ceil((end_jd - start_jd) / step)) + 1
+        grid = np.minimum(start_jd + step * np.arange(count), end_jd)
+        lons, speeds = _positions(name, grid)
+
+        stations = np.empty(0)
+        if name not in NO_STATIONS:
+            stations = _find_stations(name, grid, speeds)
+            if include_stations:
+                _, after = _positions(name, stations + 10 * STATION_TOLERANCE)
+                for jd, speed_after in zip(stations, after):
+                    events.append({
+                        "type": "station",
+                        "jd": float(jd),
+                        "date": jd_to_iso(jd),
+                        "transit": name,
+                        "direction": "retrograde" if speed_after < 0 else "direct"
+                    })
+
+        if not targets.size:
+            continue
+
+        # Split the grid at stations so longitude is monotonic between breakpoints
+        if stations.size:
+            station_lons, _ = _positions(name, stations)
+            order = np.argsort(np.concatenate([grid, stations]), kind='stable')
+            breakpoints = np.concatenate([grid, stations])[order]
+            lons = np.concatenate([lons, station_lons])[order]
+        else:
+            breakpoints = grid
+
+        # Signed distance to every target at each breakpoint, unwrapped along each interval
+        f_start = _wrap180(lons[:-1, None] - targets[None, :])
+        f_end = f_start + _wrap180(lons[1:] - lons[:-1])[:, None]
+        interval, target = np.nonzero((f_start < 0) != (f_end < 0))
+        if not interval.size:
+            continue
+
+        jds, hit_speeds = _refine_crossings(
+            name, breakpoints[interval], breakpoints[interval + 1],
+            f_start[interval, target], f_end[interval, target], targets[target]
+        )
+
+        for jd, speed, index in zip(jds.tolist(), hit_speeds.tolist(), target.tolist()):
+            event = {"jd": jd, "date": jd_to_iso(jd), "transit": name, "retrograde": speed < 0}
+            if index < len(aspect_targets):
+                event.update({"type": "aspect", "natal": natal_names[index], "aspect": aspect_names[index]})
+            else:
+                sign_index = index - len(aspect_targets)
+                if speed < 0:
+                    sign_index -= 1
+                event.update({"type": "ingress", "sign": ZODIAC_SIGNS[sign_index % 12]})
+            events.append(event)
+
+    events.sort(key=lambda event: event['jd'])
+    return events
+
+# --- Streaming Timeline ---
+
+def daily_summaries(natal_points, day_jds, orb=TIMELINE_ORB, aspects=MAJOR_ASPECTS):
+    """
+    Sky positions and active transit-to-natal aspects for a run of days.
+
+    All days are evaluated in one vectorized pass: positions come from a
+    single calculate_planetary_positions_many call, and aspects from one
+    (days, bodies, natal points) find_aspects stack.
+
+    Args:
+        natal_points (dict): Point name -> natal longitude.
+        day_jds (ndarray): Julian Days (UT) at which to summarise, one per day.
+        orb (float): Orb applied to every aspect.
+        aspects (sequence): Aspect tuples to test.
+
+    Returns:
+        list: One summary dict per day with `type` 'day', `jd`, `date`,
+              `positions` and `aspects`.
+    """
+    bodies = list(PLANET_IDS)
+    positions = calculate_planetary_positions_many(day_jds, bodies)
+    sky_lon = np.stack([positions[name][:, 0] for name in bodies], axis=-1)
+    sky_speed = np.stack([positions[name][:, 3] for name in bodies], axis=-1)
+
+    natal_names = list(natal_points)
+    natal_lon = np.array([natal_points[name] for name in natal_names])
+    config = AspectConfig([aspect._replace(orb=orb) for aspect in aspects])
+    matrix = find_aspects(sky_lon, natal_lon, speed_a=sky_speed, speed_b=np.zeros(len(natal_names)),
+                          config=config)
+
+    summaries = []
+    for day, jd in enumerate(day_jds.tolist()):
+        summaries.append({
+            "type": "day",
+            "jd": jd,
+            "date": jd_to_iso(jd)[:10],
+            "positions": {
+                name: {
+                    "longitude": round(float(sky_lon[day, b]), 4),
+                    "sign": ZODIAC_SIGNS[int(sky_lon[day, b] // 30) % 12],
+                    "degree": round(get_zodiac_degree(float(sky_lon[day, b])), 2),
+                    "retrograde": bool(sky_speed[day, b] < 0)
+                }
+                for b, name in enumerate(bodies)
+            },
+            "aspects": []
+        })
+
+    days, transit_index, natal_index = np.nonzero(matrix.aspect >= 0)
+    for day, b, n in zip(days.tolist(), transit_index.tolist(), natal_index.tolist()):
+        summaries[day]["aspects"].append({
+            "transit": bodies[b],
+            "natal": natal_names[n],
+            "aspect": config.names[int(matrix.aspect[day, b, n])],
+            "orb": round(float(matrix.orb[day, b, n]), 2),
+            "applying": bool(matrix.applying[day, b, n])
+        })
+    return summaries
+
+def iter_transit_timeline(natal_points, start_jd, days, chunk_days=TIMELINE_CHUNK_DAYS, orb=TIMELINE_ORB,
+                          bodies=None, aspects=MAJOR_ASPECTS):
+    """
+    Yields a day-by-day transit timeline, one chunk of days at a time.
+
+    Exact events are searched per chunk, so memory use depends on the chunk
+    length rather than the whole range, and the first day is available as
+    soon as the first chunk is done.
+
+    Args:
+        natal_points (dict): Point name -> natal longitude.
+        start_jd (float): Julian Day (UT) of 00:00 UT on the first day.
+        days (int): Number of days to cover.
+        chunk_days (int): Days searched per find_transit_events call.
+        orb (float): Orb for the daily summaries.
+        bodies (list, optional): Transiting bodies for exact events.
+        aspects (sequence): Aspects to search for and summarise.
+
+    Yields:
+        dict: For every day, its summary (see daily_summaries) followed by
+              that day's exact events (see find_transit_events), in time order.
+    """
+    for chunk_start in range(0, days, chunk_days):
+        chunk_end = min(chunk_start + chunk_days, days)
+        window_start = start_jd + chunk_start
+        window_end = start_jd + chunk_end
+
+        events = [
+            event for event in find_transit_events(natal_points, window_start, window_end, bodies, aspects)
+            if window_start <= event['jd'] < window_end
+        ]
+        summaries = daily_summaries(
+            natal_points, window_start + np.arange(chunk_end - chunk_start) + SUMMARY_HOUR_UT / 24.0, orb, aspects
+        )
+
+        position = 0
+        for day, summary in enumerate(summaries):
+            yield summary
+            day_end = window_start + day + 1
+            while position < len(events) and events[position]['jd'] < day_end:
+                yield events[position]
+                position += 1
@@ -0,0 +1,331 @@
+#!/usr/bin/env python3
+"""
+unknown_time.py: What a chart can say when only the birth date is known.
+
+Given a date and a place, this module reports the intervals of the local day
+during which each planet's sign, the Ascendant sign and each major aspect
+between planets hold. Rather than evaluating a chart for every minute, it
+locates the exact moments at which these change:
+
+- planet sign changes come from transits.find_transit_events, which brackets
+  and polishes ingresses with a safeguarded Newton iteration;
+- the Ascendant is a closed-form function of local sidereal time, which is
+  interpolated between two swe.sidtime calls, so its sign boundaries are
+  bracketed on a coarse grid and bisected without further ephemeris calls;
+- aspect boundaries (where a pair's separation enters or leaves the orb) are
+  bracketed on a six-hourly grid and refined by Newton steps on the separation,
+  using the planets' speeds as the derivative.
+"""
+
+from datetime import datetime, timedelta
+
+import numpy as np
+import pytz
+import swisseph as swe
+
+from aspect_engine import DEFAULT_CONFIG
+from astrocartography import relocated_angles
+from astrology_core import PLANET_IDS, ZODIAC_SIGNS, calculate_planetary_positions_many, get_obliquity
+from time_conversion import local_to_julian_day
+from transits import find_transit_events
+
+# --- Constants and Configuration ---
+
+# Grid used to bracket Ascendant sign changes, in days. Bracketing holds while
+# the Ascendant moves less than 180° per step. It moves fastest near the polar
+# circles: at most 11° in ten minutes at 60°, 38° at 65° and 85° at 66°, but
+# 167° at 66.5°. Charts are refused beyond MAX_LATITUDE.
+ASCENDANT_STEP = 10.0 / 1440.0
+MAX_LATITUDE = 66.0
+
+# Grid used to bracket aspect boundaries, in days. Entering and leaving
+# one aspect's orb window takes even the Moon about a day, so a window can
+# never open and close between two samples.
+ASPECT_STEP = 0.25
+
+# Root-finding tolerances, in days and degrees.
+TIME_TOLERANCE = 1e-6
+ANGLE_TOLERANCE = 1e-6
+MAX_ITERATIONS = 20
+
+JD_UNIX_EPOCH = 2440587.5
+
+# --- Helper Functions ---
+
+def _wrap180(angle):
+    """Wraps angles to [-180, 180)."""
+    return (angle + 180.0) % 360.0 - 180.0
+
+def local_day_bounds(date_str, zone_name):
+    """
+    Julian Days (UT) of local midnight at the start and end of a date.
+
+    DST transition days are 23 or 25 hours long, so the end is computed from
+    the next date rather than by adding 24 hours.
+
+    Raises:
+        ValueError: If the date or zone is invalid.
+    """
+    next_day = str(np.datetime64(date_str, 'D') + 1) if len(date_str) == 10 else None
+    if next_day is None:
+        raise ValueError(f"Invalid date: {date_str!r}")
+    start, _ = local_to_julian_day(date_str, "00:00", zone_name)
+    end, _ = local_to_julian_day(next_day, "00:00", zone_name)
+    return start, end
+
+def jd_to_local_iso(jd_ut, zone):
+    """Formats a Julian Day (UT) as local ISO-8601 time with offset, to the second."""
+    moment = datetime(1970, 1, 1, tzinfo=pytz.UTC) + timedelta(days=jd_ut - JD_UNIX_EPOCH)
+    moment = (moment + timedelta(microseconds=500000)).replace(microsecond=0)
+    return moment.astimezone(zone).isoformat()
+
+def _intervals(initial, changes, start, end):
+    """
+    Turns an initial state and time-ordered changes into intervals.
+
+    Args:
+        initial: The state at `start`.
+        changes (list): (jd, new_state) pairs inside [start, end).
+
+    Returns:
+        list: (state, start_jd, end_jd) tuples covering [start, end).
+    """
+    intervals = []
+    state, since = initial, start
+    for jd, new_state in changes:
+        if new_state == state:
+            continue
+        intervals.append((state, since, jd))
+        state, since = new_state, jd
+    intervals.append((state, since, end))
+    return intervals
+
+# --- Planet Signs ---
+
+def planet_sign_intervals(start_jd, end_jd, names=None):
+    """
+    Sign intervals for each planet over a window.
+
+    Returns:
+        dict: Planet name -> list of (sign, start_jd, end_jd).
+    """
+    names = list(names or PLANET_IDS)
+    positions = calculate_planetary_positions_many(np.array([start_jd]), names)
+
+    # Only bodies that could reach a sign boundary within the window are searched
+    candidates = []
+    for name in names:
+        lon, speed = positions[name][0, 0], positions[name][0, 3]
+        to_boundary = min(lon % 30.0, 30.0 - lon % 30.0)
+        if to_boundary <= 2.0 * abs(speed) * (end_jd - start_jd) + 0.1:
+            candidates.append(name)
+    events = []
+    if candidates:
+        events = find_transit_events({}, start_jd, end_jd, bodies=candidates, include_stations=False)
+
+    result = {}
+    for name in names:
+        initial = ZODIAC_SIGNS[int(positions[name][0, 0] // 30) % 12]
+        changes = [(event['jd'], event['sign']) for event in events if event['transit'] == name]
+        result[name] = _intervals(initial, changes, start_jd, end_jd)
+    return result
+
+# --- Ascendant ---
+
+def _ascendant_function(start_jd, end_jd, lon):
+    """
+    Returns a vectorized Ascendant-at-time function for one place and window.
+
+    Sidereal time is linear in time to well under an arcsecond over a day, so
+    it is interpolated between its values at the window ends; the obliquity
+    is taken once.
+    """
+    gast_start = swe.sidtime(start_jd) * 15.0
+    gast_end = swe.sidtime(end_jd) * 15.0
+    # Sidereal time gains ~361° per solar day; unwrap to the matching turn
+    turns = np.round(((end_jd - start_jd) * 360.98564736629 - (gast_end - gast_start)) / 360.0)
+    rate = (gast_end - gast_start + 360.0 * turns) / (end_jd - start_jd)
+    obliquity = get_obliquity(start_jd)
+
+    def ascendant(jds, lat):
+        armc = (gast_start + rate * (np.asarray(jds) - start_jd) + lon) % 360.0
+        return relocated_angles(armc, lat, obliquity)[0]
+    return ascendant
+
+def ascendant_sign_intervals(start_jd, end_jd, lat, lon):
+    """
+    Ascendant sign intervals over a window at one place.
+
+    Returns:
+        list: (sign, start_jd, end_jd) tuples.
+    """
+    ascendant = _ascendant_function(start_jd, end_jd, lon)
+    count = int(np.ceil((end_jd - start_jd) / ASCENDANT_STEP)) + 1
+    grid = np.minimum(start_jd + ASCENDANT_STEP * np.arange(count), end_jd)
+    values = ascendant(grid, lat)
+    unwrapped = values[0] + np.concatenate([[0.0], np.cumsum(_wrap180(np.diff(values)))])
+
+    # Every multiple of 30° passed between consecutive samples is a boundary
+    lo_index, targets = [], []
+    for k in range(count - 1):
+        low, high = sorted((unwrapped[k], unwrapped[k + 1]))
+        for boundary in np.arange(np.floor(low / 30.0) + 1, np.floor(high / 30.0) + 1) * 30.0:
+            lo_index.append(k)
+            targets.append(boundary)
+    if not targets:
+        return [(ZODIAC_SIGNS[int(values[0] // 30) % 12], start_jd, end_jd)]
+
+    lo_index = np.array(lo_index)
+    targets = np.array(targets)
+    lo, hi = grid[lo_index], grid[lo_index + 1]
+    rising = unwrapped[lo_index + 1] > unwrapped[lo_index]
+    for _ in range(60):
+        if np.max(hi - lo) < TIME_TOLERANCE:
+            break
+        mid = 0.5 * (lo + hi)
+        past = (_wrap180(ascendant(mid, lat) - targets) >= 0) == rising
+        hi = np.where(past, mid, hi)
+        lo = np.where(past, lo, mid)
+    jds = 0.5 * (lo + hi)
+
+    changes = []
+    for jd, target, up in sorted(zip(jds.tolist(), targets.tolist(), rising.tolist())):
+        sign_index = int(round(target / 30.0)) if up else int(round(target / 30.0)) - 1
+        changes.append((jd, ZODIAC_SIGNS[sign_index % 12]))
+    return _intervals(ZODIAC_SIGNS[int(values[0] // 30) % 12], changes, start_jd, end_jd)
+
+# --- Aspects ---
+
+def _pair_separations(names, jds):
+    """Separations of every planet pair at many instants, shape (len(jds), pairs)."""
+    positions = calculate_planetary_positions_many(jds, names)
+    lon = np.stack([positions[name][:, 0] for name in names], axis=-1)
+    i, j = np.triu_indices(len(names), k=1)
+    return np.abs(_wrap180(lon[:, j] - lon[:, i])), (i, j)
+
+def _refine_separations(body_a, body_b, lo, hi, f_lo, targets):
+    """
+    Polishes bracketed times at which |lon_b - lon_a| equals `targets`.
+
+    Only the bodies that appear in a bracket are evaluated, so a day whose
+    boundaries all involve the Moon costs a few Moon/partner lookups.
+
+    Returns:
+        ndarray: Julian Days of the crossings.
+    """
+    involved = sorted(set(body_a) | set(body_b))
+    column = {name: index for index, name in enumerate(involved)}
+    col_a = np.array([column[name] for name in body_a])
+    col_b = np.array([column[name] for name in body_b])
+    rows = np.arange(len(targets))
+
+    t = 0.5 * (lo + hi)
+    for _ in range(MAX_ITERATIONS):
+        positions = calculate_planetary_positions_many(t, involved)
+        lon = np.stack([positions[name][:, 0] for name in involved], axis=-1)
+        speed = np.stack([positions[name][:, 3] for name in involved], axis=-1)
+        delta = _wrap180(lon[rows, col_b] - lon[rows, col_a])
+        f = np.abs(delta) - targets
+        if np.max(np.abs(f)) < ANGLE_TOLERANCE:
+            break
+        same = np.sign(f) == np.sign(f_lo)
+        lo = np.where(same, t, lo)
+        hi = np.where(same, hi, t)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            newton = t - f / (np.sign(delta) * (speed[rows, col_b] - speed[rows, col_a]))
+        t = np.where((newton > lo) & (newton < hi), newton, 0.5 * (lo + hi))
+    return t
+
+def aspect_intervals(start_jd, end_jd, names=None, config=DEFAULT_CONFIG):
+    """
+    Intervals during which each aspect between two planets is within orb.
+
+    Returns:
+        list: (planet1, planet2, aspect name, start_jd, end_jd) tuples, one
+              per interval, for every aspect that holds at some point.
+    """
+    names = list(names or PLANET_IDS)
+    count = int(np.ceil((end_jd - start_jd) / ASPECT_STEP)) + 1
+    grid = np.minimum(start_jd + ASPECT_STEP * np.arange(count), end_jd)
+    separation, (pair_i, pair_j) = _pair_separations(names, grid)
+    orb_matrix = np.broadcast_to(config.orb_matrix(names, names), (len(names), len(names), len(config.names)))
+    orbs = orb_matrix[pair_i, pair_j]                                 # (pairs, aspects)
+
+    # Signed distance inside the orb window; positive means the aspect holds
+    inside = orbs[None] - np.abs(separation[:, :, None] - config.angles)   # (samples, pairs, aspects)
+    sample, pair, aspect = np.nonzero((inside[:-1] >= 0) != (inside[1:] >= 0))
+
+    # Each boundary is where the separation equals angle ± orb, on the side
+    # of the exact angle the first sample is on
+    below = separation[sample, pair] < config.angles[aspect]
+    targets = np.where(below, config.angles[aspect] - orbs[pair, aspect], config.angles[aspect] + orbs[pair, aspect])
+    t = np.empty(0)
+    if sample.size:
+        t = _refine_separations(
+            [names[pair_i[p]] for p in pair.tolist()], [names[pair_j[p]] for p in pair.tolist()],
+            grid[sample], grid[sample + 1], separation[sample, pair] - targets, targets
+        )
+
+    crossings = {}
+    for jd, p, a, s in zip(t.tolist(), pair.tolist(), aspect.tolist(), sample.tolist()):
+        crossings.setdefault((p, a), []).append((jd, bool(inside[s + 1, p, a] >= 0)))
+
+    result = []
+    active = set(zip(*np.nonzero(inside[0] >= 0)))
+    for p, a in sorted(set(crossings) | {(int(p), int(a)) for p, a in active}):
+        initial = (p, a) in active
+        for holds, since, until in _intervals(initial, sorted(crossings.get((p, a), [])), start_jd, end_jd):
+            if holds:
+                result.append((names[pair_i[p]], names[pair_j[p]], config.names[a], since, until))
+    result.sort(key=lambda interval: (interval[3], interval[0], interval[1]))
+    return result
+
+# --- Public API ---
+
+def unknown_time_chart(date_str, lat, lon, zone_name):
+    """
+    Everything that can be said about a chart whose birth time is unknown.
+
+    Args:
+        date_str (str): Local birth date, 'YYYY-MM-DD'.
+        lat, lon (float): Birth place.
+        zone_name (str): IANA timezone of the birth place.
+
+    Returns:
+        dict: `dayStart`/`dayEnd` and interval lists `planetSigns`
+              (per planet), `ascendantSign` and `aspects`; each interval has
+              local ISO `start` and `end` times. Values that hold all day
+              form a single interval.
+
+    Raises:
+        ValueError: If the date or zone is invalid, or the place is beyond
+            MAX_LATITUDE.
+    """
+    if abs(lat) > MAX_LATITUDE:
+        raise ValueError(f"Unknown-time charts are limited to latitudes within ±{MAX_LATITUDE:g}°")
+    start_jd, end_jd = local_day_bounds(date_str, zone_name)
+    zone = pytz.timezone(zone_name)
+    local = lambda jd: jd_to_local_iso(jd, zone)
+
+    planet_signs = {
+        name: [{"sign": sign, "start": local(since), "end": local(until)} for sign, since, until in intervals]
+        for name, intervals in planet_sign_intervals(start_jd, end_jd).items()
+    }
+    ascendant = [
+        {"sign": sign, "start": local(since), "end": local(until)}
+        for sign, since, until in ascendant_sign_intervals(start_jd, end_jd, lat, lon)
+    ]
+    aspects = [
+        {"planet1": planet1, "planet2": planet2, "aspect": aspect, "start": local(since), "end": local(until),
+         "allDay": since == start_jd and until == end_jd}
+        for planet1, planet2, aspect, since, until in aspect_intervals(start_jd, end_jd)
+    ]
+
+    return {
+        "dayStart": local(start_jd),
+        "dayEnd": local(end_jd),
+        "planetSigns": planet_signs,
+        "moonSign": planet_signs['Moon'],
+        "ascendantSign": ascendant,
+        "aspects": aspects
+    }
@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+warmup.py: Pre-fork preloading, per-worker warm-up and readiness.
+
+Under a pre-forking server the master imports the app once, and `preload`
+then loads everything that is expensive but read-only (TimezoneFinder's
+polygon data, the ephemeris table pages, zone transition tables) so that
+workers inherit it copy-on-write instead of each paying for it on their
+first request. After the fork, `warm_up` reopens the ephemeris files and
+computes one throwaway chart through the full request path, and only then
+marks the worker ready; `/health` reports 503 until that has happened.
+"""
+
+import logging
+import threading
+import time
+
+from astrology_core import (
+    calculate_all_planetary_positions, calculate_houses_and_angles, get_astrological_data, reset_ephemeris
+)
+from time_conversion import get_zone_transitions, local_to_julian_day
+
+logger = logging.getLogger(__name__)
+
+# --- Constants and Configuration ---
+
+# Warm-up chart: an arbitrary fixed birth record (Sheboygan, WI).
+WARMUP_RECORD = ("1982-06-03", "04:26", 43.7508, -87.7145)
+
+_ready = threading.Event()
+_state = {"warmupSeconds": None, "error": None}
+
+# --- Public API ---
+
+def preload(resolver):
+    """
+    Loads shared read-only data; call once in the master before forking.
+
+    Args:
+        resolver (TimezoneResolver): The app's timezone resolver.
+    """
+    resolver.load_finder(in_memory=True)
+    birth_date, birth_time, lat, lon = WARMUP_RECORD
+    zone = resolver.resolve(lat, lon)
+    get_zone_transitions(zone)
+    # Computing positions here faults in the ephemeris table pages once for
+    # every worker; the descriptors it opens are reset after the fork. The
+    # chart cache is bypassed so each worker's warm-up runs the full path.
+    jd, _ = local_to_julian_day(birth_date, birth_time, zone)
+    calculate_all_planetary_positions(jd)
+    calculate_houses_and_angles(jd, lat, lon)
+
+def warm_up(resolver):
+    """
+    Prepares a worker to serve, then marks it ready.
+
+    Reopens the ephemeris files (the master's descriptors must not be shared)
+    and runs one chart through timezone lookup, time conversion and the core
+    calculation. Failures are recorded and leave the worker not ready.
+
+    Returns:
+        bool: True if the worker is ready.
+    """
+    started = time.perf_counter()
+    try:
+        reset_ephemeris()
+        birth_date, birth_time, lat, lon = WARMUP_RECORD
+        zone = resolver.resolve(lat, lon)
+        jd, _ = local_to_julian_day(birth_date, birth_time, zone)
+        get_astrological_data(jd, lat, lon)
+    except Exception as e:
+        logger.exception("Worker warm-up failed")
+        _state["error"] = str(e)
+        return False
+
+    _state["warmupSeconds"] = round(time.perf_counter() - started, 4)
+    _state["error"] = None
+    _ready.set()
+    return True
+
+def is_ready():
+    """True once warm_up has completed successfully in this process."""
+    return _ready.is_set()
+
+def readiness():
+    """Readiness details for the health endpoint."""
+    return {"ready": is_ready(), **_state}
@@ -0,0 +1,40 @@
+#!/usr/bin/env python3
+"""
+wsgi.py: Production entry point.
+
+gunicorn imports this module once in the master (preload_app = True in
+gunicorn.conf.py), so `create_app` runs before any worker is forked and the
+data it loads is shared by all of them copy-on-write. Per-worker warm-up
+happens in the config's post_worker_init hook.
+
+Usage:
+    gunicorn -c gunicorn.conf.py
+"""
+
+import logging
+
+from app import app as flask_app, timezone_resolver
+from warmup import preload
+
+def configure_logging():
+    """Sends the application's log records to gunicorn's error log."""
+    gunicorn_logger = logging.getLogger('gunicorn.error')
+    root = logging.getLogger()
+    if gunicorn_logger.handlers:
+        root.handlers = gunicorn_logger.handlers
+        root.setLevel(gunicorn_logger.level)
+    else:
+        logging.basicConfig(level=logging.INFO)
+
+def create_app():
+    """
+    Returns the Flask app with shared data preloaded.
+
+    Returns:
+        Flask: The application object to serve.
+    """
+    configure_logging()
+    preload(timezone_resolver)
+    return flask_app
+
+app = create_app()
@@ -46,7 +46,7 @@ function App() {
         day: 'numeric'
       });
       
-      let sunSign, moonSign, ascendant, aspects, uniqueInsights, planets, ascendantData;
+      let sunSign, moonSign, ascendant, aspects, uniqueInsights, planets, ascendantData, backendRarity;
       let usingBackend = false;
       
       // Try to use the backend API first
@@ -69,6 +69,7 @@ function App() {
           uniqueInsights = backendData.uniqueInsights;
           planets = backendData.planets;
           ascendantData = backendData.ascendantData;
+          backendRarity = backendData.rarity?.oneIn;
           usingBackend = true;
           console.log('Using accurate Swiss Ephemeris calculations from backend');
         }
@@ -88,7 +89,8 @@ function App() {
       // Calculate additional chart data
       const elements = calculateElementalBalance(sunSign, moonSign, ascendant);
       const modalities = calculateModalityBalance(sunSign, moonSign, ascendant);
-      const rarity = calculateRarity(sunSign, moonSign, ascendant);
+      // Prefer the backend's statistical rarity; the local estimate is a fallback
+      const rarity = backendRarity ?? calculateRarity(sunSign, moonSign, ascendant);
       
       // Generate a unique sacred geometry pattern based on the birth data
       const pattern = generateSacredGeometryPattern(data);
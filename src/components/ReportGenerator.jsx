@@ -1,6 +1,5 @@
 import React, { useState } from 'react';
-import { fetchCosmicSignature } from '../lib/apiClient';
-import { fetchCosmicReport } from '../lib/supabaseClient';
+import { fetchCosmicSignature, saveCosmicReport, streamCosmicReport } from '../lib/apiClient';
 import { generateCosmicReport } from '../lib/openaiClient';
 import Hero from './Hero';
 import BirthDataForm from './BirthDataForm';
@@ -28,7 +27,21 @@ const ReportGenerator = () => {
       // Save the birth data for display
       setBirthData(formData);
       
-      // Generate OpenAI cosmic report with the astrological data
+      const birthRecord = {
+        birthDate: formData.birthDate,
+        birthTime: formData.birthTime,
+        latitude: parseFloat(formData.latitude),
+        longitude: parseFloat(formData.longitude)
+      };
+
+      // Generate the report on the backend, which stores it under the chart fingerprint
+      const backendReport = await streamCosmicReport(birthRecord);
+      if (backendReport) {
+        setReport({ ...cosmicData, ...backendReport });
+        return;
+      }
+
+      // Backend unavailable: generate OpenAI cosmic report in the browser
       const openAIReport = await generateCosmicReport({
         ...cosmicData,
         birthData: {
@@ -54,22 +67,8 @@ const ReportGenerator = () => {
       // Set the complete report
       setReport(completeReport);
       
-      // Optionally save to Supabase
-      try {
-        await fetchCosmicReport({
-          birth_date: formData.birthDate,
-          birth_time: formData.birthTime,
-          latitude: parseFloat(formData.latitude),
-          longitude: parseFloat(formData.longitude),
-          sun_sign: cosmicData.sunSign,
-          moon_sign: cosmicData.moonSign,
-          ascendant: cosmicData.ascendant,
-          report_content: cosmicData
-        });
-      } catch (supabaseError) {
-        console.error('Error saving to Supabase:', supabaseError);
-        // Continue even if Supabase save fails
-      }
+      // Persist the report on the backend, keyed by the chart fingerprint
+      await saveCosmicReport(birthRecord, openAIReport.cosmicReport);
     } catch (err) {
       setError('Error generating cosmic report: ' + err.message);
       console.error('Error generating cosmic report:', err);
@@ -36,6 +36,114 @@ export async function fetchCosmicSignature(birthData) {
   }
 }
 
+// Store a generated report under its chart fingerprint (find-or-create in one request)
+export async function saveCosmicReport(birthData, report, reportVersion) {
+  try {
+    const response = await fetch(`${API_BASE_URL}/api/reports`, {
+      method: 'POST',
+      headers: {
+        'Content-Type': 'application/json',
+      },
+      body: JSON.stringify({
+        birthDate: birthData.birthDate,
+        birthTime: birthData.birthTime || '12:00',
+        latitude: birthData.latitude,
+        longitude: birthData.longitude,
+        report,
+        reportVersion
+      }),
+      signal: AbortSignal.timeout(30000)
+    });
+
+    if (!response.ok) {
+      throw new Error(`Backend error: ${response.status} ${response.statusText}`);
+    }
+
+    return await response.json();
+  } catch (error) {
+    console.error('Error saving cosmic report:', error);
+    return null;
+  }
+}
+
+// Generate the narrative report on the backend, calling onToken with each streamed chunk.
+// Concurrent requests for the same chart share one generation; finished reports are stored.
+// The server closes long streams with a reconnect record, and we resume from its offset.
+export async function streamCosmicReport(birthData, onToken) {
+  try {
+    const birthRecord = {
+      birthDate: birthData.birthDate,
+      birthTime: birthData.birthTime || '12:00',
+      latitude: birthData.latitude,
+      longitude: birthData.longitude
+    };
+    let text = '';
+    let start = null;
+    let resume = null;
+
+    for (let attempt = 0; attempt < 10; attempt++) {
+      const response = await fetch(`${API_BASE_URL}/api/reports/generate`, {
+        method: 'POST',
+        headers: {
+          'Content-Type': 'application/json',
+          'Accept': 'application/x-ndjson'
+        },
+        body: JSON.stringify({ ...birthRecord, ...resume }),
+        signal: AbortSignal.timeout(60000)
+      });
+
+      if (!response.ok) {
+        throw new Error(`Backend error: ${response.status} ${response.statusText}`);
+      }
+
+      const reader = response.body.getReader();
+      const decoder = new TextDecoder();
+      let buffered = '';
+      let finished = false;
+      resume = null;
+      for (;;) {
+        const { done, value } = await reader.read();
+        if (done) break;
+        buffered += decoder.decode(value, { stream: true });
+        const lines = buffered.split('\n');
+        buffered = lines.pop();
+        for (const line of lines) {
+          if (!line) continue;
+          const record = JSON.parse(line);
+          if (record.type === 'start') {
+            start = record;
+            // The generation we were following is gone; this stream starts from the beginning
+            if (!record.resumed) text = '';
+          } else if (record.type === 'token') {
+            text += record.text;
+            if (onToken) onToken(record.text, text);
+          } else if (record.type === 'reconnect') {
+            resume = { generation: record.generation, offset: record.offset };
+          } else if (record.type === 'end') {
+            finished = true;
+          } else if (record.type === 'error') {
+            throw new Error(record.error);
+          }
+        }
+      }
+      if (finished) {
+        return {
+          cosmicReport: text,
+          fingerprint: start && start.fingerprint,
+          templateVersion: start && start.templateVersion,
+          cached: Boolean(start && start.cached),
+          timestamp: new Date().toISOString()
+        };
+      }
+      if (!resume) throw new Error('Report stream ended early');
+    }
+    throw new Error('Report generation did not finish');
+  } catch (error) {
+    console.error('Error generating report on backend:', error);
+    return null;
+  }
+}
+
 // Check if backend is available
 export async function checkBackendHealth() {
   try {
@@ -38,6 +38,37 @@ const COMMON_CITIES = {
   'detroit': { lat: 42.3314, lng: -83.0458 }
 };
 
+const API_BASE_URL = import.meta.env.VITE_API_URL || 'http://localhost:5000';
+
+// Geocode using the backend's offline gazetteer (fast, includes the timezone)
+export async function geocodeWithBackend(query) {
+  try {
+    const response = await fetch(
+      `${API_BASE_URL}/api/geocode?q=${encodeURIComponent(query)}&limit=1`,
+      { signal: AbortSignal.timeout(3000) }
+    );
+
+    if (!response.ok) throw new Error('Backend geocoder error');
+
+    const data = await response.json();
+    if (data.results && data.results.length > 0) {
+      const place = data.results[0];
+      return {
+        lat: place.latitude,
+        lng: place.longitude,
+        displayName: place.label,
+        placeId: place.placeId,
+        timezone: place.timezone
+      };
+    }
+
+    return null;
+  } catch (error) {
+    console.error('Backend geocoding error:', error);
+    return null;
+  }
+}
+
 // Geocode using OpenStreetMap Nominatim API (free, no key required)
 export async function geocodeWithNominatim(query) {
   try {
@@ -83,6 +114,15 @@ export async function geocodeLocation(query) {
     };
   }
   
+  // Then the backend gazetteer
+  const backendResult = await geocodeWithBackend(query);
+  if (backendResult) {
+    return {
+      ...backendResult,
+      source: 'gazetteer'
+    };
+  }
+
   // Try Nominatim as fallback
   const nominatimResult = await geocodeWithNominatim(query);
   if (nominatimResult) {